@@ -0,0 +1,181 @@
+"""
+alteracoes.py
+
+Log de alterações (change data capture) e sincronização incremental.
+
+Cada criação, atualização ou exclusão em um model do app (inclusive exclusões em cascata) grava
+uma linha em `Alteracao` (ver agric.signals). A `sequencia` da linha é o cursor da sincronização:
+`GET /api/changes/?since=<cursor>` retorna as alterações posteriores ao cursor, já com a
+representação atual de cada objeto criado ou alterado, e o cursor da próxima página.
+
+O id da linha não serve de cursor: é reservado no INSERT, e uma transação longa (virada de
+safra, importação) pode confirmar ids menores que os de transações já confirmadas. A sequência
+é numerada depois que a transação termina (`publicar`): no PostgreSQL, apenas as linhas de
+transações anteriores à mais antiga ainda em andamento (`pg_snapshot_xmin`), na ordem
+(transação, id); nos demais bancos, que serializam as escritas, todas as linhas confirmadas.
+Uma linha confirmada depois recebe uma sequência maior que qualquer cursor já entregue.
+
+- registrar / registrar_varias: gravam alterações (escritas em massa que não disparam sinais,
+  como `QuerySet.update`, devem chamar `registrar_varias` explicitamente).
+- publicar: numera as alterações de transações já terminadas.
+- pagina_de_alteracoes: monta uma página de deltas a partir de um cursor.
+- compactar: remove as alterações superadas por outra mais recente do mesmo objeto e as
+  anteriores à retenção (`CHANGES_RETENTION_DAYS`). Cursores anteriores ao que a retenção
+  removeu ficam expirados (`CursorExpirado`) e o consumidor deve recarregar as tabelas.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+
+from .models import Produtor, Estado, Cidade, TipoCultura, Propriedade, Cultura
+from .models import Alteracao, CompactacaoAlteracoes
+from .serializers import ProdutorSerializer, EstadoSerializer, CidadeSerializer
+from .serializers import TipoCulturaSerializer, PropriedadeSerializer, CulturaSerializer
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# nome -> (model, campo usado como chave na API, serializer, select_related)
+MODELOS = {
+    "produtor": (Produtor, "cpf_cnpj", ProdutorSerializer, ()),
+    "estado": (Estado, "id_estado", EstadoSerializer, ()),
+    "cidade": (Cidade, "id_cidade", CidadeSerializer, ()),
+    "tipocultura": (TipoCultura, "id_tipo_cultura", TipoCulturaSerializer, ()),
+    "propriedade": (Propriedade, "id_propriedade", PropriedadeSerializer, ("produtor",)),
+    "cultura": (Cultura, "id_cultura", CulturaSerializer, ()),
+}
+NOMES = {model: nome for nome, (model, *_) in MODELOS.items()}
+# Alterações numeradas por UPDATE na compactação.
+LOTE_PUBLICACAO = 10000
+
+
+class CursorExpirado(Exception):
+    """
+    O cursor é anterior às alterações já removidas pela retenção.
+    """
+    def __init__(self, cursor_minimo, cursor_atual):
+        super().__init__(f"Cursor anterior a {cursor_minimo}")
+        self.cursor_minimo = cursor_minimo
+        self.cursor_atual = cursor_atual
+
+
+def chave(instance) -> str:
+    return str(getattr(instance, MODELOS[NOMES[type(instance)]][1]))
+
+
+def registrar(instance, operacao):
+    Alteracao.objects.create(modelo=NOMES[type(instance)], chave=chave(instance), operacao=operacao)
+
+
+def registrar_varias(model, chaves, operacao, batch_size=1000):
+    agora = timezone.now()
+    Alteracao.objects.bulk_create(
+        [Alteracao(modelo=NOMES[model], chave=str(c), operacao=operacao, criado_em=agora) for c in chaves],
+        batch_size=batch_size)
+
+
+def cursor_minimo() -> int:
+    return CompactacaoAlteracoes.objects.aggregate(cursor=Max('cursor_minimo'))['cursor'] or 0
+
+
+def cursor_atual() -> int:
+    return Alteracao.objects.aggregate(cursor=Max('sequencia'))['cursor'] or 0
+
+
+def publicar(limite) -> int:
+    """
+    Numera (`sequencia`) até `limite` alterações de transações já terminadas, continuando a
+    maior sequência, e retorna quantas numerou. Um único publicador por vez: advisory lock no
+    PostgreSQL; nos demais bancos, o próprio UPDATE serializa.
+    """
+    tabela = Alteracao._meta.db_table
+    terminadas = ''
+    with transaction.atomic(savepoint=False), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [tabela])
+            terminadas = 'AND "transacao" < pg_snapshot_xmin(pg_current_snapshot())::text::bigint'
+        cursor.execute(
+            f'UPDATE "{tabela}" SET "sequencia" = p."base" + p."ordem" FROM ('
+            f'SELECT "id_alteracao", (SELECT COALESCE(MAX("sequencia"), 0) FROM "{tabela}") AS "base", '
+            f'ROW_NUMBER() OVER (ORDER BY "transacao", "id_alteracao") AS "ordem" FROM "{tabela}" '
+            f'WHERE "sequencia" IS NULL {terminadas} ORDER BY "transacao", "id_alteracao" LIMIT %s) AS p '
+            f'WHERE "{tabela}"."id_alteracao" = p."id_alteracao"',
+            [limite])
+        return cursor.rowcount
+
+
+def pagina_de_alteracoes(since=0, limite=None) -> dict:
+    """
+    Retorna {"cursor", "mais", "alteracoes"} com até `limite` (no máximo `CHANGES_PAGE_SIZE`)
+    alterações posteriores a `since`.
+
+    Cada objeto aparece uma única vez por página, com a última operação e sua representação
+    atual (`dados`; None nas exclusões). Antes da leitura, publica as alterações de transações
+    já terminadas; as de transações em andamento ficam para as próximas páginas.
+    """
+    minimo = cursor_minimo()
+    if since < minimo:
+        raise CursorExpirado(minimo, cursor_atual())
+    limite = min(limite or settings.CHANGES_PAGE_SIZE, settings.CHANGES_PAGE_SIZE)
+    publicadas = publicar(limite + 1)
+
+    linhas = list(Alteracao.objects.filter(sequencia__gt=since).order_by('sequencia')
+                  .values_list('sequencia', 'modelo', 'chave', 'operacao')[:limite + 1])
+    # Um lote cheio pode ter deixado alterações terminadas sem número.
+    mais = len(linhas) > limite or publicadas > limite
+    linhas = linhas[:limite]
+
+    ultimas = {}
+    for _, modelo, chave_objeto, operacao in linhas:
+        ultimas.pop((modelo, chave_objeto), None)
+        ultimas[(modelo, chave_objeto)] = operacao
+
+    # Uma consulta por model com objetos criados ou alterados na página.
+    dados = {}
+    for nome, (model, campo, serializer_class, relacionados) in MODELOS.items():
+        chaves = [c for (m, c), op in ultimas.items() if m == nome and op != Alteracao.EXCLUSAO]
+        if chaves:
+            objetos = model.objects.select_related(*relacionados).filter(**{f"{campo}__in": chaves})
+            dados.update(((nome, str(getattr(obj, campo))), serializer_class(obj).data) for obj in objetos)
+
+    alteracoes = []
+    for (modelo, chave_objeto), operacao in ultimas.items():
+        representacao = dados.get((modelo, chave_objeto))
+        if representacao is None:
+            # Removido depois: a exclusão também aparece adiante no log.
+            operacao = Alteracao.EXCLUSAO
+        alteracoes.append({"modelo": modelo, "chave": chave_objeto, "operacao": operacao, "dados": representacao})
+
+    return {"cursor": linhas[-1][0] if linhas else since, "mais": mais, "alteracoes": alteracoes}
+
+
+def compactar(dias=None) -> dict:
+    """
+    Compacta o log de alterações e retorna {"superadas", "expiradas", "cursor_minimo"}.
+
+    - Remove as alterações com outra mais recente para o mesmo objeto: quem sincroniza a partir
+      de qualquer cursor continua recebendo o estado final do objeto.
+    - Remove as alterações anteriores a `dias` (padrão `CHANGES_RETENTION_DAYS`) e registra a
+      maior sequência removida como cursor mínimo aceito.
+    """
+    dias = settings.CHANGES_RETENTION_DAYS if dias is None else dias
+    # Uma alteração sem número não pode expirar: o cursor mínimo não a cobriria.
+    while publicar(LOTE_PUBLICACAO) == LOTE_PUBLICACAO:
+        pass
+    superadas, _ = Alteracao.objects.filter(Exists(Alteracao.objects.filter(
+        modelo=OuterRef('modelo'), chave=OuterRef('chave'), id_alteracao__gt=OuterRef('id_alteracao')))).delete()
+
+    antigas = Alteracao.objects.filter(criado_em__lt=timezone.now() - timedelta(days=dias))
+    maior_removido = antigas.aggregate(cursor=Max('sequencia'))['cursor']
+    expiradas = 0
+    if maior_removido is not None:
+        expiradas, _ = Alteracao.objects.filter(sequencia__lte=maior_removido).delete()
+    minimo = max(cursor_minimo(), maior_removido or 0)
+    CompactacaoAlteracoes.objects.create(cursor_minimo=minimo, removidas=superadas + expiradas)
+    logger.info("Log de alterações compactado: %d superadas, %d expiradas, cursor mínimo %d",
+                superadas, expiradas, minimo)
+    return {"superadas": superadas, "expiradas": expiradas, "cursor_minimo": minimo}
@@ -0,0 +1,380 @@
+"""
+analytics.py
+
+Motor analítico em memória (colunar, NumPy) para agregações ad-hoc sobre propriedades e culturas.
+
+Cada processo mantém um snapshot colunar de Produtor, Propriedade e Cultura:
+- dimensões codificadas por dicionário (inteiros densos): cidade, produtor, tipo_cultura e
+  ano_safra. Estado e tipo_documento são derivados na consulta (cidade -> estado pelo cache de
+  referência, produtor -> tipo de documento), então mudanças de cidade de estado valem sem
+  reler as propriedades;
+- medidas em arrays float64 (áreas).
+
+O snapshot é validado pelas versões de Produtor, Propriedade e Cultura (`agric.versioning`):
+enquanto elas não mudam, as consultas não tocam o banco. Quando mudam, apenas os objetos
+registrados no log de alterações desde o último cursor (`agric.alteracoes`) são relidos. O
+snapshot é reconstruído por inteiro quando o cursor expira, quando há alterações demais
+(`ANALYTICS_INCREMENTAL_LIMIT`) ou a cada `ANALYTICS_MAX_AGE` segundos, o que também absorve
+escritas em massa que não passam pelo log.
+
+- snapshot.consultar(fonte, dimensoes, medidas): agrupa e agrega; usado por GET /api/analytics/.
+"""
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .alteracoes import cursor_atual, cursor_minimo, publicar
+from .models import Produtor, Propriedade, Cultura, Alteracao
+from .refcache import cidades, estados, tipos_cultura
+from .versioning import get_versions
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# fonte -> (dimensões, medidas numéricas)
+FONTES = {
+    "propriedades": (("estado", "cidade", "produtor", "tipo_documento"),
+                     ("area_total", "area_agricultavel", "area_vegetacao")),
+    "culturas": (("estado", "cidade", "produtor", "tipo_documento", "tipo_cultura", "ano_safra"),
+                 ("area",)),
+}
+FUNCOES = ("count", "sum", "mean", "distinct")
+MODELOS = (Produtor, Propriedade, Cultura)
+
+
+class ConsultaInvalida(ValueError):
+    """
+    Fonte, dimensão ou medida desconhecida.
+    """
+
+
+class Dicionario:
+    """
+    Codificação por dicionário: valor -> código inteiro denso, na ordem de chegada.
+    """
+    def __init__(self):
+        self.codigos = {}
+        self.valores = []
+
+    def codificar(self, valor) -> int:
+        codigo = self.codigos.get(valor)
+        if codigo is None:
+            codigo = self.codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return codigo
+
+    def codificar_varios(self, valores) -> np.ndarray:
+        return np.fromiter((self.codificar(v) for v in valores), dtype=np.int32, count=len(valores))
+
+    def __len__(self):
+        return len(self.valores)
+
+
+class Tabela:
+    """
+    Colunas NumPy com uma linha por objeto, endereçadas pela chave primária (codificada por
+    dicionário). Cresce por duplicação; linhas removidas ficam inativas até a reconstrução.
+    """
+    def __init__(self, tipos):
+        self.linhas = Dicionario()
+        self.colunas = {nome: np.zeros(0, dtype=tipo) for nome, tipo in tipos.items()}
+        self.ativo = np.zeros(0, dtype=bool)
+
+    def _crescer(self, tamanho):
+        if tamanho <= len(self.ativo):
+            return
+        capacidade = max(tamanho, 2 * len(self.ativo), 1024)
+        for nome, coluna in self.colunas.items():
+            nova = np.zeros(capacidade, dtype=coluna.dtype)
+            nova[:len(coluna)] = coluna
+            self.colunas[nome] = nova
+        ativo = np.zeros(capacidade, dtype=bool)
+        ativo[:len(self.ativo)] = self.ativo
+        self.ativo = ativo
+
+    def linhas_de(self, pks) -> np.ndarray:
+        """
+        Retorna os números das linhas de `pks`, reservando (inativas) as que ainda não existem.
+        """
+        linhas = self.linhas.codificar_varios(pks)
+        self._crescer(len(self.linhas))
+        return linhas
+
+    def gravar(self, pks, valores) -> np.ndarray:
+        """
+        Insere ou sobrescreve as linhas de `pks` com `valores` ({coluna: sequência}).
+        Retorna os números das linhas.
+        """
+        linhas = self.linhas_de(pks)
+        for nome, coluna in valores.items():
+            self.colunas[nome][linhas] = coluna
+        self.ativo[linhas] = True
+        return linhas
+
+    def remover(self, pks):
+        linhas = [self.linhas.codigos[pk] for pk in pks if pk in self.linhas.codigos]
+        self.ativo[linhas] = False
+
+    def ativas(self) -> np.ndarray:
+        return self.ativo[:len(self.linhas)]
+
+    def coluna(self, nome) -> np.ndarray:
+        return self.colunas[nome][:len(self.linhas)]
+
+
+class Snapshot:
+    """
+    Cópia colunar de Produtor, Propriedade e Cultura, atualizada a partir do log de alterações.
+    """
+    # Colunas lidas de cada model.
+    PRODUTOR = ("id_produtor", "cpf_cnpj", "tipo_documento")
+    PROPRIEDADE = ("id_propriedade", "cidade_id", "produtor_id", "area_total", "area_agricultavel", "area_vegetacao")
+    CULTURA = ("id_cultura", "propriedade_id", "tipo_cultura_id", "ano_safra", "area")
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.cidades = Dicionario()
+            self.estados = Dicionario()
+            self.tipos_cultura = Dicionario()
+            self.anos = Dicionario()
+            self.tipos_documento = Dicionario()
+            self.documentos = {}  # linha do produtor -> cpf_cnpj
+            self.produtores = Tabela({"tipo_documento": np.int32})
+            self.propriedades = Tabela({"cidade": np.int32, "produtor": np.int32, "area_total": np.float64,
+                                        "area_agricultavel": np.float64, "area_vegetacao": np.float64})
+            self.culturas = Tabela({"propriedade": np.int32, "tipo_cultura": np.int32, "ano_safra": np.int32,
+                                    "area": np.float64})
+            self.cursor = 0
+            self.versoes = None
+            self.construido_em = 0.0
+
+    # Carga
+
+    def _gravar_produtores(self, linhas):
+        if linhas:
+            pks, documentos, tipos = zip(*linhas)
+            gravadas = self.produtores.gravar(pks, {"tipo_documento": self.tipos_documento.codificar_varios(tipos)})
+            self.documentos.update(zip(gravadas.tolist(), documentos))
+
+    def _gravar_propriedades(self, linhas):
+        if linhas:
+            pks, cidade_ids, produtor_ids, totais, agricultaveis, vegetacoes = zip(*linhas)
+            self.propriedades.gravar(pks, {
+                "cidade": self.cidades.codificar_varios(cidade_ids),
+                "produtor": self.produtores.linhas_de(produtor_ids),
+                "area_total": totais, "area_agricultavel": agricultaveis, "area_vegetacao": vegetacoes,
+            })
+
+    def _gravar_culturas(self, linhas):
+        if linhas:
+            pks, propriedade_ids, tipo_ids, anos, areas = zip(*linhas)
+            self.culturas.gravar(pks, {
+                "propriedade": self.propriedades.linhas_de(propriedade_ids),
+                "tipo_cultura": self.tipos_cultura.codificar_varios(tipo_ids),
+                "ano_safra": self.anos.codificar_varios(anos), "area": areas,
+            })
+
+    @staticmethod
+    def _ler(model, campos, **filtros):
+        return list(model.objects.filter(**filtros).order_by().values_list(*campos).iterator(chunk_size=10000))
+
+    def _reconstruir(self, versoes):
+        inicio = time.monotonic()
+        self.reset()
+        # Lido antes das linhas: alterações concorrentes à carga são reaplicadas depois.
+        self.cursor = cursor_atual()
+        self._gravar_produtores(self._ler(Produtor, self.PRODUTOR))
+        self._gravar_propriedades(self._ler(Propriedade, self.PROPRIEDADE))
+        self._gravar_culturas(self._ler(Cultura, self.CULTURA))
+        self.versoes = versoes
+        self.construido_em = time.monotonic()
+        logger.info("Snapshot analítico reconstruído: %d propriedades, %d culturas em %.3fs",
+                    len(self.propriedades.linhas), len(self.culturas.linhas), self.construido_em - inicio)
+
+    def _aplicar_alteracoes(self, versoes) -> bool:
+        """
+        Relê os objetos alterados desde o cursor. Retorna False se for preciso reconstruir.
+        """
+        if self.cursor < cursor_minimo():
+            return False
+        limite = settings.ANALYTICS_INCREMENTAL_LIMIT
+        # Mesmo cursor de /api/changes/: só as alterações de transações já terminadas.
+        publicar(limite + 1)
+        linhas = list(Alteracao.objects.filter(sequencia__gt=self.cursor, modelo__in=("produtor", "propriedade", "cultura"))
+                      .order_by('sequencia').values_list('sequencia', 'modelo', 'chave', 'operacao')[:limite + 1])
+        if len(linhas) > limite:
+            return False
+        # Alterações ainda sem número (transações em andamento): as versões não são marcadas como lidas.
+        completo = not Alteracao.objects.filter(sequencia__isnull=True).exists()
+
+        ultimas = {}
+        for _, modelo, chave, operacao in linhas:
+            ultimas[(modelo, chave)] = operacao
+        alterados = {modelo: [] for modelo in ("produtor", "propriedade", "cultura")}
+        removidos = {modelo: [] for modelo in ("propriedade", "cultura")}
+        for (modelo, chave), operacao in ultimas.items():
+            if operacao != Alteracao.EXCLUSAO:
+                alterados[modelo].append(chave)
+            elif modelo in removidos:
+                # Produtores removidos não têm linhas próprias nas fontes: basta remover suas propriedades.
+                removidos[modelo].append(int(chave))
+
+        if alterados["produtor"]:
+            self._gravar_produtores(self._ler(Produtor, self.PRODUTOR, cpf_cnpj__in=alterados["produtor"]))
+        for modelo, model, campos, tabela, gravar in (
+                ("propriedade", Propriedade, self.PROPRIEDADE, self.propriedades, self._gravar_propriedades),
+                ("cultura", Cultura, self.CULTURA, self.culturas, self._gravar_culturas)):
+            pks = [int(chave) for chave in alterados[modelo]]
+            if pks:
+                lidas = self._ler(model, campos, pk__in=pks)
+                gravar(lidas)
+                # Alterado e removido depois: a exclusão ainda não foi lida do log.
+                removidos[modelo] += set(pks) - {linha[0] for linha in lidas}
+            tabela.remover(removidos[modelo])
+
+        if linhas:
+            self.cursor = linhas[-1][0]
+        if completo:
+            self.versoes = versoes
+        logger.debug("Snapshot analítico atualizado com %d alterações (cursor %d)", len(linhas), self.cursor)
+        return True
+
+    def atualizar(self):
+        versoes = get_versions(MODELOS)
+        if versoes == self.versoes and time.monotonic() - self.construido_em < settings.ANALYTICS_MAX_AGE:
+            return
+        with self._lock:
+            if versoes == self.versoes and time.monotonic() - self.construido_em < settings.ANALYTICS_MAX_AGE:
+                return
+            if not self.construido_em or time.monotonic() - self.construido_em >= settings.ANALYTICS_MAX_AGE or \
+                    not self._aplicar_alteracoes(versoes):
+                self._reconstruir(versoes)
+
+    # Consulta
+
+    def _colunas(self, fonte) -> tuple:
+        """
+        Retorna ({dimensão: códigos}, {medida: valores}, {dimensão: cardinalidade}) das linhas ativas.
+        """
+        estado_da_cidade = {cidade.pk: cidade.estado_id for cidade in cidades.all()}
+        estado_por_codigo = self.estados.codificar_varios([estado_da_cidade.get(pk) for pk in self.cidades.valores])
+        tipo_por_produtor = self.produtores.coluna("tipo_documento")
+
+        propriedades = self.propriedades
+        if fonte == "propriedades":
+            ativas = propriedades.ativas()
+            linhas = np.nonzero(ativas)[0]
+            medidas = {nome: propriedades.coluna(nome)[linhas] for nome in FONTES[fonte][1]}
+            dimensoes = {}
+        else:
+            culturas = self.culturas
+            # Culturas cuja propriedade ainda não foi lida (carga concorrente) ficam de fora.
+            ativas = culturas.ativas() & propriedades.ativas()[culturas.coluna("propriedade")]
+            linhas_culturas = np.nonzero(ativas)[0]
+            linhas = culturas.coluna("propriedade")[linhas_culturas]
+            medidas = {"area": culturas.coluna("area")[linhas_culturas]}
+            dimensoes = {"tipo_cultura": culturas.coluna("tipo_cultura")[linhas_culturas],
+                         "ano_safra": culturas.coluna("ano_safra")[linhas_culturas]}
+        cidade = propriedades.coluna("cidade")[linhas]
+        produtor = propriedades.coluna("produtor")[linhas]
+        dimensoes.update(cidade=cidade, produtor=produtor, estado=estado_por_codigo[cidade],
+                         tipo_documento=tipo_por_produtor[produtor])
+        cardinalidades = {"cidade": len(self.cidades), "produtor": len(self.produtores.linhas),
+                          "estado": len(self.estados), "tipo_documento": len(self.tipos_documento),
+                          "tipo_cultura": len(self.tipos_cultura), "ano_safra": len(self.anos)}
+        return dimensoes, medidas, cardinalidades
+
+    def _rotulo(self, dimensao, codigo):
+        if dimensao == "estado":
+            pk = self.estados.valores[codigo]
+            return estados.nome(pk) if pk is not None else None
+        if dimensao == "cidade":
+            return cidades.nome(self.cidades.valores[codigo])
+        if dimensao == "tipo_cultura":
+            return tipos_cultura.nome(self.tipos_cultura.valores[codigo])
+        if dimensao == "produtor":
+            return self.documentos.get(codigo)
+        if dimensao == "tipo_documento":
+            return self.tipos_documento.valores[codigo]
+        return self.anos.valores[codigo]
+
+    def consultar(self, fonte, dimensoes=(), medidas=("count",)) -> list:
+        """
+        Agrupa as linhas de `fonte` pelas `dimensoes` e calcula as `medidas`
+        ("count", "sum:<medida>", "mean:<medida>", "distinct:<dimensão>").
+        Retorna uma lista de dicts ordenada pelas dimensões.
+        """
+        if fonte not in FONTES:
+            raise ConsultaInvalida(f"Fonte desconhecida: {fonte}. Use {', '.join(FONTES)}.")
+        dimensoes_validas, medidas_validas = FONTES[fonte]
+        for dimensao in dimensoes:
+            if dimensao not in dimensoes_validas:
+                raise ConsultaInvalida(f"Dimensão desconhecida para {fonte}: {dimensao}.")
+        pedidas = []
+        for medida in medidas or ("count",):
+            funcao, _, campo = medida.partition(":")
+            validos = dimensoes_validas if funcao == "distinct" else medidas_validas
+            if funcao not in FUNCOES or (funcao == "count") != (not campo) or (campo and campo not in validos):
+                raise ConsultaInvalida(f"Medida inválida: {medida}.")
+            pedidas.append((medida, funcao, campo))
+
+        self.atualizar()
+        with self._lock:
+            colunas, valores, cardinalidades = self._colunas(fonte)
+            n = len(next(iter(valores.values())))
+
+            # Chave combinada das dimensões (misto de bases com as cardinalidades).
+            chave = np.zeros(n, dtype=np.int64)
+            for dimensao in dimensoes:
+                chave = chave * max(cardinalidades[dimensao], 1) + colunas[dimensao]
+            espaco = int(np.prod([max(cardinalidades[d], 1) for d in dimensoes], dtype=object))
+            if espaco <= max(n, 1 << 20):
+                presentes = np.bincount(chave, minlength=espaco) if n else np.zeros(espaco, dtype=np.int64)
+                grupos = np.nonzero(presentes)[0]
+                posicao = np.full(espaco, -1, dtype=np.int64)
+                posicao[grupos] = np.arange(len(grupos))
+                inverso = posicao[chave]
+            else:
+                grupos, inverso = np.unique(chave, return_inverse=True)
+            total_grupos = len(grupos)
+
+            contagem = np.bincount(inverso, minlength=total_grupos)
+            resultados = {}
+            for medida, funcao, campo in pedidas:
+                if funcao == "count":
+                    resultados[medida] = contagem
+                elif funcao == "distinct":
+                    cardinalidade = max(cardinalidades[campo], 1)
+                    pares = np.unique(inverso * cardinalidade + colunas[campo])
+                    resultados[medida] = np.bincount(pares // cardinalidade, minlength=total_grupos)
+                else:
+                    soma = np.bincount(inverso, weights=valores[campo], minlength=total_grupos)
+                    resultados[medida] = soma if funcao == "sum" else soma / np.maximum(contagem, 1)
+
+            # Decodifica os grupos de volta em um código por dimensão.
+            codigos = {}
+            restante = grupos.astype(np.int64)
+            for dimensao in reversed(dimensoes):
+                cardinalidade = max(cardinalidades[dimensao], 1)
+                codigos[dimensao] = (restante % cardinalidade).tolist()
+                restante = restante // cardinalidade
+
+            saida = []
+            for i in range(total_grupos):
+                linha = {dimensao: self._rotulo(dimensao, codigos[dimensao][i]) for dimensao in dimensoes}
+                for medida, funcao, _ in pedidas:
+                    valor = resultados[medida][i]
+                    linha[medida] = int(valor) if funcao in ("count", "distinct") else float(valor)
+                saida.append(linha)
+        saida.sort(key=lambda linha: tuple((linha[d] is None, linha[d]) for d in dimensoes))
+        return saida
+
+
+snapshot = Snapshot()
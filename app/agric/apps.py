@@ -8,5 +8,8 @@ class AgricConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'agric'
 
-    def ready(self):        
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .consultas_lentas import conectar
+        conectar()
         logger.info("App 'agric' inicializado.")
\ No newline at end of file
@@ -0,0 +1,20 @@
+"""
+Suíte de benchmarks do app Agric.
+
+Mede latência (p50/p95/p99) e queries por chamada dos endpoints, validadores e comandos
+de gestão sobre bases sintéticas de tamanho configurável. Não faz parte da suíte de testes
+padrão; execute com:
+
+    cd app
+    AGRIC_BENCH_SCALE=1k pytest agric/benchmarks -o python_files="bench_*.py"
+
+Variáveis de ambiente:
+- AGRIC_BENCH_SCALE: 1k, 100k, 1m ou um número de propriedades (padrão 1k).
+- AGRIC_BENCH_ITER: iterações máximas por caso (padrão 50).
+- AGRIC_BENCH_SECONDS: tempo máximo por caso, em segundos (padrão 10).
+- AGRIC_BENCH_OUTPUT: arquivo JSON de resultados (padrão bench_results.json).
+
+Para comparar duas execuções:
+
+    python -m agric.benchmarks.compare base.json novo.json
+"""
@@ -0,0 +1,17 @@
+"""
+Benchmarks dos comandos de gestão `seed` e `clear_data`.
+
+Cada caso roda dentro da transação do teste, desfeita ao final; a primeira execução de
+`clear_data` também remove a base sintética, o que aparece no p99.
+"""
+import os
+
+from django.core.management import call_command
+
+
+ITERACOES = int(os.getenv("AGRIC_BENCH_CMD_ITER", "3"))
+
+
+def test_seed_e_clear_data(bench):
+    bench.run("command seed", lambda i: call_command("seed"), iteracoes=ITERACOES, aquecimento=0)
+    bench.run("command clear_data", lambda i: call_command("clear_data"), iteracoes=ITERACOES, aquecimento=0)
@@ -0,0 +1,129 @@
+"""
+Benchmarks dos endpoints do roteador e do DashboardView via cliente de testes do Django.
+"""
+import random
+
+import pytest
+from rest_framework.test import APIClient
+from django.urls import reverse
+
+from agric.benchmarks.dataset import gerar_cpf
+from agric.dashboard import calcular_dashboard
+from agric.resumos import calcular_distribuicao, calcular_ranking
+from agric.models import Estado, Cidade, TipoCultura, Produtor, Propriedade, Cultura
+
+
+RECURSOS = {
+    "produtor": (Produtor, "cpf_cnpj"),
+    "estado": (Estado, "id_estado"),
+    "cidade": (Cidade, "id_cidade"),
+    "tipocultura": (TipoCultura, "id_tipo_cultura"),
+    "propriedade": (Propriedade, "id_propriedade"),
+    "cultura": (Cultura, "id_cultura"),
+}
+
+
+def amostra_de_chaves(model, campo, n=200):
+    return list(model.objects.order_by("?").values_list(campo, flat=True)[:n])
+
+
+@pytest.mark.parametrize("rota", list(RECURSOS))
+def test_list(bench, rota):
+    client = APIClient()
+    url = reverse(f"{rota}-list")
+
+    def chamada(i):
+        assert client.get(url).status_code == 200
+    bench.run(f"GET {rota}-list", chamada)
+
+
+@pytest.mark.parametrize("rota", list(RECURSOS))
+def test_retrieve(bench, rota):
+    client = APIClient()
+    model, campo = RECURSOS[rota]
+    chaves = amostra_de_chaves(model, campo)
+    rng = random.Random(0)
+
+    def chamada(i):
+        assert client.get(reverse(f"{rota}-detail", args=[rng.choice(chaves)])).status_code == 200
+    bench.run(f"GET {rota}-detail", chamada)
+
+
+def test_portfolio(bench):
+    client = APIClient()
+    chaves = amostra_de_chaves(Produtor, "cpf_cnpj")
+    rng = random.Random(0)
+
+    def chamada(i):
+        assert client.get(reverse("produtor-portfolio", args=[rng.choice(chaves)])).status_code == 200
+    bench.run("GET produtor-portfolio", chamada)
+
+
+def test_dashboard(bench):
+    client = APIClient()
+    url = reverse("dashboard")
+
+    def chamada(i):
+        assert client.get(url).status_code == 200
+    bench.run("GET dashboard", chamada)
+
+
+def test_calcular_dashboard(bench):
+    # Cálculo sem o cache do dashboard (ver agric.singleflight).
+    bench.run("calcular_dashboard", lambda i: calcular_dashboard())
+
+
+def test_analytics(bench):
+    client = APIClient()
+    url = reverse("analytics")
+    params = {"dimensoes": "estado,tipo_cultura,ano_safra", "medidas": "count,sum:area,distinct:produtor"}
+
+    def chamada(i):
+        assert client.get(url, params).status_code == 200
+    bench.run("GET analytics", chamada)
+
+
+@pytest.mark.parametrize("rota,params", [
+    ("distribuicao", {"campo": "area_total", "faixas": 20}),
+    ("ranking", {"medida": "area_total", "limite": 20}),
+    ("geo", {"limite": 20}),
+])
+def test_resumos(bench, rota, params):
+    client = APIClient()
+    url = reverse(rota)
+
+    def chamada(i):
+        assert client.get(url, params).status_code == 200
+    bench.run(f"GET {rota}", chamada)
+
+
+def test_calcular_resumos(bench):
+    # Cálculo sem o cache (ver agric.resumos).
+    bench.run("calcular_distribuicao", lambda i: calcular_distribuicao("area_total", faixas=20))
+    bench.run("calcular_ranking", lambda i: calcular_ranking("area_total", limite=20))
+
+
+def test_creates(bench):
+    client = APIClient()
+    estado = Estado.objects.first()
+    cidade = Cidade.objects.first()
+    produtor = Produtor.objects.first()
+    tipo = TipoCultura.objects.first()
+    propriedade = Propriedade.objects.first()
+    payloads = {
+        "produtor": lambda i: {"cpf_cnpj": gerar_cpf(900_000_000 + i + 10), "nome_produtor": f"Bench {i}"},
+        "estado": lambda i: {"nome_estado": f"Bench Estado {i}"},
+        "cidade": lambda i: {"nome_cidade": f"Bench Cidade {i}", "estado": estado.pk},
+        "tipocultura": lambda i: {"tipo_cultura": f"Bench Tipo {i}"},
+        "propriedade": lambda i: {"nome_propriedade": f"Bench {i}", "area_total": 100.0,
+                                  "area_agricultavel": 60.0, "area_vegetacao": 40.0,
+                                  "cidade": cidade.pk, "produtor": produtor.cpf_cnpj},
+        "cultura": lambda i: {"ano_safra": 3000 + i + 10, "tipo_cultura": tipo.pk, "propriedade": propriedade.pk},
+    }
+    for rota, payload in payloads.items():
+        url = reverse(f"{rota}-list")
+
+        def chamada(i, url=url, payload=payload):
+            response = client.post(url, payload(i), format="json")
+            assert response.status_code == 201, response.data
+        bench.run(f"POST {rota}-list", chamada)
@@ -0,0 +1,46 @@
+"""
+Benchmarks dos validadores de documentos (CPF/CNPJ) e do caminho de escrita de Produtor.
+"""
+import re
+
+from agric.benchmarks.dataset import gerar_cpf
+from agric.models import Produtor
+from agric.validators import is_valid_cpf, is_valid_cnpj, get_document_type, parse_document
+
+
+CPFS = [gerar_cpf(i) for i in range(1000)]
+CPFS_MASCARA = [f"{c[:3]}.{c[3:6]}.{c[6:9]}-{c[9:]}" for c in CPFS]
+CNPJ = "11.222.333/0001-81"
+
+
+def test_validadores(bench):
+    bench.run("is_valid_cpf x1000", lambda i: [is_valid_cpf(c) for c in CPFS])
+    bench.run("is_valid_cpf com máscara x1000", lambda i: [is_valid_cpf(c) for c in CPFS_MASCARA])
+    bench.run("is_valid_cnpj x1000", lambda i: [is_valid_cnpj(CNPJ) for _ in range(1000)])
+    bench.run("get_document_type x1000", lambda i: [get_document_type(c) for c in CPFS_MASCARA])
+
+
+def documento_em_varias_passadas(valor):
+    # O caminho anterior de um POST: validate_cpf_cnpj, create do serializer e clean do model.
+    digitos = ''.join(filter(str.isdigit, valor))
+    get_document_type(digitos)
+    documento = re.sub(r'\D', '', digitos)
+    tipo = get_document_type(documento)
+    return is_valid_cpf(documento) if tipo == 'CPF' else is_valid_cnpj(documento)
+
+
+def test_pipeline_do_documento(bench):
+    bench.run("documento em várias passadas x1000", lambda i: [documento_em_varias_passadas(c) for c in CPFS_MASCARA])
+    bench.run("parse_document x1000", lambda i: [parse_document(c) for c in CPFS_MASCARA])
+
+
+def test_save_do_produtor(bench):
+    # full_clean() no save (validação e consulta de unicidade) x documento já validado pelo chamador.
+    def com_full_clean(i):
+        Produtor(cpf_cnpj=gerar_cpf(700_000_010 + i), tipo_documento="CPF", nome_produtor=f"Bench {i}").save()
+
+    def validado(i):
+        Produtor(cpf_cnpj=gerar_cpf(750_000_010 + i), tipo_documento="CPF",
+                 nome_produtor=f"Bench {i}").save(validado=True)
+    bench.run("Produtor.save com full_clean", com_full_clean)
+    bench.run("Produtor.save(validado=True)", validado)
@@ -0,0 +1,53 @@
+"""
+compare.py
+
+Compara dois arquivos de resultados de benchmark e aponta regressões.
+
+Uso:
+    python -m agric.benchmarks.compare base.json novo.json [--limite 0.2]
+
+Um caso regride quando o p95 cresce mais que `--limite` (fração, padrão 20%) ou quando
+o número máximo de queries por chamada aumenta. O processo termina com código 1 se houver
+regressão, para uso em CI.
+"""
+import argparse
+import json
+import sys
+
+
+def comparar(base, novo, limite=0.2) -> list:
+    """
+    Retorna uma linha por caso presente nos dois arquivos: (nome, p95 base, p95 novo, variação,
+    queries base, queries novo, regrediu).
+    """
+    linhas = []
+    for nome in sorted(set(base["resultados"]) & set(novo["resultados"])):
+        a, b = base["resultados"][nome], novo["resultados"][nome]
+        variacao = (b["p95_ms"] - a["p95_ms"]) / a["p95_ms"] if a["p95_ms"] else 0.0
+        regrediu = variacao > limite or b["queries_max"] > a["queries_max"]
+        linhas.append((nome, a["p95_ms"], b["p95_ms"], variacao, a["queries_max"], b["queries_max"], regrediu))
+    return linhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara resultados de benchmark do app Agric.")
+    parser.add_argument("base")
+    parser.add_argument("novo")
+    parser.add_argument("--limite", type=float, default=0.2, help="Aumento tolerado no p95 (fração)")
+    args = parser.parse_args(argv)
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.novo, encoding="utf-8") as f:
+        novo = json.load(f)
+
+    linhas = comparar(base, novo, args.limite)
+    print(f"{'caso':<40} {'p95 base':>10} {'p95 novo':>10} {'var':>8} {'queries':>9}")
+    for nome, p95_a, p95_b, variacao, q_a, q_b, regrediu in linhas:
+        marca = "  REGRESSÃO" if regrediu else ""
+        print(f"{nome:<40} {p95_a:>10.3f} {p95_b:>10.3f} {variacao:>+8.1%} {q_a:>4}->{q_b:<4}{marca}")
+    return 1 if any(linha[-1] for linha in linhas) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
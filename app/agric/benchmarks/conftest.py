@@ -0,0 +1,42 @@
+"""
+Fixtures da suíte de benchmarks.
+
+- bench_dataset: base sintética criada uma única vez por sessão, na escala de AGRIC_BENCH_SCALE.
+- bench: BenchRecorder da sessão; os resultados são gravados em AGRIC_BENCH_OUTPUT ao final.
+  Os benchmarks rodam num único processo: os comandos aceitam o LocMemCache (ALLOW_LOCAL_CACHE).
+"""
+import os
+
+import pytest
+
+from agric.benchmarks.dataset import construir_dataset, resolver_escala
+from agric.benchmarks.runner import BenchRecorder, metadados
+
+
+_recorder = BenchRecorder(
+    iteracoes=int(os.getenv("AGRIC_BENCH_ITER", "50")),
+    segundos=float(os.getenv("AGRIC_BENCH_SECONDS", "10")),
+)
+
+
+@pytest.fixture(scope="session")
+def bench_dataset(django_db_setup, django_db_blocker):
+    escala = os.getenv("AGRIC_BENCH_SCALE", "1k")
+    with django_db_blocker.unblock():
+        dataset = construir_dataset(resolver_escala(escala))
+    _recorder.meta.update(metadados(escala, dataset))
+    return dataset
+
+
+@pytest.fixture
+def bench(bench_dataset, db, settings):
+    settings.ALLOW_LOCAL_CACHE = True
+    return _recorder
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if _recorder.resultados:
+        caminho = os.getenv("AGRIC_BENCH_OUTPUT", "bench_results.json")
+        _recorder.salvar(caminho)
+        session.config.pluginmanager.get_plugin("terminalreporter").write_line(
+            f"Resultados dos benchmarks gravados em {caminho}")
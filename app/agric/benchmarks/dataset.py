@@ -0,0 +1,99 @@
+"""
+dataset.py
+
+Geração de bases sintéticas em escala para os benchmarks.
+
+Usa `bulk_create` em lotes, gerando CPFs válidos de forma determinística, para montar
+rapidamente bases de milhares a milhões de propriedades. Como `bulk_create` não dispara
+sinais, as versões das tabelas são trocadas e os resumos por produtor e geográficos
+recalculados ao final (ver `agric.signals`); a base sintética não é registrada no log de alterações.
+"""
+from agric.models import Estado, Cidade, TipoCultura, Produtor, Propriedade, Cultura, ResumoProdutor, \
+    ResumoProdutorSafra, ResumoGeografico
+from agric.signals import VERSIONED_MODELS, invalidar_tabela
+
+
+ESCALAS = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+QTD_ESTADOS = 27
+CIDADES_POR_ESTADO = 10
+TIPOS_CULTURA = ("Soja", "Milho", "Cana-de-açúcar", "Café", "Algodão",
+                 "Arroz", "Feijão", "Trigo", "Laranja", "Banana")
+PROPRIEDADES_POR_PRODUTOR = 5
+ANOS_SAFRA = (2024, 2025)
+
+
+def resolver_escala(valor) -> int:
+    """
+    Converte "1k", "100k", "1m" ou um número em quantidade de propriedades.
+    """
+    valor = str(valor).strip().lower()
+    return ESCALAS[valor] if valor in ESCALAS else int(valor)
+
+
+def gerar_cpf(n) -> str:
+    """
+    Gera um CPF válido e único a partir de um inteiro (n < 10^9).
+    """
+    base = [int(d) for d in f"{n + 100_000_000:09d}"[-9:]]
+    for tamanho in (9, 10):
+        soma = sum(d * (tamanho + 1 - i) for i, d in enumerate(base[:tamanho]))
+        base.append((soma * 10 % 11) % 10)
+    return "".join(map(str, base))
+
+
+def construir_dataset(n_propriedades, batch_size=5000) -> dict:
+    """
+    Cria estados, cidades, tipos de cultura, produtores, `n_propriedades` propriedades
+    e uma cultura por propriedade. Retorna as quantidades criadas.
+    """
+    estados = Estado.objects.bulk_create(
+        [Estado(nome_estado=f"Estado {i:02d}") for i in range(QTD_ESTADOS)])
+    cidades = Cidade.objects.bulk_create(
+        [Cidade(nome_cidade=f"Cidade {e.pk}-{j}", estado=e) for e in estados for j in range(CIDADES_POR_ESTADO)])
+    tipos = TipoCultura.objects.bulk_create([TipoCultura(tipo_cultura=nome) for nome in TIPOS_CULTURA])
+
+    n_produtores = max(1, n_propriedades // PROPRIEDADES_POR_PRODUTOR)
+    for inicio in range(0, n_produtores, batch_size):
+        Produtor.objects.bulk_create([
+            Produtor(cpf_cnpj=gerar_cpf(i), tipo_documento=Produtor.CPF, nome_produtor=f"Produtor {i}")
+            for i in range(inicio, min(inicio + batch_size, n_produtores))
+        ])
+    ids_produtores = list(Produtor.objects.order_by("pk").values_list("pk", flat=True))
+
+    for inicio in range(0, n_propriedades, batch_size):
+        Propriedade.objects.bulk_create([
+            Propriedade(
+                nome_propriedade=f"Fazenda {i}",
+                area_total=100.0 + i % 900,
+                area_agricultavel=(100.0 + i % 900) * 0.6,
+                area_vegetacao=(100.0 + i % 900) * 0.3,
+                cidade_id=cidades[i % len(cidades)].pk,
+                estado_id=cidades[i % len(cidades)].estado_id,
+                produtor_id=ids_produtores[i % n_produtores],
+            )
+            for i in range(inicio, min(inicio + batch_size, n_propriedades))
+        ])
+
+    ids = list(Propriedade.objects.order_by("pk").values_list("pk", flat=True))
+    for inicio in range(0, len(ids), batch_size):
+        Cultura.objects.bulk_create([
+            Cultura(ano_safra=ANOS_SAFRA[i % len(ANOS_SAFRA)], tipo_cultura_id=tipos[i % len(tipos)].pk,
+                    propriedade_id=pk)
+            for i, pk in enumerate(ids[inicio:inicio + batch_size], start=inicio)
+        ])
+
+    ResumoProdutor.recalcular()
+    ResumoProdutorSafra.recalcular()
+    ResumoGeografico.recalcular()
+    for model in VERSIONED_MODELS:
+        invalidar_tabela(model)
+
+    return {
+        "estados": len(estados),
+        "cidades": len(cidades),
+        "tipos_cultura": len(tipos),
+        "produtores": n_produtores,
+        "propriedades": len(ids),
+        "culturas": len(ids),
+    }
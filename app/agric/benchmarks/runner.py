@@ -0,0 +1,100 @@
+"""
+runner.py
+
+Execução e registro dos casos de benchmark.
+
+BenchRecorder executa cada caso repetidamente (até AGRIC_BENCH_ITER iterações ou
+AGRIC_BENCH_SECONDS segundos, com no mínimo 3 amostras), mede a latência de cada chamada
+e as queries executadas (via `agric.querycount.QueryRecorder`) e grava o resumo em JSON.
+"""
+import json
+import os
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+
+import django
+from django.db import connection
+
+from agric.querycount import QueryRecorder
+
+
+MIN_AMOSTRAS = 3
+
+
+def percentil(amostras, p) -> float:
+    """
+    Percentil `p` (0-100) por interpolação linear entre as amostras ordenadas.
+    """
+    ordenadas = sorted(amostras)
+    if len(ordenadas) == 1:
+        return ordenadas[0]
+    posicao = (len(ordenadas) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenadas) - 1)
+    return ordenadas[inferior] + (ordenadas[superior] - ordenadas[inferior]) * (posicao - inferior)
+
+
+class BenchRecorder:
+    """
+    Acumula os resultados dos casos de benchmark de uma sessão.
+    """
+    def __init__(self, iteracoes=50, segundos=10.0, meta=None):
+        self.iteracoes = iteracoes
+        self.segundos = segundos
+        self.meta = dict(meta or {})
+        self.resultados = {}
+
+    def run(self, nome, fn, iteracoes=None, aquecimento=1):
+        """
+        Executa `fn(i)` repetidamente e registra latência e queries por chamada sob `nome`.
+        """
+        for i in range(aquecimento):
+            fn(-1 - i)
+        limite = iteracoes or self.iteracoes
+        tempos, queries = [], []
+        inicio = time.perf_counter()
+        for i in range(limite):
+            with QueryRecorder() as recorder:
+                t0 = time.perf_counter()
+                fn(i)
+                tempos.append(time.perf_counter() - t0)
+            queries.append(recorder.count)
+            if len(tempos) >= MIN_AMOSTRAS and time.perf_counter() - inicio > self.segundos:
+                break
+        self.resultados[nome] = resumir(tempos, queries)
+        return self.resultados[nome]
+
+    def to_dict(self) -> dict:
+        return {"meta": self.meta, "resultados": self.resultados}
+
+    def salvar(self, caminho):
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False, sort_keys=True)
+
+
+def resumir(tempos, queries) -> dict:
+    ms = [t * 1000 for t in tempos]
+    return {
+        "n": len(ms),
+        "p50_ms": round(percentil(ms, 50), 4),
+        "p95_ms": round(percentil(ms, 95), 4),
+        "p99_ms": round(percentil(ms, 99), 4),
+        "media_ms": round(statistics.fmean(ms), 4),
+        "queries": round(statistics.fmean(queries), 2),
+        "queries_max": max(queries),
+    }
+
+
+def metadados(escala, dataset) -> dict:
+    return {
+        "escala": escala,
+        "dataset": dataset,
+        "data": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "banco": connection.vendor,
+        "host": platform.node(),
+        "pid": os.getpid(),
+    }
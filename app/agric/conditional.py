@@ -0,0 +1,94 @@
+"""
+conditional.py
+
+GET condicional (ETag/Last-Modified) para as views da API.
+
+Os validadores são derivados das versões das tabelas de que a resposta depende
+(`agric.versioning`), sem executar o queryset nem serializar o corpo. Assim, uma requisição com
+`If-None-Match` (ou `If-Modified-Since`) ainda válida recebe 304 sem consultar o banco.
+
+A versão é por tabela: qualquer escrita na tabela muda o ETag de todas as suas listagens e
+detalhes. Com mais de um worker, o cache do Django precisa ser compartilhado (ver `CACHES`),
+senão cada worker teria suas próprias versões.
+
+`Last-Modified` tem resolução de um segundo: enquanto o segundo da versão corrente não terminou,
+outra escrita no mesmo segundo manteria a mesma data e um cliente que só envia
+`If-Modified-Since` receberia 304 com dados antigos. Nesse intervalo a resposta sai sem
+`Last-Modified` (e `If-Modified-Since` é ignorado), apenas com o ETag.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from .versioning import get_versions
+
+
+class ConditionalGetMixin:
+    """
+    Mixin para views DRF que adiciona ETag, Last-Modified e Cache-Control às respostas GET.
+
+    Atributos:
+    - version_models: models dos quais a resposta depende (padrão: o model do queryset).
+    - public_cache: se True, a resposta pode ser guardada por proxies reversos por
+      `REFERENCE_CACHE_MAX_AGE` segundos; caso contrário, o cliente deve revalidar sempre.
+    """
+    version_models = None
+    public_cache = False
+
+    def get_version_models(self):
+        if self.version_models is not None:
+            return self.version_models
+        return (self.queryset.model,)
+
+    def get_validators(self, request):
+        """
+        Retorna (etag, last_modified) da representação pedida, a partir das versões das tabelas.
+        last_modified é None enquanto o segundo da versão mais recente não tiver terminado.
+        """
+        versions = get_versions(self.get_version_models())
+        renderer = getattr(request, "accepted_renderer", None)
+        key = "|".join([request.get_full_path(), getattr(renderer, "format", ""),
+                        *(f"{model._meta.label_lower}={versions[model]}" for model in sorted(
+                            versions, key=lambda m: m._meta.label_lower))])
+        etag = f'W/"{hashlib.blake2b(key.encode(), digest_size=12).hexdigest()}"'
+        last_modified = max(versions.values()) // 1_000_000_000
+        if last_modified >= time.time_ns() // 1_000_000_000:
+            last_modified = None
+        return etag, last_modified
+
+    def set_validator_headers(self, response, etag, last_modified):
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        if self.public_cache:
+            patch_cache_control(response, public=True, max_age=settings.REFERENCE_CACHE_MAX_AGE)
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ("Accept",))
+        return response
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        """
+        Responde 304 se os validadores enviados pelo cliente ainda valem; senão executa `handler`.
+        """
+        etag, last_modified = self.get_validators(request)
+        if get_conditional_response(request, etag=etag, last_modified=last_modified) is not None:
+            return self.set_validator_headers(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+        response = handler(request, *args, **kwargs)
+        if getattr(response, "stale", False):
+            # Dados de uma versão anterior (stale-while-revalidate): sem validadores da versão atual.
+            patch_cache_control(response, private=True, no_cache=True)
+        elif response.status_code == status.HTTP_200_OK:
+            self.set_validator_headers(response, etag, last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
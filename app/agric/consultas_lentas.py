@@ -0,0 +1,232 @@
+"""
+consultas_lentas.py
+
+Log de consultas lentas com captura automática do plano (EXPLAIN).
+
+- Com SLOW_QUERY_LOG=1 (desligado por padrão), toda conexão recebe, ao ser aberta (sinal
+  `connection_created`), um execute_wrapper que mede cada query; as que passam de SLOW_QUERY_MS
+  entram em um anel em memória de tamanho SLOW_QUERY_RING com a rota da requisição
+  (`agric.logs.route_var`), os parâmetros redigidos (apenas números, booleanos e nulos são
+  mantidos) e a origem no código do projeto.
+- Com SLOW_QUERY_EXPLAIN=1 (também desligado por padrão), na primeira ocorrência de cada formato
+  de query (`querycount.sql_fingerprint`) o plano é capturado com `EXPLAIN (ANALYZE off)` no
+  PostgreSQL (`EXPLAIN QUERY PLAN` no SQLite), em um cursor do backend: a query de EXPLAIN não passa pelos execute_wrappers (não conta nas
+  métricas nem no Server-Timing) e, dentro de uma transação, roda sob um savepoint. Os literais
+  de texto do plano são redigidos como os parâmetros.
+- Cada consulta lenta também é logada e contada em `agric_slow_queries_total` (ver agric.metrics).
+- Os registros são por processo; consultados em /api/slow-queries/ (somente staff) e pelo
+  comando consultas_lentas.
+"""
+import contextvars
+import os
+import re
+import threading
+import time
+import traceback
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+from .logs import route_var
+from .metrics import registry
+from .querycount import sql_fingerprint
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Frames destes módulos não são a origem de uma query.
+_INFRA = tuple(os.path.join(os.path.dirname(__file__), nome) for nome in
+               ("consultas_lentas.py", "middleware.py", "querycount.py"))
+_RAIZ = str(settings.BASE_DIR)
+# Instruções com plano (SAVEPOINT, BEGIN e afins não têm).
+_EXPLICAVEIS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+# Literais de texto em um plano (o PostgreSQL inclui os parâmetros: `Filter: (cpf_cnpj = '...'::text)`).
+_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+
+def redigir(params):
+    """
+    Mantém números, booleanos e nulos e troca os demais valores pelo nome do tipo (ex: "<str>"),
+    para não expor documentos, nomes e afins no log.
+    """
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {chave: redigir(valor) for chave, valor in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [redigir(valor) if isinstance(valor, (list, tuple)) else _redigir_valor(valor) for valor in params]
+    return _redigir_valor(params)
+
+
+def _redigir_valor(valor):
+    if valor is None or isinstance(valor, (bool, int, float)):
+        return valor
+    return f"<{type(valor).__name__}>"
+
+
+def redigir_plano(plano: str) -> str:
+    """
+    Aplica ao texto do plano a mesma regra de `redigir`: literais de texto viram '<str>'.
+    """
+    return _LITERAL.sub("'<str>'", plano)
+
+
+def origem() -> str:
+    """
+    Primeiro frame do projeto (fora do Django, das bibliotecas e desta instrumentação) na pilha.
+    """
+    for frame in reversed(traceback.extract_stack()):
+        if (frame.filename.startswith(_RAIZ) and not frame.filename.startswith(_INFRA)
+                and "site-packages" not in frame.filename):
+            return f"{os.path.relpath(frame.filename, _RAIZ)}:{frame.lineno} em {frame.name}"
+    return "desconhecida"
+
+
+def explicar(connection, sql, params) -> str:
+    """
+    Plano da query, sem executá-la. Usa um cursor do backend, fora dos execute_wrappers.
+    """
+    if connection.vendor == "postgresql":
+        prefixo = "EXPLAIN (ANALYZE off)"
+    else:
+        prefixo = connection.ops.explain_query_prefix()
+    cursor = connection.create_cursor()
+    protegido = connection.in_atomic_block
+    try:
+        # Um EXPLAIN com erro não pode abortar a transação em andamento (PostgreSQL).
+        if protegido:
+            cursor.execute("SAVEPOINT agric_explain")
+        try:
+            cursor.execute(f"{prefixo} {sql}", params)
+            linhas = cursor.fetchall()
+        except Exception:
+            if protegido:
+                cursor.execute("ROLLBACK TO SAVEPOINT agric_explain")
+            raise
+        finally:
+            if protegido:
+                cursor.execute("RELEASE SAVEPOINT agric_explain")
+    finally:
+        cursor.close()
+    return redigir_plano("\n".join(" ".join(str(coluna) for coluna in linha) for linha in linhas))
+
+
+class RegistroDeConsultasLentas:
+    """
+    Anel das últimas consultas lentas e planos por formato de query, seguro entre threads.
+    Os planos também são limitados (os formatos mais antigos saem primeiro). `limiar_ms` é o
+    limiar do processo; `limiar()` o troca apenas no contexto corrente (ContextVar).
+    """
+    def __init__(self, limiar_ms=200.0, tamanho=200, explain=True):
+        self.limiar_ms = limiar_ms
+        self._limiar = contextvars.ContextVar(f"agric_slow_query_ms_{id(self)}", default=None)
+        self.explain = explain
+        self.consultas = deque(maxlen=tamanho)
+        self.planos = OrderedDict()
+        self.tamanho = tamanho
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        resultado = execute(sql, params, many, context)
+        duracao_ms = (time.perf_counter() - inicio) * 1000
+        if duracao_ms >= self.limiar_atual():
+            try:
+                self.registrar(context["connection"], sql, params, many, duracao_ms)
+            except Exception:
+                logger.exception("Falha ao registrar consulta lenta")
+        return resultado
+
+    def limiar_atual(self) -> float:
+        limiar_ms = self._limiar.get()
+        return self.limiar_ms if limiar_ms is None else limiar_ms
+
+    def registrar(self, connection, sql, params, many, duracao_ms):
+        formato = sql_fingerprint(sql)
+        rota = route_var.get()
+        consulta = {
+            "quando": datetime.now(timezone.utc).isoformat(),
+            "duracao_ms": round(duracao_ms, 3),
+            "rota": rota,
+            "banco": connection.alias,
+            "formato": formato,
+            "sql": sql,
+            "parametros": redigir(params),
+            "origem": origem(),
+        }
+        with self._lock:
+            novo = formato not in self.planos
+            if novo:
+                self.planos[formato] = None
+                while len(self.planos) > self.tamanho:
+                    self.planos.popitem(last=False)
+            self.consultas.append(consulta)
+        if novo:
+            plano = None
+            if self.explain and not many and sql.lstrip().upper().startswith(_EXPLICAVEIS):
+                try:
+                    plano = explicar(connection, sql, params)
+                except Exception as e:
+                    plano = f"EXPLAIN indisponível: {e}"
+            with self._lock:
+                if formato in self.planos:
+                    self.planos[formato] = {"formato": formato, "sql": sql, "plano": plano,
+                                            "capturado_em": consulta["quando"], "rota": rota}
+        registry.inc("agric_slow_queries_total", "Consultas acima de SLOW_QUERY_MS.", {"route": str(rota)})
+        logger.warning("Consulta lenta (%.1f ms) em %s: %s", duracao_ms, consulta["origem"], formato,
+                       extra={"duracao_ms": consulta["duracao_ms"], "formato": formato,
+                              "origem": consulta["origem"]})
+
+    def listar(self, limite=None, rota=None) -> dict:
+        """
+        Consultas mais recentes primeiro (opcionalmente de uma rota) e os planos dos seus formatos.
+        """
+        with self._lock:
+            consultas = [consulta for consulta in reversed(self.consultas)
+                         if rota is None or consulta["rota"] == rota][:limite]
+            formatos = dict.fromkeys(consulta["formato"] for consulta in consultas)
+            planos = [self.planos[formato] for formato in formatos if self.planos.get(formato)]
+        return {"limiar_ms": self.limiar_atual(), "consultas": consultas, "planos": planos}
+
+    def limpar(self):
+        with self._lock:
+            self.consultas.clear()
+            self.planos.clear()
+
+    @contextmanager
+    def limiar(self, limiar_ms):
+        """
+        Troca o limiar durante o bloco (ex: 0 para registrar todas as queries de uma requisição),
+        só no contexto corrente: as outras threads seguem com o limiar do processo.
+        """
+        token = self._limiar.set(limiar_ms)
+        try:
+            yield self
+        finally:
+            self._limiar.reset(token)
+
+
+registro = RegistroDeConsultasLentas(
+    limiar_ms=getattr(settings, "SLOW_QUERY_MS", 200.0),
+    tamanho=getattr(settings, "SLOW_QUERY_RING", 200),
+    explain=getattr(settings, "SLOW_QUERY_EXPLAIN", False),
+)
+
+
+def instalar(sender, connection, **kwargs):
+    """
+    Receptor de `connection_created`: acrescenta o registro aos execute_wrappers da conexão.
+    """
+    # No início da lista: a conexão pode ser aberta dentro de um `execute_wrapper()` (middleware,
+    # QueryRecorder), que ao sair remove o último wrapper da lista.
+    if registro not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, registro)
+
+
+def conectar():
+    if getattr(settings, "SLOW_QUERY_LOG", False):
+        connection_created.connect(instalar, dispatch_uid="agric.consultas_lentas")
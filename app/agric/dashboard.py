@@ -0,0 +1,84 @@
+"""
+dashboard.py
+
+Cálculo das estatísticas consolidadas do dashboard.
+
+- calcular_dashboard: executa as agregações e retorna a representação validada pelo
+  DashboardResponseSerializer.
+- obter_dashboard: serve o dashboard a partir do cache, com um único cálculo em andamento por
+  vez (ver `agric.singleflight`). O resultado é associado às versões das tabelas agregadas, de
+  modo que qualquer escrita nelas força o recálculo na próxima requisição.
+"""
+from django.conf import settings
+from django.db.models import F, Sum, Count
+
+from .models import Estado, Cidade, TipoCultura, Propriedade, Cultura
+from .refcache import estados
+from .serializers import DashboardResponseSerializer
+from .singleflight import get_or_compute
+from .versioning import get_versions
+
+
+DASHBOARD_MODELS = (Propriedade, Cultura, Cidade, Estado, TipoCultura)
+
+
+def calcular_dashboard() -> dict:
+    """
+    Executa as agregações do dashboard (cinco queries) e retorna os dados serializados.
+    """
+    total_fazendas = Propriedade.objects.count()
+    total_hectares = Propriedade.objects.aggregate(total=Sum('area_total'))['total'] or 0
+
+    # Agrupado pelo estado desnormalizado (sem join, coberto pelo índice estado+áreas);
+    # os nomes vêm do cache de referência.
+    fazendas_por_estado = [
+        {"nome_estado": estados.nome(item["estado_id"]), "qtd_fazendas": item["qtd_fazendas"],
+         "total_hectares": item["total_hectares"]}
+        for item in (Propriedade.objects
+            .values('estado_id')
+            .annotate(qtd_fazendas=Count('id_propriedade'),
+                total_hectares=Sum('area_total'))
+            .order_by('-qtd_fazendas'))]
+
+    culturas = (Cultura.objects
+            .values(nome_tipo_cultura=F('tipo_cultura__tipo_cultura'))
+            .annotate(qtd=Count('id_cultura'), area=Sum('area'))
+            .order_by('-qtd'))
+    culturas_list = [{"tipo_cultura": item["nome_tipo_cultura"],
+                      "qtd": item["qtd"], "area": item["area"] or 0} for item in culturas]
+
+    uso_solo = Propriedade.objects.aggregate(total_agricultavel=Sum('area_agricultavel'),
+        total_vegetacao=Sum('area_vegetacao'))
+
+    data = {
+        "total_fazendas": total_fazendas,
+        "total_hectares": total_hectares,
+        "fazendas_por_estado": fazendas_por_estado,
+        "culturas_plantadas": culturas_list,
+        # Sem propriedades cadastradas, as somas vêm como None.
+        "uso_do_solo": {**{campo: valor or 0 for campo, valor in uso_solo.items()},
+                        "total_plantado": sum(item["area"] for item in culturas_list)},
+    }
+    serializer = DashboardResponseSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.data
+
+
+def versions_token(models) -> str:
+    versions = get_versions(models)
+    return ",".join(str(versions[model]) for model in models)
+
+
+def obter_dashboard():
+    """
+    Retorna (dados, stale) do dashboard, coalescendo os cálculos concorrentes.
+    `stale` indica que os dados são de uma versão anterior, servidos durante o recálculo.
+    """
+    return get_or_compute(
+        "dashboard", calcular_dashboard,
+        token=versions_token(DASHBOARD_MODELS),
+        ttl=settings.DASHBOARD_CACHE_TTL,
+        stale_ttl=settings.DASHBOARD_STALE_TTL,
+        cross_worker=settings.SINGLE_FLIGHT_CROSS_WORKER,
+        lock_timeout=settings.SINGLE_FLIGHT_LOCK_TIMEOUT,
+    )
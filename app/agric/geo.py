@@ -0,0 +1,128 @@
+"""
+geo.py
+
+Drill-down geográfico (Brasil → estado → cidade → propriedade) com os totais de cada nível.
+
+- abrir(nivel, pk, limite, offset): retorna o nó (propriedades, áreas, culturas e área plantada,
+  com a abertura por tipo de cultura) e uma página dos filhos, ordenados pela área total.
+- Estados e cidades são lidos de ResumoGeografico (mantido a cada escrita em Propriedade e
+  Cultura): o nó é um prefixo do índice único e os filhos, uma faixa de um índice por (pai, área).
+  O custo de abrir um nó não depende da quantidade de propriedades sob ele.
+- As propriedades de uma cidade são lidas do índice (cidade, área) de Propriedade; o nó de uma
+  propriedade agrega apenas as culturas dela.
+- Os nomes vêm do cache de referência (`agric.refcache`), sem joins.
+"""
+from django.db.models import Count, Sum
+
+from .models import Propriedade, Cultura, ResumoGeografico
+from .refcache import cidades, estados, tipos_cultura
+
+
+NIVEIS = ("brasil", "estado", "cidade", "propriedade")
+MEDIDAS = ResumoGeografico.MEDIDAS
+
+
+class NoNaoEncontrado(LookupError):
+    """
+    Estado, cidade ou propriedade inexistente.
+    """
+
+
+def _medidas(linha) -> dict:
+    return {medida: linha[medida] for medida in MEDIDAS}
+
+
+def _no(nivel, pk, nome, linhas) -> dict:
+    """
+    Monta o nó a partir das suas linhas de ResumoGeografico (total e por tipo de cultura).
+    """
+    total = dict.fromkeys(MEDIDAS, 0)
+    por_cultura = {}
+    for linha in linhas:
+        if linha['tipo_cultura_id'] == ResumoGeografico.TODOS:
+            for medida in MEDIDAS:
+                total[medida] += linha[medida]
+        elif linha['culturas']:
+            item = por_cultura.setdefault(linha['tipo_cultura_id'], {"culturas": 0, "area_plantada": 0.0})
+            item["culturas"] += linha['culturas']
+            item["area_plantada"] += linha['area_plantada']
+    return {"nivel": nivel, "id": pk, "nome": nome, **total, "por_cultura": [
+        {"tipo_cultura": tipos_cultura.nome(tipo), **item}
+        for tipo, item in sorted(por_cultura.items(), key=lambda par: -par[1]["area_plantada"])]}
+
+
+def _pagina(itens, limite):
+    return itens[:limite], len(itens) > limite
+
+
+def _abrir_brasil(limite, offset):
+    # Uma linha por estado e tipo de cultura: lidas de uma vez e paginadas em memória.
+    linhas = list(ResumoGeografico.objects.filter(cidade_id=ResumoGeografico.TODOS)
+                  .values('estado_id', 'tipo_cultura_id', *MEDIDAS))
+    no = _no("brasil", None, "Brasil", linhas)
+    filhos = sorted((linha for linha in linhas
+                     if linha['tipo_cultura_id'] == ResumoGeografico.TODOS and linha['propriedades']),
+                    key=lambda linha: (-linha['area_total'], linha['estado_id']))
+    filhos = [{"nivel": "estado", "id": linha['estado_id'], "nome": estados.nome(linha['estado_id']),
+               **_medidas(linha)} for linha in filhos[offset:offset + limite + 1]]
+    return no, *_pagina(filhos, limite)
+
+
+def _abrir_estado(pk, limite, offset):
+    if estados.get(pk) is None:
+        raise NoNaoEncontrado(f"Estado {pk} não encontrado.")
+    no = _no("estado", pk, estados.nome(pk), ResumoGeografico.objects.filter(
+        estado_id=pk, cidade_id=ResumoGeografico.TODOS).values('tipo_cultura_id', *MEDIDAS))
+    linhas = (ResumoGeografico.objects
+              .filter(estado_id=pk, tipo_cultura_id=ResumoGeografico.TODOS, cidade_id__gt=ResumoGeografico.TODOS,
+                      propriedades__gt=0)
+              .order_by('-area_total', 'cidade_id').values('cidade_id', *MEDIDAS)[offset:offset + limite + 1])
+    filhos = [{"nivel": "cidade", "id": linha['cidade_id'], "nome": cidades.nome(linha['cidade_id']),
+               **_medidas(linha)} for linha in linhas]
+    return no, *_pagina(filhos, limite)
+
+
+def _abrir_cidade(pk, limite, offset):
+    cidade = cidades.get(pk)
+    if cidade is None:
+        raise NoNaoEncontrado(f"Cidade {pk} não encontrada.")
+    no = _no("cidade", pk, cidades.nome(pk), ResumoGeografico.objects.filter(
+        estado_id=cidade.estado_id, cidade_id=pk).values('tipo_cultura_id', *MEDIDAS))
+    linhas = (Propriedade.objects.filter(cidade_id=pk).order_by('-area_total', 'pk')
+              .values('pk', 'nome_propriedade', 'area_total', 'area_agricultavel', 'area_vegetacao')
+              [offset:offset + limite + 1])
+    filhos = [{"nivel": "propriedade", "id": linha['pk'], "nome": linha['nome_propriedade'], "propriedades": 1,
+               "area_total": linha['area_total'], "area_agricultavel": linha['area_agricultavel'],
+               "area_vegetacao": linha['area_vegetacao']} for linha in linhas]
+    return no, *_pagina(filhos, limite)
+
+
+def _abrir_propriedade(pk):
+    propriedade = (Propriedade.objects.filter(pk=pk)
+                   .values('nome_propriedade', 'area_total', 'area_agricultavel', 'area_vegetacao').first())
+    if propriedade is None:
+        raise NoNaoEncontrado(f"Propriedade {pk} não encontrada.")
+    linhas = [{"tipo_cultura_id": ResumoGeografico.TODOS, "propriedades": 1, "culturas": 0, "area_plantada": 0.0,
+               **{campo: propriedade[campo] for campo in ('area_total', 'area_agricultavel', 'area_vegetacao')}}]
+    for item in (Cultura.objects.filter(propriedade_id=pk).values('tipo_cultura_id').order_by()
+                 .annotate(culturas=Count('pk'), area_plantada=Sum('area'))):
+        linhas.append({**dict.fromkeys(MEDIDAS, 0), **item})
+        linhas[0]["culturas"] += item['culturas']
+        linhas[0]["area_plantada"] += item['area_plantada']
+    return _no("propriedade", pk, propriedade['nome_propriedade'], linhas), [], False
+
+
+def abrir(nivel, pk=None, limite=50, offset=0) -> dict:
+    """
+    Retorna {"no", "filhos", "mais"} do nó `nivel`/`pk`, com os filhos de `offset` a
+    `offset + limite`. Levanta NoNaoEncontrado se o nó não existir.
+    """
+    if nivel == "brasil":
+        no, filhos, mais = _abrir_brasil(limite, offset)
+    elif nivel == "estado":
+        no, filhos, mais = _abrir_estado(pk, limite, offset)
+    elif nivel == "cidade":
+        no, filhos, mais = _abrir_cidade(pk, limite, offset)
+    else:
+        no, filhos, mais = _abrir_propriedade(pk)
+    return {"no": no, "filhos": filhos, "mais": mais}
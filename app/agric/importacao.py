@@ -0,0 +1,186 @@
+"""
+importacao.py
+
+Importação em massa de produtores e propriedades (linhas de CSV, como dicionários).
+
+- importar_produtores(linhas) e importar_propriedades(linhas): gravam as linhas em lotes com
+  `bulk_create`, sem `full_clean` (e sem a consulta de unicidade) por linha.
+- As regras que o banco garante (CheckConstraints de áreas e de documento, unicidade do
+  documento) não são conferidas em Python: um lote que viole alguma é desfeito (savepoint) e
+  regravado linha a linha, para atribuir cada erro à sua linha com a mesma mensagem da API
+  (`models.erro_de_restricao`).
+- Em Python ficam apenas a conversão dos valores (áreas finitas, nomes não vazios), a resolução
+  das referências (cidade pelo cache de referência, produtor pelo documento, uma consulta por
+  lote) e os dígitos verificadores.
+- Como `bulk_create` não dispara sinais, ao final os resumos dos produtores e estados afetados
+  são recalculados, as linhas criadas registradas no log de alterações e as versões das tabelas
+  trocadas (ver `agric.signals`).
+"""
+import math
+import re
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from .models import Alteracao, Produtor, Propriedade, ResumoGeografico, ResumoProdutor, erro_de_restricao
+from .refcache import cidades
+from .validators import parse_document
+from . import alteracoes
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+TAMANHO_DO_LOTE = 1000
+MENSAGEM_NUMERO = 'Um número válido é necessário.'
+MENSAGEM_EM_BRANCO = 'Este campo não pode ficar em branco.'
+# Número da primeira linha de dados em um CSV com cabeçalho.
+PRIMEIRA_LINHA = 2
+
+
+def _mensagens(erro: ValidationError) -> dict:
+    return erro.message_dict if hasattr(erro, 'error_dict') else {'non_field_errors': erro.messages}
+
+
+def _lotes(linhas, tamanho):
+    lote = []
+    for numero, linha in enumerate(linhas, start=PRIMEIRA_LINHA):
+        lote.append((numero, linha))
+        if len(lote) == tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _gravar(model, objetos, erros) -> list:
+    """
+    Grava os pares (número da linha, objeto) em um bulk_create; se o banco recusar o lote, grava
+    linha a linha e anota o erro de cada linha recusada. Retorna os objetos gravados.
+    """
+    if not objetos:
+        return []
+    try:
+        with transaction.atomic():
+            return model.objects.bulk_create([objeto for _, objeto in objetos])
+    except IntegrityError:
+        pass
+    gravados = []
+    for numero, objeto in objetos:
+        try:
+            with transaction.atomic():
+                gravados += model.objects.bulk_create([objeto])
+        except IntegrityError as e:
+            validacao = erro_de_restricao(e)
+            if validacao is None:
+                raise
+            erros.append({"linha": numero, "erros": _mensagens(validacao)})
+    return gravados
+
+
+def _nome(linha, campo, erros) -> str:
+    nome = (linha.get(campo) or '').strip()
+    if not nome:
+        erros[campo] = [MENSAGEM_EM_BRANCO]
+    return nome
+
+
+def _area(linha, campo, erros):
+    """
+    Área da linha como float finito: "nan" e "inf" passariam pelo float() e pelas CheckConstraints
+    (no PostgreSQL, NaN não é menor que zero nem maior que a área total).
+    """
+    try:
+        area = float(linha.get(campo) or '')
+    except ValueError:
+        area = math.nan
+    if not math.isfinite(area):
+        erros[campo] = [MENSAGEM_NUMERO]
+    return area
+
+
+def _produtor(linha) -> Produtor:
+    erros = {}
+    documento, tipo, valido = parse_document(linha.get('cpf_cnpj'))
+    # Tamanho e tipo ficam com o banco; os dígitos verificadores, não.
+    if tipo is not None and not valido:
+        erros['cpf_cnpj'] = [f'{tipo} inválido']
+    nome = _nome(linha, 'nome_produtor', erros)
+    if erros:
+        raise ValidationError(erros)
+    return Produtor(cpf_cnpj=documento, tipo_documento=tipo or '', nome_produtor=nome)
+
+
+def _propriedade(linha, produtores) -> Propriedade:
+    erros = {}
+    nome = _nome(linha, 'nome_propriedade', erros)
+    areas = {campo: _area(linha, campo, erros) for campo in ('area_total', 'area_agricultavel', 'area_vegetacao')}
+    try:
+        cidade = cidades.get(int(linha.get('cidade') or ''))
+    except ValueError:
+        cidade = None
+    if cidade is None:
+        erros['cidade'] = ['Cidade inexistente.']
+    produtor = produtores.get(re.sub(r'\D', '', linha.get('produtor') or ''))
+    if produtor is None:
+        erros['produtor'] = ['Produtor inexistente.']
+    if erros:
+        raise ValidationError(erros)
+    return Propriedade(nome_propriedade=nome, cidade_id=cidade.pk,
+                       estado_id=cidade.estado_id, produtor_id=produtor, **areas)
+
+
+def _resultado(gravados, erros) -> dict:
+    return {"importadas": len(gravados), "erros": sorted(erros, key=lambda erro: erro["linha"])}
+
+
+def importar_produtores(linhas, tamanho_do_lote=TAMANHO_DO_LOTE) -> dict:
+    """
+    Importa produtores (colunas cpf_cnpj e nome_produtor). Retorna {"importadas", "erros"},
+    com os erros como [{"linha", "erros": {campo: [mensagens]}}].
+    """
+    from .signals import invalidar_tabela
+
+    gravados, erros = [], []
+    with transaction.atomic():
+        for lote in _lotes(linhas, tamanho_do_lote):
+            objetos = []
+            for numero, linha in lote:
+                try:
+                    objetos.append((numero, _produtor(linha)))
+                except ValidationError as e:
+                    erros.append({"linha": numero, "erros": _mensagens(e)})
+            gravados += _gravar(Produtor, objetos, erros)
+        if gravados:
+            alteracoes.registrar_varias(Produtor, [produtor.cpf_cnpj for produtor in gravados], Alteracao.CRIACAO)
+            invalidar_tabela(Produtor)
+    logger.info("Importação de produtores: %s gravados, %s linhas com erro", len(gravados), len(erros))
+    return _resultado(gravados, erros)
+
+
+def importar_propriedades(linhas, tamanho_do_lote=TAMANHO_DO_LOTE) -> dict:
+    """
+    Importa propriedades (colunas nome_propriedade, area_total, area_agricultavel,
+    area_vegetacao, cidade (id) e produtor (CPF/CNPJ)). Retorna {"importadas", "erros"}.
+    """
+    from .signals import invalidar_tabela
+
+    gravados, erros = [], []
+    with transaction.atomic():
+        for lote in _lotes(linhas, tamanho_do_lote):
+            documentos = {re.sub(r'\D', '', linha.get('produtor') or '') for _, linha in lote}
+            produtores = dict(Produtor.objects.filter(cpf_cnpj__in=documentos).values_list('cpf_cnpj', 'pk'))
+            objetos = []
+            for numero, linha in lote:
+                try:
+                    objetos.append((numero, _propriedade(linha, produtores)))
+                except ValidationError as e:
+                    erros.append({"linha": numero, "erros": _mensagens(e)})
+            gravados += _gravar(Propriedade, objetos, erros)
+        if gravados:
+            ResumoProdutor.recalcular(list({propriedade.produtor_id for propriedade in gravados}))
+            ResumoGeografico.recalcular(list({propriedade.estado_id for propriedade in gravados}))
+            alteracoes.registrar_varias(Propriedade, [propriedade.pk for propriedade in gravados], Alteracao.CRIACAO)
+            invalidar_tabela(Propriedade)
+    logger.info("Importação de propriedades: %s gravadas, %s linhas com erro", len(gravados), len(erros))
+    return _resultado(gravados, erros)
@@ -0,0 +1,166 @@
+"""
+logs.py
+
+Pipeline de logging estruturado e não bloqueante do app Agric.
+
+Este módulo fornece:
+- route_var: ContextVar com a rota da requisição corrente (definida por RequestMetricsMiddleware).
+- RouteSamplingFilter: amostragem por rota dos logs de sucesso (< WARNING); avisos e erros
+  são sempre mantidos.
+- AsyncQueueHandler: QueueHandler com fila limitada e um QueueListener em thread própria,
+  que formata em JSON (structlog) e escreve no stream fora da thread da requisição.
+  Quando a fila está cheia o registro é descartado e contado, em vez de bloquear a requisição.
+- json_formatter(): formatter JSON baseado em `structlog.stdlib.ProcessorFormatter`.
+- text_formatter(): formatter legível para o console (DJANGO_LOG_FORMAT=text), com os mesmos
+  campos estruturados (`extra`) em chave=valor depois da mensagem.
+
+Os contadores de descarte e amostragem são publicados em /metrics (ver `agric.metrics`).
+"""
+import atexit
+import contextvars
+import copy
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import structlog
+
+from .metrics import registry
+
+
+route_var = contextvars.ContextVar("agric_route", default=None)
+
+
+def parse_sampling(value) -> dict:
+    """
+    Converte "estado-list=0.1,dashboard=0.5" em {"estado-list": 0.1, "dashboard": 0.5}.
+    """
+    rates = {}
+    for item in filter(None, (part.strip() for part in (value or "").split(","))):
+        route, _, rate = item.partition("=")
+        rates[route.strip()] = float(rate)
+    return rates
+
+
+class RouteSamplingFilter(logging.Filter):
+    """
+    Mantém apenas uma fração dos registros abaixo de WARNING, conforme a taxa da rota corrente.
+    Registros de WARNING para cima passam sempre.
+    """
+    def __init__(self, rates=None, default=1.0):
+        super().__init__()
+        self.rates = parse_sampling(rates) if isinstance(rates, str) else dict(rates or {})
+        self.default = float(default)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(route_var.get(), self.default)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        registry.inc("agric_log_records_sampled_out_total",
+                     "Registros de log descartados pela amostragem por rota.")
+        return False
+
+
+def _campos_do_registro(logger, method_name, event_dict):
+    record = event_dict.get("_record")
+    if record is not None:
+        event_dict["timestamp"] = datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat()
+        event_dict["thread"] = record.threadName
+        if record.exc_text:
+            event_dict["exception"] = record.exc_text
+    return event_dict
+
+
+def _formatter(renderer) -> logging.Formatter:
+    return structlog.stdlib.ProcessorFormatter(
+        foreign_pre_chain=[
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.ExtraAdder(),
+            _campos_do_registro,
+        ],
+        processors=[
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            renderer,
+        ],
+    )
+
+
+def json_formatter() -> logging.Formatter:
+    """
+    Formatter que renderiza cada registro como uma linha JSON (timestamp, nível, logger, evento e extras).
+    """
+    return _formatter(structlog.processors.JSONRenderer(ensure_ascii=False))
+
+
+def text_formatter() -> logging.Formatter:
+    """
+    Formatter que renderiza cada registro em uma linha legível: timestamp, nível, evento, logger e
+    os extras em chave=valor.
+    """
+    return _formatter(structlog.dev.ConsoleRenderer(colors=False))
+
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    Enfileira os registros em uma fila limitada; uma thread (QueueListener) formata em JSON e escreve.
+
+    - maxsize: tamanho máximo da fila. Com a fila cheia, registros abaixo de ERROR são descartados
+      e contados em `dropped`; erros aguardam até `error_timeout` segundos por espaço.
+    - stream: destino final (padrão sys.stdout).
+    """
+    def __init__(self, maxsize=10000, stream=None, error_timeout=0.05):
+        super().__init__(queue.Queue(maxsize=maxsize))
+        self.error_timeout = error_timeout
+        self.dropped = 0
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.target.setFormatter(json_formatter())
+        self._start_listener()
+        atexit.register(self.stop)
+
+    def _start_listener(self):
+        self._pid = os.getpid()
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        """
+        Esvazia a fila e encerra a thread de escrita.
+        """
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+
+    def prepare(self, record):
+        """
+        Resolve a mensagem, a rota e o traceback na thread de origem; a formatação JSON fica
+        para a thread de escrita.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if getattr(record, "route", None) is None:
+            record.route = route_var.get()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            # Processo filho após fork (ex.: gunicorn --preload): a thread não foi herdada.
+            self._start_listener()
+        try:
+            if record.levelno >= logging.ERROR:
+                self.queue.put(record, timeout=self.error_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            registry.inc("agric_log_records_dropped_total",
+                         "Registros de log descartados por fila cheia.")
@@ -13,6 +13,7 @@ Uso:
 """
 from django.core.management.base import BaseCommand
 from agric.models import Estado, Cidade, TipoCultura, Produtor, Propriedade, Cultura
+from agric.versioning import exigir_cache_compartilhado
 
 import logging
 logger = logging.getLogger(__name__)
@@ -28,6 +29,7 @@ class Command(BaseCommand):
     help = "Remove todos os dados das tabelas principais do app agric"
 
     def handle(self, *args, **kwargs):
+        exigir_cache_compartilhado("clear_data")
         logger.info("Iniciando comando clear_data")
         Cultura.objects.all().delete()
         logger.info("Culturas removidas com sucesso!")
@@ -0,0 +1,49 @@
+"""
+clonar_safra.py
+
+Comando customizado do Django que copia as culturas de um ano-safra para outro (virada de safra,
+ver agric.safras).
+
+- A cópia é uma única instrução INSERT ... SELECT; culturas já existentes no destino são mantidas.
+- Filtros opcionais por estado (id), produtor (CPF/CNPJ) e tipo de cultura (id).
+- Propriedades sem área agricultável livre para todas as culturas copiadas ficam de fora.
+
+Uso:
+    python manage.py clonar_safra 2024 2025
+    python manage.py clonar_safra 2024 2025 --estado 3 --tipo-cultura 1
+    python manage.py clonar_safra 2024 2025 --produtor 12345678909
+"""
+from django.core.management.base import BaseCommand, CommandError
+from agric.models import Produtor
+from agric.safras import clonar_safra
+from agric.versioning import exigir_cache_compartilhado
+
+
+class Command(BaseCommand):
+    """
+    Comando Django para clonar as culturas de uma safra em outra.
+    """
+
+    help = "Copia as culturas de um ano-safra para outro em uma única instrução SQL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("origem", type=int, help="Ano-safra de origem")
+        parser.add_argument("destino", type=int, help="Ano-safra de destino")
+        parser.add_argument("--estado", type=int, default=None, help="Apenas as propriedades do estado (id)")
+        parser.add_argument("--produtor", default=None, help="Apenas as propriedades do produtor (CPF/CNPJ)")
+        parser.add_argument("--tipo-cultura", type=int, default=None, help="Apenas as culturas do tipo (id)")
+
+    def handle(self, *args, **options):
+        exigir_cache_compartilhado("clonar_safra")
+        if options["origem"] == options["destino"]:
+            raise CommandError("As safras de origem e destino devem ser diferentes.")
+        produtor = None
+        if options["produtor"] is not None:
+            produtor = Produtor.objects.filter(cpf_cnpj=options["produtor"]).values_list('pk', flat=True).first()
+            if produtor is None:
+                raise CommandError(f"Produtor {options['produtor']} não encontrado.")
+        resultado = clonar_safra(options["origem"], options["destino"], estado=options["estado"],
+                                 produtor=produtor, tipo_cultura=options["tipo_cultura"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['clonadas']} culturas clonadas de {resultado['origem']} para {resultado['destino']} "
+            f"({resultado['existentes']} já existentes, {resultado['sem_capacidade']} sem área agricultável)."))
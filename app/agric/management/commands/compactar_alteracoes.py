@@ -0,0 +1,36 @@
+"""
+compactar_alteracoes.py
+
+Comando customizado do Django para compactar o log de alterações (ver agric.alteracoes).
+
+- Remove as alterações superadas por outra mais recente do mesmo objeto.
+- Remove as alterações mais antigas que a retenção (CHANGES_RETENTION_DAYS, ou --dias).
+  Consumidores com cursor anterior ao removido recebem 410 em /api/changes/.
+
+Uso:
+    python manage.py compactar_alteracoes
+    python manage.py compactar_alteracoes --dias 7
+"""
+from django.core.management.base import BaseCommand
+from agric.alteracoes import compactar
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Comando Django para compactar o log de alterações e aplicar a retenção.
+    """
+
+    help = "Compacta o log de alterações e remove as alterações fora da retenção"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=None,
+                            help="Retenção em dias (padrão: CHANGES_RETENTION_DAYS)")
+
+    def handle(self, *args, **options):
+        resultado = compactar(options["dias"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['superadas']} alterações superadas e {resultado['expiradas']} expiradas removidas; "
+            f"cursor mínimo {resultado['cursor_minimo']}."))
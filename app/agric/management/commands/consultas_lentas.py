@@ -0,0 +1,69 @@
+"""
+consultas_lentas.py
+
+Comando customizado do Django que diagnostica as consultas de endpoints da API com o log de
+consultas lentas (ver agric.consultas_lentas).
+
+- Faz GET, no próprio processo, em cada URL informada, com o limiar trocado por --limiar-ms
+  (padrão 0: todas as queries), e lista as consultas registradas: duração, rota, origem no
+  código, formato e parâmetros redigidos.
+- Em seguida, imprime o plano (EXPLAIN) de cada formato de query, capturado na primeira ocorrência.
+- O anel de /api/slow-queries/ é por processo: este comando mostra o que as URLs fazem contra o
+  banco configurado, sem depender dos workers da API.
+- O registro (com EXPLAIN) é ligado só durante a execução do comando, mesmo com SLOW_QUERY_LOG=0
+  e SLOW_QUERY_EXPLAIN=0.
+
+Uso:
+    python manage.py consultas_lentas /api/dashboard/
+    python manage.py consultas_lentas "/api/propriedades/?limit=50" /api/geo/ --limiar-ms 5
+"""
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from agric.consultas_lentas import registro
+
+
+class Command(BaseCommand):
+    """
+    Comando Django para listar as consultas (e seus planos) feitas por endpoints da API.
+    """
+
+    help = "Faz GET nas URLs informadas e lista as consultas acima do limiar, com os planos (EXPLAIN)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("urls", nargs="+", help="Caminhos da API (ex: /api/dashboard/)")
+        parser.add_argument("--limiar-ms", type=float, default=0.0, help="Duração mínima registrada (ms)")
+        parser.add_argument("--limite", type=int, default=50, help="Quantidade máxima de consultas listadas")
+
+    def handle(self, *args, **options):
+        hosts = [host.lstrip(".") for host in settings.ALLOWED_HOSTS if host != "*"]
+        client = Client(HTTP_HOST=hosts[0] if hosts else "localhost")
+        registro.limpar()
+        explain, registro.explain = registro.explain, True
+        try:
+            with ExitStack() as pilha:
+                if registro not in connection.execute_wrappers:
+                    pilha.enter_context(connection.execute_wrapper(registro))
+                pilha.enter_context(registro.limiar(options["limiar_ms"]))
+                for url in options["urls"]:
+                    response = client.get(url)
+                    self.stdout.write(f"GET {url} -> {response.status_code}")
+        finally:
+            registro.explain = explain
+        resultado = registro.listar(options["limite"])
+        registro.limpar()
+
+        for consulta in reversed(resultado["consultas"]):
+            self.stdout.write(f"\n[{consulta['duracao_ms']:.1f} ms] {consulta['rota']} | {consulta['origem']}")
+            self.stdout.write(f"  {consulta['formato']}")
+            self.stdout.write(f"  parâmetros: {consulta['parametros']}")
+        for plano in resultado["planos"]:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\nPlano: {plano['formato']}"))
+            for linha in (plano["plano"] or "(sem plano)").splitlines():
+                self.stdout.write(f"  {linha}")
+        self.stdout.write(self.style.SUCCESS(
+            f"\n{len(resultado['consultas'])} consultas acima de {options['limiar_ms']} ms, "
+            f"{len(resultado['planos'])} planos."))
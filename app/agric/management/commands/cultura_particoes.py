@@ -0,0 +1,82 @@
+"""
+cultura_particoes.py
+
+Comando customizado do Django para manter as partições da tabela cultura por ano_safra
+(PostgreSQL com CULTURA_PARTITIONING=1; ver agric.particoes).
+
+- Cria as partições das próximas safras (a partir do ano corrente), movendo para elas as linhas
+  que estiverem na partição padrão.
+- Arquiva (desanexa e renomeia para cultura_arquivo_<ano>) ou remove as partições de safras
+  antigas, que deixam de aparecer na API.
+- Converte uma tabela cultura comum em particionada (--converter).
+
+Em SQLite ou com o particionamento desativado, apenas informa que não há partições.
+
+Uso:
+    python manage.py cultura_particoes
+    python manage.py cultura_particoes --proximas 2
+    python manage.py cultura_particoes --arquivar-ate 2015 [--remover]
+    python manage.py cultura_particoes --converter
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from agric import particoes
+from agric.models import Cultura
+from agric.signals import invalidar_tabela
+from agric.versioning import exigir_cache_compartilhado
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Comando Django para criar, listar e arquivar partições de Cultura por ano_safra.
+    """
+
+    help = "Cria as partições das próximas safras e arquiva as antigas (PostgreSQL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--proximas", type=int, default=None,
+                            help="Cria partições do ano corrente até N safras à frente")
+        parser.add_argument("--ano", type=int, action="append", default=[], help="Cria a partição desta safra")
+        parser.add_argument("--arquivar-ate", type=int, help="Arquiva as partições das safras até este ano")
+        parser.add_argument("--remover", action="store_true", help="Remove em vez de arquivar")
+        parser.add_argument("--converter", action="store_true",
+                            help="Converte a tabela cultura comum em particionada")
+
+    def handle(self, *args, **options):
+        if not particoes.suportado(connection):
+            self.stdout.write("Particionamento indisponível (requer PostgreSQL e CULTURA_PARTITIONING=1); "
+                              "cultura é uma tabela comum.")
+            return
+        if options["arquivar_ate"] is not None:
+            exigir_cache_compartilhado("cultura_particoes --arquivar-ate")
+
+        with connection.cursor() as cursor:
+            if options["converter"] and particoes.converter(cursor):
+                self.stdout.write(self.style.SUCCESS("Tabela cultura convertida para particionada."))
+            if not particoes.particionada(cursor):
+                raise CommandError("A tabela cultura não é particionada (use --converter).")
+
+            anos = list(options["ano"])
+            if options["proximas"] is not None:
+                atual = date.today().year
+                anos += range(atual, atual + options["proximas"] + 1)
+            for ano in sorted(set(anos)):
+                if particoes.criar_particao(cursor, ano):
+                    self.stdout.write(self.style.SUCCESS(f"Partição {particoes.nome_particao(ano)} criada."))
+
+            if options["arquivar_ate"] is not None:
+                for nome, _, _ in particoes.listar(cursor):
+                    sufixo = nome.removeprefix(f"{particoes.TABELA}_")
+                    if sufixo.isdigit() and int(sufixo) <= options["arquivar_ate"]:
+                        particoes.arquivar_particao(cursor, int(sufixo), remover=options["remover"])
+                        acao = "removida" if options["remover"] else "arquivada"
+                        self.stdout.write(self.style.SUCCESS(f"Partição {nome} {acao}."))
+                invalidar_tabela(Cultura)
+
+            for nome, limites, linhas in particoes.listar(cursor):
+                self.stdout.write(f"{nome:<24} {limites:<40} ~{max(linhas, 0)} linhas")
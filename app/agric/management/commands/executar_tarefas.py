@@ -0,0 +1,106 @@
+"""
+executar_tarefas.py
+
+Comando customizado do Django que executa as tarefas em segundo plano da fila (ver agric.tarefas).
+
+- Reserva as tarefas pendentes por prioridade e as executa num pool de threads (--threads).
+- Renova a reserva das tarefas em execução numa thread própria (também com --threads 1, em que a
+  tarefa roda no laço principal) e devolve à fila as de workers interrompidos.
+- Remove, a cada hora, as tarefas finalizadas fora da retenção (JOBS_RETENTION_DAYS) e seus arquivos.
+- Com --uma-vez, executa as tarefas disponíveis e sai (útil em cron e nos testes).
+
+Vários workers (processos ou hosts) podem consumir a mesma fila.
+
+Uso:
+    python manage.py executar_tarefas
+    python manage.py executar_tarefas --threads 4
+    python manage.py executar_tarefas --uma-vez
+"""
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from agric import tarefas
+from agric.versioning import exigir_cache_compartilhado
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+INTERVALO_LIMPEZA = 3600
+
+
+def executar_em_thread(tarefa):
+    try:
+        return tarefas.executar(tarefa)
+    finally:
+        # Cada thread do pool abre sua própria conexão.
+        connection.close()
+
+
+class Command(BaseCommand):
+    """
+    Comando Django que consome a fila de tarefas em segundo plano.
+    """
+
+    help = "Executa as tarefas em segundo plano enfileiradas em /api/jobs/"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=None,
+                            help="Tarefas executadas em paralelo (padrão: JOBS_WORKER_THREADS)")
+        parser.add_argument("--intervalo", type=float, default=None,
+                            help="Espera (s) quando a fila está vazia (padrão: JOBS_POLL_INTERVAL)")
+        parser.add_argument("--uma-vez", action="store_true", help="Executa as tarefas disponíveis e sai")
+
+    def handle(self, *args, **options):
+        exigir_cache_compartilhado("executar_tarefas")
+        threads = max(options["threads"] or settings.JOBS_WORKER_THREADS, 1)
+        intervalo = options["intervalo"] if options["intervalo"] is not None else settings.JOBS_POLL_INTERVAL
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        logger.info("Worker de tarefas %s iniciado com %d threads", worker, threads)
+
+        executadas = 0
+        ultima_limpeza = 0.0
+        em_execucao = set()
+        renovador = tarefas.RenovadorDeReservas(worker)
+        renovador.start()
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="tarefa") as pool:
+            try:
+                while True:
+                    close_old_connections()
+                    if time.monotonic() - ultima_limpeza >= INTERVALO_LIMPEZA:
+                        tarefas.remover_antigas()
+                        ultima_limpeza = time.monotonic()
+                    tarefas.liberar_expiradas()
+
+                    em_execucao = {futuro for futuro in em_execucao if not futuro.done()}
+                    reservou = False
+                    while len(em_execucao) < threads:
+                        tarefa = tarefas.reservar(worker)
+                        if tarefa is None:
+                            break
+                        reservou = True
+                        executadas += 1
+                        if threads == 1:
+                            tarefas.executar(tarefa)
+                        else:
+                            em_execucao.add(pool.submit(executar_em_thread, tarefa))
+
+                    if options["uma_vez"] and not reservou and not em_execucao:
+                        break
+                    if em_execucao:
+                        wait(em_execucao, timeout=intervalo, return_when=FIRST_COMPLETED)
+                    elif not reservou:
+                        time.sleep(intervalo)
+            except KeyboardInterrupt:
+                logger.info("Worker de tarefas %s interrompido; aguardando %d tarefas em execução",
+                            worker, len(em_execucao))
+            finally:
+                # Só depois das tarefas em execução: a saída do bloco `with` aguarda o pool.
+                pool.shutdown(wait=True)
+                renovador.parar()
+        self.stdout.write(self.style.SUCCESS(f"{executadas} tarefas executadas."))
@@ -0,0 +1,54 @@
+"""
+importar_csv.py
+
+Comando customizado do Django que importa produtores ou propriedades de um arquivo CSV
+(ver agric.importacao).
+
+- A gravação é feita em lotes com bulk_create; as regras de área e de documento são garantidas
+  pelas CheckConstraints do banco, sem validação linha a linha em Python.
+- As linhas recusadas são listadas com o número da linha e a mesma mensagem da API; as demais
+  são gravadas.
+- Colunas de produtores: cpf_cnpj, nome_produtor. Colunas de propriedades: nome_propriedade,
+  area_total, area_agricultavel, area_vegetacao, cidade (id) e produtor (CPF/CNPJ).
+
+Uso:
+    python manage.py importar_csv produtores produtores.csv
+    python manage.py importar_csv propriedades propriedades.csv --lote 5000
+"""
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from agric.importacao import TAMANHO_DO_LOTE, importar_produtores, importar_propriedades
+from agric.versioning import exigir_cache_compartilhado
+
+
+IMPORTADORES = {"produtores": importar_produtores, "propriedades": importar_propriedades}
+
+
+class Command(BaseCommand):
+    """
+    Comando Django para importar produtores ou propriedades de um CSV.
+    """
+
+    help = "Importa produtores ou propriedades de um arquivo CSV em lotes, com as restrições garantidas pelo banco"
+
+    def add_arguments(self, parser):
+        parser.add_argument("tipo", choices=sorted(IMPORTADORES), help="O que importar")
+        parser.add_argument("arquivo", help="Caminho do arquivo CSV (com cabeçalho)")
+        parser.add_argument("--lote", type=int, default=TAMANHO_DO_LOTE, help="Linhas por bulk_create")
+
+    def handle(self, *args, **options):
+        exigir_cache_compartilhado("importar_csv")
+        if options["lote"] < 1:
+            raise CommandError("O lote deve ter ao menos uma linha.")
+        try:
+            with open(options["arquivo"], newline="", encoding="utf-8") as arquivo:
+                resultado = IMPORTADORES[options["tipo"]](csv.DictReader(arquivo), options["lote"])
+        except OSError as e:
+            raise CommandError(f"Não foi possível ler {options['arquivo']}: {e}")
+        for erro in resultado["erros"]:
+            mensagens = "; ".join(f"{campo}: {' '.join(textos)}" for campo, textos in erro["erros"].items())
+            self.stderr.write(f"Linha {erro['linha']}: {mensagens}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Importação de {options['tipo']}: {resultado['importadas']} linhas gravadas, "
+            f"{len(resultado['erros'])} com erro."))
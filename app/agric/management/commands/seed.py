@@ -11,7 +11,7 @@ Uso:
 """
 from django.core.management.base import BaseCommand
 from agric.models import Estado, Cidade, TipoCultura, Produtor, Propriedade, Cultura
-from agric.validators import get_document_type
+from agric.versioning import exigir_cache_compartilhado
 from faker import Faker
 import random
 from datetime import datetime
@@ -31,7 +31,7 @@ class Command(BaseCommand):
     help = "Popula o banco de dados com dados realistas para testes e desenvolvimento."
 
     def handle(self, *args, **kwargs):
-
+        exigir_cache_compartilhado("seed")
         logger.info("Iniciando comando seed para popular o banco de dados com dados de exemplo.")
 
         fake = Faker('pt_BR')
@@ -73,19 +73,15 @@ class Command(BaseCommand):
         for _ in range(20):
             for _ in range(10):  # tenta até conseguir um CPF único
                 nome = fake.unique.name()
-                cpf = fake.unique.cpf()
-                tipo_documento = get_document_type(cpf)
                 try:
-                    produtor, created = Produtor.objects.get_or_create(
-                        cpf_cnpj=cpf,
-                        defaults={
-                            "nome_produtor": nome,
-                            "tipo_documento": tipo_documento
-                        }
-                    )
-                    if created:
-                        produtores.append(produtor)
-                        break
+                    # Documento normalizado e validado uma única vez; o save não repete a validação.
+                    cpf, tipo_documento = Produtor.normalizar_documento(fake.unique.cpf())
+                    if Produtor.objects.filter(cpf_cnpj=cpf).exists():
+                        continue
+                    produtor = Produtor(cpf_cnpj=cpf, nome_produtor=nome, tipo_documento=tipo_documento)
+                    produtor.save(validado=True)
+                    produtores.append(produtor)
+                    break
                 except Exception:
                     continue
         logger.info(f"{len(produtores)} produtores criados com sucesso!")
@@ -120,14 +116,19 @@ class Command(BaseCommand):
             total_culturas = random.randint(1, 4)
             combinacoes = [(ano, tipo) for ano in anos_safra for tipo in tipos_cultura]
             random.shuffle(combinacoes)
+            # Área ainda disponível por safra (a soma das culturas não passa da área agricultável)
+            area_disponivel = {ano: prop.area_agricultavel for ano in anos_safra}
             for _ in range(total_culturas):
                 if not combinacoes:
                     break
                 ano_safra, tipo_cultura = combinacoes.pop()
+                area = round(random.uniform(0, min(area_disponivel[ano_safra], 50)), 2)
+                area_disponivel[ano_safra] -= area
                 Cultura.objects.get_or_create(
                     propriedade=prop,
                     tipo_cultura=tipo_cultura,
-                    ano_safra=ano_safra
+                    ano_safra=ano_safra,
+                    defaults={"area": area}
                 )
         logger.info(f"{len(Cultura.objects.all())} culturas criadas com sucesso!")
 
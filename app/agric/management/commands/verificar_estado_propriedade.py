@@ -0,0 +1,64 @@
+"""
+verificar_estado_propriedade.py
+
+Comando customizado do Django para verificar a consistência do estado desnormalizado em
+Propriedade (Propriedade.estado deve ser igual ao estado da sua cidade).
+
+Lista as propriedades divergentes e, com --fix, corrige-as com um único UPDATE (recalculando
+os resumos dos produtores e dos estados afetados, ver ResumoProdutor e ResumoGeografico). Sai com erro
+quando encontra divergências sem --fix, para uso em rotinas agendadas e CI.
+
+Uso:
+    python manage.py verificar_estado_propriedade
+    python manage.py verificar_estado_propriedade --fix
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, OuterRef, Subquery
+from agric.models import Cidade, Propriedade, ResumoProdutor, ResumoProdutorSafra, ResumoGeografico
+from agric.signals import invalidar_tabela
+from agric.versioning import exigir_cache_compartilhado
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Comando Django para verificar (e opcionalmente corrigir) Propriedade.estado.
+    """
+
+    help = "Verifica se o estado desnormalizado das propriedades corresponde ao estado da cidade"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Corrige as propriedades divergentes")
+        parser.add_argument("--limite", type=int, default=20, help="Quantidade de divergências listadas")
+
+    def handle(self, *args, **options):
+        if options["fix"]:
+            exigir_cache_compartilhado("verificar_estado_propriedade --fix")
+        divergentes = Propriedade.objects.exclude(estado_id=F('cidade__estado_id'))
+        total = divergentes.count()
+        if not total:
+            self.stdout.write(self.style.SUCCESS("Nenhuma divergência encontrada."))
+            return
+
+        for id_propriedade, estado_id, estado_cidade in divergentes.values_list(
+                'id_propriedade', 'estado_id', 'cidade__estado_id')[:options["limite"]]:
+            self.stdout.write(f"Propriedade {id_propriedade}: estado {estado_id}, cidade no estado {estado_cidade}")
+        logger.warning("%d propriedades com estado divergente da cidade", total)
+
+        if not options["fix"]:
+            raise CommandError(f"{total} propriedades com estado divergente (use --fix para corrigir).")
+
+        produtor_ids = list(divergentes.values_list('produtor_id', flat=True).distinct())
+        estado_ids = set()
+        for estado_id, estado_cidade in divergentes.values_list('estado_id', 'cidade__estado_id').distinct():
+            estado_ids.update((estado_id, estado_cidade))
+        corrigidas = Propriedade.objects.filter(pk__in=divergentes.values('pk')).update(
+            estado_id=Subquery(Cidade.objects.filter(pk=OuterRef('cidade_id')).values('estado_id')[:1]))
+        ResumoProdutor.recalcular(produtor_ids)
+        ResumoProdutorSafra.recalcular(produtor_ids)
+        ResumoGeografico.recalcular(list(estado_ids))
+        invalidar_tabela(Propriedade)
+        logger.info("%d propriedades corrigidas", corrigidas)
+        self.stdout.write(self.style.SUCCESS(f"{corrigidas} propriedades corrigidas."))
@@ -0,0 +1,160 @@
+"""
+metrics.py
+
+Métricas em memória do processo para o app Agric, expostas no formato texto do Prometheus.
+
+Este módulo fornece:
+- Histogram: histograma cumulativo com buckets fixos, seguro para uso entre threads.
+- MetricsRegistry: registro de histogramas e contadores identificados por nome e labels.
+- registry: instância global usada pelo middleware de métricas e pelos demais módulos.
+- metrics_view: view Django que publica o conteúdo do registro em /metrics, apenas para os IPs
+  de METRICS_ALLOWED_IPS ou para quem envia o METRICS_TOKEN (403 para os demais).
+
+Cada worker do gunicorn mantém seu próprio registro; o Prometheus agrega por instância.
+"""
+import hmac
+import ipaddress
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class Histogram:
+    """
+    Histograma cumulativo no estilo Prometheus (buckets `le`, soma e contagem).
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class MetricsRegistry:
+    """
+    Registro de métricas do processo, indexado por (nome, labels).
+    """
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text, labels=None, buckets=DEFAULT_BUCKETS) -> Histogram:
+        key = (name, tuple(sorted((labels or {}).items())))
+        hist = self._histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.setdefault(key, Histogram(buckets))
+                self._help.setdefault(name, (help_text, "histogram"))
+        return hist
+
+    def inc(self, name, help_text, labels=None, value=1):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._help.setdefault(name, (help_text, "counter"))
+
+    def counter_value(self, name, labels=None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        return self._counters.get(key, 0)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._help.clear()
+
+    def render(self) -> str:
+        """
+        Serializa todas as métricas no formato de exposição texto do Prometheus (0.0.4).
+        """
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            helps = dict(self._help)
+
+        lines = []
+        seen = set()
+
+        def header(name):
+            if name not in seen:
+                seen.add(name)
+                help_text, kind = helps[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (name, labels), hist in histograms:
+            header(name)
+            counts, total, count = hist.snapshot()
+            for bound, bucket_count in zip(hist.buckets, counts):
+                le = _format_labels(labels + (("le", _format_number(bound)),))
+                lines.append(f"{name}_bucket{le} {bucket_count}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_number(value):
+    return repr(float(value)) if not float(value).is_integer() else f"{float(value):.1f}"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels
+    )
+    return "{" + pairs + "}"
+
+
+registry = MetricsRegistry()
+
+
+def acesso_permitido(request) -> bool:
+    """
+    True se a requisição traz "Authorization: Bearer <METRICS_TOKEN>" ou vem (REMOTE_ADDR) de um
+    dos IPs ou redes de METRICS_ALLOWED_IPS.
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token and hmac.compare_digest(request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()):
+        return True
+    try:
+        ip = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(ip in ipaddress.ip_network(rede, strict=False)
+               for rede in getattr(settings, "METRICS_ALLOWED_IPS", ()))
+
+
+def metrics_view(request):
+    """
+    Publica as métricas do processo no formato texto do Prometheus.
+    """
+    if not acesso_permitido(request):
+        return HttpResponseForbidden("Acesso a /metrics não permitido.", content_type="text/plain; charset=utf-8")
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,136 @@
+"""
+middleware.py
+
+Middlewares do app Agric.
+
+RequestMetricsMiddleware mede, para cada requisição:
+- quantidade de queries e tempo total de banco (via `connection.execute_wrapper`);
+- tempo da view descontado o banco (regras de negócio e serialização);
+- tempo de renderização da resposta (JSONRenderer do DRF);
+- tempo total dentro do Django.
+
+Os valores são enviados no cabeçalho `Server-Timing` (quando SERVER_TIMING=True) e agregados
+em histogramas por rota no registro de `agric.metrics`, publicado em /metrics.
+A rota resolvida também fica em `agric.logs.route_var` durante a requisição (amostragem de logs).
+"""
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .logs import route_var
+from .metrics import registry, QUERY_BUCKETS
+
+
+class RequestStats:
+    """
+    Acumula as métricas de banco e os marcos de tempo de uma requisição.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.view_start = None
+        self.view_end = None
+        self.render_start = None
+        self.render_end = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+class RequestMetricsMiddleware:
+    """
+    Coleta tempo total, tempo de banco, quantidade de queries e tempo de renderização
+    por requisição, publicando-os em `Server-Timing` e nos histogramas por rota.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        request._agric_stats = stats
+        token = route_var.set(None)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            route_var.reset(token)
+        total = time.perf_counter() - stats.start
+
+        route = route_name(request)
+        timings = {"db": stats.db_time, "total": total}
+        if stats.view_start is not None:
+            view_end = stats.view_end or stats.render_start or (stats.start + total)
+            timings["app"] = max(view_end - stats.view_start - stats.db_time, 0.0)
+        if stats.render_start is not None and stats.render_end is not None:
+            timings["render"] = stats.render_end - stats.render_start
+
+        self.observe(route, request.method, response.status_code, stats.queries, timings)
+        if getattr(settings, "SERVER_TIMING", True):
+            response["Server-Timing"] = server_timing_header(stats.queries, timings)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = getattr(request, "_agric_stats", None)
+        if stats is not None:
+            stats.view_start = time.perf_counter()
+        route_var.set(route_name(request))
+
+    def process_template_response(self, request, response):
+        stats = getattr(request, "_agric_stats", None)
+        if stats is not None:
+            stats.view_end = stats.render_start = time.perf_counter()
+
+            def render_done(rendered):
+                stats.render_end = time.perf_counter()
+            response.add_post_render_callback(render_done)
+        return response
+
+    @staticmethod
+    def observe(route, method, status, queries, timings):
+        labels = {"route": route, "method": method}
+        registry.inc("agric_requests_total", "Total de requisições atendidas.",
+                     {**labels, "status": str(status)})
+        registry.histogram("agric_request_duration_seconds", "Tempo total da requisição no Django.",
+                           labels).observe(timings["total"])
+        registry.histogram("agric_request_db_seconds", "Tempo gasto em queries por requisição.",
+                           labels).observe(timings["db"])
+        registry.histogram("agric_request_queries", "Quantidade de queries por requisição.",
+                           labels, buckets=QUERY_BUCKETS).observe(queries)
+        if "app" in timings:
+            registry.histogram("agric_request_app_seconds",
+                               "Tempo da view sem banco (regras de negócio e serialização).",
+                               labels).observe(timings["app"])
+        if "render" in timings:
+            registry.histogram("agric_request_render_seconds", "Tempo de renderização da resposta.",
+                               labels).observe(timings["render"])
+
+
+def route_name(request) -> str:
+    """
+    Retorna um identificador de rota de baixa cardinalidade (nome da URL) para a requisição.
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "nao_encontrada"
+    return match.view_name or match.route or "desconhecida"
+
+
+def server_timing_header(queries, timings) -> str:
+    """
+    Monta o valor do cabeçalho Server-Timing (durações em milissegundos).
+    """
+    parts = [f'db;dur={timings["db"] * 1000:.2f};desc="{queries} queries"']
+    for name in ("app", "render", "total"):
+        if name in timings:
+            parts.append(f"{name};dur={timings[name] * 1000:.2f}")
+    return ", ".join(parts)
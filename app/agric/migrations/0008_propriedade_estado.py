@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-19 06:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agric', '0007_cultura'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propriedade',
+            name='estado',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='propriedades', to='agric.estado'),
+        ),
+    ]
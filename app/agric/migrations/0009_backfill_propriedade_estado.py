@@ -0,0 +1,23 @@
+"""
+Preenche Propriedade.estado a partir do estado da cidade de cada propriedade.
+"""
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def preencher_estado(apps, schema_editor):
+    Propriedade = apps.get_model('agric', 'Propriedade')
+    Cidade = apps.get_model('agric', 'Cidade')
+    Propriedade.objects.update(
+        estado_id=Subquery(Cidade.objects.filter(pk=OuterRef('cidade_id')).values('estado_id')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agric', '0008_propriedade_estado'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_estado, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-19 06:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agric', '0009_backfill_propriedade_estado'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='propriedade',
+            name='estado',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='propriedades', to='agric.estado'),
+        ),
+        migrations.AddIndex(
+            model_name='propriedade',
+            index=models.Index(fields=['estado', 'area_total', 'area_agricultavel', 'area_vegetacao'], name='propriedade_estado_areas_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+"""
+Converte a tabela cultura em particionada por ano_safra quando CULTURA_PARTITIONING=1 em
+PostgreSQL (ver agric.particoes). Nos demais casos, não faz nada.
+"""
+from django.db import migrations
+
+from agric import particoes
+
+
+def particionar(apps, schema_editor):
+    if particoes.suportado(schema_editor.connection):
+        with schema_editor.connection.cursor() as cursor:
+            particoes.converter(cursor)
+
+
+def desparticionar(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        with schema_editor.connection.cursor() as cursor:
+            particoes.reverter(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agric', '0010_alter_propriedade_estado'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar, desparticionar),
+    ]
@@ -0,0 +1,25 @@
+"""
+Chave substituta de Produtor, passo 1: colunas temporárias para o novo id do produtor e para a
+referência inteira em propriedade.
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agric', '0011_cultura_particionada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produtor',
+            name='id_produtor',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='propriedade',
+            name='produtor_ref',
+            field=models.BigIntegerField(null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+"""
+Chave substituta de Produtor, passo 2: numera os produtores e copia o novo id para as
+propriedades.
+"""
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def numerar_produtores(apps, schema_editor):
+    Produtor = apps.get_model('agric', 'Produtor')
+    Propriedade = apps.get_model('agric', 'Propriedade')
+    # Um único UPDATE numerando os produtores por documento (PostgreSQL e SQLite >= 3.33).
+    schema_editor.execute(
+        'UPDATE "produtor" SET "id_produtor" = numerados."numero" FROM ('
+        'SELECT "cpf_cnpj", ROW_NUMBER() OVER (ORDER BY "cpf_cnpj") AS "numero" FROM "produtor"'
+        ') AS numerados WHERE "produtor"."cpf_cnpj" = numerados."cpf_cnpj"')
+    Propriedade.objects.update(produtor_ref=Subquery(
+        Produtor.objects.filter(cpf_cnpj=OuterRef('produtor_id')).values('id_produtor')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agric', '0012_produtor_id_produtor'),
+    ]
+
+    operations = [
+        migrations.RunPython(numerar_produtores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+"""
+Chave substituta de Produtor, passo 3: id_produtor passa a ser a chave primária, cpf_cnpj
+continua único, e propriedade.produtor é recriada apontando para o novo id.
+"""
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agric', '0013_preencher_id_produtor'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='propriedade',
+            name='produtor',
+        ),
+        migrations.AlterField(
+            model_name='produtor',
+            name='id_produtor',
+            field=models.BigIntegerField(primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='produtor',
+            name='cpf_cnpj',
+            field=models.CharField(max_length=20, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='produtor',
+            name='id_produtor',
+            field=models.BigAutoField(primary_key=True, serialize=False),
+        ),
+        migrations.AddField(
+            model_name='propriedade',
+            name='produtor',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='propriedades', to='agric.produtor'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+"""
+Chave substituta de Produtor, passo 4: preenche propriedade.produtor com o id guardado no passo 2.
+"""
+from django.db import migrations
+from django.db.models import F
+
+
+def copiar_referencia(apps, schema_editor):
+    Propriedade = apps.get_model('agric', 'Propriedade')
+    Propriedade.objects.update(produtor_id=F('produtor_ref'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agric', '0014_produtor_chave_substituta'),
+    ]
+
+    operations = [
+        migrations.RunPython(copiar_referencia, migrations.RunPython.noop),
+    ]
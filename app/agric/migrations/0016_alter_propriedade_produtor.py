@@ -0,0 +1,25 @@
+"""
+Chave substituta de Produtor, passo 5: propriedade.produtor obrigatório e remoção da coluna
+temporária.
+"""
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agric', '0015_preencher_propriedade_produtor'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='propriedade',
+            name='produtor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='propriedades', to='agric.produtor'),
+        ),
+        migrations.RemoveField(
+            model_name='propriedade',
+            name='produtor_ref',
+        ),
+    ]
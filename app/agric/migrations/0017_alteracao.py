@@ -0,0 +1,40 @@
+# Generated by Django 5.2.3 on 2026-10-19 06:50
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agric', '0016_alter_propriedade_produtor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompactacaoAlteracoes',
+            fields=[
+                ('id_compactacao', models.BigAutoField(primary_key=True, serialize=False)),
+                ('executada_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('cursor_minimo', models.BigIntegerField(default=0)),
+                ('removidas', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'alteracao_compactacao',
+            },
+        ),
+        migrations.CreateModel(
+            name='Alteracao',
+            fields=[
+                ('id_alteracao', models.BigAutoField(primary_key=True, serialize=False)),
+                ('modelo', models.CharField(max_length=32)),
+                ('chave', models.CharField(max_length=64)),
+                ('operacao', models.CharField(choices=[('C', 'Criação'), ('U', 'Atualização'), ('D', 'Exclusão')], max_length=1)),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'alteracao',
+                'indexes': [models.Index(fields=['modelo', 'chave', 'id_alteracao'], name='alteracao_objeto_idx'), models.Index(fields=['criado_em'], name='alteracao_criado_em_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-19 06:54
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agric', '0017_alteracao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cultura',
+            name='area',
+            field=models.FloatField(default=0.0, validators=[django.core.validators.MinValueValidator(0.0)]),
+        ),
+        migrations.CreateModel(
+            name='OcupacaoSafra',
+            fields=[
+                ('id_ocupacao', models.BigAutoField(primary_key=True, serialize=False)),
+                ('ano_safra', models.IntegerField()),
+                ('area_plantada', models.FloatField(default=0.0)),
+                ('propriedade', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ocupacoes', to='agric.propriedade')),
+            ],
+            options={
+                'db_table': 'ocupacao_safra',
+                'constraints': [models.UniqueConstraint(fields=('propriedade', 'ano_safra'), name='ocupacao_safra_propriedade_ano_uniq')],
+            },
+        ),
+    ]
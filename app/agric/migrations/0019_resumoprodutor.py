@@ -0,0 +1,42 @@
+# Generated by Django 5.2.3 on 2026-10-19 07:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def preencher_resumos(apps, schema_editor):
+    Propriedade = apps.get_model('agric', 'Propriedade')
+    ResumoProdutor = apps.get_model('agric', 'ResumoProdutor')
+    ResumoProdutor.objects.bulk_create([
+        ResumoProdutor(produtor_id=item['produtor_id'], estado_id=item['estado_id'], propriedades=item['qtd'],
+                       area_total=item['total'], area_agricultavel=item['agricultavel'])
+        for item in Propriedade.objects.values('produtor_id', 'estado_id').order_by().annotate(
+            qtd=models.Count('pk'), total=models.Sum('area_total'), agricultavel=models.Sum('area_agricultavel'))
+    ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agric', '0018_cultura_area'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoProdutor',
+            fields=[
+                ('id_resumo', models.BigAutoField(primary_key=True, serialize=False)),
+                ('propriedades', models.IntegerField(default=0)),
+                ('area_total', models.FloatField(default=0.0)),
+                ('area_agricultavel', models.FloatField(default=0.0)),
+                ('estado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='agric.estado')),
+                ('produtor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos', to='agric.produtor')),
+            ],
+            options={
+                'db_table': 'resumo_produtor',
+                'indexes': [models.Index(fields=['estado', '-area_total'], name='resumo_produtor_total_idx'), models.Index(fields=['estado', '-area_agricultavel'], name='resumo_produtor_agric_idx')],
+                'constraints': [models.UniqueConstraint(fields=('produtor', 'estado'), name='resumo_produtor_estado_uniq')],
+            },
+        ),
+        migrations.RunPython(preencher_resumos, migrations.RunPython.noop),
+    ]
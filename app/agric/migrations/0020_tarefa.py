@@ -0,0 +1,40 @@
+# Generated by Django 5.2.3 on 2026-10-19 07:07
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agric', '0019_resumoprodutor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarefa',
+            fields=[
+                ('id_tarefa', models.BigAutoField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(max_length=64)),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('prioridade', models.IntegerField(default=0)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('executando', 'Executando'), ('concluida', 'Concluída'), ('falhou', 'Falhou')], default='pendente', max_length=16)),
+                ('tentativas', models.IntegerField(default=0)),
+                ('max_tentativas', models.IntegerField(default=3)),
+                ('progresso', models.FloatField(default=0.0)),
+                ('mensagem', models.TextField(blank=True, default='')),
+                ('resultado', models.JSONField(blank=True, null=True)),
+                ('arquivo', models.CharField(blank=True, default='', max_length=255)),
+                ('worker', models.CharField(blank=True, default='', max_length=128)),
+                ('criada_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('disponivel_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('iniciada_em', models.DateTimeField(blank=True, null=True)),
+                ('expira_em', models.DateTimeField(blank=True, null=True)),
+                ('concluida_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'tarefa',
+                'indexes': [models.Index(fields=['status', '-prioridade', 'disponivel_em', 'id_tarefa'], name='tarefa_fila_idx'), models.Index(fields=['status', 'expira_em'], name='tarefa_reserva_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.3 on 2026-10-19 07:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def preencher_resumos(apps, schema_editor):
+    Propriedade = apps.get_model('agric', 'Propriedade')
+    Cultura = apps.get_model('agric', 'Cultura')
+    ResumoGeografico = apps.get_model('agric', 'ResumoGeografico')
+    linhas = {}
+
+    def somar(estado_id, cidade_id, tipo_cultura_id, **deltas):
+        for chave in ((estado_id, 0, tipo_cultura_id), (estado_id, cidade_id, tipo_cultura_id)):
+            linha = linhas.setdefault(chave, {})
+            for medida, valor in deltas.items():
+                linha[medida] = linha.get(medida, 0) + valor
+
+    for item in Propriedade.objects.values('estado_id', 'cidade_id').order_by().annotate(
+            qtd=models.Count('pk'), total=models.Sum('area_total'), agricultavel=models.Sum('area_agricultavel'),
+            vegetacao=models.Sum('area_vegetacao')):
+        somar(item['estado_id'], item['cidade_id'], 0, propriedades=item['qtd'], area_total=item['total'],
+              area_agricultavel=item['agricultavel'], area_vegetacao=item['vegetacao'])
+    for item in Cultura.objects.values('tipo_cultura_id', estado_id=models.F('propriedade__estado_id'),
+                                       cidade_id=models.F('propriedade__cidade_id')).order_by().annotate(
+            qtd=models.Count('pk'), area=models.Sum('area')):
+        for tipo in (0, item['tipo_cultura_id']):
+            somar(item['estado_id'], item['cidade_id'], tipo, culturas=item['qtd'], area_plantada=item['area'])
+    ResumoGeografico.objects.bulk_create([
+        ResumoGeografico(estado_id=estado_id, cidade_id=cidade_id, tipo_cultura_id=tipo_cultura_id, **medidas)
+        for (estado_id, cidade_id, tipo_cultura_id), medidas in linhas.items()
+    ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agric', '0020_tarefa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoGeografico',
+            fields=[
+                ('id_resumo', models.BigAutoField(primary_key=True, serialize=False)),
+                ('cidade_id', models.IntegerField(default=0)),
+                ('tipo_cultura_id', models.IntegerField(default=0)),
+                ('propriedades', models.IntegerField(default=0)),
+                ('area_total', models.FloatField(default=0.0)),
+                ('area_agricultavel', models.FloatField(default=0.0)),
+                ('area_vegetacao', models.FloatField(default=0.0)),
+                ('culturas', models.IntegerField(default=0)),
+                ('area_plantada', models.FloatField(default=0.0)),
+            ],
+            options={
+                'db_table': 'resumo_geografico',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='propriedade',
+            index=models.Index(fields=['cidade', '-area_total'], name='propriedade_cidade_area_idx'),
+        ),
+        migrations.AddField(
+            model_name='resumogeografico',
+            name='estado',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='agric.estado'),
+        ),
+        migrations.AddIndex(
+            model_name='resumogeografico',
+            index=models.Index(fields=['estado', 'tipo_cultura_id', '-area_total'], name='resumo_geografico_filhos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resumogeografico',
+            index=models.Index(fields=['cidade_id', 'tipo_cultura_id', '-area_total'], name='resumo_geografico_estados_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumogeografico',
+            constraint=models.UniqueConstraint(fields=('estado', 'cidade_id', 'tipo_cultura_id'), name='resumo_geografico_no_uniq'),
+        ),
+        migrations.RunPython(preencher_resumos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-19 07:22
+
+from django.db import migrations, models
+
+
+def preencher_culturas(apps, schema_editor):
+    Cultura = apps.get_model('agric', 'Cultura')
+    ResumoProdutor = apps.get_model('agric', 'ResumoProdutor')
+    for item in Cultura.objects.values(produtor=models.F('propriedade__produtor_id'),
+                                       uf=models.F('propriedade__estado_id')).order_by().annotate(
+            qtd=models.Count('pk'), area=models.Sum('area')):
+        ResumoProdutor.objects.filter(produtor_id=item['produtor'], estado_id=item['uf']).update(
+            culturas=item['qtd'], area_plantada=item['area'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agric', '0021_resumogeografico'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumoprodutor',
+            name='area_plantada',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='resumoprodutor',
+            name='culturas',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(preencher_culturas, migrations.RunPython.noop),
+    ]
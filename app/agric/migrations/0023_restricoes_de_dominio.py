@@ -0,0 +1,46 @@
+# Generated by Django 5.2.3 on 2026-10-19 07:32
+
+import django.db.models.expressions
+import django.db.models.functions.text
+import django.db.models.lookups
+from django.db import migrations, models
+from django.db.models.functions import Length
+
+
+def verificar_dados(apps, schema_editor):
+    """
+    Falha com uma mensagem clara se houver linhas que as novas restrições recusariam.
+    """
+    Produtor = apps.get_model('agric', 'Produtor')
+    Propriedade = apps.get_model('agric', 'Propriedade')
+    documentos = Produtor.objects.annotate(tamanho=Length('cpf_cnpj')).exclude(
+        models.Q(tamanho=11, tipo_documento='CPF') | models.Q(tamanho=14, tipo_documento='CNPJ')).count()
+    areas = Propriedade.objects.filter(
+        models.Q(area_total__lt=0) | models.Q(area_agricultavel__lt=0) | models.Q(area_vegetacao__lt=0) |
+        models.Q(area_agricultavel__gt=models.F('area_total') - models.F('area_vegetacao') + 1e-6)).count()
+    if documentos or areas:
+        raise RuntimeError(f"Corrija antes de migrar: {documentos} produtores com documento incompatível com o "
+                           f"tipo e {areas} propriedades com áreas inválidas.")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agric', '0022_resumoprodutor_culturas'),
+    ]
+
+    operations = [
+        migrations.RunPython(verificar_dados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='produtor',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(django.db.models.lookups.Exact(django.db.models.functions.text.Length('cpf_cnpj'), 11), ('tipo_documento', 'CPF')), models.Q(django.db.models.lookups.Exact(django.db.models.functions.text.Length('cpf_cnpj'), 14), ('tipo_documento', 'CNPJ')), _connector='OR'), name='produtor_documento_tipo_check', violation_error_message='Documento deve ser CPF ou CNPJ válido'),
+        ),
+        migrations.AddConstraint(
+            model_name='propriedade',
+            constraint=models.CheckConstraint(condition=models.Q(('area_agricultavel__gte', 0), ('area_total__gte', 0), ('area_vegetacao__gte', 0)), name='propriedade_areas_nao_negativas_check', violation_error_message='As áreas não podem ser negativas.'),
+        ),
+        migrations.AddConstraint(
+            model_name='propriedade',
+            constraint=models.CheckConstraint(condition=django.db.models.lookups.LessThanOrEqual(django.db.models.expressions.CombinedExpression(models.F('area_agricultavel'), '+', models.F('area_vegetacao')), django.db.models.expressions.CombinedExpression(models.F('area_total'), '+', models.Value(1e-06))), name='propriedade_areas_soma_check', violation_error_message='A soma das áreas agricultável e de vegetação não pode ultrapassar a área total.'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.3 on 2026-10-19 08:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Linha de total de todos os estados (ResumoProdutor.TODOS).
+TODOS = 0
+
+
+def preencher_resumos(apps, schema_editor):
+    Cultura = apps.get_model('agric', 'Cultura')
+    ResumoProdutor = apps.get_model('agric', 'ResumoProdutor')
+    ResumoProdutorSafra = apps.get_model('agric', 'ResumoProdutorSafra')
+    ResumoProdutor.objects.bulk_create([
+        ResumoProdutor(produtor_id=item['produtor_id'], estado_id=TODOS, propriedades=item['qtd'],
+                       area_total=item['total'], area_agricultavel=item['agricultavel'],
+                       culturas=item['culturas'], area_plantada=item['plantada'])
+        for item in ResumoProdutor.objects.values('produtor_id').order_by().annotate(
+            qtd=models.Sum('propriedades'), total=models.Sum('area_total'),
+            agricultavel=models.Sum('area_agricultavel'), culturas=models.Sum('culturas'),
+            plantada=models.Sum('area_plantada'))
+    ], batch_size=5000)
+    linhas = {}
+    for item in Cultura.objects.values('ano_safra', produtor=models.F('propriedade__produtor_id'),
+                                       uf=models.F('propriedade__estado_id')).order_by().annotate(
+            qtd=models.Count('pk'), area=models.Sum('area')):
+        for uf in (item['uf'], TODOS):
+            linha = linhas.setdefault((item['produtor'], uf, item['ano_safra']), ResumoProdutorSafra(
+                produtor_id=item['produtor'], estado_id=uf, ano_safra=item['ano_safra']))
+            linha.culturas += item['qtd']
+            linha.area_plantada += item['area']
+    ResumoProdutorSafra.objects.bulk_create(linhas.values(), batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agric', '0023_restricoes_de_dominio'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resumoprodutor',
+            name='estado',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='agric.estado'),
+        ),
+        migrations.CreateModel(
+            name='ResumoProdutorSafra',
+            fields=[
+                ('id_resumo', models.BigAutoField(primary_key=True, serialize=False)),
+                ('ano_safra', models.IntegerField()),
+                ('culturas', models.IntegerField(default=0)),
+                ('area_plantada', models.FloatField(default=0.0)),
+                ('estado', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='agric.estado')),
+                ('produtor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='agric.produtor')),
+            ],
+            options={
+                'db_table': 'resumo_produtor_safra',
+                'indexes': [models.Index(fields=['ano_safra', 'estado', '-area_plantada'], name='resumo_produtor_safra_idx')],
+                'constraints': [models.UniqueConstraint(fields=('produtor', 'estado', 'ano_safra'), name='resumo_produtor_safra_uniq')],
+            },
+        ),
+        migrations.RunPython(preencher_resumos, migrations.RunPython.noop),
+    ]
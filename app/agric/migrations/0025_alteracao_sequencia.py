@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-19 08:12
+
+import agric.models
+from django.db import migrations, models
+
+
+def numerar_existentes(apps, schema_editor):
+    # Os cursores já entregues eram ids: as alterações existentes mantêm o id como sequência.
+    Alteracao = apps.get_model('agric', 'Alteracao')
+    Alteracao.objects.update(sequencia=models.F('id_alteracao'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agric', '0024_resumo_produtor_safra'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alteracao',
+            name='sequencia',
+            field=models.BigIntegerField(null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='alteracao',
+            name='transacao',
+            field=models.BigIntegerField(db_default=agric.models.TransacaoAtual(), null=True),
+        ),
+        migrations.RunPython(numerar_existentes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='alteracao',
+            index=models.Index(condition=models.Q(('sequencia__isnull', True)), fields=['transacao', 'id_alteracao'], name='alteracao_pendente_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-19 08:23
+
+from django.db import migrations, models
+
+
+def verificar_dados(apps, schema_editor):
+    """
+    Falha com uma mensagem clara se houver culturas que a nova restrição recusaria.
+    """
+    Cultura = apps.get_model('agric', 'Cultura')
+    negativas = Cultura.objects.filter(area__lt=0).count()
+    if negativas:
+        raise RuntimeError(f"Corrija antes de migrar: {negativas} culturas com área negativa.")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agric', '0025_alteracao_sequencia'),
+    ]
+
+    operations = [
+        migrations.RunPython(verificar_dados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cultura',
+            constraint=models.CheckConstraint(condition=models.Q(('area__gte', 0)), name='cultura_area_nao_negativa_check', violation_error_message='A área não pode ser negativa.'),
+        ),
+    ]
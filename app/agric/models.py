@@ -4,28 +4,54 @@ models.py
 Modelos de dados do app Agric.
 
 Este módulo define as entidades principais do sistema de gestão agrícola:
-- Produtor: representa um produtor rural, identificado por CPF ou CNPJ.
+- Produtor: representa um produtor rural, identificado por CPF ou CNPJ (chave natural)
+  e por uma chave substituta inteira (id_produtor), usada nas chaves estrangeiras.
 - Estado: representa uma unidade federativa.
 - Cidade: representa um município vinculado a um estado.
 - TipoCultura: representa um tipo de cultura agrícola (ex: Grãos, Frutas).
 - Propriedade: representa uma fazenda/propriedade rural, vinculada a um produtor e cidade.
 - Cultura: representa o plantio de um tipo de cultura em uma propriedade em determinado ano-safra.
+- OcupacaoSafra: total de área plantada por propriedade e ano-safra, mantido a cada escrita em
+  Cultura para validar a capacidade da propriedade sem reagregar as culturas.
+- ResumoProdutor: totais de propriedades, áreas e culturas por produtor e estado (e de todos os
+  estados), mantidos a cada escrita em Propriedade e Cultura para o ranking e o portfólio de produtores.
+- ResumoProdutorSafra: área plantada por produtor, estado e ano-safra, mantida a cada escrita em
+  Cultura para o ranking por safra.
+- ResumoGeografico: totais de propriedades, áreas e culturas por estado e cidade (e por tipo de
+  cultura), mantidos a cada escrita em Propriedade e Cultura para o drill-down geográfico.
+- Alteracao: log append-only das criações, atualizações e exclusões nos models acima.
+- CompactacaoAlteracoes: execuções da compactação do log (horizonte de retenção).
+- Tarefa: fila de tarefas em segundo plano (exportações e recálculos), executadas pelo comando
+  executar_tarefas.
 
 Cada model implementa validações de negócio e métodos utilitários para garantir a integridade dos dados.
 """
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models.functions import Length
+from django.db.models.lookups import Exact, LessThanOrEqual
+from django.core.validators import MinValueValidator
+from django.utils import timezone
 from django.core.exceptions import ValidationError
-from .validators import is_valid_cpf, is_valid_cnpj, get_document_type
-import re
+from .validators import parse_document
 
 import logging
 logger = logging.getLogger(__name__)
 
 
+MENSAGEM_DOCUMENTO = 'Documento deve ser CPF ou CNPJ válido'
+MENSAGEM_AREAS = "A soma das áreas agricultável e de vegetação não pode ultrapassar a área total."
+# Folga para o erro de arredondamento de float na soma das áreas (ex.: 0.1 + 0.2 > 0.3).
+TOLERANCIA_AREAS = 1e-6
+
+
 class Produtor(models.Model):
     """
     Representa um produtor rural, identificado por CPF ou CNPJ.
     Valida o documento e define o tipo automaticamente.
+    A chave primária é o inteiro id_produtor (joins e índices menores); o documento continua
+    único e é o identificador exposto pela API.
+    O banco garante que o tamanho do documento corresponde ao tipo (11 dígitos para CPF, 14 para
+    CNPJ); os dígitos verificadores são conferidos apenas em Python (`clean`).
     """
     CPF = 'CPF'
     CNPJ = 'CNPJ'
@@ -34,33 +60,51 @@ class Produtor(models.Model):
         (CNPJ, 'CNPJ'),
     ]
 
-    cpf_cnpj = models.CharField(primary_key=True, max_length=20, unique=True)
+    id_produtor = models.BigAutoField(primary_key=True)
+    cpf_cnpj = models.CharField(max_length=20, unique=True)
     tipo_documento = models.CharField(max_length=10, choices=TIPO_DOCUMENTO_CHOICES)
     nome_produtor = models.CharField(max_length=255)
 
     class Meta:
-        db_table = "produtor"    
+        db_table = "produtor"
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(Exact(Length('cpf_cnpj'), 11), tipo_documento='CPF') |
+                models.Q(Exact(Length('cpf_cnpj'), 14), tipo_documento='CNPJ'),
+                name='produtor_documento_tipo_check', violation_error_message=MENSAGEM_DOCUMENTO),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Guarda o documento carregado: a unicidade só precisa ser checada quando ele muda.
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_cpf_cnpj = dict(zip(field_names, values)).get('cpf_cnpj')
+        return instance
+
+    @classmethod
+    def normalizar_documento(cls, valor) -> tuple:
+        """
+        Remove a máscara, identifica o tipo e confere os dígitos verificadores em uma única
+        passada. Retorna (documento, tipo) ou levanta ValidationError para o campo cpf_cnpj.
+        """
+        documento, tipo, valido = parse_document(valor)
+        if not valido:
+            logger.warning("%s inválido recebido: %s", tipo or "Documento", documento)
+            raise ValidationError({'cpf_cnpj': f'{tipo} inválido' if tipo else MENSAGEM_DOCUMENTO})
+        return documento, tipo
 
     def clean(self):
-        # Remove máscara
-        self.cpf_cnpj = re.sub(r'\D', '', self.cpf_cnpj)
-        tipo = get_document_type(self.cpf_cnpj)
-        if tipo == 'CPF':
-            if not is_valid_cpf(self.cpf_cnpj):
-                logger.warning("CPF inválido recebido: %s", self.cpf_cnpj)
-                raise ValidationError({'cpf_cnpj': 'CPF inválido'})
-        elif tipo == 'CNPJ':
-            if not is_valid_cnpj(self.cpf_cnpj):
-                logger.warning("CNPJ inválido recebido: %s", self.cpf_cnpj)
-                raise ValidationError({'cpf_cnpj': 'CNPJ inválido'})
-        else:
-            logger.warning("Documento inválido recebido: %s", self.cpf_cnpj)
-            raise ValidationError({'cpf_cnpj': 'Documento deve ser CPF ou CNPJ válido'})
-        self.tipo_documento = tipo
+        self.cpf_cnpj, self.tipo_documento = self.normalizar_documento(self.cpf_cnpj)
 
-    def save(self, *args, **kwargs):
-        self.full_clean()
+    def save(self, *args, validado=False, **kwargs):
+        # validado=True: o chamador (ProdutorSerializer, seed) já normalizou e validou o documento,
+        # inclusive a unicidade; sem isso, full_clean repetiria a validação e a consulta.
+        # As CheckConstraints ficam com o banco: validá-las aqui custaria uma consulta cada.
+        if not validado:
+            self.full_clean(validate_unique=self._state.adding or
+                            self.cpf_cnpj != getattr(self, '_loaded_cpf_cnpj', None), validate_constraints=False)
         super().save(*args, **kwargs)
+        self._loaded_cpf_cnpj = self.cpf_cnpj
 
     def __str__(self):
         return f"{self.nome_produtor} ({self.cpf_cnpj})"
@@ -93,6 +137,13 @@ class Cidade(models.Model):
         db_table = "cidade"
         unique_together = ('nome_cidade', 'estado')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Guarda o estado carregado para detectar mudança de estado no save (ver agric.signals).
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_estado_id = dict(zip(field_names, values)).get('estado_id')
+        return instance
+
     def __str__(self):
         return f"{self.nome_cidade} ({self.estado.nome_estado})"
 
@@ -116,7 +167,13 @@ class Propriedade(models.Model):
     Representa uma fazenda/propriedade rural.
     Vinculada a um produtor e cidade.
     Valida que a soma das áreas agricultável e de vegetação não ultrapassa a área total.
+    O estado é desnormalizado a partir da cidade (preenchido em agric.signals), permitindo
+    agregações por estado sem join, cobertas pelo índice (estado, áreas).
+    As regras de área (não negativas, agricultável + vegetação <= total) também são
+    CheckConstraints, de modo que escritas em massa (bulk_create, QuerySet.update) não as violam.
     """
+    TOLERANCIA = TOLERANCIA_AREAS
+
     id_propriedade = models.BigAutoField(primary_key=True)
     nome_propriedade = models.CharField(max_length=255)
     area_total = models.FloatField()
@@ -124,16 +181,42 @@ class Propriedade(models.Model):
     area_vegetacao = models.FloatField()
     cidade = models.ForeignKey('Cidade', on_delete=models.CASCADE, related_name='propriedades')
     produtor = models.ForeignKey('Produtor', on_delete=models.CASCADE, related_name='propriedades')
+    estado = models.ForeignKey('Estado', on_delete=models.CASCADE, related_name='propriedades', editable=False)
 
     class Meta:
         db_table = "propriedade"
+        indexes = [
+            models.Index(fields=['estado', 'area_total', 'area_agricultavel', 'area_vegetacao'],
+                         name='propriedade_estado_areas_idx'),
+            # Propriedades de uma cidade pela área (drill-down geográfico).
+            models.Index(fields=['cidade', '-area_total'], name='propriedade_cidade_area_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(area_total__gte=0, area_agricultavel__gte=0, area_vegetacao__gte=0),
+                name='propriedade_areas_nao_negativas_check',
+                violation_error_message="As áreas não podem ser negativas."),
+            models.CheckConstraint(
+                condition=LessThanOrEqual(models.F('area_agricultavel') + models.F('area_vegetacao'),
+                                          models.F('area_total') + TOLERANCIA_AREAS),
+                name='propriedade_areas_soma_check', violation_error_message=MENSAGEM_AREAS),
+        ]
 
     def clean(self):
-        if self.area_agricultavel + self.area_vegetacao > self.area_total:
+        if self.area_agricultavel + self.area_vegetacao > self.area_total + self.TOLERANCIA:
             logger.warning("Área inválida em Propriedade '%s': agric.=%s + veget.=%s > total=%s",
                 self.nome_propriedade, self.area_agricultavel, self.area_vegetacao, self.area_total)
-            raise ValidationError("A soma das áreas agricultável e de vegetação não pode ultrapassar a área total.")
+            raise ValidationError(MENSAGEM_AREAS)
+
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Guarda o resumo carregado: o post_save ajusta ResumoProdutor apenas pela diferença.
+        instance = super().from_db(db, field_names, values)
+        carregados = dict(zip(field_names, values))
+        instance._loaded_resumo = tuple(carregados.get(campo) for campo in ResumoProdutor.CAMPOS)
+        instance._loaded_geo = tuple(carregados.get(campo) for campo in ResumoGeografico.CAMPOS)
+        return instance
 
     def __str__(self):
         return self.nome_propriedade
@@ -143,16 +226,804 @@ class Cultura(models.Model):
     """
     Representa o plantio de um tipo de cultura em uma propriedade em determinado ano-safra.
     Garante unicidade por (ano_safra, tipo_cultura, propriedade).
+    A soma das áreas plantadas numa safra não pode ultrapassar a área agricultável da
+    propriedade; o save reserva a diferença de área em OcupacaoSafra, na mesma transação.
+    A área não negativa também é uma CheckConstraint, como as áreas da Propriedade.
     """
     id_cultura = models.BigAutoField(primary_key=True)
     ano_safra = models.IntegerField()
     tipo_cultura = models.ForeignKey('TipoCultura', on_delete=models.CASCADE, related_name='culturas')
     propriedade = models.ForeignKey('Propriedade', on_delete=models.CASCADE, related_name='culturas')
+    area = models.FloatField(default=0.0, validators=[MinValueValidator(0.0)])
 
     class Meta:
         db_table = "cultura"
         unique_together = ('ano_safra', 'tipo_cultura', 'propriedade')
+        constraints = [
+            models.CheckConstraint(condition=models.Q(area__gte=0), name='cultura_area_nao_negativa_check',
+                                   violation_error_message="A área não pode ser negativa."),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Guarda a ocupação carregada: o save reserva ou libera apenas a diferença.
+        instance = super().from_db(db, field_names, values)
+        carregados = dict(zip(field_names, values))
+        instance._loaded_ocupacao = (carregados.get('propriedade_id'), carregados.get('ano_safra'),
+                                     carregados.get('area'))
+        instance._loaded_resumo = tuple(carregados.get(campo) for campo in ResumoProdutor.CAMPOS_CULTURA)
+        instance._loaded_safra = tuple(carregados.get(campo) for campo in ResumoProdutorSafra.CAMPOS_CULTURA)
+        instance._loaded_geo = tuple(carregados.get(campo) for campo in ResumoGeografico.CAMPOS_CULTURA)
+        return instance
+
+    def clean(self):
+        """
+        Confere a capacidade da safra para formulários (ModelForm/admin), que só tratam a
+        ValidationError levantada na validação. Sem trava: o save continua sendo a garantia.
+        """
+        if self.propriedade_id is None or self.ano_safra is None or not self.area:
+            return
+        anterior = None if self._state.adding else getattr(self, '_loaded_ocupacao', None)
+        liberada = anterior[2] if anterior and anterior[:2] == (self.propriedade_id, self.ano_safra) else 0.0
+        plantada = OcupacaoSafra.objects.filter(propriedade_id=self.propriedade_id, ano_safra=self.ano_safra) \
+            .values_list('area_plantada', flat=True).first() or 0.0
+        capacidade = Propriedade.objects.filter(pk=self.propriedade_id) \
+            .values_list('area_agricultavel', flat=True).first()
+        if capacidade is not None and plantada - (liberada or 0.0) + self.area > capacidade + OcupacaoSafra.TOLERANCIA:
+            raise ValidationError({'area': self.mensagem_de_capacidade()})
+
+    def mensagem_de_capacidade(self) -> str:
+        return (f"A soma das áreas plantadas na safra {self.ano_safra} não pode ultrapassar a área "
+                "agricultável da propriedade.")
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(savepoint=False):
+            reservado = self.atualizar_ocupacao()
+            if reservado:
+                super().save(*args, **kwargs)
+        # Levantado fora do bloco atômico: a reserva recusada não escreveu nada, e a transação
+        # de quem chamou continua utilizável.
+        if not reservado:
+            logger.warning("Área plantada excederia a capacidade: propriedade=%s safra=%s area=%s",
+                           self.propriedade_id, self.ano_safra, self.area)
+            raise ValidationError({'area': self.mensagem_de_capacidade()})
+        self._loaded_ocupacao = (self.propriedade_id, self.ano_safra, self.area)
+
+    def atualizar_ocupacao(self) -> bool:
+        """
+        Reserva (ou libera) em OcupacaoSafra a área desta cultura. Retorna False, sem alterar
+        nada, se a nova área não couber na safra.
+        """
+        anterior = None if self._state.adding else getattr(self, '_loaded_ocupacao', None)
+        atual = (self.propriedade_id, self.ano_safra, self.area)
+        if anterior == atual:
+            return True
+        if anterior is not None and anterior[:2] == atual[:2]:
+            diferenca = self.area - anterior[2]
+            if diferenca <= 0:
+                OcupacaoSafra.liberar(self.propriedade_id, self.ano_safra, -diferenca)
+                return True
+            return OcupacaoSafra.reservar(self.propriedade_id, self.ano_safra, diferenca)
+        if not OcupacaoSafra.reservar(*atual):
+            return False
+        if anterior is not None:
+            OcupacaoSafra.liberar(*anterior)
+        return True
 
     def __str__(self):
         return f"{self.tipo_cultura.tipo_cultura} - {self.ano_safra} ({self.propriedade.nome_propriedade})"
-    
\ No newline at end of file
+    
+
+class OcupacaoSafra(models.Model):
+    """
+    Total de área plantada (soma de Cultura.area) por propriedade e ano-safra.
+
+    Cada reserva é um upsert condicional: a linha da safra é criada ou incrementada apenas se o
+    novo total couber na área agricultável da propriedade. Antes dele a linha da propriedade é
+    travada (SELECT ... FOR UPDATE), como em `verificar_capacidade`: reservas concorrentes e a
+    redução da área agricultável da mesma propriedade são serializadas, e o custo por escrita
+    não depende da quantidade de culturas da propriedade.
+    Escritas em massa em Cultura (bulk_create, QuerySet.update) devem chamar `recalcular`.
+    """
+    TOLERANCIA = 1e-6
+
+    id_ocupacao = models.BigAutoField(primary_key=True)
+    propriedade = models.ForeignKey('Propriedade', on_delete=models.CASCADE, related_name='ocupacoes')
+    ano_safra = models.IntegerField()
+    area_plantada = models.FloatField(default=0.0)
+
+    class Meta:
+        db_table = "ocupacao_safra"
+        constraints = [
+            models.UniqueConstraint(fields=['propriedade', 'ano_safra'], name='ocupacao_safra_propriedade_ano_uniq'),
+        ]
+
+    @classmethod
+    def reservar(cls, propriedade_id, ano_safra, area) -> bool:
+        """
+        Soma `area` ao total da safra. Retorna False, sem alterar nada, se o total ultrapassar
+        a área agricultável da propriedade.
+        """
+        if not area or area <= 0:
+            return True
+        cls.travar_propriedade(propriedade_id)
+        tabela, propriedades = cls._meta.db_table, Propriedade._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO "{tabela}" ("propriedade_id", "ano_safra", "area_plantada") '
+                f'SELECT "id_propriedade", %s, %s FROM "{propriedades}" '
+                f'WHERE "id_propriedade" = %s AND %s <= "area_agricultavel" + %s '
+                f'ON CONFLICT ("propriedade_id", "ano_safra") DO UPDATE '
+                f'SET "area_plantada" = "{tabela}"."area_plantada" + excluded."area_plantada" '
+                f'WHERE "{tabela}"."area_plantada" + excluded."area_plantada" <= (SELECT "area_agricultavel" '
+                f'FROM "{propriedades}" WHERE "id_propriedade" = excluded."propriedade_id") + %s',
+                [ano_safra, area, propriedade_id, area, cls.TOLERANCIA, cls.TOLERANCIA])
+            return cursor.rowcount > 0
+
+    @classmethod
+    def liberar(cls, propriedade_id, ano_safra, area):
+        if area and area > 0:
+            cls.objects.filter(propriedade_id=propriedade_id, ano_safra=ano_safra).update(
+                area_plantada=models.F('area_plantada') - area)
+
+    @staticmethod
+    def travar_propriedade(propriedade_id):
+        """
+        Trava a linha da propriedade até o fim da transação (no SQLite a escrita já é serializada).
+        """
+        list(Propriedade.objects.select_for_update().filter(pk=propriedade_id).values_list('pk', flat=True))
+
+    @classmethod
+    def verificar_capacidade(cls, propriedade_id, area_agricultavel):
+        """
+        Levanta ValidationError se alguma safra da propriedade tiver mais área plantada que
+        `area_agricultavel`. Trava a propriedade até o fim da transação: nenhuma reserva da
+        propriedade (nem a primeira de uma safra nova) é feita antes da nova área ser gravada.
+        """
+        cls.travar_propriedade(propriedade_id)
+        excedidas = [ano for ano, area in cls.objects.filter(propriedade_id=propriedade_id)
+                     .values_list('ano_safra', 'area_plantada')
+                     if area > area_agricultavel + cls.TOLERANCIA]
+        if excedidas:
+            raise ValidationError({'area_agricultavel': "A área agricultável não pode ser menor que a área "
+                                                        f"plantada na safra {min(excedidas)}."})
+
+    @classmethod
+    def recalcular(cls, propriedade_ids=None):
+        """
+        Reconstrói os totais a partir das culturas (de todas as propriedades ou das informadas).
+        """
+        culturas = Cultura.objects.all()
+        ocupacoes = cls.objects.all()
+        if propriedade_ids is not None:
+            culturas = culturas.filter(propriedade_id__in=propriedade_ids)
+            ocupacoes = ocupacoes.filter(propriedade_id__in=propriedade_ids)
+        with transaction.atomic():
+            ocupacoes.delete()
+            cls.objects.bulk_create([
+                cls(propriedade_id=item['propriedade_id'], ano_safra=item['ano_safra'], area_plantada=item['total'])
+                for item in culturas.values('propriedade_id', 'ano_safra').annotate(total=models.Sum('area'))
+                if item['total']], batch_size=5000)
+
+    def __str__(self):
+        return f"{self.propriedade_id}/{self.ano_safra}: {self.area_plantada} ha"
+
+
+# Linhas por instrução nos upserts de resumos em lote.
+LOTE_RESUMOS = 1000
+
+
+def _acumular(linhas, chave, valores):
+    atual = linhas.get(chave)
+    linhas[chave] = tuple(valores) if atual is None else tuple(a + b for a, b in zip(atual, valores))
+
+
+def _somar_em_lote(model, chaves, medidas, linhas):
+    """
+    Soma `linhas` ({chave: valores das medidas}) às linhas de `model` identificadas pelas colunas
+    `chaves`, criando-as se preciso, com um INSERT ... ON CONFLICT DO UPDATE por lote. Linhas sem
+    alteração são descartadas (cada chave aparece no máximo uma vez por instrução).
+    """
+    tabela = model._meta.db_table
+    itens = [(*chave, *valores) for chave, valores in linhas.items() if any(valores)]
+    colunas = ", ".join(f'"{coluna}"' for coluna in chaves + medidas)
+    linha = f'({", ".join(["%s"] * (len(chaves) + len(medidas)))})'
+    conflito = ", ".join(f'"{coluna}"' for coluna in chaves)
+    atualizacoes = ", ".join(f'"{medida}" = "{tabela}"."{medida}" + excluded."{medida}"' for medida in medidas)
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(itens), LOTE_RESUMOS):
+            lote = itens[inicio:inicio + LOTE_RESUMOS]
+            cursor.execute(
+                f'INSERT INTO "{tabela}" ({colunas}) VALUES {", ".join([linha] * len(lote))} '
+                f'ON CONFLICT ({conflito}) DO UPDATE SET {atualizacoes}',
+                [valor for item in lote for valor in item])
+
+
+class ResumoProdutor(models.Model):
+    """
+    Quantidade de propriedades, soma das áreas, culturas e área plantada por produtor e estado.
+
+    Cada produtor tem ainda uma linha com estado_id = 0 que totaliza todos os estados (sem chave
+    estrangeira no banco para esse valor). Mantido a cada save/delete de Propriedade e Cultura
+    (ver agric.signals) com incrementos atômicos, de modo que o ranking e o portfólio de
+    produtores leem uma linha por produtor, percorrendo o índice (estado, -medida), em vez de
+    agregar as propriedades e culturas. Escritas em massa em Propriedade ou Cultura
+    (bulk_create, QuerySet.update) devem chamar `recalcular`.
+    """
+    TODOS = 0
+    # Campos de Propriedade e de Cultura que compõem o resumo, na ordem dos métodos abaixo.
+    CAMPOS = ('produtor_id', 'estado_id', 'area_total', 'area_agricultavel')
+    CAMPOS_CULTURA = ('propriedade_id', 'area')
+
+    id_resumo = models.BigAutoField(primary_key=True)
+    produtor = models.ForeignKey('Produtor', on_delete=models.CASCADE, related_name='resumos')
+    estado = models.ForeignKey('Estado', on_delete=models.CASCADE, related_name='+', db_constraint=False)
+    propriedades = models.IntegerField(default=0)
+    area_total = models.FloatField(default=0.0)
+    area_agricultavel = models.FloatField(default=0.0)
+    culturas = models.IntegerField(default=0)
+    area_plantada = models.FloatField(default=0.0)
+
+    class Meta:
+        db_table = "resumo_produtor"
+        constraints = [
+            models.UniqueConstraint(fields=['produtor', 'estado'], name='resumo_produtor_estado_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['estado', '-area_total'], name='resumo_produtor_total_idx'),
+            models.Index(fields=['estado', '-area_agricultavel'], name='resumo_produtor_agric_idx'),
+        ]
+
+    @classmethod
+    def adicionar(cls, produtor_id, estado_id, area_total, area_agricultavel, propriedades=1, culturas=0,
+                  area_plantada=0.0):
+        """
+        Soma uma propriedade (ou os valores informados) ao resumo do (produtor, estado) e ao total
+        do produtor, criando as linhas se preciso.
+        """
+        tabela = cls._meta.db_table
+        valores = [propriedades, area_total, area_agricultavel, culturas, area_plantada]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO "{tabela}" ("produtor_id", "estado_id", "propriedades", "area_total", '
+                f'"area_agricultavel", "culturas", "area_plantada") '
+                f'VALUES (%s, %s, %s, %s, %s, %s, %s), (%s, %s, %s, %s, %s, %s, %s) '
+                f'ON CONFLICT ("produtor_id", "estado_id") DO UPDATE '
+                f'SET "propriedades" = "{tabela}"."propriedades" + excluded."propriedades", '
+                f'"area_total" = "{tabela}"."area_total" + excluded."area_total", '
+                f'"area_agricultavel" = "{tabela}"."area_agricultavel" + excluded."area_agricultavel", '
+                f'"culturas" = "{tabela}"."culturas" + excluded."culturas", '
+                f'"area_plantada" = "{tabela}"."area_plantada" + excluded."area_plantada"',
+                [produtor_id, estado_id, *valores, produtor_id, cls.TODOS, *valores])
+
+    @classmethod
+    def remover(cls, produtor_id, estado_id, area_total, area_agricultavel, propriedades=1, culturas=0,
+                area_plantada=0.0):
+        # UPDATE e não upsert: na exclusão em cascata do produtor ou do estado, a linha pode já
+        # ter sido removida, e não deve ser recriada.
+        cls.objects.filter(produtor_id=produtor_id, estado_id__in=(estado_id, cls.TODOS)).update(
+            propriedades=models.F('propriedades') - propriedades,
+            area_total=models.F('area_total') - area_total,
+            area_agricultavel=models.F('area_agricultavel') - area_agricultavel,
+            culturas=models.F('culturas') - culturas,
+            area_plantada=models.F('area_plantada') - area_plantada)
+
+    @classmethod
+    def adicionar_cultura(cls, propriedade_id, area):
+        """
+        Soma uma cultura ao resumo do produtor e estado da propriedade (e ao total do produtor),
+        lidos no próprio INSERT ... SELECT.
+        """
+        tabela = cls._meta.db_table
+        propriedades = Propriedade._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO "{tabela}" ("produtor_id", "estado_id", "propriedades", "area_total", '
+                f'"area_agricultavel", "culturas", "area_plantada") '
+                f'SELECT "produtor_id", "estado_id", 0, 0, 0, 1, %s FROM "{propriedades}" '
+                f'WHERE "id_propriedade" = %s UNION ALL '
+                f'SELECT "produtor_id", %s, 0, 0, 0, 1, %s FROM "{propriedades}" '
+                f'WHERE "id_propriedade" = %s '
+                f'ON CONFLICT ("produtor_id", "estado_id") DO UPDATE '
+                f'SET "culturas" = "{tabela}"."culturas" + excluded."culturas", '
+                f'"area_plantada" = "{tabela}"."area_plantada" + excluded."area_plantada"',
+                [area, propriedade_id, cls.TODOS, area, propriedade_id])
+
+    @classmethod
+    def remover_cultura(cls, propriedade_id, area, culturas=1):
+        propriedade = Propriedade.objects.filter(pk=propriedade_id)
+        cls.objects.filter(models.Q(estado_id=models.Subquery(propriedade.values('estado_id')))
+                           | models.Q(estado_id=cls.TODOS),
+                           produtor_id=models.Subquery(propriedade.values('produtor_id'))).update(
+            culturas=models.F('culturas') - culturas, area_plantada=models.F('area_plantada') - area)
+
+    @classmethod
+    def somar_culturas(cls, deltas):
+        """
+        Soma culturas e área plantada ({(produtor_id, estado_id): (culturas, area)}) aos resumos e
+        aos totais dos produtores, em um upsert por lote (escritas em massa, ex: virada de safra).
+        """
+        linhas = {}
+        for (produtor_id, estado_id), (culturas, area) in deltas.items():
+            for uf in (estado_id, cls.TODOS):
+                _acumular(linhas, (produtor_id, uf), (0, 0.0, 0.0, culturas, area))
+        _somar_em_lote(cls, ('produtor_id', 'estado_id'),
+                       ('propriedades', 'area_total', 'area_agricultavel', 'culturas', 'area_plantada'), linhas)
+
+    @classmethod
+    def mover_culturas(cls, propriedade_id, origem, destino):
+        """
+        Transfere as culturas da propriedade do resumo `origem` para `destino` ((produtor_id, estado_id)).
+        """
+        totais = Cultura.objects.filter(propriedade_id=propriedade_id).aggregate(
+            qtd=models.Count('pk'), area=models.Sum('area'))
+        if totais['qtd']:
+            cls.remover(*origem, 0.0, 0.0, propriedades=0, culturas=totais['qtd'], area_plantada=totais['area'])
+            cls.adicionar(*destino, 0.0, 0.0, propriedades=0, culturas=totais['qtd'], area_plantada=totais['area'])
+
+    @classmethod
+    def recalcular(cls, produtor_ids=None):
+        """
+        Reconstrói os resumos a partir das propriedades e culturas (de todos os produtores ou dos informados).
+        """
+        propriedades = Propriedade.objects.all()
+        culturas = Cultura.objects.all()
+        resumos = cls.objects.all()
+        if produtor_ids is not None:
+            propriedades = propriedades.filter(produtor_id__in=produtor_ids)
+            culturas = culturas.filter(propriedade__produtor_id__in=produtor_ids)
+            resumos = resumos.filter(produtor_id__in=produtor_ids)
+        linhas = {}
+        for item in propriedades.values('produtor_id', 'estado_id').order_by().annotate(
+                qtd=models.Count('pk'), total=models.Sum('area_total'),
+                agricultavel=models.Sum('area_agricultavel')):
+            linhas[(item['produtor_id'], item['estado_id'])] = cls(
+                produtor_id=item['produtor_id'], estado_id=item['estado_id'], propriedades=item['qtd'],
+                area_total=item['total'], area_agricultavel=item['agricultavel'])
+        for item in culturas.values(produtor=models.F('propriedade__produtor_id'),
+                                    uf=models.F('propriedade__estado_id')).order_by().annotate(
+                qtd=models.Count('pk'), area=models.Sum('area')):
+            linha = linhas[(item['produtor'], item['uf'])]
+            linha.culturas, linha.area_plantada = item['qtd'], item['area']
+        totais = {}
+        for linha in linhas.values():
+            total = totais.setdefault(linha.produtor_id, cls(produtor_id=linha.produtor_id, estado_id=cls.TODOS))
+            for campo in ('propriedades', 'area_total', 'area_agricultavel', 'culturas', 'area_plantada'):
+                setattr(total, campo, getattr(total, campo) + getattr(linha, campo))
+        linhas.update({(produtor_id, cls.TODOS): total for produtor_id, total in totais.items()})
+        with transaction.atomic():
+            resumos.delete()
+            cls.objects.bulk_create(linhas.values(), batch_size=5000)
+
+    def __str__(self):
+        return f"{self.produtor_id}/{self.estado_id}: {self.propriedades} propriedades, {self.area_total} ha"
+
+
+class ResumoProdutorSafra(models.Model):
+    """
+    Culturas e área plantada por produtor, estado e ano-safra; estado_id = 0 totaliza os estados
+    do produtor, como em ResumoProdutor.
+
+    Mantido a cada save/delete de Cultura e a cada troca de produtor ou de estado de uma
+    Propriedade (ver agric.signals), de modo que o ranking por área plantada numa safra percorre
+    o índice (ano_safra, estado, -area_plantada) em vez de agregar OcupacaoSafra. Escritas em
+    massa em Cultura devem chamar `recalcular`.
+    """
+    TODOS = ResumoProdutor.TODOS
+    # Campos de Cultura que compõem o resumo, na ordem dos métodos abaixo.
+    CAMPOS_CULTURA = ('propriedade_id', 'ano_safra', 'area')
+
+    id_resumo = models.BigAutoField(primary_key=True)
+    produtor = models.ForeignKey('Produtor', on_delete=models.CASCADE, related_name='+')
+    estado = models.ForeignKey('Estado', on_delete=models.CASCADE, related_name='+', db_constraint=False)
+    ano_safra = models.IntegerField()
+    culturas = models.IntegerField(default=0)
+    area_plantada = models.FloatField(default=0.0)
+
+    class Meta:
+        db_table = "resumo_produtor_safra"
+        constraints = [
+            models.UniqueConstraint(fields=['produtor', 'estado', 'ano_safra'], name='resumo_produtor_safra_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['ano_safra', 'estado', '-area_plantada'], name='resumo_produtor_safra_idx'),
+        ]
+
+    @classmethod
+    def adicionar(cls, propriedade_id, ano_safra, area, culturas=1):
+        """
+        Soma culturas à safra do produtor e do estado da propriedade (e ao total do produtor),
+        lidos no próprio INSERT ... SELECT.
+        """
+        tabela = cls._meta.db_table
+        propriedades = Propriedade._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO "{tabela}" ("produtor_id", "estado_id", "ano_safra", "culturas", "area_plantada") '
+                f'SELECT "produtor_id", "estado_id", %s, %s, %s FROM "{propriedades}" '
+                f'WHERE "id_propriedade" = %s UNION ALL '
+                f'SELECT "produtor_id", %s, %s, %s, %s FROM "{propriedades}" '
+                f'WHERE "id_propriedade" = %s '
+                f'ON CONFLICT ("produtor_id", "estado_id", "ano_safra") DO UPDATE '
+                f'SET "culturas" = "{tabela}"."culturas" + excluded."culturas", '
+                f'"area_plantada" = "{tabela}"."area_plantada" + excluded."area_plantada"',
+                [ano_safra, culturas, area, propriedade_id, cls.TODOS, ano_safra, culturas, area, propriedade_id])
+
+    @classmethod
+    def remover(cls, propriedade_id, ano_safra, area, culturas=1):
+        # UPDATE e não upsert: na exclusão em cascata do produtor, as linhas podem já ter sido
+        # removidas, e não devem ser recriadas.
+        propriedade = Propriedade.objects.filter(pk=propriedade_id)
+        cls.objects.filter(models.Q(estado_id=models.Subquery(propriedade.values('estado_id')))
+                           | models.Q(estado_id=cls.TODOS),
+                           produtor_id=models.Subquery(propriedade.values('produtor_id')),
+                           ano_safra=ano_safra).update(
+            culturas=models.F('culturas') - culturas, area_plantada=models.F('area_plantada') - area)
+
+    @classmethod
+    def somar(cls, deltas):
+        """
+        Soma culturas e área plantada ({(produtor_id, estado_id, ano_safra): (culturas, area)}) às
+        safras e aos totais dos produtores, em um upsert por lote.
+        """
+        linhas = {}
+        for (produtor_id, estado_id, ano_safra), valores in deltas.items():
+            for uf in (estado_id, cls.TODOS):
+                _acumular(linhas, (produtor_id, uf, ano_safra), valores)
+        _somar_em_lote(cls, ('produtor_id', 'estado_id', 'ano_safra'), ('culturas', 'area_plantada'), linhas)
+
+    @classmethod
+    def mover(cls, propriedade_id, origem, destino):
+        """
+        Transfere as culturas da propriedade, safra a safra, do (produtor_id, estado_id) `origem`
+        para `destino`, em um único upsert.
+        """
+        deltas = {}
+        for item in Cultura.objects.filter(propriedade_id=propriedade_id).values('ano_safra').order_by() \
+                .annotate(qtd=models.Count('pk'), area=models.Sum('area')):
+            for (produtor_id, estado_id), sinal in ((origem, -1), (destino, 1)):
+                _acumular(deltas, (produtor_id, estado_id, item['ano_safra']),
+                          (sinal * item['qtd'], sinal * item['area']))
+        # Com o mesmo produtor, o total dele não muda e sai do upsert (ver `_somar_em_lote`).
+        cls.somar(deltas)
+
+    @classmethod
+    def recalcular(cls, produtor_ids=None):
+        """
+        Reconstrói os resumos a partir das culturas (de todos os produtores ou dos informados).
+        """
+        culturas = Cultura.objects.all()
+        resumos = cls.objects.all()
+        if produtor_ids is not None:
+            culturas = culturas.filter(propriedade__produtor_id__in=produtor_ids)
+            resumos = resumos.filter(produtor_id__in=produtor_ids)
+        linhas = {}
+        for item in culturas.values('ano_safra', produtor=models.F('propriedade__produtor_id'),
+                                    uf=models.F('propriedade__estado_id')).order_by().annotate(
+                qtd=models.Count('pk'), area=models.Sum('area')):
+            for uf in (item['uf'], cls.TODOS):
+                linha = linhas.setdefault((item['produtor'], uf, item['ano_safra']), cls(
+                    produtor_id=item['produtor'], estado_id=uf, ano_safra=item['ano_safra']))
+                linha.culturas += item['qtd']
+                linha.area_plantada += item['area']
+        with transaction.atomic():
+            resumos.delete()
+            cls.objects.bulk_create(linhas.values(), batch_size=5000)
+
+    def __str__(self):
+        return f"{self.produtor_id}/{self.estado_id}/{self.ano_safra}: {self.area_plantada} ha"
+
+
+class ResumoGeografico(models.Model):
+    """
+    Propriedades, áreas e culturas somadas por estado e cidade, para o drill-down geográfico.
+
+    Cada (estado, cidade_id, tipo_cultura_id) é uma linha: cidade_id = 0 totaliza o estado e
+    tipo_cultura_id = 0 totaliza todas as culturas; as demais linhas abrem as culturas do nó por
+    tipo. Abrir um nó lê as linhas de um prefixo do índice único, qualquer que seja a quantidade
+    de propriedades sob ele.
+
+    Mantido a cada save/delete de Propriedade e Cultura (ver agric.signals) com incrementos
+    atômicos. Escritas em massa (bulk_create, QuerySet.update) devem chamar `recalcular`.
+    """
+    TODOS = 0
+    MEDIDAS = ('propriedades', 'area_total', 'area_agricultavel', 'area_vegetacao', 'culturas', 'area_plantada')
+    # Campos de Propriedade e de Cultura que compõem o resumo, na ordem dos métodos abaixo.
+    CAMPOS = ('estado_id', 'cidade_id', 'area_total', 'area_agricultavel', 'area_vegetacao')
+    CAMPOS_CULTURA = ('propriedade_id', 'tipo_cultura_id', 'area')
+
+    id_resumo = models.BigAutoField(primary_key=True)
+    estado = models.ForeignKey('Estado', on_delete=models.CASCADE, related_name='+')
+    cidade_id = models.IntegerField(default=TODOS)
+    tipo_cultura_id = models.IntegerField(default=TODOS)
+    propriedades = models.IntegerField(default=0)
+    area_total = models.FloatField(default=0.0)
+    area_agricultavel = models.FloatField(default=0.0)
+    area_vegetacao = models.FloatField(default=0.0)
+    culturas = models.IntegerField(default=0)
+    area_plantada = models.FloatField(default=0.0)
+
+    class Meta:
+        db_table = "resumo_geografico"
+        constraints = [
+            models.UniqueConstraint(fields=['estado', 'cidade_id', 'tipo_cultura_id'], name='resumo_geografico_no_uniq'),
+        ]
+        indexes = [
+            # Cidades de um estado e estados (cidade_id = 0), pela área.
+            models.Index(fields=['estado', 'tipo_cultura_id', '-area_total'], name='resumo_geografico_filhos_idx'),
+            models.Index(fields=['cidade_id', 'tipo_cultura_id', '-area_total'], name='resumo_geografico_estados_idx'),
+        ]
+
+    @classmethod
+    def _somar(cls, tipo_cultura_id, deltas, regiao=None, propriedade_id=None):
+        """
+        Soma `deltas` às linhas do estado e da cidade (totais e, se informado, do tipo de cultura),
+        criando-as se preciso. A região é (estado_id, cidade_id) ou a da propriedade informada,
+        lida no próprio INSERT ... SELECT.
+        """
+        tabela = cls._meta.db_table
+        valores = [deltas.get(medida, 0) for medida in cls.MEDIDAS]
+        colunas = ", ".join(f'"{coluna}"' for coluna in ('estado_id', 'cidade_id', 'tipo_cultura_id') + cls.MEDIDAS)
+        medidas = ", ".join(["%s"] * len(cls.MEDIDAS))
+        selects, params = [], []
+        for tipo in ((cls.TODOS, tipo_cultura_id) if tipo_cultura_id else (cls.TODOS,)):
+            for por_cidade in (False, True):
+                if propriedade_id is None:
+                    selects.append(f'SELECT %s, %s, %s, {medidas}')
+                    params += [regiao[0], regiao[1] if por_cidade else cls.TODOS, tipo, *valores]
+                else:
+                    cidade = '"cidade_id"' if por_cidade else str(cls.TODOS)
+                    selects.append(f'SELECT "estado_id", {cidade}, %s, {medidas} '
+                                   f'FROM "{Propriedade._meta.db_table}" WHERE "id_propriedade" = %s')
+                    params += [tipo, *valores, propriedade_id]
+        atualizacoes = ", ".join(f'"{medida}" = "{tabela}"."{medida}" + excluded."{medida}"' for medida in cls.MEDIDAS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO "{tabela}" ({colunas}) {" UNION ALL ".join(selects)} '
+                f'ON CONFLICT ("estado_id", "cidade_id", "tipo_cultura_id") DO UPDATE SET {atualizacoes}',
+                params)
+
+    @classmethod
+    def _subtrair(cls, tipo_cultura_id, deltas, regiao=None, propriedade_id=None):
+        # UPDATE e não upsert: na exclusão em cascata do estado, as linhas podem já ter sido
+        # removidas, e não devem ser recriadas.
+        if propriedade_id is None:
+            estado_id, cidade_id = regiao
+        else:
+            propriedade = Propriedade.objects.filter(pk=propriedade_id)
+            estado_id = models.Subquery(propriedade.values('estado_id'))
+            cidade_id = models.Subquery(propriedade.values('cidade_id'))
+        cls.objects.filter(
+            models.Q(cidade_id=cls.TODOS) | models.Q(cidade_id=cidade_id), estado_id=estado_id,
+            tipo_cultura_id__in={cls.TODOS, tipo_cultura_id},
+        ).update(**{medida: models.F(medida) - valor for medida, valor in deltas.items()})
+
+    @classmethod
+    def adicionar_propriedade(cls, estado_id, cidade_id, area_total, area_agricultavel, area_vegetacao):
+        cls._somar(cls.TODOS, {"propriedades": 1, "area_total": area_total, "area_agricultavel": area_agricultavel,
+                               "area_vegetacao": area_vegetacao}, regiao=(estado_id, cidade_id))
+
+    @classmethod
+    def remover_propriedade(cls, estado_id, cidade_id, area_total, area_agricultavel, area_vegetacao,
+                            propriedades=1):
+        cls._subtrair(cls.TODOS, {"propriedades": propriedades, "area_total": area_total,
+                                  "area_agricultavel": area_agricultavel, "area_vegetacao": area_vegetacao},
+                      regiao=(estado_id, cidade_id))
+
+    @classmethod
+    def adicionar_cultura(cls, propriedade_id, tipo_cultura_id, area):
+        cls._somar(tipo_cultura_id, {"culturas": 1, "area_plantada": area}, propriedade_id=propriedade_id)
+
+    @classmethod
+    def remover_cultura(cls, propriedade_id, tipo_cultura_id, area, culturas=1):
+        cls._subtrair(tipo_cultura_id, {"culturas": culturas, "area_plantada": area}, propriedade_id=propriedade_id)
+
+    @classmethod
+    def somar_culturas(cls, deltas):
+        """
+        Soma culturas e área plantada ({(estado_id, cidade_id, tipo_cultura_id): (culturas, area)})
+        às linhas do estado e da cidade, totais e do tipo, em um upsert por lote.
+        """
+        linhas = {}
+        for (estado_id, cidade_id, tipo_cultura_id), (culturas, area) in deltas.items():
+            for cidade in (cls.TODOS, cidade_id):
+                for tipo in (cls.TODOS, tipo_cultura_id):
+                    _acumular(linhas, (estado_id, cidade, tipo), (0, 0.0, 0.0, 0.0, culturas, area))
+        _somar_em_lote(cls, ('estado_id', 'cidade_id', 'tipo_cultura_id'), cls.MEDIDAS, linhas)
+
+    @classmethod
+    def mover_culturas(cls, propriedade_id, origem, destino):
+        """
+        Transfere as culturas da propriedade da região `origem` para `destino` ((estado_id, cidade_id)).
+        """
+        for item in (Cultura.objects.filter(propriedade_id=propriedade_id).values('tipo_cultura_id')
+                     .order_by().annotate(qtd=models.Count('pk'), area=models.Sum('area'))):
+            deltas = {"culturas": item['qtd'], "area_plantada": item['area']}
+            cls._subtrair(item['tipo_cultura_id'], deltas, regiao=origem)
+            cls._somar(item['tipo_cultura_id'], deltas, regiao=destino)
+
+    @classmethod
+    def recalcular(cls, estado_ids=None):
+        """
+        Reconstrói os resumos a partir das propriedades e culturas (de todos os estados ou dos informados).
+        """
+        propriedades = Propriedade.objects.all()
+        culturas = Cultura.objects.all()
+        resumos = cls.objects.all()
+        if estado_ids is not None:
+            propriedades = propriedades.filter(estado_id__in=estado_ids)
+            culturas = culturas.filter(propriedade__estado_id__in=estado_ids)
+            resumos = resumos.filter(estado_id__in=estado_ids)
+
+        linhas = {}
+
+        def somar(estado_id, cidade_id, tipo_cultura_id, **deltas):
+            for chave in ((estado_id, cls.TODOS, tipo_cultura_id), (estado_id, cidade_id, tipo_cultura_id)):
+                linha = linhas.setdefault(chave, dict.fromkeys(cls.MEDIDAS, 0))
+                for medida, valor in deltas.items():
+                    linha[medida] += valor
+
+        for item in propriedades.values('estado_id', 'cidade_id').order_by().annotate(
+                qtd=models.Count('pk'), total=models.Sum('area_total'), agricultavel=models.Sum('area_agricultavel'),
+                vegetacao=models.Sum('area_vegetacao')):
+            somar(item['estado_id'], item['cidade_id'], cls.TODOS, propriedades=item['qtd'], area_total=item['total'],
+                  area_agricultavel=item['agricultavel'], area_vegetacao=item['vegetacao'])
+        for item in culturas.values('tipo_cultura_id', estado_id=models.F('propriedade__estado_id'),
+                                    cidade_id=models.F('propriedade__cidade_id')).order_by().annotate(
+                qtd=models.Count('pk'), area=models.Sum('area')):
+            for tipo in (cls.TODOS, item['tipo_cultura_id']):
+                somar(item['estado_id'], item['cidade_id'], tipo, culturas=item['qtd'], area_plantada=item['area'])
+
+        with transaction.atomic():
+            resumos.delete()
+            cls.objects.bulk_create([
+                cls(estado_id=estado_id, cidade_id=cidade_id, tipo_cultura_id=tipo_cultura_id, **medidas)
+                for (estado_id, cidade_id, tipo_cultura_id), medidas in linhas.items()], batch_size=5000)
+
+    def __str__(self):
+        return (f"{self.estado_id}/{self.cidade_id}/{self.tipo_cultura_id}: {self.propriedades} propriedades, "
+                f"{self.area_total} ha, {self.culturas} culturas")
+
+
+class TransacaoAtual(models.Func):
+    """
+    Id da transação corrente no PostgreSQL (`pg_current_xact_id()`), como bigint. NULL nos demais
+    bancos, que serializam as escritas.
+    """
+    template = 'NULL'
+    output_field = models.BigIntegerField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return '(pg_current_xact_id()::text::bigint)', []
+
+
+class Alteracao(models.Model):
+    """
+    Registro append-only de uma criação, atualização ou exclusão em um dos models acima,
+    gravado pelos sinais do app (ver agric.signals e agric.alteracoes).
+    `chave` é o identificador do objeto na API (cpf_cnpj para Produtor, id para os demais).
+    `transacao` é a transação que gravou a linha (preenchida pelo banco) e `sequencia`, o cursor
+    da sincronização incremental: numerada só depois que a transação termina, na ordem em que as
+    alterações ficam visíveis (ver `agric.alteracoes.publicar`).
+    """
+    CRIACAO = 'C'
+    ATUALIZACAO = 'U'
+    EXCLUSAO = 'D'
+    OPERACAO_CHOICES = [
+        (CRIACAO, 'Criação'),
+        (ATUALIZACAO, 'Atualização'),
+        (EXCLUSAO, 'Exclusão'),
+    ]
+
+    id_alteracao = models.BigAutoField(primary_key=True)
+    modelo = models.CharField(max_length=32)
+    chave = models.CharField(max_length=64)
+    operacao = models.CharField(max_length=1, choices=OPERACAO_CHOICES)
+    criado_em = models.DateTimeField(default=timezone.now)
+    transacao = models.BigIntegerField(null=True, db_default=TransacaoAtual())
+    sequencia = models.BigIntegerField(null=True, unique=True)
+
+    class Meta:
+        db_table = "alteracao"
+        indexes = [
+            models.Index(fields=['modelo', 'chave', 'id_alteracao'], name='alteracao_objeto_idx'),
+            models.Index(fields=['criado_em'], name='alteracao_criado_em_idx'),
+            models.Index(fields=['transacao', 'id_alteracao'], condition=models.Q(sequencia__isnull=True),
+                         name='alteracao_pendente_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.id_alteracao}: {self.operacao} {self.modelo} {self.chave}"
+
+
+class CompactacaoAlteracoes(models.Model):
+    """
+    Execução da compactação do log de alterações. `cursor_minimo` é a maior sequência removida pela
+    retenção: cursores anteriores a ele não podem mais ser atendidos.
+    """
+    id_compactacao = models.BigAutoField(primary_key=True)
+    executada_em = models.DateTimeField(default=timezone.now)
+    cursor_minimo = models.BigIntegerField(default=0)
+    removidas = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = "alteracao_compactacao"
+
+    def __str__(self):
+        return f"Compactação {self.id_compactacao} (cursor mínimo {self.cursor_minimo})"
+
+
+class Tarefa(models.Model):
+    """
+    Tarefa em segundo plano da fila mantida no banco (ver agric.tarefas).
+
+    Um worker reserva a tarefa pendente de maior prioridade com um UPDATE condicional no status
+    (sem broker externo nem travas de linha) e renova `expira_em` enquanto a executa. Tarefas
+    com a reserva expirada (worker interrompido) voltam para a fila. Falhas são repetidas até
+    `max_tentativas`, com espera crescente entre as tentativas.
+    """
+    PENDENTE = 'pendente'
+    EXECUTANDO = 'executando'
+    CONCLUIDA = 'concluida'
+    FALHOU = 'falhou'
+    STATUS_CHOICES = [
+        (PENDENTE, 'Pendente'),
+        (EXECUTANDO, 'Executando'),
+        (CONCLUIDA, 'Concluída'),
+        (FALHOU, 'Falhou'),
+    ]
+
+    id_tarefa = models.BigAutoField(primary_key=True)
+    tipo = models.CharField(max_length=64)
+    parametros = models.JSONField(default=dict, blank=True)
+    prioridade = models.IntegerField(default=0)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDENTE)
+    tentativas = models.IntegerField(default=0)
+    max_tentativas = models.IntegerField(default=3)
+    progresso = models.FloatField(default=0.0)
+    mensagem = models.TextField(blank=True, default='')
+    resultado = models.JSONField(null=True, blank=True)
+    arquivo = models.CharField(max_length=255, blank=True, default='')
+    worker = models.CharField(max_length=128, blank=True, default='')
+    criada_em = models.DateTimeField(default=timezone.now)
+    disponivel_em = models.DateTimeField(default=timezone.now)
+    iniciada_em = models.DateTimeField(null=True, blank=True)
+    expira_em = models.DateTimeField(null=True, blank=True)
+    concluida_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "tarefa"
+        indexes = [
+            models.Index(fields=['status', '-prioridade', 'disponivel_em', 'id_tarefa'], name='tarefa_fila_idx'),
+            models.Index(fields=['status', 'expira_em'], name='tarefa_reserva_idx'),
+        ]
+
+    def __str__(self):
+        return f"Tarefa {self.id_tarefa} ({self.tipo}, {self.status})"
+
+
+# Campo a que cada CheckConstraint se refere, como na validação em Python (as demais são gerais).
+CAMPOS_DAS_RESTRICOES = {'produtor_documento_tipo_check': 'cpf_cnpj', 'cultura_area_nao_negativa_check': 'area'}
+
+
+def erro_de_restricao(erro):
+    """
+    Converte a violação de uma CheckConstraint ou de um campo único (IntegrityError) no
+    ValidationError com a mesma mensagem da validação em Python. Retorna None se o erro não
+    vier de uma delas.
+    """
+    texto = str(erro)
+    for model in (Produtor, Propriedade, Cultura):
+        for restricao in model._meta.constraints:
+            if isinstance(restricao, models.CheckConstraint) and restricao.name in texto:
+                mensagem = restricao.get_violation_error_message()
+                campo = CAMPOS_DAS_RESTRICOES.get(restricao.name)
+                return ValidationError({campo: mensagem} if campo else mensagem)
+    if 'UNIQUE' in texto.upper() or 'duplicate key' in texto:
+        # SQLite cita "tabela.coluna"; PostgreSQL, "Key (coluna)=" no detalhe.
+        for model in (Produtor, Propriedade):
+            for campo in model._meta.fields:
+                if campo.unique and not campo.primary_key and (
+                        f"{model._meta.db_table}.{campo.column}" in texto or f"({campo.column})=" in texto):
+                    return ValidationError({campo.name: model().unique_error_message(model, (campo.name,))})
+    return None
@@ -0,0 +1,210 @@
+"""
+particoes.py
+
+Particionamento declarativo (PostgreSQL) da tabela `cultura` por `ano_safra`.
+
+Com `CULTURA_PARTITIONING=1` em PostgreSQL, `cultura` vira uma tabela particionada por faixa de
+`ano_safra`, com uma partição por safra (`cultura_<ano>`) e uma partição padrão
+(`cultura_padrao`) para safras sem partição própria. Consultas filtradas por uma safra
+(`WHERE ano_safra = ...`) tocam apenas a partição da safra (partition pruning).
+
+Como o PostgreSQL exige que chaves únicas incluam a chave de partição:
+- a chave primária física passa a ser (id_cultura, ano_safra); id_cultura continua único, pois
+  vem de uma sequência, e o Django continua tratando id_cultura como PK;
+- a unicidade (ano_safra, tipo_cultura, propriedade) já inclui ano_safra e é mantida.
+
+Em outros bancos (ex: SQLite) ou com o particionamento desativado, `cultura` continua uma
+tabela comum e as funções deste módulo não fazem nada.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+TABELA = "cultura"
+PARTICAO_PADRAO = "cultura_padrao"
+SEQUENCIA = "cultura_id_cultura_part_seq"
+COLUNAS_BASE = ("id_cultura", "ano_safra", "propriedade_id", "tipo_cultura_id")
+
+
+def nome_particao(ano) -> str:
+    return f"{TABELA}_{int(ano)}"
+
+
+def suportado(conn=connection) -> bool:
+    return conn.vendor == "postgresql" and settings.CULTURA_PARTITIONING
+
+
+def particionada(cursor) -> bool:
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = %s AND pg_table_is_visible(c.oid)", [TABELA])
+    return cursor.fetchone() is not None
+
+
+def ddl_particao(ano) -> str:
+    ano = int(ano)
+    return (f'CREATE TABLE IF NOT EXISTS "{nome_particao(ano)}" PARTITION OF "{TABELA}" '
+            f"FOR VALUES FROM ({ano}) TO ({ano + 1})")
+
+
+def ddl_tabela_particionada() -> list:
+    """
+    Comandos que criam a tabela `cultura` particionada, com as mesmas colunas, FKs e unicidade.
+    """
+    return [
+        f'CREATE SEQUENCE IF NOT EXISTS "{SEQUENCIA}"',
+        f'''CREATE TABLE "{TABELA}" (
+            "id_cultura" bigint NOT NULL DEFAULT nextval('{SEQUENCIA}'),
+            "ano_safra" integer NOT NULL,
+            "propriedade_id" bigint NOT NULL
+                REFERENCES "propriedade" ("id_propriedade") DEFERRABLE INITIALLY DEFERRED,
+            "tipo_cultura_id" bigint NOT NULL
+                REFERENCES "tipo_cultura" ("id_tipo_cultura") DEFERRABLE INITIALLY DEFERRED,
+            CONSTRAINT "cultura_part_pkey" PRIMARY KEY ("id_cultura", "ano_safra"),
+            CONSTRAINT "cultura_ano_safra_tipo_cultura_propriedade_uniq"
+                UNIQUE ("ano_safra", "tipo_cultura_id", "propriedade_id")
+        ) PARTITION BY RANGE ("ano_safra")''',
+        f'ALTER SEQUENCE "{SEQUENCIA}" OWNED BY "{TABELA}"."id_cultura"',
+        f'CREATE INDEX "cultura_part_propriedade_idx" ON "{TABELA}" ("propriedade_id")',
+        f'CREATE INDEX "cultura_part_tipo_cultura_idx" ON "{TABELA}" ("tipo_cultura_id")',
+        f'CREATE TABLE "{PARTICAO_PADRAO}" PARTITION OF "{TABELA}" DEFAULT',
+    ]
+
+
+def colunas_extras(cursor, tabela) -> list:
+    """
+    Retorna [(nome, tipo, not_null)] das colunas de `tabela` além de COLUNAS_BASE, adicionadas
+    por migrações posteriores à conversão (ex: area).
+    """
+    cursor.execute(
+        "SELECT a.attname, format_type(a.atttypid, a.atttypmod), a.attnotnull FROM pg_attribute a "
+        "WHERE a.attrelid = to_regclass(%s) AND a.attnum > 0 AND NOT a.attisdropped ORDER BY a.attnum", [tabela])
+    return [coluna for coluna in cursor.fetchall() if coluna[0] not in COLUNAS_BASE]
+
+
+def copiar_colunas_extras(cursor, origem, destino) -> str:
+    """
+    Adiciona a `destino` (vazia) as colunas extras de `origem` e retorna a lista de todas as
+    colunas a copiar, pronta para INSERT ... SELECT.
+    """
+    colunas = list(COLUNAS_BASE)
+    for nome, tipo, not_null in colunas_extras(cursor, origem):
+        cursor.execute(f'ALTER TABLE "{destino}" ADD COLUMN "{nome}" {tipo}{" NOT NULL" if not_null else ""}')
+        colunas.append(nome)
+    return ", ".join(f'"{coluna}"' for coluna in colunas)
+
+
+def copiar_restricoes_de_checagem(cursor, origem, destino):
+    """
+    Recria em `destino` as CheckConstraints de `origem` (ex: cultura_area_nao_negativa_check),
+    que a tabela nova não traz.
+    """
+    cursor.execute("SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                   "WHERE conrelid = to_regclass(%s) AND contype = 'c' AND conislocal", [origem])
+    for nome, definicao in cursor.fetchall():
+        cursor.execute(f'ALTER TABLE "{destino}" ADD CONSTRAINT "{nome}" {definicao}')
+
+
+def converter(cursor):
+    """
+    Converte a tabela comum `cultura` em particionada, copiando os dados e criando uma
+    partição para cada safra existente.
+    """
+    if particionada(cursor):
+        return False
+    cursor.execute(f'ALTER TABLE "{TABELA}" RENAME TO "cultura_legado"')
+    for comando in ddl_tabela_particionada():
+        cursor.execute(comando)
+    colunas = copiar_colunas_extras(cursor, "cultura_legado", TABELA)
+    copiar_restricoes_de_checagem(cursor, "cultura_legado", TABELA)
+    cursor.execute('SELECT DISTINCT "ano_safra" FROM "cultura_legado"')
+    for (ano,) in cursor.fetchall():
+        cursor.execute(ddl_particao(ano))
+    cursor.execute(f'INSERT INTO "{TABELA}" ({colunas}) SELECT {colunas} FROM "cultura_legado"')
+    cursor.execute(f'''SELECT setval('{SEQUENCIA}', COALESCE((SELECT MAX("id_cultura") FROM "{TABELA}"), 0) + 1, false)''')
+    cursor.execute('DROP TABLE "cultura_legado"')
+    logger.info("Tabela %s convertida para particionada por ano_safra", TABELA)
+    return True
+
+
+def reverter(cursor):
+    """
+    Volta `cultura` a uma tabela comum (inverso de `converter`).
+    """
+    if not particionada(cursor):
+        return False
+    cursor.execute(f'ALTER TABLE "{TABELA}" RENAME TO "cultura_particionada"')
+    cursor.execute(f'''CREATE TABLE "{TABELA}" (
+        "id_cultura" bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        "ano_safra" integer NOT NULL,
+        "propriedade_id" bigint NOT NULL
+            REFERENCES "propriedade" ("id_propriedade") DEFERRABLE INITIALLY DEFERRED,
+        "tipo_cultura_id" bigint NOT NULL
+            REFERENCES "tipo_cultura" ("id_tipo_cultura") DEFERRABLE INITIALLY DEFERRED
+    )''')
+    colunas = copiar_colunas_extras(cursor, "cultura_particionada", TABELA)
+    copiar_restricoes_de_checagem(cursor, "cultura_particionada", TABELA)
+    cursor.execute(f'INSERT INTO "{TABELA}" ({colunas}) SELECT {colunas} FROM "cultura_particionada"')
+    cursor.execute(f'''SELECT setval(pg_get_serial_sequence('"{TABELA}"', 'id_cultura'),
+        COALESCE((SELECT MAX("id_cultura") FROM "{TABELA}"), 0) + 1, false)''')
+    cursor.execute('DROP TABLE "cultura_particionada" CASCADE')
+    cursor.execute(f'DROP SEQUENCE IF EXISTS "{SEQUENCIA}"')
+    cursor.execute(f'ALTER TABLE "{TABELA}" ADD CONSTRAINT "cultura_ano_safra_tipo_cultura_propriedade_uniq" '
+                   'UNIQUE ("ano_safra", "tipo_cultura_id", "propriedade_id")')
+    cursor.execute(f'CREATE INDEX ON "{TABELA}" ("propriedade_id")')
+    cursor.execute(f'CREATE INDEX ON "{TABELA}" ("tipo_cultura_id")')
+    return True
+
+
+def listar(cursor) -> list:
+    """
+    Retorna [(nome, limites, linhas_estimadas)] das partições de `cultura`.
+    """
+    cursor.execute(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint "
+        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = %s ORDER BY c.relname", [TABELA])
+    return cursor.fetchall()
+
+
+def criar_particao(cursor, ano):
+    """
+    Cria a partição da safra `ano`, movendo para ela as linhas que estiverem na partição padrão.
+    """
+    nome = nome_particao(ano)
+    cursor.execute("SELECT to_regclass(%s)", [nome])
+    if cursor.fetchone()[0] is not None:
+        return False
+    with transaction.atomic(using=cursor.db.alias):
+        cursor.execute(f'ALTER TABLE "{TABELA}" DETACH PARTITION "{PARTICAO_PADRAO}"')
+        cursor.execute(ddl_particao(ano))
+        cursor.execute(
+            f'WITH movidas AS (DELETE FROM "{PARTICAO_PADRAO}" WHERE "ano_safra" = %s RETURNING *) '
+            f'INSERT INTO "{TABELA}" SELECT * FROM movidas', [int(ano)])
+        cursor.execute(f'ALTER TABLE "{TABELA}" ATTACH PARTITION "{PARTICAO_PADRAO}" DEFAULT')
+    logger.info("Partição %s criada", nome)
+    return True
+
+
+def arquivar_particao(cursor, ano, remover=False):
+    """
+    Desanexa a partição da safra `ano` (renomeada para cultura_arquivo_<ano>) ou a remove.
+    """
+    nome = nome_particao(ano)
+    cursor.execute("SELECT to_regclass(%s)", [nome])
+    if cursor.fetchone()[0] is None:
+        return False
+    cursor.execute(f'ALTER TABLE "{TABELA}" DETACH PARTITION "{nome}"')
+    if remover:
+        cursor.execute(f'DROP TABLE "{nome}"')
+    else:
+        # O arquivo não deve impedir a exclusão de propriedades e tipos de cultura.
+        cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'", [nome])
+        for (constraint,) in cursor.fetchall():
+            cursor.execute(f'ALTER TABLE "{nome}" DROP CONSTRAINT "{constraint}"')
+        cursor.execute(f'ALTER TABLE "{nome}" RENAME TO "cultura_arquivo_{int(ano)}"')
+    logger.info("Partição %s %s", nome, "removida" if remover else "arquivada")
+    return True
@@ -0,0 +1,120 @@
+"""
+querycount.py
+
+Utilitários para registrar e auditar as queries SQL executadas por um trecho de código.
+
+Este módulo fornece:
+- sql_fingerprint(sql): forma normalizada de uma query (literais e listas IN substituídos),
+  usada para identificar queries repetidas com o mesmo formato (padrão N+1).
+- QueryRecorder: context manager que registra as queries executadas em todas as conexões.
+- QueryBudgetExceeded: erro levantado quando um trecho ultrapassa seu orçamento de queries
+  ou repete o mesmo formato de query mais vezes que o permitido.
+- query_budget(max_queries, max_repeats): context manager que aplica esse orçamento.
+
+Usado pelos testes de orçamento de queries (fixture `query_budget` em tests/conftest.py)
+e pela suíte de benchmarks.
+"""
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+
+
+def sql_fingerprint(sql) -> str:
+    """
+    Normaliza uma query SQL para seu formato: literais viram `?` e listas `IN (...)` viram `IN (...)`.
+
+    Exemplo:
+        SELECT * FROM estado WHERE id_estado = 3  ->  SELECT * FROM estado WHERE id_estado = ?
+    """
+    shape = _STRING.sub("?", sql)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("IN (...)", shape)
+    return _SPACES.sub(" ", shape).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Orçamento de queries excedido ou formato de query repetido (provável N+1).
+    """
+
+
+class QueryRecorder:
+    """
+    Registra as queries executadas dentro do bloco `with`, em todas as conexões configuradas.
+
+    Cada item de `queries` é um dict com `sql`, `fingerprint`, `params`, `duration` e `alias`.
+    """
+    def __init__(self):
+        self.queries = []
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self._wrapper(connection.alias)))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+        return False
+
+    def _wrapper(self, alias):
+        def wrapper(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                self.queries.append({
+                    "sql": sql,
+                    "fingerprint": sql_fingerprint(sql),
+                    "params": params,
+                    "duration": time.perf_counter() - start,
+                    "alias": alias,
+                })
+        return wrapper
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def duration(self) -> float:
+        return sum(q["duration"] for q in self.queries)
+
+    def repeated(self, max_repeats=1) -> dict:
+        """
+        Retorna {fingerprint: ocorrências} dos formatos executados mais de `max_repeats` vezes.
+        """
+        counts = Counter(q["fingerprint"] for q in self.queries)
+        return {shape: n for shape, n in counts.items() if n > max_repeats}
+
+    def report(self) -> str:
+        return "\n".join(f"  {i + 1}. {q['sql']}" for i, q in enumerate(self.queries))
+
+
+@contextmanager
+def query_budget(max_queries, max_repeats=1):
+    """
+    Falha com QueryBudgetExceeded se o bloco executar mais de `max_queries` queries
+    ou repetir um mesmo formato de query mais de `max_repeats` vezes.
+    """
+    with QueryRecorder() as recorder:
+        yield recorder
+    if recorder.count > max_queries:
+        raise QueryBudgetExceeded(
+            f"{recorder.count} queries executadas, orçamento de {max_queries}:\n{recorder.report()}")
+    repeated = recorder.repeated(max_repeats)
+    if repeated:
+        detalhes = "\n".join(f"  {n}x {shape}" for shape, n in repeated.items())
+        raise QueryBudgetExceeded(f"Queries repetidas com o mesmo formato (provável N+1):\n{detalhes}")
@@ -0,0 +1,112 @@
+"""
+refcache.py
+
+Cache de dados de referência por processo (Estado, Cidade e TipoCultura).
+
+As tabelas de referência são pequenas e raramente mudam. Cada ReferenceCache carrega a
+tabela inteira com uma única query e passa a servir, a partir da memória:
+- a validação das chaves estrangeiras nos serializers (CachedPrimaryKeyRelatedField);
+- a resolução de nomes por id (ex: `estados.nome(id_estado)`).
+
+A tabela é recarregada quando sua versão (`agric.versioning`) muda, o que ocorre em qualquer
+escrita nos models de referência (ver `agric.signals`). Uma chave ausente do cache ainda é
+procurada no banco antes de ser considerada inexistente.
+"""
+import threading
+
+from rest_framework import serializers
+
+from .models import Estado, Cidade, TipoCultura
+from .versioning import get_version
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class ReferenceCache:
+    """
+    Cópia em memória de uma tabela de referência, indexada pela chave primária.
+    """
+    def __init__(self, model, name_field):
+        self.model = model
+        self.name_field = name_field
+        self.field_names = [f.attname for f in model._meta.concrete_fields]
+        self._rows = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        version = get_version(self.model)
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            rows = {row[0]: row for row in
+                    self.model.objects.order_by().values_list(self.model._meta.pk.attname, *self.field_names)}
+            self._rows = {pk: row[1:] for pk, row in rows.items()}
+            self._version = version
+            logger.debug("Cache de referência %s recarregado (%d linhas)", self.model.__name__, len(rows))
+
+    def reset(self):
+        with self._lock:
+            self._rows = {}
+            self._version = None
+
+    def _instance(self, row):
+        return self.model.from_db("default", self.field_names, row)
+
+    def get(self, pk):
+        """
+        Retorna uma instância nova (não compartilhada) do objeto `pk`, ou None se não existir.
+        """
+        self._refresh()
+        row = self._rows.get(pk)
+        if row is None:
+            values = self.model.objects.filter(pk=pk).values_list(*self.field_names).first()
+            if values is None:
+                return None
+            self._rows = {**self._rows, pk: values}
+            row = values
+        return self._instance(row)
+
+    def nome(self, pk):
+        """
+        Retorna o nome do objeto `pk` (ex: nome_estado) sem consultar o banco, ou None.
+        """
+        obj = self.get(pk)
+        return getattr(obj, self.name_field) if obj is not None else None
+
+    def all(self) -> list:
+        self._refresh()
+        return [self._instance(row) for row in self._rows.values()]
+
+
+estados = ReferenceCache(Estado, "nome_estado")
+cidades = ReferenceCache(Cidade, "nome_cidade")
+tipos_cultura = ReferenceCache(TipoCultura, "tipo_cultura")
+
+CACHES = {Estado: estados, Cidade: cidades, TipoCultura: tipos_cultura}
+
+
+def reset_all():
+    for reference_cache in CACHES.values():
+        reference_cache.reset()
+
+
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField que valida a chave no cache de referência do model,
+    evitando o SELECT por escrita.
+    """
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = CACHES[self.get_queryset().model].get(pk)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
@@ -0,0 +1,128 @@
+"""
+reprcache.py
+
+Cache read-through das representações serializadas usadas no retrieve dos ViewSets.
+
+Cada processo mantém um LRU limitado (`REPR_CACHE_SIZE` entradas; 0 desativa) com a
+representação já serializada de cada objeto, indexada por (model, valor do lookup). Cada entrada
+guarda a versão do objeto (`agric.versioning.get_object_version`) lida antes da consulta ao
+banco; a entrada só é servida enquanto essa versão não mudar. Escritas via ORM (save/delete,
+inclusive exclusões em cascata) trocam a versão do objeto em `agric.signals`, o que invalida a
+entrada em todos os workers que compartilham o backend de cache.
+
+Acertos, faltas e despejos são publicados em /metrics:
+- agric_repr_cache_requests_total{model, resultado="hit"|"miss"}
+- agric_repr_cache_evictions_total{model}
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .metrics import registry
+from .versioning import get_object_version
+
+
+class LRUCache:
+    """
+    Dicionário limitado com despejo do item menos usado recentemente. Seguro entre threads.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """
+        Insere `key` e retorna a lista de chaves despejadas.
+        """
+        if self.maxsize <= 0:
+            return []
+        evicted = []
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted.append(self._data.popitem(last=False)[0])
+        return evicted
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+representations = LRUCache(settings.REPR_CACHE_SIZE)
+
+
+def _count(name, help_text, labels):
+    registry.inc(name, help_text, labels)
+
+
+def get_representation(model, lookup):
+    """
+    Retorna a representação em cache de `model` com lookup `lookup`, ou None se ausente ou
+    desatualizada.
+    """
+    label = model._meta.label_lower
+    key = (label, str(lookup))
+    entry = representations.get(key)
+    if entry is not None:
+        pk, version, data = entry
+        if get_object_version(model, pk) == version:
+            _count("agric_repr_cache_requests_total", "Consultas ao cache de representações.",
+                   {"model": label, "resultado": "hit"})
+            return data
+        representations.delete(key)
+    _count("agric_repr_cache_requests_total", "Consultas ao cache de representações.",
+           {"model": label, "resultado": "miss"})
+    return None
+
+
+def set_representation(model, lookup, pk, version, data):
+    for evicted_label, _ in representations.set((model._meta.label_lower, str(lookup)), (pk, version, data)):
+        _count("agric_repr_cache_evictions_total", "Entradas despejadas do cache de representações (LRU).",
+               {"model": evicted_label})
+
+
+class RepresentationCacheMixin:
+    """
+    Mixin para ModelViewSet que serve o retrieve a partir do cache de representações.
+    """
+    def retrieve(self, request, *args, **kwargs):
+        model = self.queryset.model
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        data = get_representation(model, lookup)
+        if data is not None:
+            return Response(data)
+        # A versão é lida antes do SELECT: uma escrita concorrente a troca e a entrada nasce inválida.
+        # Para lookups que não são a PK, a PK só é conhecida depois do SELECT.
+        pk = None
+        if self.lookup_field == model._meta.pk.name:
+            try:
+                pk = model._meta.pk.to_python(lookup)
+            except ValidationError:
+                pass  # get_object() responde 404
+        version = get_object_version(model, pk) if pk is not None else None
+        instance = self.get_object()
+        if pk is None:
+            pk = instance.pk
+            version = get_object_version(model, pk)
+        data = self.get_serializer(instance).data
+        set_representation(model, lookup, pk, version, data)
+        return Response(data)
@@ -0,0 +1,202 @@
+"""
+resumos.py
+
+Distribuição das áreas das propriedades e ranking de produtores, calculados no servidor.
+
+- distribuicao: quantidade, mínimo, máximo, média, percentis e histograma (faixas de mesma
+  largura) de area_total ou area_agricultavel, filtrados por estado e ano-safra. O histograma é
+  agrupado no banco. Os percentis são exatos no PostgreSQL (`percentile_cont`); nos demais
+  bancos, são estimados por um sketch de erro relativo limitado (`SketchQuantis`), também
+  agrupado no banco: nenhum dos dois caminhos traz as linhas para o Python.
+- ranking: top-N produtores pela soma de áreas, lida da linha do produtor no estado (ou da linha
+  de total, estado_id = 0) de ResumoProdutor, ou pela área plantada numa safra, lida de
+  ResumoProdutorSafra: nos dois casos, uma varredura do índice (estado, -medida) limitada a N
+  linhas. Com ano-safra, o ranking por área total ou agricultável soma apenas as propriedades
+  com cultura na safra (o mesmo filtro da distribuição).
+- obter_distribuicao / obter_ranking: servem os resultados a partir do cache, com um único
+  cálculo em andamento por vez (ver `agric.singleflight`), associados às versões das tabelas.
+"""
+import math
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Aggregate, Avg, Count, Exists, F, FloatField, Max, Min, OuterRef, Sum, Value
+from django.db.models.functions import Ceil, Floor, Ln
+
+from .models import Produtor, Propriedade, Cultura, OcupacaoSafra, ResumoProdutor, ResumoProdutorSafra
+from .dashboard import versions_token
+from .singleflight import get_or_compute
+
+
+CAMPOS = ("area_total", "area_agricultavel")
+MEDIDAS = CAMPOS + ("area_plantada",)
+PERCENTIS = (10, 25, 50, 75, 90, 99)
+ERRO_RELATIVO = 0.01
+
+
+class Percentil(Aggregate):
+    """
+    percentile_cont(fração) WITHIN GROUP (ORDER BY expressão) do PostgreSQL.
+    """
+    function = 'percentile_cont'
+    template = '%(function)s(%(fracao)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = FloatField()
+
+    def __init__(self, expression, fracao, **extra):
+        super().__init__(expression, fracao=float(fracao), **extra)
+
+
+class SketchQuantis:
+    """
+    Sketch de quantis com erro relativo limitado (como o DDSketch): cada valor positivo conta no
+    balde ceil(log_gamma(valor)), com gamma = (1 + erro) / (1 - erro). O quantil estimado fica a
+    no máximo `erro` (relativo) do exato, e o número de baldes cresce apenas com o logaritmo da
+    amplitude dos valores.
+    """
+    def __init__(self, erro=ERRO_RELATIVO):
+        self.gamma = (1 + erro) / (1 - erro)
+        self.log_gamma = math.log(self.gamma)
+        self.baldes = {}
+        self.zeros = 0
+        self.total = 0
+
+    def adicionar(self, balde, quantidade=1):
+        self.baldes[balde] = self.baldes.get(balde, 0) + quantidade
+        self.total += quantidade
+
+    def adicionar_zeros(self, quantidade):
+        self.zeros += quantidade
+        self.total += quantidade
+
+    def quantil(self, q):
+        if not self.total:
+            return None
+        posicao = q * (self.total - 1)
+        acumulado = self.zeros
+        if posicao < acumulado:
+            return 0.0
+        for balde in sorted(self.baldes):
+            acumulado += self.baldes[balde]
+            if posicao < acumulado:
+                return 2 * self.gamma ** balde / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.baldes) / (self.gamma + 1)
+
+
+def propriedades_filtradas(estado_id=None, ano_safra=None):
+    propriedades = Propriedade.objects.order_by()
+    if estado_id is not None:
+        propriedades = propriedades.filter(estado_id=estado_id)
+    if ano_safra is not None:
+        propriedades = propriedades.filter(
+            Exists(Cultura.objects.filter(propriedade_id=OuterRef('pk'), ano_safra=ano_safra)))
+    return propriedades
+
+
+def _percentis_exatos(propriedades, campo) -> dict:
+    return propriedades.aggregate(**{f"p{p}": Percentil(campo, p / 100) for p in PERCENTIS})
+
+
+def _percentis_aproximados(propriedades, campo) -> dict:
+    sketch = SketchQuantis()
+    positivas = propriedades.filter(**{f"{campo}__gt": 0})
+    for item in (positivas.annotate(balde=Ceil(Ln(campo) / Value(sketch.log_gamma)))
+                 .values('balde').annotate(qtd=Count('pk'))):
+        sketch.adicionar(int(item['balde']), item['qtd'])
+    sketch.adicionar_zeros(propriedades.filter(**{f"{campo}__lte": 0}).count())
+    return {f"p{p}": sketch.quantil(p / 100) for p in PERCENTIS}
+
+
+def calcular_distribuicao(campo, estado_id=None, ano_safra=None, faixas=10) -> dict:
+    """
+    Retorna {"campo", "total", "minimo", "maximo", "media", "percentis", "aproximado",
+    "histograma": [{"de", "ate", "qtd"}]} de `campo` nas propriedades filtradas.
+    """
+    propriedades = propriedades_filtradas(estado_id, ano_safra)
+    resumo = propriedades.aggregate(total=Count('pk'), minimo=Min(campo), maximo=Max(campo), media=Avg(campo))
+    data = {"campo": campo, **resumo, "percentis": {f"p{p}": None for p in PERCENTIS},
+            "aproximado": False, "histograma": []}
+    if not resumo["total"]:
+        return data
+
+    data["aproximado"] = connection.vendor != 'postgresql'
+    data["percentis"] = (_percentis_aproximados if data["aproximado"] else _percentis_exatos)(propriedades, campo)
+
+    minimo, maximo = resumo["minimo"], resumo["maximo"]
+    largura = (maximo - minimo) / faixas or 1.0
+    contagens = [0] * faixas
+    for item in (propriedades.annotate(faixa=Floor((F(campo) - Value(minimo)) / Value(largura)))
+                 .values('faixa').annotate(qtd=Count('pk'))):
+        # O máximo cai na faixa seguinte à última: conta na última.
+        contagens[min(int(item['faixa']), faixas - 1)] += item['qtd']
+    data["histograma"] = [{"de": minimo + i * largura, "ate": minimo + (i + 1) * largura, "qtd": qtd}
+                          for i, qtd in enumerate(contagens)]
+    return data
+
+
+def calcular_ranking(medida="area_total", estado_id=None, ano_safra=None, limite=10) -> dict:
+    """
+    Retorna {"medida", "produtores": [{"posicao", "cpf_cnpj", "nome_produtor", "propriedades",
+    "valor"}]} com os `limite` maiores produtores por `medida`. `area_plantada` exige `ano_safra`.
+    """
+    uf = ResumoProdutor.TODOS if estado_id is None else estado_id
+    if medida == "area_plantada":
+        # Uma linha por produtor na safra e no estado (ou no total): percorre o índice
+        # (ano_safra, estado, -area_plantada). "propriedades" conta apenas as dos N produtores.
+        linhas = list(ResumoProdutorSafra.objects.filter(
+            ano_safra=ano_safra, estado_id=uf, area_plantada__gt=OcupacaoSafra.TOLERANCIA)
+            .values('produtor_id', valor=F('area_plantada')).order_by('-valor', 'produtor_id')[:limite])
+        plantadas = OcupacaoSafra.objects.filter(
+            ano_safra=ano_safra, area_plantada__gt=OcupacaoSafra.TOLERANCIA,
+            propriedade__produtor_id__in=[linha['produtor_id'] for linha in linhas])
+        if estado_id is not None:
+            plantadas = plantadas.filter(propriedade__estado_id=estado_id)
+        qtds = dict(plantadas.values_list('propriedade__produtor_id').order_by().annotate(qtd=Count('pk')))
+        for linha in linhas:
+            linha['qtd'] = qtds.get(linha['produtor_id'], 0)
+    elif ano_safra is not None:
+        linhas = list(propriedades_filtradas(estado_id, ano_safra).values('produtor_id')
+                      .annotate(valor=Sum(medida), qtd=Count('pk')).order_by('-valor', 'produtor_id')[:limite])
+    else:
+        # Uma linha por produtor no estado (ou no total): percorre o índice (estado, -medida).
+        linhas = list(ResumoProdutor.objects.filter(estado_id=uf, propriedades__gt=0)
+                      .values('produtor_id', valor=F(medida), qtd=F('propriedades'))
+                      .order_by('-valor', 'produtor_id')[:limite])
+
+    produtores = {pk: (cpf_cnpj, nome) for pk, cpf_cnpj, nome in Produtor.objects.filter(
+        pk__in=[linha['produtor_id'] for linha in linhas]).values_list('pk', 'cpf_cnpj', 'nome_produtor')}
+    return {"medida": medida, "produtores": [
+        {"posicao": posicao, "cpf_cnpj": produtores[linha['produtor_id']][0],
+         "nome_produtor": produtores[linha['produtor_id']][1], "propriedades": linha['qtd'],
+         "valor": linha['valor']}
+        for posicao, linha in enumerate(linhas, start=1)]}
+
+
+def _obter(nome, parametros, compute, models):
+    chave = ":".join([nome] + ["" if valor is None else str(valor) for valor in parametros])
+    return get_or_compute(
+        chave, compute,
+        token=versions_token(models),
+        ttl=settings.DASHBOARD_CACHE_TTL,
+        stale_ttl=settings.DASHBOARD_STALE_TTL,
+        cross_worker=settings.SINGLE_FLIGHT_CROSS_WORKER,
+        lock_timeout=settings.SINGLE_FLIGHT_LOCK_TIMEOUT,
+        rotulo=nome,
+    )
+
+
+def obter_distribuicao(campo, estado_id=None, ano_safra=None, faixas=10):
+    """
+    Retorna (dados, stale) da distribuição, coalescendo os cálculos concorrentes.
+    """
+    models = (Propriedade,) if ano_safra is None else (Propriedade, Cultura)
+    return _obter("distribuicao", (campo, estado_id, ano_safra, faixas),
+                  lambda: calcular_distribuicao(campo, estado_id, ano_safra, faixas), models)
+
+
+def obter_ranking(medida="area_total", estado_id=None, ano_safra=None, limite=10):
+    """
+    Retorna (dados, stale) do ranking de produtores, coalescendo os cálculos concorrentes.
+    """
+    models = (Propriedade, Produtor) if ano_safra is None else (Propriedade, Produtor, Cultura)
+    return _obter("ranking", (medida, estado_id, ano_safra, limite),
+                  lambda: calcular_ranking(medida, estado_id, ano_safra, limite), models)
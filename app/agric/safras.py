@@ -0,0 +1,162 @@
+"""
+safras.py
+
+Virada de safra: cópia das culturas de um ano-safra para outro em uma única instrução SQL.
+
+- clonar_safra(origem, destino, estado, produtor, tipo_cultura): copia as culturas de `origem`
+  (opcionalmente só de um estado, produtor ou tipo de cultura) para `destino` com um
+  INSERT ... SELECT ... ON CONFLICT DO NOTHING, sem uma escrita (e uma checagem de
+  unicidade) por cultura.
+- Culturas que já existem na safra de destino (mesmo tipo e propriedade) são mantidas.
+- A capacidade é respeitada por propriedade: se as culturas copiadas, somadas às já plantadas
+  no destino, ultrapassarem a área agricultável, nenhuma cultura da propriedade é copiada.
+- Antes da cópia as propriedades envolvidas são travadas (SELECT ... FOR UPDATE), como em
+  `OcupacaoSafra.reservar`: reservas e reduções de área agricultável concorrentes esperam a
+  virada, e a checagem de capacidade lê os totais já confirmados.
+- Como a instrução não dispara sinais, a área copiada é somada a OcupacaoSafra (incremento com a
+  mesma condição de capacidade de `reservar`), as culturas e áreas criadas são somadas aos resumos
+  (agrupadas por produtor, estado, cidade e tipo, um upsert por resumo) e as culturas criadas são
+  registradas no log de alterações (ver `agric.signals`).
+
+Funciona em PostgreSQL (inclusive com `cultura` particionada: as linhas vão para a partição da
+safra, ou para a padrão) e em SQLite 3.35+ (INSERT ... RETURNING).
+"""
+from collections import defaultdict
+
+from django.db import DatabaseError, connection, transaction
+
+from .models import (Alteracao, Cultura, OcupacaoSafra, Propriedade, ResumoGeografico, ResumoProdutor,
+                     ResumoProdutorSafra)
+from . import alteracoes
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Propriedades por instrução no incremento de OcupacaoSafra (3 parâmetros cada).
+LOTE_OCUPACAO = 300
+
+
+def _filtros(estado=None, produtor=None, tipo_cultura=None) -> tuple:
+    """
+    Condições (sobre `c`, a cultura de origem, e `p`, sua propriedade) e parâmetros dos filtros.
+    """
+    condicoes, params = [], []
+    for coluna, valor in (('p."estado_id"', estado), ('p."produtor_id"', produtor),
+                          ('c."tipo_cultura_id"', tipo_cultura)):
+        if valor is not None:
+            condicoes.append(f"{coluna} = %s")
+            params.append(valor)
+    return "".join(f" AND {condicao}" for condicao in condicoes), params
+
+
+def _travar_propriedades(cursor, origem, filtros, params):
+    """
+    Trava, em ordem de id, as propriedades com culturas de `origem` que atendem aos filtros.
+    """
+    culturas, propriedades = Cultura._meta.db_table, Propriedade._meta.db_table
+    if not connection.features.has_select_for_update:
+        return  # SQLite: a escrita já é serializada pelo banco.
+    cursor.execute(
+        f'SELECT p."id_propriedade" FROM "{propriedades}" p WHERE EXISTS (SELECT 1 FROM "{culturas}" c '
+        f'WHERE c."propriedade_id" = p."id_propriedade" AND c."ano_safra" = %s{filtros}) '
+        f'ORDER BY p."id_propriedade" FOR UPDATE',
+        [origem, *params])
+
+
+def _ocupar_destino(cursor, destino, criadas):
+    """
+    Soma ao total plantado na safra de destino a área das culturas criadas (linhas (id_cultura,
+    propriedade_id, area, tipo_cultura_id)), com a condição de capacidade de `OcupacaoSafra.reservar`.
+    """
+    propriedades, ocupacoes = Propriedade._meta.db_table, OcupacaoSafra._meta.db_table
+    areas = defaultdict(float)
+    for _, propriedade_id, area, _ in criadas:
+        areas[propriedade_id] += area or 0.0
+    itens = [(propriedade_id, area) for propriedade_id, area in sorted(areas.items()) if area > 0]
+    for inicio in range(0, len(itens), LOTE_OCUPACAO):
+        lote = itens[inicio:inicio + LOTE_OCUPACAO]
+        valores = ", ".join(["(%s, %s)"] * len(lote))
+        cursor.execute(
+            f'INSERT INTO "{ocupacoes}" ("propriedade_id", "ano_safra", "area_plantada") '
+            f'SELECT v.column1, %s, v.column2 FROM (VALUES {valores}) v '
+            f'JOIN "{propriedades}" p ON p."id_propriedade" = v.column1 '
+            f'WHERE v.column2 <= p."area_agricultavel" + %s '
+            f'ON CONFLICT ("propriedade_id", "ano_safra") DO UPDATE '
+            f'SET "area_plantada" = "{ocupacoes}"."area_plantada" + excluded."area_plantada" '
+            f'WHERE "{ocupacoes}"."area_plantada" + excluded."area_plantada" <= (SELECT "area_agricultavel" '
+            f'FROM "{propriedades}" WHERE "id_propriedade" = excluded."propriedade_id") + %s',
+            [destino, *(valor for item in lote for valor in item), OcupacaoSafra.TOLERANCIA, OcupacaoSafra.TOLERANCIA])
+        if cursor.rowcount != len(lote):
+            # Não deveria ocorrer com as propriedades travadas: desfaz a virada inteira.
+            raise DatabaseError(f"Capacidade da safra {destino} excedida durante a virada de safra.")
+
+
+def _atualizar_resumos(destino, criadas):
+    """
+    Faz o que os sinais fariam para as culturas criadas (linhas (id_cultura, propriedade_id, area,
+    tipo_cultura_id)), somando aos resumos os totais agrupados, sem reagregar as culturas.
+    """
+    from .signals import invalidar_tabela
+
+    regioes = {pk: (produtor_id, estado_id, cidade_id) for pk, produtor_id, estado_id, cidade_id in
+               Propriedade.objects.filter(pk__in={propriedade_id for _, propriedade_id, _, _ in criadas})
+               .values_list('pk', 'produtor_id', 'estado_id', 'cidade_id')}
+    por_produtor, por_regiao = defaultdict(lambda: [0, 0.0]), defaultdict(lambda: [0, 0.0])
+    for _, propriedade_id, area, tipo_cultura_id in criadas:
+        produtor_id, estado_id, cidade_id = regioes[propriedade_id]
+        for totais in (por_produtor[(produtor_id, estado_id)], por_regiao[(estado_id, cidade_id, tipo_cultura_id)]):
+            totais[0] += 1
+            totais[1] += area or 0.0
+    ResumoProdutor.somar_culturas(por_produtor)
+    ResumoProdutorSafra.somar({(*chave, destino): totais for chave, totais in por_produtor.items()})
+    ResumoGeografico.somar_culturas(por_regiao)
+    alteracoes.registrar_varias(Cultura, [pk for pk, _, _, _ in criadas], Alteracao.CRIACAO)
+    invalidar_tabela(Cultura)
+
+
+def clonar_safra(origem, destino, estado=None, produtor=None, tipo_cultura=None) -> dict:
+    """
+    Copia as culturas da safra `origem` para `destino`. `estado`, `produtor` e `tipo_cultura`
+    são ids. Retorna as contagens de culturas de origem, clonadas, já existentes no destino e
+    recusadas por falta de área agricultável.
+    """
+    culturas, propriedades = Cultura._meta.db_table, Propriedade._meta.db_table
+    ocupacoes = OcupacaoSafra._meta.db_table
+    filtros, params = _filtros(estado, produtor, tipo_cultura)
+    existe_no_destino = (f'EXISTS (SELECT 1 FROM "{culturas}" d WHERE d."ano_safra" = %s '
+                         f'AND d."tipo_cultura_id" = c."tipo_cultura_id" AND d."propriedade_id" = c."propriedade_id")')
+    origem_filtrada = (f'FROM "{culturas}" c JOIN "{propriedades}" p ON p."id_propriedade" = c."propriedade_id" '
+                       f'WHERE c."ano_safra" = %s{filtros}')
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        _travar_propriedades(cursor, origem, filtros, params)
+        cursor.execute(
+            f'SELECT COUNT(*), COALESCE(SUM(CASE WHEN {existe_no_destino} THEN 1 ELSE 0 END), 0) {origem_filtrada}',
+            [destino, origem, *params])
+        total, existentes = cursor.fetchone()
+
+        # Candidatas: culturas de origem ainda ausentes no destino. Copiadas apenas as das
+        # propriedades em que todas cabem na área agricultável livre da safra de destino.
+        cursor.execute(
+            f'WITH candidatas AS (SELECT c."tipo_cultura_id", c."propriedade_id", c."area", '
+            f'p."area_agricultavel" {origem_filtrada} AND NOT {existe_no_destino}), '
+            f'cabem AS (SELECT k."propriedade_id" FROM candidatas k LEFT JOIN "{ocupacoes}" o '
+            f'ON o."propriedade_id" = k."propriedade_id" AND o."ano_safra" = %s '
+            f'GROUP BY k."propriedade_id", k."area_agricultavel", o."area_plantada" '
+            f'HAVING COALESCE(o."area_plantada", 0) + SUM(k."area") <= k."area_agricultavel" + %s) '
+            f'INSERT INTO "{culturas}" ("ano_safra", "tipo_cultura_id", "propriedade_id", "area") '
+            f'SELECT %s, k."tipo_cultura_id", k."propriedade_id", k."area" FROM candidatas k '
+            f'WHERE k."propriedade_id" IN (SELECT "propriedade_id" FROM cabem) '
+            f'ON CONFLICT DO NOTHING RETURNING "id_cultura", "propriedade_id", "area", "tipo_cultura_id"',
+            [origem, *params, destino, destino, OcupacaoSafra.TOLERANCIA, destino])
+        criadas = cursor.fetchall()
+
+        if criadas:
+            _ocupar_destino(cursor, destino, criadas)
+            _atualizar_resumos(destino, criadas)
+
+    resultado = {"origem": origem, "destino": destino, "culturas_origem": total, "clonadas": len(criadas),
+                 "existentes": existentes, "sem_capacidade": total - existentes - len(criadas)}
+    logger.info("Safra %s clonada para %s: %s", origem, destino, resultado)
+    return resultado
@@ -0,0 +1,46 @@
+"""
+schema.py
+
+Decoradores de documentação OpenAPI usados pelas views do app Agric.
+
+Quando `drf_spectacular` está em INSTALLED_APPS, reexporta `extend_schema`,
+`extend_schema_view`, `OpenApiExample` e `OpenApiParameter` originais. Caso contrário (perfil
+`agric.settings_api` sem API_DOCS=1), expõe versões nulas, evitando que a simples
+importação de `views.py` carregue o gerador de schema do drf_spectacular.
+"""
+from django.apps import apps
+
+
+if apps.is_installed('drf_spectacular'):
+    from drf_spectacular.utils import extend_schema  # noqa: F401
+    from drf_spectacular.utils import extend_schema_view  # noqa: F401
+    from drf_spectacular.utils import OpenApiExample  # noqa: F401
+    from drf_spectacular.utils import OpenApiParameter  # noqa: F401
+else:
+    def extend_schema(*args, **kwargs):
+        """
+        Decorador nulo: devolve a view ou o método sem alterações.
+        """
+        def decorator(f):
+            return f
+        return decorator
+
+    def extend_schema_view(**kwargs):
+        """
+        Decorador nulo para classes de view.
+        """
+        def decorator(view):
+            return view
+        return decorator
+
+    def OpenApiExample(*args, **kwargs):
+        """
+        Exemplo nulo: o conteúdo só interessa ao gerador de schema.
+        """
+        return None
+
+    def OpenApiParameter(*args, **kwargs):
+        """
+        Parâmetro nulo: o conteúdo só interessa ao gerador de schema.
+        """
+        return None
@@ -11,9 +11,14 @@ os dados das principais entidades do sistema agric:
 - TipoCultura
 - Propriedade
 - Cultura
+- Tarefa (fila de tarefas em segundo plano)
+- Portfólio do produtor (propriedades e culturas aninhadas, somente leitura)
+- Virada de safra (parâmetros da cópia das culturas de uma safra para outra)
 
 Cada serializer garante as regras de negócio e integridade dos dados para a API.
 """
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.urls import reverse
 from rest_framework import serializers
 from .models import Produtor
 from .models import Estado
@@ -21,47 +26,59 @@ from .models import Cidade
 from .models import TipoCultura
 from .models import Propriedade
 from .models import Cultura
+from .models import OcupacaoSafra
+from .models import Tarefa
+from .models import MENSAGEM_AREAS
+from .tarefas import TIPOS, ParametrosInvalidos, validar_parametros
+from .refcache import CachedPrimaryKeyRelatedField, cidades, estados, tipos_cultura
+from .validators import parse_document
 
 
 class ProdutorSerializer(serializers.ModelSerializer):
     """
     Serializador para o model Produtor.
-    - Valida CPF/CNPJ.
+    - Valida CPF/CNPJ em uma única passada (máscara, tipo, dígitos verificadores e unicidade).
     - Preenche automaticamente o tipo de documento.
     - Usa o campo cpf_cnpj como identificador.
+    - Grava com `save(validado=True)`: o model não repete a validação nem a consulta de unicidade.
     """
     class Meta:
         model = Produtor
         fields = ['cpf_cnpj', 'tipo_documento', 'nome_produtor']
         read_only_fields = ['tipo_documento']
+        # A unicidade é conferida em validate(), sobre o documento já sem máscara.
+        extra_kwargs = {'cpf_cnpj': {'validators': []}}
 
-    
-    def create(self, validated_data):
+    def validate(self, attrs):
         """
-        Cria um novo Produtor.
-        Define automaticamente o tipo de documento (CPF ou CNPJ) com base no tamanho 
-        do campo cpf_cnpj.
+        Normaliza o documento, identifica o tipo e confere os dígitos verificadores e a
+        unicidade (apenas se o documento mudou).
         """
-        cpf_cnpj = validated_data.get("cpf_cnpj", "")
-        if len(cpf_cnpj) == 11:
-            validated_data["tipo_documento"] = "CPF"
-        elif len(cpf_cnpj) == 14:
-            validated_data["tipo_documento"] = "CNPJ"
-        else:
-            validated_data["tipo_documento"] = ""
-        return super().create(validated_data)
+        if 'cpf_cnpj' not in attrs:
+            return attrs
+        documento, tipo, valido = parse_document(attrs['cpf_cnpj'])
+        if tipo is None:
+            raise serializers.ValidationError({'cpf_cnpj': "CPF deve ter 11 dígitos ou CNPJ 14 dígitos."})
+        if not valido:
+            raise serializers.ValidationError({'cpf_cnpj': f"{tipo} inválido"})
+        if (self.instance is None or documento != self.instance.cpf_cnpj) and \
+                Produtor.objects.filter(cpf_cnpj=documento).exists():
+            raise serializers.ValidationError(
+                {'cpf_cnpj': Produtor().unique_error_message(Produtor, ('cpf_cnpj',)).messages})
+        attrs['cpf_cnpj'], attrs['tipo_documento'] = documento, tipo
+        return attrs
 
+    def create(self, validated_data):
+        produtor = Produtor(**validated_data)
+        produtor.save(validado=True)
+        return produtor
+
+    def update(self, instance, validated_data):
+        for campo, valor in validated_data.items():
+            setattr(instance, campo, valor)
+        instance.save(validado=True)
+        return instance
 
-    def validate_cpf_cnpj(self, value):
-        """
-        Valida o campo cpf_cnpj, garantindo que contenha apenas números e 
-        tenha 11 (CPF) ou 14 (CNPJ) dígitos.
-        """
-        value = ''.join(filter(str.isdigit, value))
-        if not (len(value) == 11 or len(value) == 14):
-            raise serializers.ValidationError("CPF deve ter 11 dígitos ou CNPJ 14 dígitos.")
-        return value
-    
 
 class EstadoSerializer(serializers.ModelSerializer):
     """
@@ -76,7 +93,10 @@ class CidadeSerializer(serializers.ModelSerializer):
     """
     Serializador para o model Cidade.
     - Serializa id, nome e estado associado.
+    - Valida o estado pelo cache de referência, sem consultar o banco.
     """
+    estado = CachedPrimaryKeyRelatedField(queryset=Estado.objects.all())
+
     class Meta:
         model = Cidade
         fields = ['id_cidade', 'nome_cidade', 'estado']
@@ -97,39 +117,203 @@ class PropriedadeSerializer(serializers.ModelSerializer):
     Serializador para o model Propriedade.
     - Valida soma das áreas agricultável e de vegetação.
     - Serializa todos os campos principais da propriedade.
+    - Valida a cidade pelo cache de referência, sem consultar o banco.
+    - Referencia o produtor pelo documento (cpf_cnpj), embora a FK use a chave inteira id_produtor.
+    - Impede reduzir a área agricultável abaixo da área já plantada em alguma safra.
+    - Recusa áreas negativas (as mesmas regras são CheckConstraints no banco).
     """
+    cidade = CachedPrimaryKeyRelatedField(queryset=Cidade.objects.all())
+    produtor = serializers.SlugRelatedField(slug_field='cpf_cnpj', queryset=Produtor.objects.all())
+
     class Meta:
         model = Propriedade
         fields = [
             'id_propriedade', 'nome_propriedade', 'area_total',
             'area_agricultavel', 'area_vegetacao', 'cidade', 'produtor'
         ]
+        extra_kwargs = {campo: {'min_value': 0.0}
+                        for campo in ('area_total', 'area_agricultavel', 'area_vegetacao')}
 
     def validate(self, data):
         """
         Valida se a soma das áreas agricultável e de vegetação não ultrapassa a 
-        área total da propriedade.
+        área total da propriedade. Em um PATCH, as áreas omitidas vêm da instância.
         """
-        area_total = data.get('area_total')
-        area_agricultavel = data.get('area_agricultavel')
-        area_vegetacao = data.get('area_vegetacao')
-        if area_total is not None and area_agricultavel is not None and area_vegetacao is not None:
-            if area_agricultavel + area_vegetacao > area_total:
-                raise serializers.ValidationError(
-                    "A soma das áreas agricultável e de vegetação não pode ultrapassar a área total."
-                )
+        areas = [data.get(campo, getattr(self.instance, campo, None))
+                 for campo in ('area_total', 'area_agricultavel', 'area_vegetacao')]
+        area_total, area_agricultavel, area_vegetacao = areas
+        if None not in areas and area_agricultavel + area_vegetacao > area_total + Propriedade.TOLERANCIA:
+            raise serializers.ValidationError(MENSAGEM_AREAS)
         return data
 
+    def update(self, instance, validated_data):
+        area_agricultavel = validated_data.get('area_agricultavel')
+        if area_agricultavel is not None and area_agricultavel < instance.area_agricultavel:
+            try:
+                OcupacaoSafra.verificar_capacidade(instance.pk, area_agricultavel)
+            except DjangoValidationError as e:
+                raise serializers.ValidationError(e.message_dict)
+        return super().update(instance, validated_data)
+
 
 class CulturaSerializer(serializers.ModelSerializer):
     """
     Serializador para o model Cultura.
-    - Serializa id, ano_safra, tipo_cultura e propriedade.
+    - Serializa id, ano_safra, tipo_cultura, propriedade e area.
     - Garante unicidade por (ano_safra, tipo_cultura, propriedade).
+    - Valida o tipo de cultura pelo cache de referência, sem consultar o banco.
+    - Converte em erro 400 a área plantada que excederia a área agricultável na safra
+      (verificada no save, ver OcupacaoSafra).
     """
+    tipo_cultura = CachedPrimaryKeyRelatedField(queryset=TipoCultura.objects.all())
+
+    class Meta:
+        model = Cultura
+        fields = ['id_cultura', 'ano_safra', 'tipo_cultura', 'propriedade', 'area']
+
+    def create(self, validated_data):
+        try:
+            return super().create(validated_data)
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+
+    def update(self, instance, validated_data):
+        try:
+            return super().update(instance, validated_data)
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+
+
+class ClonarSafraSerializer(serializers.Serializer):
+    """
+    Parâmetros da virada de safra (ver agric.safras).
+    - Filtros opcionais por estado, produtor (pelo documento) e tipo de cultura.
+    - As safras de origem e destino devem ser diferentes.
+    """
+    origem = serializers.IntegerField(help_text="Ano-safra de origem")
+    destino = serializers.IntegerField(help_text="Ano-safra de destino")
+    estado = CachedPrimaryKeyRelatedField(queryset=Estado.objects.all(), required=False)
+    produtor = serializers.SlugRelatedField(slug_field='cpf_cnpj', queryset=Produtor.objects.all(), required=False)
+    tipo_cultura = CachedPrimaryKeyRelatedField(queryset=TipoCultura.objects.all(), required=False)
+
+    def validate(self, data):
+        if data['origem'] == data['destino']:
+            raise serializers.ValidationError({'destino': "As safras de origem e destino devem ser diferentes."})
+        return data
+
+
+class ClonarSafraResultadoSerializer(serializers.Serializer):
+    """
+    Contagens da virada de safra.
+    """
+    origem = serializers.IntegerField()
+    destino = serializers.IntegerField()
+    culturas_origem = serializers.IntegerField(help_text="Culturas da safra de origem que atendem aos filtros")
+    clonadas = serializers.IntegerField(help_text="Culturas criadas na safra de destino")
+    existentes = serializers.IntegerField(help_text="Culturas que já existiam na safra de destino")
+    sem_capacidade = serializers.IntegerField(help_text="Culturas não copiadas por falta de área agricultável")
+
+
+class PortfolioCulturaSerializer(serializers.ModelSerializer):
+    """
+    Cultura no portfólio do produtor, com o nome do tipo (lido do cache de referência).
+    """
+    nome_tipo_cultura = serializers.SerializerMethodField()
+
     class Meta:
         model = Cultura
-        fields = ['id_cultura', 'ano_safra', 'tipo_cultura', 'propriedade']
+        fields = ['id_cultura', 'ano_safra', 'tipo_cultura', 'nome_tipo_cultura', 'area']
+
+    def get_nome_tipo_cultura(self, obj) -> str:
+        return tipos_cultura.nome(obj.tipo_cultura_id)
+
+
+class PortfolioPropriedadeSerializer(serializers.ModelSerializer):
+    """
+    Propriedade no portfólio do produtor, com os nomes da cidade e do estado (lidos do cache de
+    referência) e as culturas pré-carregadas.
+    """
+    nome_cidade = serializers.SerializerMethodField()
+    nome_estado = serializers.SerializerMethodField()
+    culturas = PortfolioCulturaSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Propriedade
+        fields = ['id_propriedade', 'nome_propriedade', 'area_total', 'area_agricultavel', 'area_vegetacao',
+                  'cidade', 'nome_cidade', 'estado', 'nome_estado', 'culturas']
+
+    def get_nome_cidade(self, obj) -> str:
+        return cidades.nome(obj.cidade_id)
+
+    def get_nome_estado(self, obj) -> str:
+        return estados.nome(obj.estado_id)
+
+
+class TotaisProdutorSerializer(serializers.Serializer):
+    """
+    Totais do produtor, lidos da sua linha de total em ResumoProdutor (estado_id = 0), pré-carregada
+    pela view (nenhuma, se o produtor não tem propriedades).
+    """
+    propriedades = serializers.IntegerField(help_text="Quantidade de propriedades")
+    area_total = serializers.FloatField(help_text="Soma das áreas totais (hectares)")
+    area_agricultavel = serializers.FloatField(help_text="Soma das áreas agricultáveis (hectares)")
+    culturas = serializers.IntegerField(help_text="Quantidade de culturas, somando as safras")
+    area_plantada = serializers.FloatField(help_text="Área plantada, somando as safras (hectares)")
+
+    def to_representation(self, resumos):
+        resumos = resumos.all()
+        return {nome: sum(getattr(resumo, nome) for resumo in resumos) for nome in self.fields}
+
+
+class PortfolioSerializer(serializers.ModelSerializer):
+    """
+    Serializador somente leitura do portfólio de um produtor: seus dados, os totais mantidos em
+    ResumoProdutor e as propriedades com suas culturas, pré-carregadas pela view.
+    """
+    totais = TotaisProdutorSerializer(source='resumos', read_only=True)
+    propriedades = PortfolioPropriedadeSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Produtor
+        fields = ['cpf_cnpj', 'tipo_documento', 'nome_produtor', 'totais', 'propriedades']
+
+
+class TarefaSerializer(serializers.ModelSerializer):
+    """
+    Serializador para o model Tarefa.
+    - Na criação, aceita tipo, parametros, prioridade e max_tentativas; os demais campos são
+      mantidos pelo worker.
+    - Valida o tipo e os parâmetros pelo registro de tipos (ver agric.tarefas).
+    - `download` traz a URL do arquivo de resultado, quando houver.
+    """
+    download = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Tarefa
+        fields = ['id_tarefa', 'tipo', 'parametros', 'prioridade', 'status', 'tentativas', 'max_tentativas',
+                  'progresso', 'mensagem', 'resultado', 'download', 'criada_em', 'iniciada_em', 'concluida_em']
+        read_only_fields = ['status', 'tentativas', 'progresso', 'mensagem', 'resultado', 'criada_em',
+                            'iniciada_em', 'concluida_em']
+        extra_kwargs = {'max_tentativas': {'min_value': 1, 'max_value': 10}}
+
+    def get_download(self, obj):
+        if not obj.arquivo or obj.status != Tarefa.CONCLUIDA:
+            return None
+        url = reverse('tarefa-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def validate_tipo(self, value):
+        if value not in TIPOS:
+            raise serializers.ValidationError(f"Tipo de tarefa desconhecido. Use {', '.join(sorted(TIPOS))}.")
+        return value
+
+    def validate(self, attrs):
+        try:
+            attrs['parametros'] = validar_parametros(attrs['tipo'], attrs.get('parametros', {}))
+        except ParametrosInvalidos as e:
+            raise serializers.ValidationError({'parametros': str(e)})
+        return attrs
 
 
 class FazendaPorEstadoSerializer(serializers.Serializer):
@@ -147,6 +331,7 @@ class CulturaPlantadaSerializer(serializers.Serializer):
     """
     tipo_cultura = serializers.CharField(help_text="Nome do tipo de cultura")
     qtd = serializers.IntegerField(help_text="Quantidade de culturas plantadas desse tipo")
+    area = serializers.FloatField(help_text="Área plantada desse tipo (hectares)")
 
 
 class UsoDoSoloSerializer(serializers.Serializer):
@@ -155,6 +340,7 @@ class UsoDoSoloSerializer(serializers.Serializer):
     """
     total_agricultavel = serializers.FloatField(help_text="Área total agricultável (hectares)")
     total_vegetacao = serializers.FloatField(help_text="Área total de vegetação (hectares)")
+    total_plantado = serializers.FloatField(help_text="Área total plantada, somando as safras (hectares)")
     
 
 class DashboardResponseSerializer(serializers.Serializer):
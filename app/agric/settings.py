@@ -18,24 +18,39 @@ ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "*").split(",")
 
 
 # Logging configuration
+# Por padrão os logs saem no console, legíveis (com os campos estruturados em chave=valor).
+# DJANGO_LOG_FORMAT=json (ligado na imagem Docker) escreve em JSON por uma fila limitada em thread
+# própria (agric.logs), sem bloquear as requisições.
 LOG_LEVEL = os.getenv("DJANGO_LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("DJANGO_LOG_FORMAT", "text")
+LOG_QUEUE_SIZE = int(os.getenv("DJANGO_LOG_QUEUE_SIZE", "10000"))
+# Amostragem por rota dos logs de sucesso, ex: "estado-list=0.1,dashboard=0.5"
+LOG_SAMPLING = os.getenv("DJANGO_LOG_SAMPLING", "")
+LOG_SAMPLING_DEFAULT = float(os.getenv("DJANGO_LOG_SAMPLING_DEFAULT", "1.0"))
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
     "formatters": {
         "verbose": {
-            "format": "[{asctime}] {levelname} {name} {message}",
-            "style": "{",
+            "()": "agric.logs.text_formatter",
         },
         "simple": {
             "format": "{levelname} {message}",
             "style": "{",
         },
     },
+    "filters": {
+        "sampling": {
+            "()": "agric.logs.RouteSamplingFilter",
+            "rates": LOG_SAMPLING,
+            "default": LOG_SAMPLING_DEFAULT,
+        },
+    },
     "handlers": {
         "console": {
             "class": "logging.StreamHandler",
             "formatter": "verbose",
+            "filters": ["sampling"],
         },
     },
     "root": {
@@ -43,6 +58,13 @@ LOGGING = {
         "level": LOG_LEVEL,
     },
 }
+if LOG_FORMAT != "text":
+    LOGGING["handlers"]["async_json"] = {
+        "()": "agric.logs.AsyncQueueHandler",
+        "maxsize": LOG_QUEUE_SIZE,
+        "filters": ["sampling"],
+    }
+    LOGGING["root"]["handlers"] = ["async_json"]
 
 
 # Application definition
@@ -77,6 +99,7 @@ SPECTACULAR_SETTINGS = {
 }
 
 MIDDLEWARE = [
+    'agric.middleware.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -88,6 +111,14 @@ MIDDLEWARE = [
 ]
 
 ROOT_URLCONF = 'agric.urls'
+
+# Cabeçalho Server-Timing com tempos de banco, view, renderização e total (ver agric.middleware)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"
+# Acesso a /metrics (ver agric.metrics): requisições vindas de METRICS_ALLOWED_IPS (IPs ou redes,
+# separados por vírgula; o REMOTE_ADDR, sem confiar em X-Forwarded-For) ou com o cabeçalho
+# "Authorization: Bearer <METRICS_TOKEN>". Por padrão, só a própria máquina.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",") if ip.strip()]
 CORS_ALLOW_ALL_ORIGINS = True  # Para testes/demonstracao publica
 
 TEMPLATES = [
@@ -141,6 +172,84 @@ else:
 
 
 
+# Cache
+# Guarda as versões das tabelas usadas para invalidar os caches em memória (agric.versioning).
+# Com mais de um processo (workers da API, worker de tarefas, comandos), use um backend
+# compartilhado para que a invalidação alcance todos; os docker-compose usam Redis:
+# DJANGO_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache DJANGO_CACHE_LOCATION=redis://cache:6379/0
+# Com o LocMemCache, o worker de tarefas e os comandos que escrevem dados recusam iniciar, a menos
+# que ALLOW_LOCAL_CACHE=1 (um único processo, testes).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', 'agric'),
+    }
+}
+ALLOW_LOCAL_CACHE = os.getenv('ALLOW_LOCAL_CACHE', '0') == '1'
+
+
+# Tempo (s) que proxies reversos podem guardar listagens/detalhes das tabelas de referência
+# (estados, cidades, tipos de cultura). Ver agric.conditional.
+REFERENCE_CACHE_MAX_AGE = int(os.getenv('REFERENCE_CACHE_MAX_AGE', '60'))
+
+
+# Entradas do cache de representações do retrieve, por processo (0 desativa). Ver agric.reprcache.
+REPR_CACHE_SIZE = int(os.getenv('REPR_CACHE_SIZE', '10000'))
+
+
+# Cache do dashboard (s) e janela em que o valor anterior ainda é servido durante o recálculo.
+# Com SINGLE_FLIGHT_CROSS_WORKER=1, um lock no cache compartilhado garante um único cálculo entre
+# todos os workers. Ver agric.singleflight.
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', '30'))
+DASHBOARD_STALE_TTL = int(os.getenv('DASHBOARD_STALE_TTL', '300'))
+SINGLE_FLIGHT_CROSS_WORKER = os.getenv('SINGLE_FLIGHT_CROSS_WORKER', '0') == '1'
+SINGLE_FLIGHT_LOCK_TIMEOUT = int(os.getenv('SINGLE_FLIGHT_LOCK_TIMEOUT', '30'))
+
+# Stream do dashboard (/api/dashboard/stream/, ASGI). Ver agric.transmissao.
+# Intervalo (s) de conferência das versões, heartbeat (s), eventos pendentes por cliente e
+# espera (ms) do EventSource antes de reconectar.
+DASHBOARD_STREAM_INTERVAL = float(os.getenv('DASHBOARD_STREAM_INTERVAL', '1'))
+DASHBOARD_STREAM_HEARTBEAT = float(os.getenv('DASHBOARD_STREAM_HEARTBEAT', '15'))
+DASHBOARD_STREAM_QUEUE = int(os.getenv('DASHBOARD_STREAM_QUEUE', '16'))
+DASHBOARD_STREAM_RETRY = int(os.getenv('DASHBOARD_STREAM_RETRY', '5000'))
+
+
+# Particionamento da tabela cultura por ano_safra (somente PostgreSQL). Ver agric.particoes
+# e o comando cultura_particoes.
+CULTURA_PARTITIONING = os.getenv('CULTURA_PARTITIONING', '0') == '1'
+
+
+# Log de alterações e sincronização incremental (/api/changes/). Ver agric.alteracoes e o
+# comando compactar_alteracoes.
+CHANGES_RETENTION_DAYS = int(os.getenv('CHANGES_RETENTION_DAYS', '30'))
+CHANGES_PAGE_SIZE = int(os.getenv('CHANGES_PAGE_SIZE', '500'))
+
+
+# Snapshot analítico em memória (/api/analytics/). Ver agric.analytics.
+ANALYTICS_MAX_AGE = int(os.getenv('ANALYTICS_MAX_AGE', '300'))
+ANALYTICS_INCREMENTAL_LIMIT = int(os.getenv('ANALYTICS_INCREMENTAL_LIMIT', '50000'))
+
+
+# Fila de tarefas em segundo plano (/api/jobs/). Ver agric.tarefas e o comando executar_tarefas.
+# O diretório de resultados deve ser compartilhado entre a API e os workers.
+JOBS_RESULT_DIR = os.getenv('JOBS_RESULT_DIR', str(BASE_DIR / 'tarefas'))
+JOBS_WORKER_THREADS = int(os.getenv('JOBS_WORKER_THREADS', '2'))
+JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', '2'))
+JOBS_LEASE_SECONDS = int(os.getenv('JOBS_LEASE_SECONDS', '300'))
+JOBS_RETRY_BACKOFF = int(os.getenv('JOBS_RETRY_BACKOFF', '30'))
+JOBS_RETENTION_DAYS = int(os.getenv('JOBS_RETENTION_DAYS', '7'))
+
+
+# Log de consultas lentas com captura do plano (/api/slow-queries/). Ver agric.consultas_lentas
+# e o comando consultas_lentas (que o liga só para a própria execução). Os registros ficam em
+# memória, por processo. Desligado por padrão: mede cada query e o EXPLAIN é uma ida extra ao
+# banco por formato de query; ligue explicitamente no ambiente (ver docker-compose-prod.yml).
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', '0') == '1'
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+SLOW_QUERY_RING = int(os.getenv('SLOW_QUERY_RING', '200'))
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', '0') == '1'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,69 @@
+"""
+settings_api.py
+
+Perfil de configuração enxuto para servir somente a API REST (JSON) do app Agric.
+
+Herda todas as definições de `agric.settings` e remove o que os endpoints REST não utilizam:
+- Admin, sessões, mensagens e django_extensions saem de INSTALLED_APPS.
+- Middlewares de sessão, CSRF, autenticação por sessão, mensagens e clickjacking saem de MIDDLEWARE.
+- A documentação OpenAPI (drf_spectacular) só é carregada quando API_DOCS=1, e mesmo assim
+  as views de documentação são importadas sob demanda no primeiro acesso (ver `urls.py`).
+
+Reduz o tempo de importação e o tempo até a primeira resposta de cada worker do gunicorn,
+o que importa quando os workers são escalados automaticamente.
+
+Uso:
+    DJANGO_SETTINGS_MODULE=agric.settings_api gunicorn agric.asgi:application -k uvicorn_worker.UvicornWorker
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import REST_FRAMEWORK
+
+
+API_DOCS = os.getenv("API_DOCS", "0") == "1"
+
+
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'rest_framework',
+    'agric',
+    'corsheaders',
+]
+
+if API_DOCS:
+    INSTALLED_APPS += ['django.contrib.staticfiles', 'drf_spectacular']
+
+
+MIDDLEWARE = [
+    'agric.middleware.RequestMetricsMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+
+# Sem sessões: autenticação apenas por cabeçalho HTTP.
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+}
+if not API_DOCS:
+    REST_FRAMEWORK.pop('DEFAULT_SCHEMA_CLASS', None)
+
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.request',
+            ],
+        },
+    },
+]
@@ -0,0 +1,289 @@
+"""
+signals.py
+
+Receivers de sinais dos models do app Agric, conectados em `AgricConfig.ready()`.
+
+- Escritas (save/delete, inclusive em cascata) em qualquer model do app trocam a versão da
+  tabela (`agric.versioning`), invalidando os caches de referência (`agric.refcache`) e os
+  validadores HTTP (ETag/Last-Modified, ver `agric.conditional`) em todos os workers que
+  compartilham o backend de cache. A versão é trocada imediatamente e de novo após o commit,
+  para que nenhum worker fique com dados anteriores ao commit.
+- As mesmas escritas trocam a versão do objeto, invalidando sua representação no cache do
+  retrieve (`agric.reprcache`).
+- Escritas nas tabelas do dashboard acordam, após o commit, o stream do dashboard do processo
+  (`agric.transmissao`).
+- As mesmas escritas gravam uma linha no log de alterações (`agric.alteracoes`), lido pela
+  sincronização incremental (/api/changes/).
+- A representação de Propriedade inclui o documento do produtor: a troca do cpf_cnpj de um
+  Produtor invalida as propriedades dele, registra-as como alteradas e registra a exclusão
+  do documento antigo.
+- A exclusão de uma Cultura (inclusive em cascata) libera sua área em OcupacaoSafra.
+- Cada save/delete de Propriedade e de Cultura ajusta ResumoProdutor (propriedades, áreas e
+  culturas por produtor e estado) pela diferença, e cada save/delete de Cultura ajusta
+  ResumoProdutorSafra (área plantada por produtor, estado e safra); a troca de produtor ou de
+  estado de uma propriedade transfere suas culturas, e a mudança de estado de uma Cidade
+  recalcula os produtores afetados.
+- Cada save/delete de Propriedade e de Cultura ajusta ResumoGeografico (propriedades, áreas e
+  culturas por estado, cidade e tipo de cultura) pela diferença; a troca de cidade de uma
+  propriedade transfere suas culturas. A exclusão de uma Cidade ou de um TipoCultura remove as
+  linhas correspondentes.
+- Propriedade.estado (desnormalizado) é preenchido a partir da cidade a cada save da propriedade,
+  e propagado às propriedades quando uma Cidade muda de estado.
+
+Escritas que não disparam sinais (`bulk_create`, `QuerySet.update`, SQL direto) devem chamar
+`invalidar_tabela` (e, se mudarem a representação na API, `alteracoes.registrar_varias`)
+explicitamente.
+
+Os receivers são conectados apenas aos models versionados: sem receivers, as exclusões em massa
+do próprio log de alterações (compactação) não precisam carregar as linhas.
+
+Este módulo é importado em `AgricConfig.ready()`, ou seja, na inicialização de cada worker: no
+nível do módulo importa apenas models e versioning. Os módulos que dependem do rest_framework
+(log de alterações, caches de referência, dashboard e stream) são importados dentro dos
+receivers, na primeira escrita.
+"""
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Produtor, Estado, Cidade, TipoCultura, Propriedade, Cultura, Alteracao, OcupacaoSafra
+from .models import ResumoProdutor, ResumoProdutorSafra, ResumoGeografico
+from .versioning import bump_version, bump_object_version
+
+
+REFERENCE_MODELS = (Estado, Cidade, TipoCultura)
+VERSIONED_MODELS = (Produtor, Propriedade, Cultura) + REFERENCE_MODELS
+
+
+def invalidar_tabela(model):
+    bump_version(model)
+    transaction.on_commit(lambda: bump_version(model))
+
+
+def invalidar_objeto(model, pk):
+    bump_object_version(model, pk)
+    transaction.on_commit(lambda: bump_object_version(model, pk))
+
+
+def tabela_alterada(sender, instance, **kwargs):
+    invalidar_tabela(sender)
+    invalidar_objeto(sender, instance.pk)
+
+
+def registrar_alteracao(sender, instance, signal, created=False, **kwargs):
+    if signal is post_delete:
+        operacao = Alteracao.EXCLUSAO
+    else:
+        operacao = Alteracao.CRIACAO if created else Alteracao.ATUALIZACAO
+    from . import alteracoes
+    alteracoes.registrar(instance, operacao)
+
+
+def acordar_stream_do_dashboard(sender, **kwargs):
+    from .dashboard import DASHBOARD_MODELS
+    from .transmissao import difusor
+    if sender in DASHBOARD_MODELS:
+        transaction.on_commit(difusor.notificar)
+
+
+for model in VERSIONED_MODELS:
+    for signal in (post_save, post_delete):
+        signal.connect(tabela_alterada, sender=model)
+        signal.connect(registrar_alteracao, sender=model)
+        signal.connect(acordar_stream_do_dashboard, sender=model)
+
+
+@receiver(post_delete, sender=Cultura)
+def liberar_area_da_cultura(sender, instance, **kwargs):
+    propriedade_id, ano_safra, area = getattr(
+        instance, '_loaded_ocupacao', (instance.propriedade_id, instance.ano_safra, instance.area))
+    OcupacaoSafra.liberar(propriedade_id, ano_safra, area)
+
+
+def _resumo(instance):
+    return tuple(getattr(instance, campo) for campo in ResumoProdutor.CAMPOS)
+
+
+@receiver(post_save, sender=Propriedade)
+def atualizar_resumo_do_produtor(sender, instance, created, **kwargs):
+    anterior = None if created else getattr(instance, '_loaded_resumo', None)
+    atual = _resumo(instance)
+    if anterior == atual:
+        return
+    if not created and (anterior is None or None in anterior):
+        # Salva sem ter sido carregada por inteiro do banco: o resumo anterior é desconhecido.
+        ResumoProdutor.recalcular([instance.produtor_id])
+        ResumoProdutorSafra.recalcular([instance.produtor_id])
+    elif anterior is not None and anterior[:2] == atual[:2]:
+        ResumoProdutor.remover(*atual[:2], anterior[2] - atual[2], anterior[3] - atual[3], propriedades=0)
+    else:
+        if anterior is not None:
+            ResumoProdutor.remover(*anterior)
+            ResumoProdutor.mover_culturas(instance.pk, anterior[:2], atual[:2])
+            ResumoProdutorSafra.mover(instance.pk, anterior[:2], atual[:2])
+        ResumoProdutor.adicionar(*atual)
+    instance._loaded_resumo = atual
+
+
+@receiver(post_delete, sender=Propriedade)
+def remover_do_resumo_do_produtor(sender, instance, **kwargs):
+    anterior = getattr(instance, '_loaded_resumo', None)
+    ResumoProdutor.remover(*(anterior if anterior is not None and None not in anterior else _resumo(instance)))
+
+
+@receiver(post_save, sender=Cultura)
+def atualizar_resumo_do_produtor_da_cultura(sender, instance, created, **kwargs):
+    anterior = None if created else getattr(instance, '_loaded_resumo', None)
+    atual = tuple(getattr(instance, campo) for campo in ResumoProdutor.CAMPOS_CULTURA)
+    if anterior == atual:
+        return
+    if not created and (anterior is None or None in anterior):
+        ResumoProdutor.recalcular(list(Propriedade.objects.filter(pk=instance.propriedade_id)
+                                       .values_list('produtor_id', flat=True)))
+    elif anterior is not None and anterior[0] == atual[0]:
+        ResumoProdutor.remover_cultura(atual[0], anterior[1] - atual[1], culturas=0)
+    else:
+        if anterior is not None:
+            ResumoProdutor.remover_cultura(*anterior)
+        ResumoProdutor.adicionar_cultura(*atual)
+    instance._loaded_resumo = atual
+
+
+@receiver(post_delete, sender=Cultura)
+def remover_cultura_do_resumo_do_produtor(sender, instance, **kwargs):
+    # Na exclusão em cascata da propriedade, as culturas saem antes dela: o produtor e o estado
+    # ainda são lidos da propriedade.
+    anterior = getattr(instance, '_loaded_resumo', None)
+    ResumoProdutor.remover_cultura(*(anterior if anterior is not None and None not in anterior else
+                                     tuple(getattr(instance, campo) for campo in ResumoProdutor.CAMPOS_CULTURA)))
+
+
+@receiver(post_save, sender=Cultura)
+def atualizar_resumo_da_safra(sender, instance, created, **kwargs):
+    anterior = None if created else getattr(instance, '_loaded_safra', None)
+    atual = tuple(getattr(instance, campo) for campo in ResumoProdutorSafra.CAMPOS_CULTURA)
+    if anterior == atual:
+        return
+    if not created and (anterior is None or None in anterior):
+        ResumoProdutorSafra.recalcular(list(Propriedade.objects.filter(pk=instance.propriedade_id)
+                                            .values_list('produtor_id', flat=True)))
+    elif anterior is not None and anterior[:2] == atual[:2]:
+        ResumoProdutorSafra.remover(*atual[:2], anterior[2] - atual[2], culturas=0)
+    else:
+        if anterior is not None:
+            ResumoProdutorSafra.remover(*anterior)
+        ResumoProdutorSafra.adicionar(*atual)
+    instance._loaded_safra = atual
+
+
+@receiver(post_delete, sender=Cultura)
+def remover_cultura_do_resumo_da_safra(sender, instance, **kwargs):
+    anterior = getattr(instance, '_loaded_safra', None)
+    ResumoProdutorSafra.remover(*(anterior if anterior is not None and None not in anterior else
+                                  tuple(getattr(instance, campo) for campo in ResumoProdutorSafra.CAMPOS_CULTURA)))
+
+
+def _carregado(instance):
+    # O que foi lido do banco, ou None se a instância não foi carregada por inteiro.
+    anterior = getattr(instance, '_loaded_geo', None)
+    return None if anterior is None or None in anterior else anterior
+
+
+@receiver(post_save, sender=Propriedade)
+def atualizar_resumo_geografico_da_propriedade(sender, instance, created, **kwargs):
+    anterior = None if created else _carregado(instance)
+    atual = tuple(getattr(instance, campo) for campo in ResumoGeografico.CAMPOS)
+    if anterior == atual:
+        return
+    if not created and anterior is None:
+        # Região anterior desconhecida: reconstrói tudo (caminho raro, fora da API).
+        ResumoGeografico.recalcular()
+    elif anterior is not None and anterior[:2] == atual[:2]:
+        ResumoGeografico.remover_propriedade(*atual[:2], *(a - b for a, b in zip(anterior[2:], atual[2:])),
+                                             propriedades=0)
+    else:
+        if anterior is not None:
+            ResumoGeografico.remover_propriedade(*anterior)
+            ResumoGeografico.mover_culturas(instance.pk, anterior[:2], atual[:2])
+        ResumoGeografico.adicionar_propriedade(*atual)
+    instance._loaded_geo = atual
+
+
+@receiver(post_delete, sender=Propriedade)
+def remover_do_resumo_geografico(sender, instance, **kwargs):
+    # As culturas, excluídas antes em cascata, já saíram do resumo.
+    anterior = _carregado(instance)
+    ResumoGeografico.remover_propriedade(
+        *(anterior or tuple(getattr(instance, campo) for campo in ResumoGeografico.CAMPOS)))
+
+
+@receiver(post_save, sender=Cultura)
+def atualizar_resumo_geografico_da_cultura(sender, instance, created, **kwargs):
+    anterior = None if created else _carregado(instance)
+    atual = tuple(getattr(instance, campo) for campo in ResumoGeografico.CAMPOS_CULTURA)
+    if anterior == atual:
+        return
+    if not created and anterior is None:
+        ResumoGeografico.recalcular()
+    elif anterior is not None and anterior[:2] == atual[:2]:
+        ResumoGeografico.remover_cultura(*atual[:2], anterior[2] - atual[2], culturas=0)
+    else:
+        if anterior is not None:
+            ResumoGeografico.remover_cultura(*anterior)
+        ResumoGeografico.adicionar_cultura(*atual)
+    instance._loaded_geo = atual
+
+
+@receiver(post_delete, sender=Cultura)
+def remover_cultura_do_resumo_geografico(sender, instance, **kwargs):
+    anterior = _carregado(instance)
+    ResumoGeografico.remover_cultura(
+        *(anterior or tuple(getattr(instance, campo) for campo in ResumoGeografico.CAMPOS_CULTURA)))
+
+
+@receiver(post_delete, sender=Cidade)
+def remover_cidade_do_resumo_geografico(sender, instance, **kwargs):
+    ResumoGeografico.objects.filter(cidade_id=instance.pk).delete()
+
+
+@receiver(post_delete, sender=TipoCultura)
+def remover_tipo_do_resumo_geografico(sender, instance, **kwargs):
+    ResumoGeografico.objects.filter(tipo_cultura_id=instance.pk).delete()
+
+
+@receiver(pre_save, sender=Propriedade)
+def preencher_estado_da_propriedade(sender, instance, **kwargs):
+    # Pelo cache de referência (validado pela versão de Cidade), e não pela instância de cidade
+    # em memória, que pode estar desatualizada após uma mudança de estado.
+    from .refcache import cidades
+    cidade = cidades.get(instance.cidade_id)
+    instance.estado_id = cidade.estado_id if cidade is not None else None
+
+
+@receiver(post_save, sender=Cidade)
+def propagar_estado_da_cidade(sender, instance, created, **kwargs):
+    estado_anterior = getattr(instance, '_loaded_estado_id', None)
+    if not created and estado_anterior is not None and estado_anterior != instance.estado_id:
+        propriedades = Propriedade.objects.filter(cidade_id=instance.pk)
+        produtor_ids = list(propriedades.values_list('produtor_id', flat=True).distinct())
+        propriedades.update(estado_id=instance.estado_id)
+        ResumoProdutor.recalcular(produtor_ids)
+        ResumoProdutorSafra.recalcular(produtor_ids)
+        ResumoGeografico.recalcular([estado_anterior, instance.estado_id])
+        invalidar_tabela(Propriedade)
+    instance._loaded_estado_id = instance.estado_id
+
+
+@receiver(post_save, sender=Produtor)
+def propagar_documento_do_produtor(sender, instance, created, **kwargs):
+    documento_anterior = getattr(instance, '_loaded_cpf_cnpj', None)
+    if created or documento_anterior is None or documento_anterior == instance.cpf_cnpj:
+        return
+    invalidar_tabela(Propriedade)
+    pks = list(Propriedade.objects.filter(produtor_id=instance.pk).values_list('pk', flat=True))
+    for pk in pks:
+        invalidar_objeto(Propriedade, pk)
+    # Para quem sincroniza, o produtor com o documento antigo deixou de existir.
+    from . import alteracoes
+    alteracoes.registrar_varias(Produtor, [documento_anterior], Alteracao.EXCLUSAO)
+    alteracoes.registrar_varias(Propriedade, pks, Alteracao.ATUALIZACAO)
@@ -0,0 +1,148 @@
+"""
+singleflight.py
+
+Coalescência de requisições ("single flight") para cálculos caros, como o dashboard.
+
+- SingleFlight: dentro do processo, garante um único cálculo em andamento por chave; as demais
+  threads que pedem a mesma chave aguardam e recebem o mesmo resultado (ou a mesma exceção).
+- get_or_compute: guarda o resultado no cache do Django por `ttl` segundos, associado a um token
+  (ex: versões das tabelas de que o resultado depende). Depois de expirado ou com token diferente,
+  o valor anterior ainda pode ser servido por até `stale_ttl` segundos enquanto uma única
+  requisição o recalcula (stale-while-revalidate). Opcionalmente (`cross_worker=True`), um lock
+  no backend de cache (`cache.add`) estende a coalescência a todos os workers do gunicorn.
+
+Resultados publicados em /metrics: agric_singleflight_total{chave, resultado} com resultado em
+hit (valor válido no cache), leader (calculou), shared (aguardou outra thread ou worker) e
+stale (recebeu o valor anterior durante o recálculo).
+"""
+import os
+import threading
+import time
+
+from django.core.cache import cache
+
+from .metrics import registry
+
+
+KEY_PREFIX = "agric:sf:"
+POLL_INTERVAL = 0.05
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Um cálculo em andamento por chave, compartilhado entre as threads do processo.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def running(self, key) -> bool:
+        return key in self._calls
+
+    def do(self, key, fn, timeout=None):
+        """
+        Executa `fn()` se não houver cálculo em andamento para `key`; senão aguarda o resultado dele.
+        Retorna (resultado, compartilhado).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"Cálculo de {key!r} não terminou em {timeout}s")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+flights = SingleFlight()
+
+
+def _count(key, resultado):
+    registry.inc("agric_singleflight_total", "Requisições de cálculos coalescidos, por resultado.",
+                 {"chave": key, "resultado": resultado})
+
+
+def _wait_other_worker(cache_key, token, lock_timeout):
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(cache_key)
+        if entry is not None and entry["token"] == token:
+            return entry
+    return None
+
+
+def _revalidate(key, token, compute, ttl, stale_ttl, stale, cross_worker, lock_timeout):
+    """
+    Calcula e guarda o valor de `key`, respeitando o lock entre workers se habilitado.
+    Retorna (valor, resultado) com resultado em leader, shared ou stale.
+    """
+    cache_key = f"{KEY_PREFIX}{key}"
+    lock_key = f"{cache_key}:lock"
+    locked = False
+    if cross_worker:
+        locked = cache.add(lock_key, os.getpid(), timeout=lock_timeout)
+        if not locked:
+            if stale is not None:
+                return stale["valor"], "stale"
+            entry = _wait_other_worker(cache_key, token, lock_timeout)
+            if entry is not None:
+                return entry["valor"], "shared"
+    try:
+        value = compute()
+        cache.set(cache_key, {"token": token, "expira": time.time() + ttl, "valor": value},
+                  timeout=ttl + stale_ttl)
+        return value, "leader"
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+
+def get_or_compute(key, compute, token="", ttl=30, stale_ttl=300, cross_worker=False, lock_timeout=30,
+                   rotulo=None):
+    """
+    Retorna (valor, stale): o valor de `key` no cache se válido para `token`; senão o recalcula
+    uma única vez por processo (e por cluster, com `cross_worker`). Com um valor anterior ainda
+    dentro de `stale_ttl`, as requisições concorrentes ao recálculo recebem esse valor e
+    `stale=True`. `rotulo` substitui `key` na métrica, para chaves que incluem parâmetros.
+    """
+    rotulo = rotulo or key
+    cache_key = f"{KEY_PREFIX}{key}"
+    entry = cache.get(cache_key)
+    now = time.time()
+    if entry is not None and entry["token"] == token and now < entry["expira"]:
+        _count(rotulo, "hit")
+        return entry["valor"], False
+
+    stale = entry if entry is not None and now < entry["expira"] + stale_ttl else None
+    if stale is not None and flights.running(key):
+        _count(rotulo, "stale")
+        return stale["valor"], True
+
+    (value, resultado), shared = flights.do(
+        key, lambda: _revalidate(key, token, compute, ttl, stale_ttl, stale, cross_worker, lock_timeout),
+        timeout=lock_timeout)
+    if shared and resultado == "leader":
+        resultado = "shared"
+    _count(rotulo, resultado)
+    return value, resultado == "stale"
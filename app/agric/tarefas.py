@@ -0,0 +1,354 @@
+"""
+tarefas.py
+
+Fila de tarefas em segundo plano mantida no banco (model Tarefa), sem broker externo.
+
+Exportações e recálculos demorados saem do ciclo da requisição (e do timeout do gunicorn):
+POST /api/jobs/ enfileira a tarefa, o comando `executar_tarefas` a executa e GET /api/jobs/<id>/
+acompanha o progresso. Arquivos de resultado ficam em JOBS_RESULT_DIR e são baixados por
+streaming em GET /api/jobs/<id>/download/.
+
+- registrar_tipo: decorador que registra uma função como tipo de tarefa, com um validador
+  opcional dos parâmetros (usado pelo serializer no POST).
+- reservar: reserva para um worker a tarefa pendente de maior prioridade (a mais antiga entre
+  as de mesma prioridade), com um UPDATE condicional no status.
+- executar: executa uma tarefa reservada e registra resultado, arquivo ou falha. Falhas voltam
+  para a fila, com espera de JOBS_RETRY_BACKOFF * 2^(tentativa - 1) segundos, até
+  `max_tentativas`.
+- renovar_reservas / liberar_expiradas: o worker renova a reserva das tarefas em execução (em
+  uma thread própria, RenovadorDeReservas, mesmo enquanto executa uma tarefa longa); as reservas
+  não renovadas (worker interrompido) voltam para a fila. Um worker que perdeu a reserva descarta
+  o resultado e o arquivo em vez de concluir a tarefa.
+- remover_antigas: remove as tarefas finalizadas há mais de JOBS_RETENTION_DAYS e seus arquivos.
+
+Tipos embutidos:
+- exportar: CSV de produtores, propriedades ou culturas (filtros estado e ano_safra).
+- recalcular_resumos: reconstrói OcupacaoSafra, ResumoProdutor e ResumoGeografico após escritas em massa.
+- compactar_alteracoes: compacta o log de alterações (ver agric.alteracoes).
+"""
+import csv
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import (Produtor, Propriedade, Cultura, OcupacaoSafra, ResumoProdutor, ResumoProdutorSafra,
+                     ResumoGeografico, Tarefa)
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# nome -> (função, validador dos parâmetros ou None)
+TIPOS = {}
+# Intervalo mínimo (s) entre duas gravações de progresso da mesma tarefa.
+INTERVALO_PROGRESSO = 1.0
+
+
+class ParametrosInvalidos(ValueError):
+    """
+    Parâmetros recusados pelo validador do tipo de tarefa.
+    """
+
+
+class ReservaPerdida(Exception):
+    """
+    A reserva expirou e a tarefa foi devolvida à fila (ou reservada por outro worker).
+    """
+
+
+def registrar_tipo(nome, validar=None):
+    """
+    Registra a função decorada como o tipo de tarefa `nome`. A função recebe uma `Execucao` e
+    retorna o resultado (serializável em JSON). `validar(parametros)` retorna os parâmetros
+    normalizados ou levanta ParametrosInvalidos.
+    """
+    def decorator(funcao):
+        TIPOS[nome] = (funcao, validar)
+        return funcao
+    return decorator
+
+
+def validar_parametros(tipo, parametros) -> dict:
+    if tipo not in TIPOS:
+        raise ParametrosInvalidos(f"Tipo de tarefa desconhecido: {tipo}. Use {', '.join(sorted(TIPOS))}.")
+    if not isinstance(parametros, dict):
+        raise ParametrosInvalidos("Os parâmetros devem ser um objeto.")
+    validar = TIPOS[tipo][1]
+    return validar(parametros) if validar is not None else parametros
+
+
+def diretorio_de_resultados() -> Path:
+    return Path(settings.JOBS_RESULT_DIR)
+
+
+class Execucao:
+    """
+    Contexto passado às funções de tarefa: parâmetros, progresso e arquivo de resultado.
+    """
+    def __init__(self, tarefa):
+        self.tarefa = tarefa
+        self.parametros = tarefa.parametros
+        self.arquivo = ''
+        self._ultimo_progresso = 0.0
+
+    def progresso(self, fracao, mensagem=None):
+        """
+        Grava o progresso (0 a 1), no máximo uma vez por INTERVALO_PROGRESSO, renovando a reserva.
+        Levanta ReservaPerdida se a tarefa não estiver mais reservada para este worker.
+        """
+        agora = time.monotonic()
+        if agora - self._ultimo_progresso < INTERVALO_PROGRESSO:
+            return
+        self._ultimo_progresso = agora
+        campos = {"progresso": min(max(fracao, 0.0), 1.0),
+                  "expira_em": timezone.now() + timedelta(seconds=settings.JOBS_LEASE_SECONDS)}
+        if mensagem is not None:
+            campos["mensagem"] = mensagem
+        if not _reservada(self.tarefa).update(**campos):
+            raise ReservaPerdida(self.tarefa.pk)
+
+    def caminho(self, extensao) -> Path:
+        """
+        Retorna o caminho do arquivo de resultado da tarefa (criando o diretório).
+        """
+        diretorio = diretorio_de_resultados()
+        diretorio.mkdir(parents=True, exist_ok=True)
+        self.arquivo = f"tarefa-{self.tarefa.pk}.{extensao}"
+        return diretorio / self.arquivo
+
+
+def _reservada(tarefa):
+    return Tarefa.objects.filter(pk=tarefa.pk, status=Tarefa.EXECUTANDO, worker=tarefa.worker)
+
+
+def reservar(worker, candidatas=10):
+    """
+    Reserva a próxima tarefa disponível para `worker`. Retorna a tarefa ou None.
+    Entre workers concorrentes, o UPDATE condicional no status garante uma única reserva.
+    """
+    agora = timezone.now()
+    fila = (Tarefa.objects.filter(status=Tarefa.PENDENTE, disponivel_em__lte=agora)
+            .order_by('-prioridade', 'disponivel_em', 'id_tarefa').values_list('pk', flat=True))
+    for pk in fila[:candidatas]:
+        reservada = Tarefa.objects.filter(pk=pk, status=Tarefa.PENDENTE).update(
+            status=Tarefa.EXECUTANDO, worker=worker, tentativas=F('tentativas') + 1, iniciada_em=agora,
+            expira_em=agora + timedelta(seconds=settings.JOBS_LEASE_SECONDS))
+        if reservada:
+            return Tarefa.objects.get(pk=pk)
+    return None
+
+
+def executar(tarefa):
+    """
+    Executa a tarefa reservada e grava o desfecho. Retorna o status final.
+    """
+    inicio = time.monotonic()
+    execucao = Execucao(tarefa)
+    tipo = TIPOS.get(tarefa.tipo)
+    try:
+        if tipo is None:
+            raise ParametrosInvalidos(f"Tipo de tarefa desconhecido: {tarefa.tipo}.")
+        resultado = tipo[0](execucao)
+    except ReservaPerdida:
+        logger.warning("Reserva da tarefa %s perdida durante a execução", tarefa.pk)
+        _remover_arquivo(execucao.arquivo)
+        return Tarefa.PENDENTE
+    except Exception as e:
+        _remover_arquivo(execucao.arquivo)
+        return _falhar(tarefa, e)
+
+    elapsed = time.monotonic() - inicio
+    concluida = _reservada(tarefa).update(status=Tarefa.CONCLUIDA, progresso=1.0, resultado=resultado,
+                                          arquivo=execucao.arquivo, mensagem='', concluida_em=timezone.now(),
+                                          expira_em=None)
+    if not concluida:
+        logger.warning("Reserva da tarefa %s perdida antes da conclusão; resultado descartado", tarefa.pk)
+        _remover_arquivo(execucao.arquivo)
+        return Tarefa.PENDENTE
+    logger.info("Tarefa %s (%s) concluída | Tempo: %.3fs", tarefa.pk, tarefa.tipo, elapsed,
+                extra={"tarefa": tarefa.pk, "tipo": tarefa.tipo, "tempo": elapsed})
+    return Tarefa.CONCLUIDA
+
+
+def _falhar(tarefa, erro):
+    definitiva = isinstance(erro, ParametrosInvalidos) or tarefa.tentativas >= tarefa.max_tentativas
+    if definitiva:
+        _reservada(tarefa).update(status=Tarefa.FALHOU, mensagem=str(erro), concluida_em=timezone.now(),
+                                  expira_em=None)
+        logger.error("Tarefa %s (%s) falhou na tentativa %d: %s", tarefa.pk, tarefa.tipo, tarefa.tentativas, erro,
+                     exc_info=erro)
+        return Tarefa.FALHOU
+    espera = settings.JOBS_RETRY_BACKOFF * 2 ** (tarefa.tentativas - 1)
+    _reservada(tarefa).update(status=Tarefa.PENDENTE, mensagem=str(erro), worker='', expira_em=None,
+                              disponivel_em=timezone.now() + timedelta(seconds=espera))
+    logger.warning("Tarefa %s (%s) falhou na tentativa %d, repetindo em %ds: %s",
+                   tarefa.pk, tarefa.tipo, tarefa.tentativas, espera, erro)
+    return Tarefa.PENDENTE
+
+
+def _remover_arquivo(nome):
+    if nome:
+        (diretorio_de_resultados() / nome).unlink(missing_ok=True)
+
+
+def renovar_reservas(worker):
+    Tarefa.objects.filter(status=Tarefa.EXECUTANDO, worker=worker).update(
+        expira_em=timezone.now() + timedelta(seconds=settings.JOBS_LEASE_SECONDS))
+
+
+class RenovadorDeReservas(threading.Thread):
+    """
+    Renova as reservas do worker a cada `intervalo` segundos (padrão: um terço de
+    JOBS_LEASE_SECONDS), independentemente do laço que executa as tarefas.
+    """
+    def __init__(self, worker, intervalo=None):
+        super().__init__(name="tarefas-renovacao", daemon=True)
+        self.worker = worker
+        self.intervalo = intervalo if intervalo is not None else max(settings.JOBS_LEASE_SECONDS / 3, 1.0)
+        self._parar = threading.Event()
+
+    def run(self):
+        try:
+            while not self._parar.wait(self.intervalo):
+                try:
+                    renovar_reservas(self.worker)
+                except Exception:
+                    logger.exception("Falha ao renovar as reservas do worker %s", self.worker)
+        finally:
+            connection.close()
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+
+def liberar_expiradas() -> int:
+    """
+    Devolve à fila (ou dá como falhas, se esgotadas as tentativas) as tarefas com a reserva
+    expirada. Retorna a quantidade devolvida.
+    """
+    agora = timezone.now()
+    expiradas = Tarefa.objects.filter(status=Tarefa.EXECUTANDO, expira_em__lt=agora)
+    expiradas.filter(tentativas__gte=F('max_tentativas')).update(
+        status=Tarefa.FALHOU, mensagem="Reserva expirada: worker interrompido.", concluida_em=agora, expira_em=None)
+    devolvidas = expiradas.update(status=Tarefa.PENDENTE, mensagem="Reserva expirada: worker interrompido.",
+                                  worker='', expira_em=None, disponivel_em=agora)
+    if devolvidas:
+        logger.warning("%d tarefas com reserva expirada devolvidas à fila", devolvidas)
+    return devolvidas
+
+
+def remover_antigas(dias=None) -> int:
+    """
+    Remove as tarefas finalizadas há mais de `dias` (padrão JOBS_RETENTION_DAYS) e seus arquivos.
+    """
+    dias = settings.JOBS_RETENTION_DAYS if dias is None else dias
+    antigas = Tarefa.objects.filter(status__in=(Tarefa.CONCLUIDA, Tarefa.FALHOU),
+                                    concluida_em__lt=timezone.now() - timedelta(days=dias))
+    for nome in antigas.exclude(arquivo='').values_list('arquivo', flat=True):
+        _remover_arquivo(nome)
+    removidas, _ = antigas.delete()
+    return removidas
+
+
+# Tipos embutidos
+
+# recurso -> (model, colunas (cabeçalho, campo), filtros aceitos (parâmetro -> campo))
+EXPORTACOES = {
+    "produtores": (Produtor, (("cpf_cnpj", "cpf_cnpj"), ("tipo_documento", "tipo_documento"),
+                              ("nome_produtor", "nome_produtor")), {}),
+    "propriedades": (Propriedade, (("id_propriedade", "id_propriedade"), ("nome_propriedade", "nome_propriedade"),
+                                   ("area_total", "area_total"), ("area_agricultavel", "area_agricultavel"),
+                                   ("area_vegetacao", "area_vegetacao"), ("cidade", "cidade_id"),
+                                   ("estado", "estado_id"), ("produtor", "produtor__cpf_cnpj")),
+                     {"estado": "estado_id"}),
+    "culturas": (Cultura, (("id_cultura", "id_cultura"), ("ano_safra", "ano_safra"),
+                           ("tipo_cultura", "tipo_cultura_id"), ("propriedade", "propriedade_id"), ("area", "area")),
+                 {"estado": "propriedade__estado_id", "ano_safra": "ano_safra"}),
+}
+LOTE_EXPORTACAO = 5000
+
+
+def validar_exportacao(parametros) -> dict:
+    recurso = parametros.get("recurso")
+    if recurso not in EXPORTACOES:
+        raise ParametrosInvalidos(f"Informe o recurso: {', '.join(EXPORTACOES)}.")
+    filtros = EXPORTACOES[recurso][2]
+    normalizados = {"recurso": recurso}
+    for nome, valor in parametros.items():
+        if nome == "recurso":
+            continue
+        if nome not in filtros:
+            raise ParametrosInvalidos(f"Filtro não suportado para {recurso}: {nome}.")
+        if isinstance(valor, bool) or not isinstance(valor, int):
+            raise ParametrosInvalidos(f"O filtro {nome} deve ser um inteiro.")
+        normalizados[nome] = valor
+    return normalizados
+
+
+@registrar_tipo("exportar", validar_exportacao)
+def exportar(execucao):
+    """
+    Grava em CSV as linhas do recurso pedido, em lotes, registrando o progresso.
+    """
+    model, colunas, filtros = EXPORTACOES[execucao.parametros["recurso"]]
+    linhas = model.objects.filter(**{filtros[nome]: valor for nome, valor in execucao.parametros.items()
+                                     if nome in filtros})
+    total = linhas.count()
+    escritas = 0
+    with open(execucao.caminho("csv"), "w", newline="", encoding="utf-8") as arquivo:
+        writer = csv.writer(arquivo)
+        writer.writerow([cabecalho for cabecalho, _ in colunas])
+        for linha in linhas.order_by('pk').values_list(*[campo for _, campo in colunas]).iterator(
+                chunk_size=LOTE_EXPORTACAO):
+            writer.writerow(linha)
+            escritas += 1
+            if escritas % LOTE_EXPORTACAO == 0:
+                execucao.progresso(escritas / max(total, 1), f"{escritas} de {total} linhas")
+    return {"linhas": escritas}
+
+
+def validar_sem_parametros(parametros) -> dict:
+    if parametros:
+        raise ParametrosInvalidos("Este tipo de tarefa não aceita parâmetros.")
+    return {}
+
+
+@registrar_tipo("recalcular_resumos", validar_sem_parametros)
+def recalcular_resumos(execucao):
+    """
+    Reconstrói os totais mantidos por sinais (após bulk_create ou QuerySet.update em massa).
+    """
+    from .signals import invalidar_tabela
+
+    OcupacaoSafra.recalcular()
+    execucao.progresso(0.5, "Ocupação das safras recalculada")
+    ResumoProdutor.recalcular()
+    ResumoProdutorSafra.recalcular()
+    execucao.progresso(0.75, "Resumos dos produtores recalculados")
+    ResumoGeografico.recalcular()
+    invalidar_tabela(Propriedade)
+    invalidar_tabela(Cultura)
+    return {"ocupacoes": OcupacaoSafra.objects.count(), "resumos": ResumoProdutor.objects.count(),
+            "resumos_geograficos": ResumoGeografico.objects.count()}
+
+
+def validar_compactacao(parametros) -> dict:
+    dias = parametros.get("dias")
+    if set(parametros) - {"dias"} or (dias is not None and (isinstance(dias, bool) or not isinstance(dias, int)
+                                                            or dias < 0)):
+        raise ParametrosInvalidos("Aceita apenas `dias` (inteiro não negativo).")
+    return dict(parametros)
+
+
+@registrar_tipo("compactar_alteracoes", validar_compactacao)
+def compactar_alteracoes(execucao):
+    from .alteracoes import compactar
+
+    return compactar(execucao.parametros.get("dias"))
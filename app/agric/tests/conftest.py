@@ -0,0 +1,46 @@
+"""
+Plugin pytest local dos testes do app Agric.
+
+Fixtures:
+- query_budget: context manager que falha se o bloco ultrapassar o orçamento de queries
+  ou repetir o mesmo formato de query (N+1). Ver `agric.querycount`.
+- query_recorder: fábrica de `QueryRecorder` para inspecionar as queries de um bloco.
+- limpar_caches (autouse): zera o cache do Django e os caches em memória entre os testes,
+  já que o banco de testes é desfeito ao fim de cada teste.
+- cache_local_permitido (autouse): os testes rodam num único processo, então os comandos que
+  exigem um cache compartilhado (ver `agric.versioning`) aceitam o LocMemCache.
+"""
+import pytest
+from django.core.cache import cache
+
+from agric import analytics, refcache, reprcache
+from agric.querycount import QueryRecorder, query_budget as _query_budget
+
+
+@pytest.fixture(autouse=True)
+def limpar_caches():
+    cache.clear()
+    refcache.reset_all()
+    reprcache.representations.clear()
+    analytics.snapshot.reset()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def cache_local_permitido(settings):
+    settings.ALLOW_LOCAL_CACHE = True
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Uso:
+        with query_budget(2):
+            client.get("/api/propriedades/")
+    """
+    return _query_budget
+
+
+@pytest.fixture
+def query_recorder():
+    return QueryRecorder
@@ -0,0 +1,189 @@
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+from rest_framework.test import APIClient
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+from agric.alteracoes import compactar
+from agric.models import Estado, Cidade, Produtor, Propriedade, TipoCultura, Cultura, Alteracao
+from agric.querycount import QueryRecorder
+
+
+def log():
+    return list(Alteracao.objects.order_by("id_alteracao").values_list("modelo", "chave", "operacao"))
+
+
+# Sem a transação externa do teste: cada thread confirma (ou não) a sua.
+db_transacional = pytest.mark.django_db(transaction=True)
+
+
+@pytest.mark.django_db
+class TestLogDeAlteracoes:
+    def setup_method(self):
+        self.client = APIClient()
+        self.estado = Estado.objects.create(nome_estado="Goiás")
+        self.cidade = Cidade.objects.create(nome_cidade="Rio Verde", estado=self.estado)
+        self.produtor = Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF", nome_produtor="Ana")
+        self.propriedade = Propriedade.objects.create(
+            nome_propriedade="Fazenda", area_total=100.0, area_agricultavel=60.0, area_vegetacao=40.0,
+            cidade=self.cidade, produtor=self.produtor)
+        self.cultura = Cultura.objects.create(ano_safra=2024, tipo_cultura=TipoCultura.objects.create(tipo_cultura="Soja"),
+                                              propriedade=self.propriedade)
+
+    def test_criacao_atualizacao_exclusao(self):
+        Alteracao.objects.all().delete()
+        self.client.patch(reverse("produtor-detail", args=[self.produtor.cpf_cnpj]), {"nome_produtor": "Bia"},
+                          format="json")
+        self.client.delete(reverse("cultura-detail", args=[self.cultura.pk]))
+        assert log() == [("produtor", "52998224725", "U"), ("cultura", str(self.cultura.pk), "D")]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_exclusao_e_log_na_mesma_transacao(self, monkeypatch):
+        def falha(*args, **kwargs):
+            raise RuntimeError("log indisponível")
+
+        monkeypatch.setattr("agric.alteracoes.registrar", falha)
+        with pytest.raises(RuntimeError):
+            self.client.delete(reverse("cultura-detail", args=[self.cultura.pk]))
+        assert Cultura.objects.filter(pk=self.cultura.pk).exists()
+
+    def test_exclusao_em_cascata(self):
+        Alteracao.objects.all().delete()
+        pk = self.estado.pk
+        self.estado.delete()
+        assert set(log()) == {("estado", str(pk), "D"), ("cidade", str(self.cidade.pk), "D"),
+                              ("propriedade", str(self.propriedade.pk), "D"), ("cultura", str(self.cultura.pk), "D")}
+
+    def test_troca_de_documento(self):
+        Alteracao.objects.all().delete()
+        self.produtor.cpf_cnpj = "39053344705"
+        self.produtor.save()
+        assert set(log()) == {("produtor", "39053344705", "U"), ("produtor", "52998224725", "D"),
+                              ("propriedade", str(self.propriedade.pk), "U")}
+
+
+@pytest.mark.django_db
+class TestEndpointAlteracoes:
+    def setup_method(self):
+        self.client = APIClient()
+        self.url = reverse("alteracoes")
+        self.estado = Estado.objects.create(nome_estado="Goiás")
+
+    def test_sincronizacao_desde_o_inicio(self):
+        Cidade.objects.create(nome_cidade="Rio Verde", estado=self.estado)
+        response = self.client.get(self.url)
+        assert response.status_code == 200
+        assert response.data["mais"] is False
+        assert [(a["modelo"], a["operacao"]) for a in response.data["alteracoes"]] == [("estado", "C"), ("cidade", "C")]
+        assert response.data["alteracoes"][0]["dados"] == {"id_estado": self.estado.pk, "nome_estado": "Goiás"}
+        vazio = self.client.get(self.url, {"since": response.data["cursor"]})
+        assert vazio.data == {"cursor": response.data["cursor"], "mais": False, "alteracoes": []}
+
+    def test_objeto_uma_vez_por_pagina(self):
+        cursor = self.client.get(self.url).data["cursor"]
+        for nome in ("Goiânia", "Goiás Velho"):
+            self.estado.nome_estado = nome
+            self.estado.save()
+        alteracoes = self.client.get(self.url, {"since": cursor}).data["alteracoes"]
+        assert alteracoes == [{"modelo": "estado", "chave": str(self.estado.pk), "operacao": "U",
+                               "dados": {"id_estado": self.estado.pk, "nome_estado": "Goiás Velho"}}]
+
+    def test_excluido_depois_aparece_como_exclusao(self):
+        pk = self.estado.pk
+        self.estado.delete()
+        alteracoes = self.client.get(self.url).data["alteracoes"]
+        assert alteracoes == [{"modelo": "estado", "chave": str(pk), "operacao": "D", "dados": None}]
+
+    def test_paginacao(self):
+        for i in range(4):
+            TipoCultura.objects.create(tipo_cultura=f"Tipo {i}")
+        primeira = self.client.get(self.url, {"limit": 3}).data
+        assert primeira["mais"] is True
+        assert len(primeira["alteracoes"]) == 3
+        segunda = self.client.get(self.url, {"since": primeira["cursor"], "limit": 3}).data
+        assert segunda["mais"] is False
+        assert [a["dados"]["tipo_cultura"] for a in segunda["alteracoes"]] == ["Tipo 2", "Tipo 3"]
+
+    def test_consultas_por_model(self):
+        for i in range(5):
+            Cidade.objects.create(nome_cidade=f"Cidade {i}", estado=self.estado)
+        with QueryRecorder() as recorder:
+            self.client.get(self.url)
+        # Cursor mínimo, publicação, página do log, estados e cidades (mais o advisory lock no PostgreSQL).
+        assert recorder.count == (6 if connection.vendor == "postgresql" else 5)
+
+    def test_id_confirmado_depois_do_cursor(self):
+        # Um id reservado por uma transação longa e confirmado depois que ids maiores já foram
+        # entregues recebe uma sequência acima do cursor.
+        tipos = [TipoCultura.objects.create(tipo_cultura=nome) for nome in ("Soja", "Milho", "Café")]
+        atrasada = Alteracao.objects.get(modelo="tipocultura", chave=str(tipos[0].pk))
+        atrasada.delete()
+        cursor = self.client.get(self.url).data["cursor"]
+        Alteracao.objects.create(id_alteracao=atrasada.pk, modelo="tipocultura", chave=atrasada.chave,
+                                 operacao=Alteracao.CRIACAO)
+        alteracoes = self.client.get(self.url, {"since": cursor}).data["alteracoes"]
+        assert [a["dados"]["tipo_cultura"] for a in alteracoes] == ["Soja"]
+
+    @pytest.mark.skipif(connection.vendor != "postgresql", reason="SQLite serializa as escritas")
+    @db_transacional
+    def test_transacao_aberta_por_mais_de_dois_segundos(self):
+        aberta, liberar = threading.Event(), threading.Event()
+
+        def transacao_longa():
+            try:
+                with transaction.atomic():
+                    TipoCultura.objects.create(tipo_cultura="Soja")
+                    aberta.set()
+                    liberar.wait(10)
+            finally:
+                connection.close()
+
+        longa = threading.Thread(target=transacao_longa)
+        longa.start()
+        aberta.wait(10)
+        time.sleep(2.5)
+        TipoCultura.objects.create(tipo_cultura="Milho")
+        primeira = self.client.get(self.url).data
+        liberar.set()
+        longa.join()
+        segunda = self.client.get(self.url, {"since": primeira["cursor"]}).data
+        entregues = [a["dados"]["tipo_cultura"] for a in primeira["alteracoes"] + segunda["alteracoes"]
+                     if a["modelo"] == "tipocultura"]
+        assert sorted(entregues) == ["Milho", "Soja"]
+
+    def test_cursor_invalido(self):
+        assert self.client.get(self.url, {"since": "abc"}).status_code == 400
+
+    def test_cursor_expirado(self):
+        cursor = self.client.get(self.url).data["cursor"]
+        Alteracao.objects.update(criado_em=timezone.now() - timedelta(days=40))
+        TipoCultura.objects.create(tipo_cultura="Milho")
+        compactar(dias=30)
+        response = self.client.get(self.url, {"since": 0})
+        assert response.status_code == 410
+        assert response.data["cursor"] == Alteracao.objects.get().sequencia
+        assert self.client.get(self.url, {"since": cursor}).status_code == 200
+
+
+@pytest.mark.django_db
+class TestCompactacao:
+    def test_remove_alteracoes_superadas(self):
+        estado = Estado.objects.create(nome_estado="Pará")
+        for nome in ("Amapá", "Acre"):
+            estado.nome_estado = nome
+            estado.save()
+        outro = Estado.objects.create(nome_estado="Bahia")
+        resultado = compactar()
+        assert resultado == {"superadas": 2, "expiradas": 0, "cursor_minimo": 0}
+        assert log() == [("estado", str(estado.pk), "U"), ("estado", str(outro.pk), "C")]
+
+    def test_comando(self, capsys):
+        Estado.objects.create(nome_estado="Pará")
+        Alteracao.objects.update(criado_em=timezone.now() - timedelta(days=10))
+        call_command("compactar_alteracoes", "--dias", "7")
+        assert "1 expiradas" in capsys.readouterr().out
+        assert not Alteracao.objects.exists()
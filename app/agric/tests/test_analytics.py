@@ -0,0 +1,118 @@
+import pytest
+from rest_framework.test import APIClient
+from django.urls import reverse
+from agric.alteracoes import compactar
+from agric.analytics import snapshot
+from agric.models import Estado, Cidade, Produtor, Propriedade, TipoCultura, Cultura
+from agric.querycount import QueryRecorder
+
+
+@pytest.mark.django_db
+class TestAnalytics:
+    def setup_method(self):
+        self.client = APIClient()
+        self.url = reverse("analytics")
+        self.goias = Estado.objects.create(nome_estado="Goiás")
+        self.bahia = Estado.objects.create(nome_estado="Bahia")
+        self.rio_verde = Cidade.objects.create(nome_cidade="Rio Verde", estado=self.goias)
+        self.barreiras = Cidade.objects.create(nome_cidade="Barreiras", estado=self.bahia)
+        self.soja = TipoCultura.objects.create(tipo_cultura="Soja")
+        self.milho = TipoCultura.objects.create(tipo_cultura="Milho")
+        self.ana = Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF", nome_produtor="Ana")
+        self.coop = Produtor.objects.create(cpf_cnpj="11222333000181", tipo_documento="CNPJ", nome_produtor="Coop")
+        self.fazenda = self.propriedade("Fazenda A", self.rio_verde, self.ana)
+        self.outra = self.propriedade("Fazenda B", self.barreiras, self.ana)
+        self.terceira = self.propriedade("Fazenda C", self.barreiras, self.coop)
+        self.culturas = [
+            Cultura.objects.create(ano_safra=2024, tipo_cultura=self.soja, propriedade=self.fazenda, area=20.0),
+            Cultura.objects.create(ano_safra=2024, tipo_cultura=self.milho, propriedade=self.fazenda, area=10.0),
+            Cultura.objects.create(ano_safra=2025, tipo_cultura=self.soja, propriedade=self.outra, area=30.0),
+            Cultura.objects.create(ano_safra=2025, tipo_cultura=self.soja, propriedade=self.terceira, area=5.0),
+        ]
+
+    def propriedade(self, nome, cidade, produtor):
+        return Propriedade.objects.create(nome_propriedade=nome, area_total=100.0, area_agricultavel=60.0,
+                                          area_vegetacao=40.0, cidade=cidade, produtor=produtor)
+
+    def consultar(self, **params):
+        response = self.client.get(self.url, params)
+        assert response.status_code == 200
+        return response.data["linhas"]
+
+    def test_agrupamento_por_estado_e_safra(self):
+        linhas = self.consultar(dimensoes="estado,ano_safra", medidas="count,sum:area,mean:area")
+        assert linhas == [
+            {"estado": "Bahia", "ano_safra": 2025, "count": 2, "sum:area": 35.0, "mean:area": 17.5},
+            {"estado": "Goiás", "ano_safra": 2024, "count": 2, "sum:area": 30.0, "mean:area": 15.0},
+        ]
+
+    def test_sem_dimensoes(self):
+        assert self.consultar(fonte="propriedades", medidas="count,sum:area_total") == [
+            {"count": 3, "sum:area_total": 300.0}]
+
+    def test_produtores_distintos_por_tipo_de_documento(self):
+        linhas = self.consultar(fonte="propriedades", dimensoes="tipo_documento", medidas="count,distinct:produtor")
+        assert linhas == [{"tipo_documento": "CNPJ", "count": 1, "distinct:produtor": 1},
+                          {"tipo_documento": "CPF", "count": 2, "distinct:produtor": 1}]
+
+    def test_dimensoes_por_rotulo(self):
+        linhas = self.consultar(dimensoes="produtor,tipo_cultura", medidas="sum:area")
+        assert linhas == [
+            {"produtor": "11222333000181", "tipo_cultura": "Soja", "sum:area": 5.0},
+            {"produtor": "52998224725", "tipo_cultura": "Milho", "sum:area": 10.0},
+            {"produtor": "52998224725", "tipo_cultura": "Soja", "sum:area": 50.0},
+        ]
+
+    def test_consulta_repetida_sem_banco(self):
+        self.consultar(dimensoes="estado,tipo_cultura")
+        with QueryRecorder() as recorder:
+            self.consultar(dimensoes="cidade,tipo_cultura", medidas="mean:area")
+        assert recorder.count == 0
+
+    def test_atualizacao_incremental(self):
+        self.consultar()
+        cursor = snapshot.cursor
+        Cultura.objects.create(ano_safra=2025, tipo_cultura=self.milho, propriedade=self.fazenda, area=7.0)
+        self.culturas[0].area = 25.0
+        self.culturas[0].save()
+        self.culturas[3].delete()
+        construido_em = snapshot.construido_em
+        linhas = self.consultar(dimensoes="ano_safra", medidas="count,sum:area")
+        assert snapshot.construido_em == construido_em
+        assert snapshot.cursor > cursor
+        assert linhas == [{"ano_safra": 2024, "count": 2, "sum:area": 35.0},
+                          {"ano_safra": 2025, "count": 2, "sum:area": 37.0}]
+
+    def test_exclusao_de_propriedade_e_produtor(self):
+        self.consultar()
+        self.coop.delete()
+        self.outra.delete()
+        assert self.consultar(dimensoes="estado", medidas="count") == [{"estado": "Goiás", "count": 2}]
+
+    def test_cidade_muda_de_estado(self):
+        self.consultar()
+        self.barreiras.estado = self.goias
+        self.barreiras.save()
+        assert self.consultar(dimensoes="estado", medidas="sum:area") == [{"estado": "Goiás", "sum:area": 65.0}]
+
+    def test_reconstroi_com_cursor_expirado(self):
+        self.consultar()
+        construido_em = snapshot.construido_em
+        Cultura.objects.filter(pk=self.culturas[1].pk).update(area=1.0)
+        self.culturas[0].delete()
+        compactar(dias=-1)
+        linhas = self.consultar(medidas="sum:area")
+        assert snapshot.construido_em > construido_em
+        assert linhas == [{"sum:area": 36.0}]
+
+    @pytest.mark.parametrize("params", [
+        {"fonte": "produtores"},
+        {"fonte": "propriedades", "dimensoes": "ano_safra"},
+        {"dimensoes": "nome"},
+        {"medidas": "sum:nome"},
+        {"medidas": "count:area"},
+        {"medidas": "median:area"},
+        {"medidas": "sum"},
+    ])
+    def test_consulta_invalida(self, params):
+        assert self.client.get(self.url, params).status_code == 400
@@ -0,0 +1,99 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from rest_framework.test import APIClient
+from django.urls import reverse
+from django.utils.http import http_date
+from agric.models import Estado, Cidade, Produtor, Propriedade, TipoCultura, Cultura
+from agric.querycount import QueryRecorder
+
+
+@pytest.fixture
+def segundos_depois(monkeypatch):
+    """Relógio de agric.conditional adiantado: as escritas do setup ficam em um segundo já terminado."""
+    def adiantar(segundos=2):
+        agora = time.time_ns() + segundos * 1_000_000_000
+        monkeypatch.setattr("agric.conditional.time", SimpleNamespace(time_ns=lambda: agora))
+    return adiantar
+
+
+@pytest.mark.django_db
+class TestGetCondicional:
+    def setup_method(self):
+        self.client = APIClient()
+        self.estado = Estado.objects.create(nome_estado="Minas Gerais")
+        self.cidade = Cidade.objects.create(nome_cidade="Uberaba", estado=self.estado)
+        produtor = Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF", nome_produtor="João")
+        self.propriedade = Propriedade.objects.create(
+            nome_propriedade="Fazenda", area_total=100.0, area_agricultavel=60.0, area_vegetacao=40.0,
+            cidade=self.cidade, produtor=produtor)
+        Cultura.objects.create(ano_safra=2024, tipo_cultura=TipoCultura.objects.create(tipo_cultura="Soja"),
+                               propriedade=self.propriedade)
+
+    def test_lista_retorna_validadores(self, segundos_depois):
+        segundos_depois()
+        response = self.client.get(reverse("estado-list"))
+        assert response.status_code == 200
+        assert response["ETag"].startswith('W/"')
+        assert "Last-Modified" in response
+        assert "public" in response["Cache-Control"]
+        assert "max-age=" in response["Cache-Control"]
+
+    def test_if_none_match_retorna_304_sem_queries(self):
+        url = reverse("estado-list")
+        etag = self.client.get(url)["ETag"]
+        with QueryRecorder() as recorder:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response["ETag"] == etag
+        assert not response.content
+        assert recorder.count == 0
+
+    def test_escrita_invalida_etag(self):
+        url = reverse("cidade-detail", args=[self.cidade.pk])
+        etag = self.client.get(url)["ETag"]
+        self.client.patch(url, {"nome_cidade": "Uberlândia"}, format="json")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.data["nome_cidade"] == "Uberlândia"
+        assert response["ETag"] != etag
+
+    def test_etag_distinto_por_url(self):
+        lista = self.client.get(reverse("estado-list"))["ETag"]
+        detalhe = self.client.get(reverse("estado-detail", args=[self.estado.pk]))["ETag"]
+        assert lista != detalhe
+
+    def test_if_modified_since(self, segundos_depois):
+        segundos_depois()
+        url = reverse("propriedade-list")
+        last_modified = self.client.get(url)["Last-Modified"]
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 304
+
+    def test_sem_last_modified_no_segundo_da_escrita(self):
+        url = reverse("propriedade-list")
+        response = self.client.get(url)
+        assert "Last-Modified" not in response and response["ETag"]
+        # Um If-Modified-Since do mesmo segundo não vale: outra escrita nele não mudaria a data.
+        self.client.patch(reverse("propriedade-detail", args=[self.propriedade.pk]),
+                          {"nome_propriedade": "Sítio"}, format="json")
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time()))
+        assert response.status_code == 200
+        assert response.data[0]["nome_propriedade"] == "Sítio"
+
+    def test_recursos_privados_exigem_revalidacao(self):
+        response = self.client.get(reverse("propriedade-list"))
+        assert "private" in response["Cache-Control"]
+        assert "no-cache" in response["Cache-Control"]
+
+    def test_dashboard_condicional(self):
+        url = reverse("dashboard")
+        etag = self.client.get(url)["ETag"]
+        with QueryRecorder() as recorder:
+            assert self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        assert recorder.count == 0
+        Cultura.objects.create(ano_safra=2025, tipo_cultura=TipoCultura.objects.first(), propriedade=self.propriedade)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.data["culturas_plantadas"][0]["qtd"] == 2
@@ -0,0 +1,181 @@
+import io
+import threading
+from contextlib import ExitStack
+
+import pytest
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from agric.consultas_lentas import RegistroDeConsultasLentas, explicar, redigir, redigir_plano, registro
+from agric.models import Estado, Produtor
+from agric.querycount import QueryRecorder
+
+
+@pytest.fixture(autouse=True)
+def registro_vazio(monkeypatch):
+    # Desligado por padrão (SLOW_QUERY_LOG=0, SLOW_QUERY_EXPLAIN=0): os testes o ligam na conexão.
+    monkeypatch.setattr(registro, "explain", True)
+    registro.limpar()
+    with ExitStack() as pilha:
+        if registro not in connection.execute_wrappers:
+            pilha.enter_context(connection.execute_wrapper(registro))
+        yield
+    registro.limpar()
+
+
+def test_redigir():
+    assert redigir(None) is None
+    assert redigir([3, 2.5, None, True, "52998224725", b"x"]) == [3, 2.5, None, True, "<str>", "<bytes>"]
+    assert redigir([(1, "a"), (2, "b")]) == [[1, "<str>"], [2, "<str>"]]
+    assert redigir({"nome": "Ana", "id": 7}) == {"nome": "<str>", "id": 7}
+
+
+def test_redigir_plano():
+    plano = "Index Scan using produtor_cpf_cnpj_key on agric_produtor\n  Index Cond: ((cpf_cnpj)::text = '529''82'::text) AND id > 7"
+    assert redigir_plano(plano) == ("Index Scan using produtor_cpf_cnpj_key on agric_produtor\n"
+                                    "  Index Cond: ((cpf_cnpj)::text = '<str>'::text) AND id > 7")
+
+
+def test_explicar_redige_o_plano():
+    class Cursor:
+        def execute(self, sql, params=None):
+            self.sql = sql
+
+        def fetchall(self):
+            return [("Index Scan using produtor_cpf_cnpj_key on agric_produtor",),
+                    ("  Index Cond: ((cpf_cnpj)::text = '52998224725'::text)",)]
+
+        def close(self):
+            pass
+
+    class Conexao:
+        vendor = "postgresql"
+        in_atomic_block = False
+
+        def create_cursor(self):
+            return Cursor()
+
+    plano = explicar(Conexao(), "SELECT 1 FROM agric_produtor WHERE cpf_cnpj = %s", ["52998224725"])
+    assert "52998224725" not in plano and "'<str>'::text" in plano
+
+
+def test_limiar_trocado_so_no_contexto_corrente():
+    anel = RegistroDeConsultasLentas(limiar_ms=200.0)
+    vistos = []
+    with anel.limiar(0):
+        with anel.limiar(5):
+            assert anel.limiar_atual() == 5
+        assert anel.limiar_atual() == 0
+        outra = threading.Thread(target=lambda: vistos.append(anel.limiar_atual()))
+        outra.start()
+        outra.join()
+    assert vistos == [200.0]
+    assert anel.limiar_atual() == anel.limiar_ms == 200.0
+
+
+@pytest.mark.django_db
+class TestRegistro:
+    def test_consulta_acima_do_limiar(self):
+        with registro.limiar(0):
+            Produtor.objects.filter(cpf_cnpj="52998224725").first()
+        consulta, = registro.listar()["consultas"]
+        assert consulta["parametros"] == ["<str>"]
+        assert "52998224725" not in str(consulta)
+        assert consulta["origem"].startswith("agric/tests/test_consultas_lentas.py:")
+        assert consulta["rota"] is None
+        assert consulta["formato"].endswith('WHERE "produtor"."cpf_cnpj" = ? ORDER BY "produtor"."id_produtor" ASC '
+                                            'LIMIT ?')
+
+    def test_abaixo_do_limiar_nao_registra(self):
+        with registro.limiar(10_000):
+            Estado.objects.count()
+        assert registro.listar()["consultas"] == []
+
+    def test_um_plano_por_formato(self):
+        with registro.limiar(0):
+            Estado.objects.filter(nome_estado="Goiás").exists()
+            Estado.objects.filter(nome_estado="Bahia").exists()
+            # Dentro da transação do teste: o EXPLAIN roda sob um savepoint e não a afeta.
+            Estado.objects.create(nome_estado="Pará")
+        resultado = registro.listar()
+        assert len(resultado["consultas"]) >= 3
+        formatos = [consulta["formato"] for consulta in resultado["consultas"]]
+        assert len(resultado["planos"]) == len(set(formatos))
+        plano_select = next(plano for plano in resultado["planos"] if plano["formato"].startswith("SELECT"))
+        assert "estado" in plano_select["plano"]
+        assert Estado.objects.count() == 1
+
+    def test_anel_limitado(self):
+        anel = RegistroDeConsultasLentas(limiar_ms=0, tamanho=3)
+        with connection.execute_wrapper(anel):
+            for i in range(5):
+                Estado.objects.filter(pk__gt=i).values_list("pk", flat=True)[:i + 1].exists()
+                Produtor.objects.filter(pk=i).exists()
+        assert len(anel.consultas) == 3
+        assert len(anel.planos) <= 3
+
+    def test_explain_nao_conta_como_query(self):
+        client = APIClient()
+        url = reverse("estado-list")
+        client.get(url)
+        with QueryRecorder() as sem_registro:
+            client.get(url, {"x": 1})
+        with registro.limiar(0), QueryRecorder() as com_registro:
+            client.get(url, {"x": 2})
+        assert com_registro.count == sem_registro.count
+        assert registro.listar()["planos"]
+
+
+@pytest.mark.django_db
+class TestConsultasLentasEndpoint:
+    def setup_method(self):
+        self.client = APIClient()
+        self.url = reverse("consultas-lentas")
+
+    def test_somente_staff(self):
+        assert self.client.get(self.url).status_code in (401, 403)
+        self.client.force_authenticate(User.objects.create_user("ana", is_staff=False))
+        assert self.client.get(self.url).status_code == 403
+
+    def test_lista_filtra_e_limpa(self):
+        self.client.force_authenticate(User.objects.create_user("admin", is_staff=True))
+        Estado.objects.create(nome_estado="Goiás")
+        with registro.limiar(0):
+            self.client.get(reverse("estado-list"))
+            self.client.get(reverse("produtor-list"))
+        data = self.client.get(self.url, {"rota": "estado-list"}).data
+        assert data["consultas"] and {consulta["rota"] for consulta in data["consultas"]} == {"estado-list"}
+        assert data["planos"][0]["plano"]
+        assert len(self.client.get(self.url, {"limite": 1}).data["consultas"]) == 1
+        assert self.client.get(self.url, {"limite": 0}).status_code == 400
+        assert self.client.delete(self.url).status_code == 204
+        assert self.client.get(self.url).data["consultas"] == []
+
+
+@pytest.mark.django_db
+def test_comando():
+    Estado.objects.create(nome_estado="Goiás")
+    saida = io.StringIO()
+    call_command("consultas_lentas", reverse("estado-list"), stdout=saida)
+    texto = saida.getvalue()
+    assert "GET /api/estados/ -> 200" in texto
+    assert "Plano: SELECT" in texto
+    assert registro.limiar_ms > 0
+
+
+@pytest.mark.django_db
+def test_comando_com_o_log_desligado(monkeypatch):
+    # Como num processo com SLOW_QUERY_LOG=0 e SLOW_QUERY_EXPLAIN=0: o comando liga os dois só para si.
+    monkeypatch.setattr(registro, "explain", False)
+    posicao = connection.execute_wrappers.index(registro)
+    connection.execute_wrappers.remove(registro)
+    saida = io.StringIO()
+    try:
+        call_command("consultas_lentas", reverse("estado-list"), stdout=saida)
+        assert registro not in connection.execute_wrappers
+    finally:
+        connection.execute_wrappers.insert(posicao, registro)
+    assert "Plano: SELECT" in saida.getvalue()
+    assert registro.explain is False
@@ -0,0 +1,62 @@
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from rest_framework.test import APIClient
+from django.urls import reverse
+from agric.models import Estado, Cidade, Produtor, Propriedade
+
+
+@pytest.mark.django_db
+class TestEstadoDesnormalizado:
+    def setup_method(self):
+        self.client = APIClient()
+        self.mg = Estado.objects.create(nome_estado="Minas Gerais")
+        self.sp = Estado.objects.create(nome_estado="São Paulo")
+        self.uberaba = Cidade.objects.create(nome_cidade="Uberaba", estado=self.mg)
+        self.campinas = Cidade.objects.create(nome_cidade="Campinas", estado=self.sp)
+        self.produtor = Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF", nome_produtor="Ana")
+
+    def criar_propriedade(self, cidade, nome="Fazenda"):
+        return Propriedade.objects.create(nome_propriedade=nome, area_total=100.0, area_agricultavel=60.0,
+                                          area_vegetacao=40.0, cidade=cidade, produtor=self.produtor)
+
+    def test_preenchido_na_criacao_via_api(self):
+        response = self.client.post(reverse("propriedade-list"), {
+            "nome_propriedade": "Fazenda", "area_total": 10.0, "area_agricultavel": 5.0, "area_vegetacao": 5.0,
+            "cidade": self.campinas.pk, "produtor": self.produtor.cpf_cnpj}, format="json")
+        assert response.status_code == 201
+        assert Propriedade.objects.get(pk=response.data["id_propriedade"]).estado_id == self.sp.pk
+
+    def test_troca_de_cidade(self):
+        propriedade = self.criar_propriedade(self.uberaba)
+        response = self.client.patch(reverse("propriedade-detail", args=[propriedade.pk]),
+                                     {"cidade": self.campinas.pk}, format="json")
+        assert response.status_code == 200
+        propriedade.refresh_from_db()
+        assert propriedade.estado_id == self.sp.pk
+
+    def test_cidade_muda_de_estado(self):
+        propriedade = self.criar_propriedade(self.uberaba)
+        response = self.client.patch(reverse("cidade-detail", args=[self.uberaba.pk]),
+                                     {"estado": self.sp.pk}, format="json")
+        assert response.status_code == 200
+        propriedade.refresh_from_db()
+        assert propriedade.estado_id == self.sp.pk
+
+    def test_dashboard_agrupa_por_estado(self):
+        self.criar_propriedade(self.uberaba, "A")
+        self.criar_propriedade(self.uberaba, "B")
+        self.criar_propriedade(self.campinas, "C")
+        data = self.client.get(reverse("dashboard")).data["fazendas_por_estado"]
+        assert [(item["nome_estado"], item["qtd_fazendas"]) for item in data] == [("Minas Gerais", 2), ("São Paulo", 1)]
+
+    def test_comando_verifica_e_corrige(self, capsys):
+        propriedade = self.criar_propriedade(self.uberaba)
+        call_command("verificar_estado_propriedade")
+        Propriedade.objects.filter(pk=propriedade.pk).update(estado_id=self.sp.pk)
+        with pytest.raises(CommandError, match="1 propriedades"):
+            call_command("verificar_estado_propriedade")
+        call_command("verificar_estado_propriedade", "--fix")
+        propriedade.refresh_from_db()
+        assert propriedade.estado_id == self.mg.pk
+        assert "1 propriedades corrigidas" in capsys.readouterr().out
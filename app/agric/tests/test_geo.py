@@ -0,0 +1,152 @@
+import pytest
+from rest_framework.test import APIClient
+from django.urls import reverse
+from agric.models import Estado, Cidade, Produtor, Propriedade, TipoCultura, Cultura, ResumoGeografico
+from agric.querycount import QueryRecorder
+
+
+def resumos():
+    return {(r.estado_id, r.cidade_id, r.tipo_cultura_id): tuple(getattr(r, m) for m in ResumoGeografico.MEDIDAS)
+            for r in ResumoGeografico.objects.all()}
+
+
+def recalculados():
+    # Linhas zeradas pelas exclusões não são recriadas pelo recálculo.
+    esperado = {chave: valor for chave, valor in resumos().items() if any(valor)}
+    ResumoGeografico.recalcular()
+    return esperado == resumos()
+
+
+@pytest.mark.django_db
+class TestResumoGeografico:
+    def setup_method(self):
+        self.goias = Estado.objects.create(nome_estado="Goiás")
+        self.bahia = Estado.objects.create(nome_estado="Bahia")
+        self.rio_verde = Cidade.objects.create(nome_cidade="Rio Verde", estado=self.goias)
+        self.jatai = Cidade.objects.create(nome_cidade="Jataí", estado=self.goias)
+        self.barreiras = Cidade.objects.create(nome_cidade="Barreiras", estado=self.bahia)
+        self.produtor = Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF", nome_produtor="Ana")
+        self.soja = TipoCultura.objects.create(tipo_cultura="Soja")
+        self.milho = TipoCultura.objects.create(tipo_cultura="Milho")
+
+    def propriedade(self, cidade, area_total=100.0):
+        return Propriedade.objects.create(nome_propriedade="Fazenda", area_total=area_total,
+                                          area_agricultavel=area_total / 2, area_vegetacao=area_total / 4,
+                                          cidade=cidade, produtor=self.produtor)
+
+    def cultura(self, propriedade, tipo, area, ano_safra=2025):
+        return Cultura.objects.create(ano_safra=ano_safra, tipo_cultura=tipo, propriedade=propriedade, area=area)
+
+    def test_mantido_a_cada_escrita(self):
+        fazenda = self.propriedade(self.rio_verde)
+        self.propriedade(self.jatai, 40.0)
+        self.cultura(fazenda, self.soja, 20.0)
+        self.cultura(fazenda, self.milho, 10.0, 2024)
+        atual = resumos()
+        assert atual[(self.goias.pk, 0, 0)] == (2, 140.0, 70.0, 35.0, 2, 30.0)
+        assert atual[(self.goias.pk, self.rio_verde.pk, 0)] == (1, 100.0, 50.0, 25.0, 2, 30.0)
+        assert atual[(self.goias.pk, 0, self.soja.pk)][4:] == (1, 20.0)
+        fazenda = Propriedade.objects.get(pk=fazenda.pk)
+        fazenda.area_total = 200.0
+        fazenda.save()
+        assert resumos()[(self.goias.pk, 0, 0)][:2] == (2, 240.0)
+        assert recalculados()
+
+    def test_troca_de_cidade_leva_as_culturas(self):
+        fazenda = self.propriedade(self.rio_verde)
+        self.cultura(fazenda, self.soja, 20.0)
+        fazenda = Propriedade.objects.get(pk=fazenda.pk)
+        fazenda.cidade = self.barreiras
+        fazenda.save()
+        atual = resumos()
+        assert atual[(self.goias.pk, 0, 0)] == (0, 0.0, 0.0, 0.0, 0, 0.0)
+        assert atual[(self.bahia.pk, self.barreiras.pk, self.soja.pk)][4:] == (1, 20.0)
+        assert recalculados()
+
+    def test_exclusoes(self):
+        fazenda = self.propriedade(self.rio_verde)
+        self.cultura(fazenda, self.soja, 20.0)
+        outra = self.propriedade(self.barreiras)
+        self.cultura(outra, self.milho, 5.0)
+        Cultura.objects.filter(propriedade=outra).get().delete()
+        assert resumos()[(self.bahia.pk, 0, 0)][4:] == (0, 0.0)
+        fazenda.delete()
+        assert resumos()[(self.goias.pk, 0, 0)] == (0, 0.0, 0.0, 0.0, 0, 0.0)
+        assert recalculados()
+        self.milho.delete()
+        self.barreiras.delete()
+        assert not any(chave[1] == self.barreiras.pk or chave[2] == self.milho.pk for chave in resumos())
+
+    def test_cidade_muda_de_estado(self):
+        fazenda = self.propriedade(self.rio_verde)
+        self.cultura(fazenda, self.soja, 20.0)
+        self.rio_verde.estado = self.bahia
+        self.rio_verde.save()
+        atual = resumos()
+        assert atual[(self.bahia.pk, self.rio_verde.pk, 0)] == (1, 100.0, 50.0, 25.0, 1, 20.0)
+        assert not any(atual.get((self.goias.pk, 0, 0), ()))
+
+
+@pytest.mark.django_db
+class TestGeoEndpoint:
+    def setup_method(self):
+        self.client = APIClient()
+        self.goias = Estado.objects.create(nome_estado="Goiás")
+        self.bahia = Estado.objects.create(nome_estado="Bahia")
+        self.rio_verde = Cidade.objects.create(nome_cidade="Rio Verde", estado=self.goias)
+        self.jatai = Cidade.objects.create(nome_cidade="Jataí", estado=self.goias)
+        barreiras = Cidade.objects.create(nome_cidade="Barreiras", estado=self.bahia)
+        produtor = Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF", nome_produtor="Ana")
+        soja = TipoCultura.objects.create(tipo_cultura="Soja")
+        self.fazendas = []
+        for cidade, area in ((self.rio_verde, 100.0), (self.rio_verde, 300.0), (self.jatai, 200.0), (barreiras, 50.0)):
+            self.fazendas.append(Propriedade.objects.create(
+                nome_propriedade=f"Fazenda {area:.0f}", area_total=area, area_agricultavel=area / 2,
+                area_vegetacao=area / 2, cidade=cidade, produtor=produtor))
+        Cultura.objects.create(ano_safra=2025, tipo_cultura=soja, propriedade=self.fazendas[1], area=30.0)
+
+    def test_brasil_ate_a_propriedade(self):
+        data = self.client.get(reverse("geo")).data
+        assert (data["no"]["propriedades"], data["no"]["area_total"], data["no"]["area_plantada"]) == (4, 650.0, 30.0)
+        assert data["no"]["por_cultura"] == [{"tipo_cultura": "Soja", "culturas": 1, "area_plantada": 30.0}]
+        assert [filho["nome"] for filho in data["filhos"]] == ["Goiás", "Bahia"]
+
+        data = self.client.get(data["filhos"][0]["url"]).data
+        assert (data["no"]["nome"], data["no"]["area_total"]) == ("Goiás", 600.0)
+        assert [(filho["nome"], filho["area_total"]) for filho in data["filhos"]] == [("Rio Verde", 400.0),
+                                                                                     ("Jataí", 200.0)]
+        data = self.client.get(data["filhos"][0]["url"]).data
+        assert [filho["nome"] for filho in data["filhos"]] == ["Fazenda 300", "Fazenda 100"]
+
+        data = self.client.get(data["filhos"][0]["url"]).data
+        assert (data["no"]["nivel"], data["no"]["culturas"], data["filhos"]) == ("propriedade", 1, [])
+
+    def test_paginacao_dos_filhos(self):
+        url = reverse("geo-cidade", args=[self.rio_verde.pk])
+        data = self.client.get(url, {"limite": 1}).data
+        assert [filho["nome"] for filho in data["filhos"]] == ["Fazenda 300"]
+        data = self.client.get(data["proxima"]).data
+        assert [filho["nome"] for filho in data["filhos"]] == ["Fazenda 100"]
+        assert data["proxima"] is None
+        assert self.client.get(url, {"limite": 0}).status_code == 400
+
+    @pytest.mark.parametrize("rota", ["geo-estado", "geo-cidade", "geo-propriedade"])
+    def test_no_inexistente(self, rota):
+        assert self.client.get(reverse(rota, args=[999])).status_code == 404
+
+    @pytest.mark.parametrize("nivel", ["estado", "cidade"])
+    def test_duas_consultas_por_no(self, nivel):
+        pk = self.goias.pk if nivel == "estado" else self.rio_verde.pk
+        url = reverse(f"geo-{nivel}", args=[pk])
+        self.client.get(url)
+        with QueryRecorder() as recorder:
+            # Sem o validador: o nó é aberto de novo, com os nomes vindos do cache de referência.
+            assert self.client.get(url, {"offset": 0}).status_code == 200
+        assert recorder.count == 2
+
+    def test_304_enquanto_nada_muda(self):
+        url = reverse("geo-estado", args=[self.goias.pk])
+        etag = self.client.get(url)["ETag"]
+        assert self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        self.fazendas[0].delete()
+        assert self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
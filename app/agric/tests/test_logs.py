@@ -0,0 +1,69 @@
+import io
+import json
+import logging
+
+from agric.logs import AsyncQueueHandler, RouteSamplingFilter, parse_sampling, route_var, text_formatter
+from agric.views import _log
+
+
+def make_record(level=logging.INFO, msg="mensagem %s", args=("x",), **extra):
+    record = logging.LogRecord("agric.views", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_parse_sampling():
+    assert parse_sampling("estado-list=0.1, dashboard=0.5") == {"estado-list": 0.1, "dashboard": 0.5}
+    assert parse_sampling("") == {}
+
+
+def test_sampling_descarta_sucesso_e_mantem_erros():
+    sampling = RouteSamplingFilter(rates="estado-list=0")
+    token = route_var.set("estado-list")
+    try:
+        assert sampling.filter(make_record(logging.INFO)) is False
+        assert sampling.filter(make_record(logging.WARNING)) is True
+        assert sampling.filter(make_record(logging.ERROR)) is True
+    finally:
+        route_var.reset(token)
+    assert sampling.filter(make_record(logging.INFO)) is True
+
+
+def test_async_handler_escreve_json():
+    stream = io.StringIO()
+    handler = AsyncQueueHandler(maxsize=100, stream=stream)
+    token = route_var.set("dashboard")
+    try:
+        handler.handle(make_record(tempo=0.25))
+    finally:
+        route_var.reset(token)
+    handler.stop()
+    line = json.loads(stream.getvalue().strip())
+    assert line["event"] == "mensagem x"
+    assert line["level"] == "info"
+    assert line["route"] == "dashboard"
+    assert line["tempo"] == 0.25
+
+
+def test_async_handler_descarta_com_fila_cheia():
+    stream = io.StringIO()
+    handler = AsyncQueueHandler(maxsize=1, stream=stream, error_timeout=0)
+    handler.stop()
+    for _ in range(3):
+        handler.handle(make_record())
+    assert handler.dropped == 2
+
+
+def test_text_formatter_exibe_extras():
+    linha = text_formatter().format(make_record(msg="Ação concluída", args=(), view="CulturaViewSet", acao="create"))
+    assert "Ação concluída" in linha
+    assert "acao=create" in linha and "view=CulturaViewSet" in linha
+
+
+def test_views_registram_valores_so_nos_extras(caplog):
+    with caplog.at_level(logging.INFO, logger="agric.views"):
+        _log("CulturaViewSet", "create", 0.0, usuario="ana")
+    record = caplog.records[-1]
+    assert record.getMessage() == "Ação concluída"
+    assert (record.view, record.acao, record.usuario) == ("CulturaViewSet", "create", "ana")
+    assert record.tempo > 0
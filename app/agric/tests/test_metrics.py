@@ -0,0 +1,73 @@
+import pytest
+from rest_framework.test import APIClient
+from django.urls import reverse
+from agric.metrics import Histogram, MetricsRegistry, registry
+from agric.models import Estado, Cidade, Produtor, Propriedade
+
+
+def test_histogram_buckets_cumulativos():
+    hist = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 2.0):
+        hist.observe(value)
+    counts, total, count = hist.snapshot()
+    assert counts == [1, 2]
+    assert count == 3
+    assert total == pytest.approx(2.55)
+
+
+def test_registry_formato_prometheus():
+    reg = MetricsRegistry()
+    reg.inc("x_total", "Contador.", {"route": "a"})
+    reg.histogram("y_seconds", "Histograma.", {"route": "a"}, buckets=(1.0,)).observe(0.5)
+    text = reg.render()
+    assert '# TYPE x_total counter' in text
+    assert 'x_total{route="a"} 1' in text
+    assert 'y_seconds_bucket{route="a",le="1.0"} 1' in text
+    assert 'y_seconds_bucket{route="a",le="+Inf"} 1' in text
+    assert 'y_seconds_count{route="a"} 1' in text
+
+
+@pytest.mark.django_db
+class TestRequestMetrics:
+    def setup_method(self):
+        self.client = APIClient()
+        registry.clear()
+        estado = Estado.objects.create(nome_estado="Goiás")
+        cidade = Cidade.objects.create(nome_cidade="Goiânia", estado=estado)
+        produtor = Produtor.objects.create(cpf_cnpj="12345678909", tipo_documento="CPF", nome_produtor="Produtor")
+        Propriedade.objects.create(nome_propriedade="Fazenda", area_total=100.0, area_agricultavel=60.0,
+                                   area_vegetacao=40.0, cidade=cidade, produtor=produtor)
+
+    def test_server_timing_em_list(self):
+        response = self.client.get(reverse('estado-list'))
+        assert response.status_code == 200
+        header = response["Server-Timing"]
+        assert 'db;dur=' in header
+        assert 'desc="1 queries"' in header
+        assert 'render;dur=' in header
+        assert 'total;dur=' in header
+
+    def test_server_timing_no_dashboard(self):
+        response = self.client.get(reverse('dashboard'))
+        assert response.status_code == 200
+        assert 'app;dur=' in response["Server-Timing"]
+
+    def test_endpoint_metrics_por_rota(self):
+        self.client.get(reverse('estado-list'))
+        self.client.get(reverse('dashboard'))
+        response = self.client.get(reverse('metrics'))
+        assert response.status_code == 200
+        body = response.content.decode()
+        assert 'agric_request_duration_seconds_count{method="GET",route="estado-list"} 1' in body
+        assert 'agric_request_queries_bucket{method="GET",route="estado-list",le="1.0"} 1' in body
+        assert 'agric_requests_total{method="GET",route="dashboard",status="200"} 1' in body
+
+    def test_metrics_restrito(self, settings):
+        settings.METRICS_ALLOWED_IPS = ["10.0.0.0/8"]
+        settings.METRICS_TOKEN = "segredo"
+        url = reverse('metrics')
+        assert self.client.get(url).status_code == 403
+        assert self.client.get(url, HTTP_AUTHORIZATION="Bearer errado").status_code == 403
+        assert self.client.get(url, HTTP_AUTHORIZATION="Bearer segredo").status_code == 200
+        assert self.client.get(url, REMOTE_ADDR="10.1.2.3").status_code == 200
+        assert self.client.get(url, HTTP_X_FORWARDED_FOR="10.1.2.3").status_code == 403
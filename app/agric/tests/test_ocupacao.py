@@ -0,0 +1,129 @@
+import re
+
+import pytest
+from rest_framework.test import APIClient
+from django import forms
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+from agric.models import Estado, Cidade, Produtor, Propriedade, TipoCultura, Cultura, OcupacaoSafra
+from agric.querycount import QueryRecorder
+
+# Sem a transação externa do teste: a recusa desfaz a escrita como numa requisição real.
+db_transacional = pytest.mark.django_db(transaction=True)
+
+
+def ocupacao(propriedade, ano_safra):
+    return OcupacaoSafra.objects.get(propriedade=propriedade, ano_safra=ano_safra).area_plantada
+
+
+@pytest.mark.django_db
+class TestOcupacaoSafra:
+    def setup_method(self):
+        self.client = APIClient()
+        estado = Estado.objects.create(nome_estado="Mato Grosso")
+        cidade = Cidade.objects.create(nome_cidade="Sorriso", estado=estado)
+        produtor = Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF", nome_produtor="Ana")
+        self.propriedade = Propriedade.objects.create(
+            nome_propriedade="Fazenda", area_total=100.0, area_agricultavel=60.0, area_vegetacao=40.0,
+            cidade=cidade, produtor=produtor)
+        self.tipos = [TipoCultura.objects.create(tipo_cultura=nome) for nome in ("Soja", "Milho", "Algodão")]
+        self.url = reverse("cultura-list")
+
+    def payload(self, tipo, area, ano_safra=2025):
+        return {"ano_safra": ano_safra, "tipo_cultura": tipo.pk, "propriedade": self.propriedade.pk, "area": area}
+
+    def test_total_mantido_por_safra(self):
+        assert self.client.post(self.url, self.payload(self.tipos[0], 40.0), format="json").status_code == 201
+        assert self.client.post(self.url, self.payload(self.tipos[1], 20.0), format="json").status_code == 201
+        assert self.client.post(self.url, self.payload(self.tipos[0], 60.0, 2026), format="json").status_code == 201
+        assert ocupacao(self.propriedade, 2025) == 60.0
+        assert ocupacao(self.propriedade, 2026) == 60.0
+
+    @db_transacional
+    def test_rejeita_area_acima_da_capacidade(self):
+        self.client.post(self.url, self.payload(self.tipos[0], 50.0), format="json")
+        response = self.client.post(self.url, self.payload(self.tipos[1], 10.5), format="json")
+        assert response.status_code == 400
+        assert "area" in response.data
+        assert Cultura.objects.count() == 1
+        assert ocupacao(self.propriedade, 2025) == 50.0
+
+    def test_reserva_sem_reagregar(self):
+        for tipo in self.tipos[:2]:
+            Cultura.objects.create(ano_safra=2025, tipo_cultura=tipo, propriedade=self.propriedade, area=10.0)
+        with QueryRecorder() as recorder:
+            Cultura.objects.create(ano_safra=2025, tipo_cultura=self.tipos[2], propriedade=self.propriedade, area=10.0)
+        # Nenhuma agregação nem leitura de cultura ("resumo_*" contém "SUM", daí a busca por função).
+        assert not [q["sql"] for q in recorder.queries
+                    if re.search(r'\b(SUM|COUNT|AVG|MAX|MIN)\s*\(|FROM "cultura"', q["sql"], re.IGNORECASE)]
+        assert ocupacao(self.propriedade, 2025) == 30.0
+
+    @db_transacional
+    def test_atualizacao_e_exclusao(self):
+        cultura = Cultura.objects.create(ano_safra=2025, tipo_cultura=self.tipos[0], propriedade=self.propriedade,
+                                         area=30.0)
+        detail = reverse("cultura-detail", args=[cultura.pk])
+        assert self.client.patch(detail, {"area": 50.0}, format="json").status_code == 200
+        assert ocupacao(self.propriedade, 2025) == 50.0
+        assert self.client.patch(detail, {"area": 70.0}, format="json").status_code == 400
+        assert self.client.patch(detail, {"ano_safra": 2026}, format="json").status_code == 200
+        assert (ocupacao(self.propriedade, 2025), ocupacao(self.propriedade, 2026)) == (0.0, 50.0)
+        assert self.client.delete(detail).status_code == 204
+        assert ocupacao(self.propriedade, 2026) == 0.0
+
+    @db_transacional
+    def test_area_agricultavel_nao_fica_abaixo_do_plantado(self):
+        Cultura.objects.create(ano_safra=2025, tipo_cultura=self.tipos[0], propriedade=self.propriedade, area=45.0)
+        detail = reverse("propriedade-detail", args=[self.propriedade.pk])
+        response = self.client.patch(detail, {"area_agricultavel": 40.0}, format="json")
+        assert response.status_code == 400
+        assert "area_agricultavel" in response.data
+        assert self.client.patch(detail, {"area_agricultavel": 45.0}, format="json").status_code == 200
+
+    def test_model_levanta_validation_error(self):
+        with pytest.raises(ValidationError):
+            Cultura.objects.create(ano_safra=2025, tipo_cultura=self.tipos[0], propriedade=self.propriedade,
+                                   area=61.0)
+
+    def test_clean_para_formularios(self):
+        class CulturaForm(forms.ModelForm):
+            class Meta:
+                model = Cultura
+                fields = ["ano_safra", "tipo_cultura", "propriedade", "area"]
+
+        cultura = Cultura.objects.create(ano_safra=2025, tipo_cultura=self.tipos[0], propriedade=self.propriedade,
+                                         area=50.0)
+        dados = {"ano_safra": 2025, "tipo_cultura": self.tipos[1].pk, "propriedade": self.propriedade.pk}
+        form = CulturaForm({**dados, "area": 10.5})
+        assert not form.is_valid() and "area" in form.errors
+        assert CulturaForm({**dados, "area": 10.0}).is_valid()
+        # A área da própria cultura já está reservada: só a diferença conta.
+        dados["tipo_cultura"] = self.tipos[0].pk
+        assert CulturaForm({**dados, "area": 60.0}, instance=cultura).is_valid()
+        assert not CulturaForm({**dados, "area": 60.5}, instance=cultura).is_valid()
+
+    def test_reserva_e_reducao_travam_a_propriedade(self, monkeypatch):
+        ordem = []
+        travar = OcupacaoSafra.travar_propriedade
+        monkeypatch.setattr(OcupacaoSafra, "travar_propriedade",
+                            staticmethod(lambda pk: (ordem.append(("trava", pk)), travar(pk))))
+        with QueryRecorder() as recorder:
+            Cultura.objects.create(ano_safra=2030, tipo_cultura=self.tipos[0], propriedade=self.propriedade,
+                                   area=10.0)
+        upsert = next(i for i, q in enumerate(recorder.queries) if q["sql"].startswith('INSERT INTO "ocupacao_safra"'))
+        assert recorder.queries[upsert - 1]["sql"].startswith('SELECT "propriedade"."id_propriedade"')
+        OcupacaoSafra.verificar_capacidade(self.propriedade.pk, 50.0)
+        assert ordem == [("trava", self.propriedade.pk)] * 2
+
+    def test_recalcular(self):
+        Cultura.objects.bulk_create([
+            Cultura(ano_safra=2025, tipo_cultura=tipo, propriedade=self.propriedade, area=15.0) for tipo in self.tipos])
+        OcupacaoSafra.recalcular([self.propriedade.pk])
+        assert ocupacao(self.propriedade, 2025) == 45.0
+
+    def test_dashboard_expoe_area_plantada(self):
+        Cultura.objects.create(ano_safra=2025, tipo_cultura=self.tipos[0], propriedade=self.propriedade, area=25.0)
+        Cultura.objects.create(ano_safra=2026, tipo_cultura=self.tipos[0], propriedade=self.propriedade, area=5.0)
+        data = self.client.get(reverse("dashboard")).data
+        assert data["culturas_plantadas"] == [{"tipo_cultura": "Soja", "qtd": 2, "area": 30.0}]
+        assert data["uso_do_solo"]["total_plantado"] == 30.0
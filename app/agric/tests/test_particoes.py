@@ -0,0 +1,54 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from rest_framework.test import APIClient
+from django.urls import reverse
+from agric import particoes
+from agric.models import Estado, Cidade, Produtor, Propriedade, TipoCultura, Cultura
+
+
+def test_ddl_particao_por_faixa_de_ano():
+    assert particoes.ddl_particao(2025) == (
+        'CREATE TABLE IF NOT EXISTS "cultura_2025" PARTITION OF "cultura" FOR VALUES FROM (2025) TO (2026)')
+
+
+def test_tabela_particionada_mantem_unicidade_com_chave_de_particao():
+    ddl = "\n".join(particoes.ddl_tabela_particionada())
+    assert 'PARTITION BY RANGE ("ano_safra")' in ddl
+    assert 'PRIMARY KEY ("id_cultura", "ano_safra")' in ddl
+    assert 'UNIQUE ("ano_safra", "tipo_cultura_id", "propriedade_id")' in ddl
+    assert 'PARTITION OF "cultura" DEFAULT' in ddl
+
+
+def test_sqlite_usa_tabela_comum(settings):
+    settings.CULTURA_PARTITIONING = True
+    assert connection.vendor != "postgresql" and not particoes.suportado(connection)
+
+
+@pytest.mark.django_db
+def test_comando_sem_particionamento(capsys):
+    call_command("cultura_particoes", "--proximas", "2")
+    assert "tabela comum" in capsys.readouterr().out
+
+
+@pytest.mark.django_db
+class TestFiltroAnoSafra:
+    def setup_method(self):
+        self.client = APIClient()
+        estado = Estado.objects.create(nome_estado="Paraná")
+        cidade = Cidade.objects.create(nome_cidade="Cascavel", estado=estado)
+        produtor = Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF", nome_produtor="Ana")
+        propriedade = Propriedade.objects.create(nome_propriedade="Fazenda", area_total=10.0, area_agricultavel=5.0,
+                                                 area_vegetacao=5.0, cidade=cidade, produtor=produtor)
+        tipo = TipoCultura.objects.create(tipo_cultura="Soja")
+        for ano in (2023, 2024, 2025):
+            Cultura.objects.create(ano_safra=ano, tipo_cultura=tipo, propriedade=propriedade)
+
+    def test_filtra_uma_safra(self):
+        response = self.client.get(reverse("cultura-list"), {"ano_safra": 2024})
+        assert response.status_code == 200
+        assert [c["ano_safra"] for c in response.data] == [2024]
+
+    def test_ano_invalido(self):
+        response = self.client.get(reverse("cultura-list"), {"ano_safra": "abc"})
+        assert response.status_code == 400
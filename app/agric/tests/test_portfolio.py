@@ -0,0 +1,59 @@
+import pytest
+from rest_framework.test import APIClient
+from django.urls import reverse
+from agric.models import Estado, Cidade, Produtor, Propriedade, TipoCultura, Cultura
+from agric.querycount import QueryRecorder
+
+
+@pytest.mark.django_db
+class TestPortfolio:
+    def setup_method(self):
+        self.client = APIClient()
+        goias = Estado.objects.create(nome_estado="Goiás")
+        bahia = Estado.objects.create(nome_estado="Bahia")
+        rio_verde = Cidade.objects.create(nome_cidade="Rio Verde", estado=goias)
+        barreiras = Cidade.objects.create(nome_cidade="Barreiras", estado=bahia)
+        self.produtor = Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF",
+                                                nome_produtor="Ana")
+        outro = Produtor.objects.create(cpf_cnpj="39053344705", tipo_documento="CPF", nome_produtor="Bia")
+        soja = TipoCultura.objects.create(tipo_cultura="Soja")
+        milho = TipoCultura.objects.create(tipo_cultura="Milho")
+        for i, (cidade, produtor) in enumerate([(rio_verde, self.produtor), (barreiras, self.produtor),
+                                                (rio_verde, outro)]):
+            propriedade = Propriedade.objects.create(
+                nome_propriedade=f"Fazenda {i}", area_total=100.0 * (i + 1), area_agricultavel=50.0,
+                area_vegetacao=10.0, cidade=cidade, produtor=produtor)
+            Cultura.objects.create(ano_safra=2024, tipo_cultura=soja, propriedade=propriedade, area=10.0)
+            Cultura.objects.create(ano_safra=2025, tipo_cultura=milho, propriedade=propriedade, area=20.0)
+        self.url = reverse("produtor-portfolio", args=[self.produtor.cpf_cnpj])
+
+    def test_portfolio_completo(self):
+        response = self.client.get(self.url)
+        assert response.status_code == 200
+        data = response.data
+        assert data["nome_produtor"] == "Ana"
+        assert data["totais"] == {"propriedades": 2, "area_total": 300.0, "area_agricultavel": 100.0,
+                                  "culturas": 4, "area_plantada": 60.0}
+        assert [(p["nome_propriedade"], p["nome_cidade"], p["nome_estado"]) for p in data["propriedades"]] == [
+            ("Fazenda 1", "Barreiras", "Bahia"), ("Fazenda 0", "Rio Verde", "Goiás")]
+        assert [(c["ano_safra"], c["nome_tipo_cultura"]) for c in data["propriedades"][0]["culturas"]] == [
+            (2025, "Milho"), (2024, "Soja")]
+
+    def test_filtro_por_safra(self):
+        data = self.client.get(self.url, {"ano_safra": 2024}).data
+        assert all([c["ano_safra"] for c in p["culturas"]] == [2024] for p in data["propriedades"])
+        # Os totais continuam sendo os do produtor.
+        assert data["totais"]["culturas"] == 4
+
+    def test_consultas_fixas(self):
+        self.client.get(self.url)
+        with QueryRecorder() as recorder:
+            self.client.get(self.url, {"ano_safra": 2025})
+        assert recorder.count == 4
+
+    def test_produtor_inexistente_e_304(self):
+        assert self.client.get(reverse("produtor-portfolio", args=["11144477735"])).status_code == 404
+        etag = self.client.get(self.url)["ETag"]
+        assert self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        Cultura.objects.first().delete()
+        assert self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code == 200
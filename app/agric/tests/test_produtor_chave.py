@@ -0,0 +1,81 @@
+import pytest
+from rest_framework.test import APIClient
+from django.urls import reverse
+from agric.models import Estado, Cidade, Produtor, Propriedade
+from agric.querycount import QueryRecorder
+
+
+@pytest.mark.django_db
+class TestChaveSubstitutaProdutor:
+    def setup_method(self):
+        self.client = APIClient()
+        estado = Estado.objects.create(nome_estado="Goiás")
+        self.cidade = Cidade.objects.create(nome_cidade="Jataí", estado=estado)
+        self.produtor = Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF", nome_produtor="Ana")
+
+    def test_chave_inteira_e_documento_unico(self):
+        assert isinstance(self.produtor.pk, int)
+        response = self.client.post(reverse("produtor-list"), {"cpf_cnpj": "52998224725", "nome_produtor": "Outra"},
+                                    format="json")
+        assert response.status_code == 400
+        assert "cpf_cnpj" in response.data
+
+    def test_propriedade_referencia_produtor_pelo_documento(self):
+        response = self.client.post(reverse("propriedade-list"), {
+            "nome_propriedade": "Fazenda", "area_total": 10.0, "area_agricultavel": 5.0, "area_vegetacao": 5.0,
+            "cidade": self.cidade.pk, "produtor": "52998224725"}, format="json")
+        assert response.status_code == 201
+        assert response.data["produtor"] == "52998224725"
+        assert Propriedade.objects.get(pk=response.data["id_propriedade"]).produtor_id == self.produtor.pk
+
+    def test_documento_inexistente(self):
+        response = self.client.post(reverse("propriedade-list"), {
+            "nome_propriedade": "Fazenda", "area_total": 10.0, "area_agricultavel": 5.0, "area_vegetacao": 5.0,
+            "cidade": self.cidade.pk, "produtor": "39053344705"}, format="json")
+        assert response.status_code == 400
+        assert "produtor" in response.data
+
+    def test_troca_de_documento_preserva_propriedades(self):
+        propriedade = Propriedade.objects.create(nome_propriedade="Fazenda", area_total=10.0, area_agricultavel=5.0,
+                                                 area_vegetacao=5.0, cidade=self.cidade, produtor=self.produtor)
+        antigo = reverse("produtor-detail", args=["52998224725"])
+        assert self.client.get(antigo).status_code == 200
+        self.client.get(reverse("propriedade-detail", args=[propriedade.pk]))
+        response = self.client.patch(antigo, {"cpf_cnpj": "39053344705"}, format="json")
+        assert response.status_code == 200
+        assert self.client.get(antigo).status_code == 404
+        assert self.client.get(reverse("produtor-detail", args=["39053344705"])).status_code == 200
+        detalhe = self.client.get(reverse("propriedade-detail", args=[propriedade.pk]))
+        assert detalhe.data["produtor"] == "39053344705"
+
+
+@pytest.mark.django_db
+class TestValidacaoUnicaDoDocumento:
+    def setup_method(self):
+        self.client = APIClient()
+        Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF", nome_produtor="Ana")
+
+    def test_documento_com_mascara_normalizado_antes_da_unicidade(self):
+        response = self.client.post(reverse("produtor-list"), {"cpf_cnpj": "529.982.247-25", "nome_produtor": "Bia"},
+                                    format="json")
+        assert response.status_code == 400
+        assert "cpf_cnpj" in response.data
+        response = self.client.post(reverse("produtor-list"), {"cpf_cnpj": "390.533.447-05", "nome_produtor": "Bia"},
+                                    format="json")
+        assert (response.status_code, response.data["cpf_cnpj"]) == (201, "39053344705")
+
+    def test_digito_verificador_invalido_e_400(self):
+        response = self.client.post(reverse("produtor-list"), {"cpf_cnpj": "39053344700", "nome_produtor": "Bia"},
+                                    format="json")
+        assert response.status_code == 400
+        assert response.data["cpf_cnpj"] == ["CPF inválido"]
+
+    def test_save_validado_nao_repete_a_validacao(self):
+        produtor = Produtor(cpf_cnpj="39053344705", tipo_documento="CPF", nome_produtor="Bia")
+        with QueryRecorder() as recorder:
+            produtor.save(validado=True)
+        assert [consulta["sql"].split()[0] for consulta in recorder.queries] == ["INSERT", "INSERT"]
+        # Sem a marca, o model valida: o documento com máscara é normalizado e conferido.
+        produtor = Produtor(cpf_cnpj="111.444.777-35", tipo_documento="", nome_produtor="Caio")
+        produtor.full_clean(validate_constraints=False, exclude=['tipo_documento'])
+        assert (produtor.cpf_cnpj, produtor.tipo_documento) == ("11144477735", "CPF")
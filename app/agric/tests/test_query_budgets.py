@@ -0,0 +1,295 @@
+"""
+Orçamentos de queries por endpoint.
+
+Cada ação de cada viewset do roteador (inclusive as extras, como o portfólio do produtor) e o
+DashboardView têm um orçamento declarado em QUERY_BUDGETS; uma ação sem orçamento falha o teste.
+Os endpoints de leitura são exercitados com bases de tamanhos diferentes: o número de queries
+não pode crescer com a quantidade de linhas (O(1)) nem repetir o mesmo formato de query (N+1).
+"""
+import io
+
+import pytest
+from rest_framework.test import APIClient
+from django.core.management import call_command
+from django.urls import reverse
+from agric.models import Estado, Cidade, Produtor, Propriedade, TipoCultura, Cultura
+from agric import refcache
+from agric.urls import router
+from agric.querycount import QueryBudgetExceeded, query_budget as _query_budget
+
+
+CPFS = ["12345678909", "98765432100", "11144477735", "52998224725", "39053344705",
+        "15350946056", "74682489070", "21403579814", "28625587887", "87748248800"]
+
+# (rota, ação) -> (máximo de queries, máximo de repetições do mesmo formato)
+# Toda escrita inclui o INSERT da linha no log de alterações (ver agric.alteracoes).
+QUERY_BUDGETS = {
+    ("produtor", "list"): (1, 1),
+    ("produtor", "retrieve"): (1, 1),
+    # Unicidade do documento checada uma única vez, pelo serializer (o model não repete full_clean()).
+    ("produtor", "create"): (3, 1),
+    ("produtor", "update"): (3, 1),
+    ("produtor", "partial_update"): (3, 1),
+    # Mais os DELETEs em cascata dos resumos do produtor (ver ResumoProdutor e ResumoProdutorSafra).
+    ("produtor", "destroy"): (6, 1),
+    # Produtor, resumos, propriedades e culturas (Prefetch); nomes do cache de referência.
+    ("produtor", "portfolio"): (4, 1),
+    ("estado", "list"): (1, 1),
+    ("estado", "retrieve"): (1, 1),
+    ("estado", "create"): (3, 1),
+    # Objeto, unicidade do nome, UPDATE e log.
+    ("estado", "update"): (4, 1),
+    ("estado", "partial_update"): (4, 1),
+    # Mais a coleta das cidades e propriedades em cascata e os DELETEs dos resumos do estado.
+    ("estado", "destroy"): (8, 1),
+    ("cidade", "list"): (1, 1),
+    ("cidade", "retrieve"): (1, 1),
+    ("cidade", "create"): (3, 1),
+    # O estado vem no JOIN do objeto (lido pelo validador de unicidade).
+    ("cidade", "update"): (4, 1),
+    ("cidade", "partial_update"): (4, 1),
+    ("cidade", "destroy"): (5, 1),
+    ("tipocultura", "list"): (1, 1),
+    ("tipocultura", "retrieve"): (1, 1),
+    ("tipocultura", "create"): (3, 1),
+    ("tipocultura", "update"): (4, 1),
+    ("tipocultura", "partial_update"): (4, 1),
+    ("tipocultura", "destroy"): (5, 1),
+    ("propriedade", "list"): (1, 1),
+    ("propriedade", "retrieve"): (1, 1),
+    # Mais os upserts do resumo do produtor e do resumo geográfico (ver ResumoProdutor e ResumoGeografico).
+    ("propriedade", "create"): (5, 1),
+    ("propriedade", "update"): (4, 1),
+    ("propriedade", "partial_update"): (3, 1),
+    # Propriedade sem culturas: coleta, ocupações, DELETE, log e os ajustes dos dois resumos.
+    ("propriedade", "destroy"): (7, 1),
+    ("cultura", "list"): (1, 1),
+    ("cultura", "retrieve"): (1, 1),
+    # Mais a trava da propriedade e o upsert condicional do total plantado na safra (ver
+    # OcupacaoSafra) e os upserts dos resumos do produtor, da safra e geográfico.
+    ("cultura", "create"): (9, 1),
+    # Tipo e propriedade vêm no JOIN do objeto; mais a reserva da diferença de área e os resumos.
+    ("cultura", "update"): (9, 1),
+    ("cultura", "partial_update"): (8, 1),
+    # Mais os ajustes dos resumos do produtor, da safra e geográfico.
+    ("cultura", "destroy"): (6, 1),
+    # Operações de conjunto (ver agric.safras): não cresce com o número de culturas clonadas.
+    # Contagens, INSERT ... SELECT, ocupações, regiões das propriedades, um upsert por resumo e o
+    # log; inclui a trava das propriedades (só no PostgreSQL).
+    ("cultura", "clonar_safra"): (10, 1),
+    ("tarefa", "create"): (1, 1),
+    ("tarefa", "retrieve"): (1, 1),
+    ("tarefa", "download"): (1, 1),
+    ("dashboard", "get"): (5, 1),
+}
+
+ACOES_PADRAO = ("list", "retrieve", "create", "update", "partial_update", "destroy")
+
+
+def criar_dataset(tamanho):
+    """
+    Cria `tamanho` propriedades (com uma cultura cada) distribuídas entre estados, cidades e produtores.
+    """
+    estados = [Estado.objects.create(nome_estado=f"Estado {i}") for i in range(2)]
+    cidades = [Cidade.objects.create(nome_cidade=f"Cidade {i}", estado=estados[i % 2]) for i in range(4)]
+    produtores = [Produtor.objects.create(cpf_cnpj=cpf, tipo_documento="CPF", nome_produtor=f"Produtor {i}")
+                  for i, cpf in enumerate(CPFS[:min(tamanho, len(CPFS))])]
+    tipos = [TipoCultura.objects.create(tipo_cultura=nome) for nome in ("Soja", "Milho")]
+    for i in range(tamanho):
+        prop = Propriedade.objects.create(
+            nome_propriedade=f"Fazenda {i}", area_total=100.0, area_agricultavel=60.0, area_vegetacao=40.0,
+            cidade=cidades[i % len(cidades)], produtor=produtores[i % len(produtores)])
+        Cultura.objects.create(ano_safra=2024, tipo_cultura=tipos[i % 2], propriedade=prop)
+
+
+def aquecer_caches():
+    """
+    Os orçamentos valem em regime: caches de referência já carregados (ver agric.refcache).
+    """
+    refcache.reset_all()
+    [reference_cache.all() for reference_cache in refcache.CACHES.values()]
+
+
+def detail_urls():
+    return {
+        "produtor": reverse("produtor-detail", args=[Produtor.objects.first().cpf_cnpj]),
+        "estado": reverse("estado-detail", args=[Estado.objects.first().pk]),
+        "cidade": reverse("cidade-detail", args=[Cidade.objects.first().pk]),
+        "tipocultura": reverse("tipocultura-detail", args=[TipoCultura.objects.first().pk]),
+        "propriedade": reverse("propriedade-detail", args=[Propriedade.objects.first().pk]),
+        "cultura": reverse("cultura-detail", args=[Cultura.objects.first().pk]),
+    }
+
+
+def test_toda_acao_do_roteador_tem_orcamento():
+    acoes = {(basename, acao) for _, viewset, basename in router.registry
+             for acao in [*(acao for acao in ACOES_PADRAO if hasattr(viewset, acao)),
+                          *(extra.__name__ for extra in viewset.get_extra_actions())]}
+    assert sorted(acoes - set(QUERY_BUDGETS)) == []
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("tamanho", [2, 25])
+class TestQueryBudgetsLeitura:
+    def setup_method(self):
+        self.client = APIClient()
+
+    @pytest.mark.parametrize("rota", ["produtor", "estado", "cidade", "tipocultura", "propriedade", "cultura"])
+    def test_list(self, tamanho, rota, query_budget):
+        criar_dataset(tamanho)
+        with query_budget(*QUERY_BUDGETS[(rota, "list")]):
+            response = self.client.get(reverse(f"{rota}-list"))
+        assert response.status_code == 200
+
+    @pytest.mark.parametrize("rota", ["produtor", "estado", "cidade", "tipocultura", "propriedade", "cultura"])
+    def test_retrieve(self, tamanho, rota, query_budget):
+        criar_dataset(tamanho)
+        url = detail_urls()[rota]
+        with query_budget(*QUERY_BUDGETS[(rota, "retrieve")]):
+            response = self.client.get(url)
+        assert response.status_code == 200
+
+    def test_portfolio(self, tamanho, query_budget):
+        criar_dataset(tamanho)
+        aquecer_caches()
+        produtor = Produtor.objects.first()
+        with query_budget(*QUERY_BUDGETS[("produtor", "portfolio")]):
+            response = self.client.get(reverse("produtor-portfolio", args=[produtor.cpf_cnpj]))
+        assert response.status_code == 200
+        assert response.data["propriedades"]
+
+    def test_dashboard(self, tamanho, query_budget):
+        criar_dataset(tamanho)
+        aquecer_caches()
+        with query_budget(*QUERY_BUDGETS[("dashboard", "get")]):
+            response = self.client.get(reverse("dashboard"))
+        assert response.status_code == 200
+
+
+@pytest.mark.django_db
+class TestQueryBudgetsEscrita:
+    def setup_method(self):
+        self.client = APIClient()
+        criar_dataset(3)
+        self.estado = Estado.objects.first()
+        self.cidade = Cidade.objects.first()
+        self.produtor = Produtor.objects.first()
+        self.tipo = TipoCultura.objects.first()
+        self.propriedade = Propriedade.objects.first()
+
+    def test_creates(self, query_budget):
+        payloads = {
+            "produtor": {"cpf_cnpj": "11222333000181", "nome_produtor": "Cooperativa"},
+            "estado": {"nome_estado": "Bahia"},
+            "cidade": {"nome_cidade": "Salvador", "estado": self.estado.pk},
+            "tipocultura": {"tipo_cultura": "Café"},
+            "propriedade": {"nome_propriedade": "Fazenda Nova", "area_total": 10.0, "area_agricultavel": 5.0,
+                            "area_vegetacao": 5.0, "cidade": self.cidade.pk, "produtor": self.produtor.cpf_cnpj},
+            "cultura": {"ano_safra": 2030, "tipo_cultura": self.tipo.pk, "propriedade": self.propriedade.pk,
+                        "area": 10.0},
+        }
+        for rota, payload in payloads.items():
+            aquecer_caches()
+            with query_budget(*QUERY_BUDGETS[(rota, "create")]):
+                response = self.client.post(reverse(f"{rota}-list"), payload, format="json")
+            assert response.status_code == 201, (rota, response.data)
+
+    def test_updates(self, query_budget):
+        urls = detail_urls()
+        payloads = {
+            "produtor": {"cpf_cnpj": self.produtor.cpf_cnpj, "nome_produtor": "Novo Nome"},
+            "estado": {"nome_estado": "Bahia"},
+            "cidade": {"nome_cidade": "Salvador", "estado": self.estado.pk},
+            "tipocultura": {"tipo_cultura": "Café"},
+            "propriedade": {"nome_propriedade": "Renomeada", "area_total": 100.0, "area_agricultavel": 60.0,
+                            "area_vegetacao": 40.0, "cidade": self.propriedade.cidade_id,
+                            "produtor": self.propriedade.produtor.cpf_cnpj},
+            "cultura": {"ano_safra": 2024, "tipo_cultura": self.tipo.pk, "propriedade": self.propriedade.pk,
+                        "area": 5.0},
+        }
+        for rota, payload in payloads.items():
+            aquecer_caches()
+            with query_budget(*QUERY_BUDGETS[(rota, "update")]):
+                response = self.client.put(urls[rota], payload, format="json")
+            assert response.status_code == 200, (rota, response.data)
+
+    def test_partial_updates(self, query_budget):
+        urls = detail_urls()
+        payloads = {"produtor": {"nome_produtor": "Novo Nome"}, "estado": {"nome_estado": "Bahia"},
+                    "cidade": {"nome_cidade": "Salvador"}, "tipocultura": {"tipo_cultura": "Café"},
+                    "propriedade": {"nome_propriedade": "Renomeada"}, "cultura": {"area": 1.0}}
+        for rota, payload in payloads.items():
+            aquecer_caches()
+            with query_budget(*QUERY_BUDGETS[(rota, "partial_update")]):
+                response = self.client.patch(urls[rota], payload, format="json")
+            assert response.status_code == 200, (rota, response.data)
+
+    def test_destroys(self, query_budget):
+        cultura = Cultura.objects.first()
+        with query_budget(*QUERY_BUDGETS[("cultura", "destroy")]):
+            response = self.client.delete(reverse("cultura-detail", args=[cultura.pk]))
+        assert response.status_code == 204
+        # Objetos sem dependentes: a cascata não depende da quantidade de linhas.
+        objetos = {
+            "produtor": Produtor.objects.create(cpf_cnpj="11222333000181", tipo_documento="CNPJ",
+                                                nome_produtor="Sem Fazendas"),
+            "estado": Estado.objects.create(nome_estado="Sem Cidades"),
+            "cidade": Cidade.objects.create(nome_cidade="Sem Fazendas", estado=self.estado),
+            "tipocultura": TipoCultura.objects.create(tipo_cultura="Sem Culturas"),
+            "propriedade": Propriedade.objects.create(
+                nome_propriedade="Sem Culturas", area_total=10.0, area_agricultavel=5.0, area_vegetacao=5.0,
+                cidade=self.cidade, produtor=self.produtor),
+        }
+        for rota, objeto in objetos.items():
+            aquecer_caches()
+            chave = objeto.cpf_cnpj if rota == "produtor" else objeto.pk
+            with query_budget(*QUERY_BUDGETS[(rota, "destroy")]):
+                response = self.client.delete(reverse(f"{rota}-detail", args=[chave]))
+            assert response.status_code == 204, rota
+
+    def test_clonar_safra(self, query_budget):
+        aquecer_caches()
+        with query_budget(*QUERY_BUDGETS[("cultura", "clonar_safra")]):
+            response = self.client.post(reverse("cultura-clonar-safra"), {"origem": 2024, "destino": 2025},
+                                        format="json")
+        assert response.status_code == 200
+        assert response.data["clonadas"] == 3
+
+    def test_tarefas(self, query_budget, settings, tmp_path):
+        settings.JOBS_RESULT_DIR = str(tmp_path)
+        with query_budget(*QUERY_BUDGETS[("tarefa", "create")]):
+            response = self.client.post(reverse("tarefa-list"), {"tipo": "exportar",
+                                                                 "parametros": {"recurso": "culturas"}},
+                                        format="json")
+        assert response.status_code == 202
+        call_command("executar_tarefas", "--uma-vez", "--threads", "1", stdout=io.StringIO())
+        pk = response.data["id_tarefa"]
+        with query_budget(*QUERY_BUDGETS[("tarefa", "retrieve")]):
+            assert self.client.get(reverse("tarefa-detail", args=[pk])).status_code == 200
+        with query_budget(*QUERY_BUDGETS[("tarefa", "download")]):
+            response = self.client.get(reverse("tarefa-download", args=[pk]))
+        assert response.status_code == 200
+        response.close()
+
+
+@pytest.mark.django_db
+class TestDetectorNMaisUm:
+    def test_detecta_formato_repetido(self):
+        criar_dataset(3)
+        with pytest.raises(QueryBudgetExceeded, match="N\\+1"):
+            with _query_budget(10):
+                [str(cidade) for cidade in Cidade.objects.all()]
+
+    def test_select_related_elimina_repeticao(self, query_recorder):
+        criar_dataset(3)
+        with query_recorder() as recorder:
+            [str(cidade) for cidade in Cidade.objects.select_related("estado")]
+        assert recorder.count == 1
+        assert recorder.repeated() == {}
+
+    def test_orcamento_excedido(self):
+        criar_dataset(2)
+        with pytest.raises(QueryBudgetExceeded, match="orçamento de 1"):
+            with _query_budget(1):
+                Estado.objects.count()
+                Cidade.objects.count()
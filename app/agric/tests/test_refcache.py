@@ -0,0 +1,76 @@
+import pytest
+from rest_framework.test import APIClient
+from django.urls import reverse
+from agric import refcache
+from agric.models import Estado, Cidade, TipoCultura
+from agric.querycount import QueryRecorder
+from agric.versioning import get_version, bump_version
+
+
+@pytest.mark.django_db
+class TestReferenceCache:
+    def setup_method(self):
+        self.client = APIClient()
+        self.estado = Estado.objects.create(nome_estado="Minas Gerais")
+
+    def test_carrega_uma_vez(self):
+        with QueryRecorder() as recorder:
+            assert refcache.estados.nome(self.estado.pk) == "Minas Gerais"
+            assert refcache.estados.get(self.estado.pk).pk == self.estado.pk
+        assert recorder.count == 1
+
+    def test_instancias_nao_compartilhadas(self):
+        assert refcache.estados.get(self.estado.pk) is not refcache.estados.get(self.estado.pk)
+
+    def test_escrita_troca_versao_e_recarrega(self):
+        refcache.estados.all()
+        versao = get_version(Estado)
+        self.client.patch(reverse("estado-detail", args=[self.estado.pk]), {"nome_estado": "Bahia"}, format="json")
+        assert get_version(Estado) != versao
+        assert refcache.estados.nome(self.estado.pk) == "Bahia"
+
+    def test_remocao_invalida(self):
+        refcache.estados.all()
+        self.estado.delete()
+        assert refcache.estados.get(self.estado.pk) is None
+
+    def test_chave_ausente_consulta_banco(self):
+        refcache.tipos_cultura.all()
+        # Simula um registro criado por outro worker antes da troca de versão chegar.
+        TipoCultura.objects.bulk_create([TipoCultura(tipo_cultura="Café")])
+        tipo = TipoCultura.objects.get(tipo_cultura="Café")
+        assert refcache.tipos_cultura.nome(tipo.pk) == "Café"
+
+    def test_versao_externa_recarrega(self):
+        refcache.estados.all()
+        Estado.objects.filter(pk=self.estado.pk).update(nome_estado="Goiás")
+        assert refcache.estados.nome(self.estado.pk) == "Minas Gerais"
+        bump_version(Estado)
+        assert refcache.estados.nome(self.estado.pk) == "Goiás"
+
+
+@pytest.mark.django_db
+class TestCachedPrimaryKeyRelatedField:
+    def setup_method(self):
+        self.client = APIClient()
+        self.estado = Estado.objects.create(nome_estado="Paraná")
+
+    def test_validacao_sem_select(self):
+        refcache.estados.all()
+        with QueryRecorder() as recorder:
+            response = self.client.post(reverse("cidade-list"), {"nome_cidade": "Londrina", "estado": self.estado.pk},
+                                        format="json")
+        assert response.status_code == 201
+        tabela = f'FROM "{Estado._meta.db_table}"'
+        assert not any(q["sql"].startswith("SELECT") and tabela in q["sql"] for q in recorder.queries)
+        assert Cidade.objects.get(nome_cidade="Londrina").estado_id == self.estado.pk
+
+    def test_chave_inexistente(self):
+        response = self.client.post(reverse("cidade-list"), {"nome_cidade": "X", "estado": 999}, format="json")
+        assert response.status_code == 400
+        assert "estado" in response.data
+
+    def test_tipo_incorreto(self):
+        response = self.client.post(reverse("cidade-list"), {"nome_cidade": "X", "estado": "abc"}, format="json")
+        assert response.status_code == 400
+        assert "estado" in response.data
@@ -0,0 +1,76 @@
+import pytest
+from rest_framework.test import APIClient
+from django.urls import reverse
+from agric import reprcache
+from agric.metrics import registry
+from agric.models import Estado, Cidade, Produtor, Propriedade
+from agric.querycount import QueryRecorder
+from agric.reprcache import LRUCache
+
+
+def test_lru_despeja_menos_usado():
+    lru = LRUCache(2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    assert lru.set("c", 3) == ["b"]
+    assert lru.get("b") is None
+    assert lru.get("a") == 1 and lru.get("c") == 3
+
+
+def test_lru_desativado():
+    lru = LRUCache(0)
+    lru.set("a", 1)
+    assert lru.get("a") is None
+
+
+@pytest.mark.django_db
+class TestCacheDeRepresentacoes:
+    def setup_method(self):
+        self.client = APIClient()
+        estado = Estado.objects.create(nome_estado="Goiás")
+        self.cidade = Cidade.objects.create(nome_cidade="Rio Verde", estado=estado)
+        self.produtor = Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF", nome_produtor="Ana")
+        self.propriedade = Propriedade.objects.create(
+            nome_propriedade="Fazenda", area_total=100.0, area_agricultavel=60.0, area_vegetacao=40.0,
+            cidade=self.cidade, produtor=self.produtor)
+        self.url = reverse("propriedade-detail", args=[self.propriedade.pk])
+
+    def hits(self, resultado="hit"):
+        return registry.counter_value("agric_repr_cache_requests_total",
+                                      {"model": "agric.propriedade", "resultado": resultado})
+
+    def test_segundo_retrieve_sem_queries(self):
+        hits = self.hits()
+        primeiro = self.client.get(self.url)
+        with QueryRecorder() as recorder:
+            segundo = self.client.get(self.url)
+        assert recorder.count == 0
+        assert segundo.data == primeiro.data
+        assert self.hits() == hits + 1
+
+    def test_partial_update_invalida(self):
+        self.client.get(self.url)
+        self.client.patch(self.url, {"nome_propriedade": "Renomeada"}, format="json")
+        assert self.client.get(self.url).data["nome_propriedade"] == "Renomeada"
+
+    def test_destroy_invalida(self):
+        self.client.get(self.url)
+        assert self.client.delete(self.url).status_code == 204
+        assert self.client.get(self.url).status_code == 404
+
+    def test_exclusao_em_cascata_invalida(self):
+        self.client.get(self.url)
+        self.produtor.delete()
+        assert self.client.get(self.url).status_code == 404
+
+    def test_lookup_invalido_responde_404(self):
+        response = self.client.get(reverse("cidade-detail", args=["abc"]))
+        assert response.status_code == 404
+
+    def test_limite_de_entradas(self, monkeypatch):
+        monkeypatch.setattr(reprcache.representations, "maxsize", 1)
+        self.client.get(self.url)
+        self.client.get(reverse("cidade-detail", args=[self.cidade.pk]))
+        assert len(reprcache.representations) == 1
+        assert registry.counter_value("agric_repr_cache_evictions_total", {"model": "agric.propriedade"}) >= 1
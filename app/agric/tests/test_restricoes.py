@@ -0,0 +1,146 @@
+import io
+
+import pytest
+from rest_framework.test import APIClient
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.urls import reverse
+from agric.importacao import importar_produtores, importar_propriedades
+from agric.models import (Estado, Cidade, Produtor, Propriedade, TipoCultura, Cultura, ResumoProdutor,
+                          ResumoGeografico, Alteracao, MENSAGEM_AREAS, MENSAGEM_DOCUMENTO, erro_de_restricao)
+
+
+def violacao(funcao):
+    with pytest.raises(IntegrityError) as erro, transaction.atomic():
+        funcao()
+    return erro.value
+
+
+@pytest.mark.django_db
+class TestCheckConstraints:
+    def setup_method(self):
+        estado = Estado.objects.create(nome_estado="Goiás")
+        self.cidade = Cidade.objects.create(nome_cidade="Rio Verde", estado=estado)
+        self.produtor = Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF", nome_produtor="Ana")
+        self.fazenda = Propriedade.objects.create(nome_propriedade="Fazenda", area_total=100.0, area_agricultavel=50.0,
+                                                  area_vegetacao=30.0, cidade=self.cidade, produtor=self.produtor)
+
+    def test_escritas_em_massa_respeitam_as_areas(self):
+        erro = violacao(lambda: Propriedade.objects.update(area_total=70.0))
+        assert erro_de_restricao(erro).messages == [MENSAGEM_AREAS]
+        erro = violacao(lambda: Propriedade.objects.update(area_vegetacao=-1.0))
+        assert erro_de_restricao(erro).messages == ["As áreas não podem ser negativas."]
+        Propriedade.objects.update(area_total=80.0)
+
+    def test_area_da_cultura_nao_negativa(self):
+        cultura = Cultura.objects.create(ano_safra=2024, tipo_cultura=TipoCultura.objects.create(tipo_cultura="Soja"),
+                                         propriedade=self.fazenda, area=10.0)
+        erro = violacao(lambda: Cultura.objects.filter(pk=cultura.pk).update(area=-1.0))
+        assert erro_de_restricao(erro).message_dict == {"area": ["A área não pode ser negativa."]}
+        Cultura.objects.filter(pk=cultura.pk).update(area=0.0)
+
+    def test_documento_e_tipo_consistentes(self):
+        erro = violacao(lambda: Produtor.objects.bulk_create([
+            Produtor(cpf_cnpj="11222333000181", tipo_documento="CPF", nome_produtor="Bia")]))
+        assert erro_de_restricao(erro).message_dict == {"cpf_cnpj": [MENSAGEM_DOCUMENTO]}
+        erro = violacao(lambda: Produtor.objects.filter(pk=self.produtor.pk).update(cpf_cnpj="123"))
+        assert erro_de_restricao(erro).message_dict == {"cpf_cnpj": [MENSAGEM_DOCUMENTO]}
+
+    def test_unicidade_com_a_mensagem_da_validacao(self):
+        erro = violacao(lambda: Produtor.objects.bulk_create([
+            Produtor(cpf_cnpj="52998224725", tipo_documento="CPF", nome_produtor="Bia")]))
+        assert list(erro_de_restricao(erro).message_dict) == ["cpf_cnpj"]
+
+    def test_patch_parcial_recusado_com_a_mensagem_de_sempre(self):
+        url = reverse("propriedade-detail", args=[self.fazenda.pk])
+        response = APIClient().patch(url, {"area_vegetacao": 60.0}, format="json")
+        assert response.status_code == 400
+        assert response.data["non_field_errors"] == [MENSAGEM_AREAS]
+        response = APIClient().patch(url, {"area_total": -1.0}, format="json")
+        assert response.status_code == 400 and "area_total" in response.data
+        assert APIClient().patch(url, {"area_vegetacao": 50.0}, format="json").status_code == 200
+
+
+@pytest.mark.django_db
+class TestImportacao:
+    def setup_method(self):
+        self.estado = Estado.objects.create(nome_estado="Goiás")
+        self.cidade = Cidade.objects.create(nome_cidade="Rio Verde", estado=self.estado)
+        Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF", nome_produtor="Ana")
+
+    def propriedade(self, area_total="100", area_agricultavel="50", produtor="529.982.247-25", cidade=None):
+        return {"nome_propriedade": "Fazenda", "area_total": area_total, "area_agricultavel": area_agricultavel,
+                "area_vegetacao": "10", "cidade": str(cidade or self.cidade.pk), "produtor": produtor}
+
+    def test_produtores_com_erros_por_linha(self):
+        ultima = Alteracao.objects.count()
+        resultado = importar_produtores([
+            {"cpf_cnpj": "390.533.447-05", "nome_produtor": "Bia"},
+            {"cpf_cnpj": "52998224725", "nome_produtor": "Duplicado"},
+            {"cpf_cnpj": "39053344700", "nome_produtor": "Dígito errado"},
+            {"cpf_cnpj": "123", "nome_produtor": "Curto"},
+            {"cpf_cnpj": "11.222.333/0001-81", "nome_produtor": "Cia"},
+        ], tamanho_do_lote=2)
+        assert resultado["importadas"] == 2
+        assert [(erro["linha"], list(erro["erros"])) for erro in resultado["erros"]] == [
+            (3, ["cpf_cnpj"]), (4, ["cpf_cnpj"]), (5, ["cpf_cnpj"])]
+        assert resultado["erros"][1]["erros"]["cpf_cnpj"] == ["CPF inválido"]
+        assert resultado["erros"][2]["erros"]["cpf_cnpj"] == [MENSAGEM_DOCUMENTO]
+        assert Produtor.objects.get(cpf_cnpj="11222333000181").tipo_documento == "CNPJ"
+        assert Alteracao.objects.count() - ultima == 2
+
+    def test_propriedades_e_resumos(self):
+        resultado = importar_propriedades([
+            self.propriedade(),
+            self.propriedade(area_total="40"),
+            self.propriedade(produtor="39053344705"),
+            self.propriedade(area_total="abc", cidade=999),
+            self.propriedade(area_total="200", area_agricultavel="150"),
+        ], tamanho_do_lote=3)
+        assert resultado["importadas"] == 2
+        erros = {erro["linha"]: erro["erros"] for erro in resultado["erros"]}
+        assert erros[3] == {"non_field_errors": [MENSAGEM_AREAS]}
+        assert list(erros[4]) == ["produtor"]
+        assert set(erros[5]) == {"area_total", "cidade"}
+        assert Propriedade.objects.get(area_total=200.0).estado_id == self.estado.pk
+        assert ResumoProdutor.objects.get(estado=self.estado).area_total == 300.0
+        assert ResumoGeografico.objects.get(estado=self.estado, cidade_id=0, tipo_cultura_id=0).propriedades == 2
+
+    def test_areas_nao_finitas_e_nomes_em_branco(self):
+        resultado = importar_propriedades([
+            self.propriedade(area_total="nan"),
+            self.propriedade(area_total="inf"),
+            self.propriedade(area_agricultavel="-inf"),
+            dict(self.propriedade(), area_vegetacao="NaN"),
+            dict(self.propriedade(), nome_propriedade="   "),
+            self.propriedade(),
+        ], tamanho_do_lote=10)
+        assert resultado["importadas"] == 1
+        assert [(erro["linha"], erro["erros"]) for erro in resultado["erros"]] == [
+            (2, {"area_total": ["Um número válido é necessário."]}),
+            (3, {"area_total": ["Um número válido é necessário."]}),
+            (4, {"area_agricultavel": ["Um número válido é necessário."]}),
+            (5, {"area_vegetacao": ["Um número válido é necessário."]}),
+            (6, {"nome_propriedade": ["Este campo não pode ficar em branco."]}),
+        ]
+
+    def test_produtor_com_nome_em_branco(self):
+        resultado = importar_produtores([
+            {"cpf_cnpj": "390.533.447-05", "nome_produtor": " \t"},
+            {"cpf_cnpj": "39053344700"},
+        ])
+        assert resultado["importadas"] == 0
+        assert [erro["erros"] for erro in resultado["erros"]] == [
+            {"nome_produtor": ["Este campo não pode ficar em branco."]},
+            {"cpf_cnpj": ["CPF inválido"], "nome_produtor": ["Este campo não pode ficar em branco."]},
+        ]
+
+    def test_comando(self, tmp_path):
+        arquivo = tmp_path / "propriedades.csv"
+        arquivo.write_text("nome_propriedade,area_total,area_agricultavel,area_vegetacao,cidade,produtor\n"
+                           f"Fazenda,100,50,10,{self.cidade.pk},52998224725\n"
+                           f"Fazenda,10,50,10,{self.cidade.pk},52998224725\n", encoding="utf-8")
+        saida, erros = io.StringIO(), io.StringIO()
+        call_command("importar_csv", "propriedades", str(arquivo), stdout=saida, stderr=erros)
+        assert "1 linhas gravadas, 1 com erro" in saida.getvalue()
+        assert erros.getvalue().startswith("Linha 3: non_field_errors: A soma das áreas")
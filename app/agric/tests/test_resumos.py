@@ -0,0 +1,285 @@
+import math
+
+import pytest
+from rest_framework.test import APIClient
+from django.urls import reverse
+from agric.models import (Estado, Cidade, Produtor, Propriedade, TipoCultura, Cultura, ResumoProdutor,
+                          ResumoProdutorSafra)
+from agric.querycount import QueryRecorder
+from agric.resumos import SketchQuantis, calcular_distribuicao
+from agric.signals import invalidar_tabela
+
+
+def resumos():
+    return {(r.produtor_id, r.estado_id): (r.propriedades, r.area_total, r.area_agricultavel)
+            for r in ResumoProdutor.objects.all()}
+
+
+TODOS = ResumoProdutor.TODOS
+
+
+def safras():
+    return {(r.produtor_id, r.estado_id, r.ano_safra): (r.culturas, r.area_plantada)
+            for r in ResumoProdutorSafra.objects.all()}
+
+
+def recalculados():
+    # Linhas zeradas pelas exclusões não são recriadas pelo recálculo.
+    esperado = {chave: valor for chave, valor in resumos().items() if valor[0]}
+    esperado_safras = {chave: valor for chave, valor in safras().items() if valor[0]}
+    ResumoProdutor.recalcular()
+    ResumoProdutorSafra.recalcular()
+    return esperado == resumos() and esperado_safras == safras()
+
+
+@pytest.mark.django_db
+class TestResumoProdutor:
+    def setup_method(self):
+        self.client = APIClient()
+        self.goias = Estado.objects.create(nome_estado="Goiás")
+        self.bahia = Estado.objects.create(nome_estado="Bahia")
+        self.rio_verde = Cidade.objects.create(nome_cidade="Rio Verde", estado=self.goias)
+        self.barreiras = Cidade.objects.create(nome_cidade="Barreiras", estado=self.bahia)
+        self.ana = Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF", nome_produtor="Ana")
+        self.bia = Produtor.objects.create(cpf_cnpj="39053344705", tipo_documento="CPF", nome_produtor="Bia")
+
+    def propriedade(self, produtor, cidade, area_total=100.0):
+        return Propriedade.objects.create(nome_propriedade="Fazenda", area_total=area_total,
+                                          area_agricultavel=area_total / 2, area_vegetacao=0.0,
+                                          cidade=cidade, produtor=produtor)
+
+    def test_mantido_a_cada_escrita(self):
+        fazenda = self.propriedade(self.ana, self.rio_verde)
+        self.propriedade(self.ana, self.rio_verde, 50.0)
+        self.propriedade(self.ana, self.barreiras, 10.0)
+        assert resumos() == {(self.ana.pk, self.goias.pk): (2, 150.0, 75.0),
+                             (self.ana.pk, self.bahia.pk): (1, 10.0, 5.0),
+                             (self.ana.pk, TODOS): (3, 160.0, 80.0)}
+        response = self.client.patch(reverse("propriedade-detail", args=[fazenda.pk]),
+                                     {"area_total": 200.0, "area_agricultavel": 120.0}, format="json")
+        assert response.status_code == 200
+        assert resumos()[(self.ana.pk, self.goias.pk)] == (2, 250.0, 145.0)
+        assert resumos()[(self.ana.pk, TODOS)] == (3, 260.0, 150.0)
+        assert recalculados()
+
+    def test_troca_de_produtor_cidade_e_exclusao(self):
+        fazenda = self.propriedade(self.ana, self.rio_verde)
+        fazenda = Propriedade.objects.get(pk=fazenda.pk)
+        fazenda.produtor = self.bia
+        fazenda.cidade = self.barreiras
+        fazenda.save()
+        assert resumos()[(self.bia.pk, self.bahia.pk)] == (1, 100.0, 50.0)
+        assert resumos()[(self.ana.pk, self.goias.pk)] == (0, 0.0, 0.0)
+        assert resumos()[(self.bia.pk, TODOS)] == (1, 100.0, 50.0)
+        fazenda.delete()
+        assert resumos()[(self.bia.pk, self.bahia.pk)] == (0, 0.0, 0.0)
+        assert recalculados()
+
+    def test_cidade_muda_de_estado(self):
+        self.propriedade(self.ana, self.rio_verde)
+        self.rio_verde.estado = self.bahia
+        self.rio_verde.save()
+        assert resumos() == {(self.ana.pk, self.bahia.pk): (1, 100.0, 50.0), (self.ana.pk, TODOS): (1, 100.0, 50.0)}
+
+    def test_culturas_acompanham_a_propriedade(self):
+        soja = TipoCultura.objects.create(tipo_cultura="Soja")
+        fazenda = self.propriedade(self.ana, self.rio_verde)
+        cultura = Cultura.objects.create(ano_safra=2025, tipo_cultura=soja, propriedade=fazenda, area=20.0)
+        Cultura.objects.create(ano_safra=2024, tipo_cultura=soja, propriedade=fazenda, area=10.0)
+        linha = ResumoProdutor.objects.get(produtor=self.ana, estado=self.goias)
+        assert (linha.culturas, linha.area_plantada) == (2, 30.0)
+        cultura = Cultura.objects.get(pk=cultura.pk)
+        cultura.area = 5.0
+        cultura.save()
+        fazenda = Propriedade.objects.get(pk=fazenda.pk)
+        fazenda.produtor = self.bia
+        fazenda.cidade = self.barreiras
+        fazenda.save()
+        linha = ResumoProdutor.objects.get(produtor=self.bia, estado=self.bahia)
+        assert (linha.culturas, linha.area_plantada) == (2, 15.0)
+        assert ResumoProdutor.objects.get(produtor=self.ana, estado=TODOS).culturas == 0
+        assert safras()[(self.bia.pk, self.bahia.pk, 2025)] == safras()[(self.bia.pk, TODOS, 2025)] == (1, 5.0)
+        assert safras()[(self.ana.pk, self.goias.pk, 2024)] == safras()[(self.ana.pk, TODOS, 2024)] == (0, 0.0)
+        esperado = {(r.produtor_id, r.estado_id): (r.culturas, r.area_plantada)
+                    for r in ResumoProdutor.objects.filter(propriedades__gt=0)}
+        assert recalculados()
+        assert esperado == {(r.produtor_id, r.estado_id): (r.culturas, r.area_plantada)
+                            for r in ResumoProdutor.objects.all()}
+        Cultura.objects.get(pk=cultura.pk).delete()
+        assert ResumoProdutor.objects.get(produtor=self.bia, estado=TODOS).culturas == 1
+        assert safras()[(self.bia.pk, TODOS, 2025)] == (0, 0.0)
+        fazenda.delete()
+        assert ResumoProdutor.objects.get(produtor=self.bia, estado=TODOS).culturas == 0
+        assert safras()[(self.bia.pk, TODOS, 2024)] == (0, 0.0)
+
+    def test_safras_acompanham_a_troca_de_estado(self):
+        soja = TipoCultura.objects.create(tipo_cultura="Soja")
+        fazenda = self.propriedade(self.ana, self.rio_verde)
+        Cultura.objects.create(ano_safra=2025, tipo_cultura=soja, propriedade=fazenda, area=20.0)
+        fazenda = Propriedade.objects.get(pk=fazenda.pk)
+        fazenda.cidade = self.barreiras
+        fazenda.save()
+        assert safras() == {(self.ana.pk, self.goias.pk, 2025): (0, 0.0), (self.ana.pk, self.bahia.pk, 2025): (1, 20.0),
+                            (self.ana.pk, TODOS, 2025): (1, 20.0)}
+        assert recalculados()
+
+    def test_exclusao_do_produtor(self):
+        self.propriedade(self.ana, self.rio_verde)
+        self.ana.delete()
+        assert resumos() == {}
+
+
+@pytest.mark.django_db
+class TestRanking:
+    def setup_method(self):
+        self.client = APIClient()
+        self.url = reverse("ranking")
+        self.goias = Estado.objects.create(nome_estado="Goiás")
+        self.bahia = Estado.objects.create(nome_estado="Bahia")
+        rio_verde = Cidade.objects.create(nome_cidade="Rio Verde", estado=self.goias)
+        barreiras = Cidade.objects.create(nome_cidade="Barreiras", estado=self.bahia)
+        self.soja = TipoCultura.objects.create(tipo_cultura="Soja")
+        produtores = [Produtor.objects.create(cpf_cnpj=cpf, tipo_documento="CPF", nome_produtor=nome)
+                      for cpf, nome in (("52998224725", "Ana"), ("39053344705", "Bia"), ("15350946056", "Caio"))]
+        # Ana: 300 ha em Goiás + 50 na Bahia; Bia: 200 na Bahia; Caio: 100 em Goiás.
+        for produtor, cidade, area in ((produtores[0], rio_verde, 300.0), (produtores[0], barreiras, 50.0),
+                                       (produtores[1], barreiras, 200.0), (produtores[2], rio_verde, 100.0)):
+            propriedade = Propriedade.objects.create(
+                nome_propriedade="Fazenda", area_total=area, area_agricultavel=area / 2, area_vegetacao=0.0,
+                cidade=cidade, produtor=produtor)
+            Cultura.objects.create(ano_safra=2025, tipo_cultura=self.soja, propriedade=propriedade, area=area / 4)
+
+    def ranking(self, **params):
+        response = self.client.get(self.url, params)
+        assert response.status_code == 200
+        return [(p["nome_produtor"], p["propriedades"], p["valor"]) for p in response.data["produtores"]]
+
+    def test_ranking_geral(self):
+        assert self.ranking() == [("Ana", 2, 350.0), ("Bia", 1, 200.0), ("Caio", 1, 100.0)]
+        assert self.ranking(medida="area_agricultavel", limite=1) == [("Ana", 2, 175.0)]
+
+    def test_ranking_por_estado(self):
+        assert self.ranking(estado=self.bahia.pk) == [("Bia", 1, 200.0), ("Ana", 1, 50.0)]
+
+    def test_ranking_por_area_plantada_na_safra(self):
+        assert self.ranking(medida="area_plantada", ano_safra=2025, estado=self.goias.pk) == [
+            ("Ana", 1, 75.0), ("Caio", 1, 25.0)]
+        assert self.ranking(medida="area_plantada", ano_safra=2024) == []
+
+    def test_ranking_por_area_na_safra(self):
+        # Só as propriedades com cultura na safra contam.
+        Cultura.objects.filter(propriedade__area_total=50.0).delete()
+        assert self.ranking(ano_safra=2025) == [("Ana", 1, 300.0), ("Bia", 1, 200.0), ("Caio", 1, 100.0)]
+        assert self.ranking(medida="area_agricultavel", ano_safra=2025, estado=self.bahia.pk) == [("Bia", 1, 100.0)]
+        assert self.ranking(ano_safra=2024) == []
+
+    def test_area_plantada_em_todos_os_estados(self):
+        assert self.ranking(medida="area_plantada", ano_safra=2025) == [
+            ("Ana", 2, 87.5), ("Bia", 1, 50.0), ("Caio", 1, 25.0)]
+
+    def test_ranking_le_uma_linha_por_produtor(self):
+        # Sem GROUP BY nem leitura das propriedades ou ocupações: uma varredura do índice (estado, -medida).
+        for params in ({}, {"estado": self.bahia.pk}, {"medida": "area_plantada", "ano_safra": 2025}):
+            with QueryRecorder() as recorder:
+                self.ranking(**params)
+            ranking = recorder.queries[0]["sql"]
+            assert "GROUP BY" not in ranking and '"propriedade"' not in ranking
+            assert ranking.endswith("LIMIT 10")
+
+    def test_cache_invalidado_por_escrita(self):
+        self.ranking()
+        with QueryRecorder() as recorder:
+            self.ranking()
+        assert recorder.count == 0
+        caio = Produtor.objects.get(nome_produtor="Caio")
+        Propriedade.objects.filter(produtor=caio).update(area_total=1000.0)
+        # Escrita em massa: vale depois de recalcular o resumo e invalidar a tabela.
+        assert self.ranking()[0] == ("Ana", 2, 350.0)
+        ResumoProdutor.recalcular([caio.pk])
+        invalidar_tabela(Propriedade)
+        assert self.ranking()[0] == ("Caio", 1, 1000.0)
+        fazenda = Propriedade.objects.get(produtor=caio)
+        fazenda.area_total = 60.0
+        fazenda.save()
+        assert self.ranking()[-1] == ("Caio", 1, 60.0)
+
+    @pytest.mark.parametrize("params", [
+        {"medida": "area_plantada"},
+        {"medida": "nome"},
+        {"limite": 0},
+        {"limite": 101},
+        {"estado": "abc"},
+    ])
+    def test_parametros_invalidos(self, params):
+        assert self.client.get(self.url, params).status_code == 400
+
+
+@pytest.mark.django_db
+class TestDistribuicao:
+    def setup_method(self):
+        self.client = APIClient()
+        self.url = reverse("distribuicao")
+        self.goias = Estado.objects.create(nome_estado="Goiás")
+        cidade = Cidade.objects.create(nome_cidade="Rio Verde", estado=self.goias)
+        produtor = Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF", nome_produtor="Ana")
+        soja = TipoCultura.objects.create(tipo_cultura="Soja")
+        for i in range(1, 101):
+            propriedade = Propriedade.objects.create(
+                nome_propriedade=f"Fazenda {i}", area_total=float(i), area_agricultavel=float(i) / 2,
+                area_vegetacao=0.0, cidade=cidade, produtor=produtor)
+            if i > 50:
+                Cultura.objects.create(ano_safra=2025, tipo_cultura=soja, propriedade=propriedade)
+
+    def test_distribuicao(self):
+        response = self.client.get(self.url, {"faixas": 4})
+        assert response.status_code == 200
+        data = response.data
+        assert (data["total"], data["minimo"], data["maximo"], data["media"]) == (100, 1.0, 100.0, 50.5)
+        assert [faixa["qtd"] for faixa in data["histograma"]] == [25, 25, 25, 25]
+        assert data["histograma"][0]["de"] == 1.0 and data["histograma"][-1]["ate"] == 100.0
+        # Percentis estimados (SQLite), pela posição, com erro relativo de até 1%.
+        assert data["aproximado"] is True
+        for nome, exato in (("p10", 10.0), ("p50", 50.0), ("p90", 90.0), ("p99", 99.0)):
+            assert data["percentis"][nome] == pytest.approx(exato, rel=0.02)
+
+    def test_filtros(self):
+        data = self.client.get(self.url, {"campo": "area_agricultavel", "ano_safra": 2025,
+                                          "estado": self.goias.pk}).data
+        assert (data["total"], data["minimo"], data["maximo"]) == (50, 25.5, 50.0)
+        assert sum(faixa["qtd"] for faixa in data["histograma"]) == 50
+        vazio = self.client.get(self.url, {"ano_safra": 2030}).data
+        assert vazio["total"] == 0 and vazio["histograma"] == [] and vazio["percentis"]["p50"] is None
+
+    def test_valor_unico(self):
+        Propriedade.objects.update(area_total=7.0, area_agricultavel=3.5)
+        data = calcular_distribuicao("area_total", faixas=3)
+        assert [faixa["qtd"] for faixa in data["histograma"]] == [100, 0, 0]
+        assert data["percentis"]["p50"] == pytest.approx(7.0, rel=0.01)
+
+    def test_consultas_limitadas(self):
+        with QueryRecorder() as recorder:
+            self.client.get(self.url)
+        # Resumo, baldes do sketch, zeros e histograma: agregações, sem trazer as linhas.
+        assert recorder.count == 4
+        with QueryRecorder() as recorder:
+            self.client.get(self.url)
+        assert recorder.count == 0
+
+    @pytest.mark.parametrize("params", [{"campo": "area_vegetacao"}, {"faixas": 0}, {"faixas": "x"}])
+    def test_parametros_invalidos(self, params):
+        assert self.client.get(self.url, params).status_code == 400
+
+
+class TestSketchQuantis:
+    def test_erro_relativo(self):
+        valores = [1.5 ** i for i in range(40)] + [0.0] * 10
+        sketch = SketchQuantis(erro=0.01)
+        for valor in valores:
+            if valor > 0:
+                sketch.adicionar(math.ceil(math.log(valor) / sketch.log_gamma))
+            else:
+                sketch.adicionar_zeros(1)
+        ordenados = sorted(valores)
+        for q in (0.1, 0.5, 0.9, 1.0):
+            exato = ordenados[int(q * (len(ordenados) - 1))]
+            assert sketch.quantil(q) == pytest.approx(exato, rel=0.01, abs=1e-9)
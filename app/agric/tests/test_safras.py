@@ -0,0 +1,132 @@
+import io
+
+import pytest
+from rest_framework.test import APIClient
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection, transaction
+from django.urls import reverse
+from agric.models import (Estado, Cidade, Produtor, Propriedade, TipoCultura, Cultura, OcupacaoSafra,
+                          ResumoProdutor, ResumoProdutorSafra, ResumoGeografico, Alteracao)
+from agric.querycount import QueryRecorder
+from agric.safras import _ocupar_destino, clonar_safra
+
+
+def estado_dos_resumos():
+    return (sorted(OcupacaoSafra.objects.values_list('propriedade_id', 'ano_safra', 'area_plantada')),
+            sorted(ResumoProdutor.objects.values_list('produtor_id', 'estado_id', 'culturas', 'area_plantada')),
+            sorted(ResumoProdutorSafra.objects.values_list('produtor_id', 'estado_id', 'ano_safra', 'area_plantada')),
+            sorted(ResumoGeografico.objects.values_list('estado_id', 'cidade_id', 'tipo_cultura_id', 'culturas')))
+
+
+def resumos_consistentes():
+    antes = estado_dos_resumos()
+    OcupacaoSafra.recalcular()
+    ResumoProdutor.recalcular()
+    ResumoProdutorSafra.recalcular()
+    ResumoGeografico.recalcular()
+    return antes == estado_dos_resumos()
+
+
+@pytest.mark.django_db
+class TestClonarSafra:
+    def setup_method(self):
+        self.client = APIClient()
+        self.goias = Estado.objects.create(nome_estado="Goiás")
+        bahia = Estado.objects.create(nome_estado="Bahia")
+        rio_verde = Cidade.objects.create(nome_cidade="Rio Verde", estado=self.goias)
+        barreiras = Cidade.objects.create(nome_cidade="Barreiras", estado=bahia)
+        self.ana = Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF", nome_produtor="Ana")
+        self.soja = TipoCultura.objects.create(tipo_cultura="Soja")
+        self.milho = TipoCultura.objects.create(tipo_cultura="Milho")
+        self.fazendas = [Propriedade.objects.create(
+            nome_propriedade=f"Fazenda {i}", area_total=100.0, area_agricultavel=50.0, area_vegetacao=10.0,
+            cidade=cidade, produtor=self.ana) for i, cidade in enumerate((rio_verde, rio_verde, barreiras))]
+        for fazenda in self.fazendas:
+            Cultura.objects.create(ano_safra=2024, tipo_cultura=self.soja, propriedade=fazenda, area=20.0)
+            Cultura.objects.create(ano_safra=2024, tipo_cultura=self.milho, propriedade=fazenda, area=10.0)
+
+    def test_clona_a_safra_inteira(self):
+        ultima = Alteracao.objects.count()
+        resultado = clonar_safra(2024, 2025)
+        assert resultado == {"origem": 2024, "destino": 2025, "culturas_origem": 6, "clonadas": 6,
+                             "existentes": 0, "sem_capacidade": 0}
+        assert Cultura.objects.filter(ano_safra=2025).count() == 6
+        assert Alteracao.objects.count() - ultima == 6
+        assert ResumoProdutor.objects.get(produtor=self.ana, estado=self.goias).culturas == 8
+        assert resumos_consistentes()
+        # Repetir não duplica nada.
+        assert clonar_safra(2024, 2025)["existentes"] == 6
+
+    def test_resumos_somados_em_lotes(self, monkeypatch):
+        monkeypatch.setattr("agric.models.LOTE_RESUMOS", 2)
+        assert clonar_safra(2024, 2025)["clonadas"] == 6
+        assert resumos_consistentes()
+
+    def test_existentes_e_capacidade(self):
+        # A fazenda 0 já tem soja em 2025; a fazenda 1 só tem 5 ha livres, menos que os 30 a copiar.
+        cafe = TipoCultura.objects.create(tipo_cultura="Café")
+        Cultura.objects.create(ano_safra=2025, tipo_cultura=self.soja, propriedade=self.fazendas[0], area=5.0)
+        Cultura.objects.create(ano_safra=2025, tipo_cultura=cafe, propriedade=self.fazendas[1], area=45.0)
+        resultado = clonar_safra(2024, 2025)
+        assert (resultado["clonadas"], resultado["existentes"], resultado["sem_capacidade"]) == (3, 1, 2)
+        assert Cultura.objects.get(ano_safra=2025, tipo_cultura=self.soja, propriedade=self.fazendas[0]).area == 5.0
+        assert Cultura.objects.filter(ano_safra=2025, propriedade=self.fazendas[1]).count() == 1
+        assert OcupacaoSafra.objects.get(propriedade=self.fazendas[0], ano_safra=2025).area_plantada == 15.0
+        assert resumos_consistentes()
+
+    def test_area_copiada_somada_a_ocupacao(self):
+        # Reserva confirmada por outra transação cuja cultura ainda não está visível: a virada soma
+        # a área copiada ao total em vez de sobrescrevê-lo com a soma das culturas.
+        assert OcupacaoSafra.reservar(self.fazendas[0].pk, 2025, 15.0)
+        resultado = clonar_safra(2024, 2025)
+        assert resultado["clonadas"] == 6
+        assert OcupacaoSafra.objects.get(propriedade=self.fazendas[0], ano_safra=2025).area_plantada == 45.0
+        assert OcupacaoSafra.objects.get(propriedade=self.fazendas[1], ano_safra=2025).area_plantada == 30.0
+
+    def test_incremento_respeita_a_capacidade(self):
+        assert OcupacaoSafra.reservar(self.fazendas[0].pk, 2025, 40.0)
+        with pytest.raises(DatabaseError), transaction.atomic(), connection.cursor() as cursor:
+            _ocupar_destino(cursor, 2025, [(1, self.fazendas[0].pk, 20.0, self.soja.pk), (2, self.fazendas[1].pk, 20.0, self.soja.pk)])
+        assert OcupacaoSafra.objects.get(propriedade=self.fazendas[0], ano_safra=2025).area_plantada == 40.0
+
+    @pytest.mark.skipif(not connection.features.has_select_for_update, reason="SQLite serializa as escritas")
+    def test_trava_as_propriedades(self):
+        with QueryRecorder() as recorder:
+            clonar_safra(2024, 2025, estado=self.goias.pk)
+        sqls = [q["sql"] for q in recorder.queries]
+        trava = next(i for i, sql in enumerate(sqls) if sql.endswith("FOR UPDATE"))
+        assert 'p."estado_id" = %s' in sqls[trava]
+        assert trava < next(i for i, sql in enumerate(sqls) if sql.startswith("WITH candidatas"))
+
+    def test_filtros(self):
+        assert clonar_safra(2024, 2025, estado=self.goias.pk, tipo_cultura=self.milho.pk)["clonadas"] == 2
+        assert set(Cultura.objects.filter(ano_safra=2025).values_list('tipo_cultura_id', flat=True)) == {self.milho.pk}
+        outro = Produtor.objects.create(cpf_cnpj="39053344705", tipo_documento="CPF", nome_produtor="Bia")
+        assert clonar_safra(2024, 2026, produtor=outro.pk)["culturas_origem"] == 0
+        assert resumos_consistentes()
+
+    def test_consultas_nao_dependem_da_quantidade(self):
+        with QueryRecorder() as recorder:
+            clonar_safra(2024, 2025, tipo_cultura=self.soja.pk)
+        poucas = recorder.count
+        with QueryRecorder() as recorder:
+            clonar_safra(2024, 2026)
+        assert recorder.count == poucas
+
+    def test_endpoint(self):
+        url = reverse("cultura-clonar-safra")
+        response = self.client.post(url, {"origem": 2024, "destino": 2025, "produtor": self.ana.cpf_cnpj},
+                                    format="json")
+        assert response.status_code == 200
+        assert response.data["clonadas"] == 6
+        assert self.client.post(url, {"origem": 2024, "destino": 2024}, format="json").status_code == 400
+        assert self.client.post(url, {"origem": 2024, "destino": 2025, "estado": 999},
+                                format="json").status_code == 400
+
+    def test_comando(self):
+        saida = io.StringIO()
+        call_command("clonar_safra", "2024", "2025", "--produtor", self.ana.cpf_cnpj, stdout=saida)
+        assert "6 culturas clonadas de 2024 para 2025" in saida.getvalue()
+        with pytest.raises(CommandError):
+            call_command("clonar_safra", "2024", "2024")
@@ -0,0 +1,28 @@
+import importlib
+
+from agric import settings_api
+
+
+def test_settings_api_sem_stack_admin_e_sessao():
+    """Perfil enxuto não carrega admin, sessões, mensagens nem ferramentas de dev"""
+    for app in ('django.contrib.admin', 'django.contrib.sessions', 'django.contrib.messages',
+                'django_extensions'):
+        assert app not in settings_api.INSTALLED_APPS
+    for middleware in ('django.contrib.sessions.middleware.SessionMiddleware',
+                       'django.middleware.csrf.CsrfViewMiddleware',
+                       'django.contrib.messages.middleware.MessageMiddleware'):
+        assert middleware not in settings_api.MIDDLEWARE
+
+
+def test_settings_api_docs_opcionais(monkeypatch):
+    """Documentação OpenAPI só entra no perfil enxuto com API_DOCS=1"""
+    assert 'drf_spectacular' not in settings_api.INSTALLED_APPS
+    assert 'DEFAULT_SCHEMA_CLASS' not in settings_api.REST_FRAMEWORK
+    monkeypatch.setenv("API_DOCS", "1")
+    try:
+        reloaded = importlib.reload(settings_api)
+        assert 'drf_spectacular' in reloaded.INSTALLED_APPS
+        assert 'DEFAULT_SCHEMA_CLASS' in reloaded.REST_FRAMEWORK
+    finally:
+        monkeypatch.delenv("API_DOCS")
+        importlib.reload(settings_api)
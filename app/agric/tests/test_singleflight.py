@@ -0,0 +1,146 @@
+import threading
+import time
+
+import pytest
+from rest_framework.test import APIClient
+from django.core.cache import cache
+from django.urls import reverse
+from agric.metrics import registry
+from agric.models import Estado, Cidade, Produtor, Propriedade
+from agric.querycount import QueryRecorder
+from agric.singleflight import SingleFlight, get_or_compute, flights, KEY_PREFIX
+
+
+def test_um_calculo_para_chamadas_concorrentes():
+    flight = SingleFlight()
+    chamadas = []
+    liberar = threading.Event()
+
+    def calcular():
+        chamadas.append(1)
+        liberar.wait(2)
+        return 42
+
+    resultados = []
+    threads = [threading.Thread(target=lambda: resultados.append(flight.do("k", calcular))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    liberar.set()
+    for thread in threads:
+        thread.join()
+    assert len(chamadas) == 1
+    assert sorted(resultados) == [(42, False)] + [(42, True)] * 7
+    assert not flight.running("k")
+
+
+def test_excecao_propagada_para_quem_aguarda():
+    flight = SingleFlight()
+    iniciou = threading.Event()
+    erros = []
+
+    def falhar():
+        iniciou.set()
+        time.sleep(0.1)
+        raise ValueError("falhou")
+
+    def chamar():
+        try:
+            flight.do("k", falhar)
+        except ValueError as e:
+            erros.append(str(e))
+
+    lider = threading.Thread(target=chamar)
+    lider.start()
+    iniciou.wait(1)
+    seguidor = threading.Thread(target=chamar)
+    seguidor.start()
+    lider.join()
+    seguidor.join()
+    assert erros == ["falhou", "falhou"]
+
+
+def test_valor_em_cache_ate_token_mudar():
+    chamadas = []
+
+    def calcular():
+        chamadas.append(1)
+        return len(chamadas)
+
+    assert get_or_compute("teste", calcular, token="v1") == (1, False)
+    assert get_or_compute("teste", calcular, token="v1") == (1, False)
+    assert get_or_compute("teste", calcular, token="v2") == (2, False)
+    assert len(chamadas) == 2
+
+
+def test_stale_durante_recalculo():
+    get_or_compute("teste", lambda: "antigo", token="v1")
+    liberar = threading.Event()
+    resultado = []
+
+    def recalcular():
+        liberar.wait(2)
+        return "novo"
+
+    lider = threading.Thread(target=lambda: resultado.append(get_or_compute("teste", recalcular, token="v2")))
+    lider.start()
+    while not flights.running("teste"):
+        time.sleep(0.01)
+    assert get_or_compute("teste", recalcular, token="v2") == ("antigo", True)
+    liberar.set()
+    lider.join()
+    assert resultado == [("novo", False)]
+    assert get_or_compute("teste", recalcular, token="v2") == ("novo", False)
+
+
+def test_lock_entre_workers_serve_stale():
+    get_or_compute("teste", lambda: "antigo", token="v1", cross_worker=True)
+    # Outro worker segura o lock do recálculo.
+    cache.add(f"{KEY_PREFIX}teste:lock", 1)
+    assert get_or_compute("teste", lambda: "novo", token="v2", cross_worker=True) == ("antigo", True)
+
+
+def test_lock_entre_workers_aguarda_resultado():
+    cache.add(f"{KEY_PREFIX}teste:lock", 1)
+
+    def outro_worker():
+        time.sleep(0.1)
+        cache.set(f"{KEY_PREFIX}teste", {"token": "v1", "expira": time.time() + 30, "valor": "do outro"})
+
+    thread = threading.Thread(target=outro_worker)
+    thread.start()
+    assert get_or_compute("teste", lambda: "local", token="v1", cross_worker=True, lock_timeout=2) == \
+        ("do outro", False)
+    thread.join()
+
+
+@pytest.mark.django_db
+class TestDashboardCoalescido:
+    def setup_method(self):
+        self.client = APIClient()
+        self.url = reverse("dashboard")
+
+    def test_dashboard_vazio(self):
+        response = self.client.get(self.url)
+        assert response.status_code == 200
+        assert response.data["total_fazendas"] == 0
+        assert response.data["uso_do_solo"] == {"total_agricultavel": 0.0, "total_vegetacao": 0.0,
+                                                "total_plantado": 0.0}
+
+    def test_segunda_requisicao_usa_cache(self):
+        self.client.get(self.url)
+        hits = registry.counter_value("agric_singleflight_total", {"chave": "dashboard", "resultado": "hit"})
+        with QueryRecorder() as recorder:
+            assert self.client.get(self.url).status_code == 200
+        assert recorder.count == 0
+        assert registry.counter_value("agric_singleflight_total",
+                                      {"chave": "dashboard", "resultado": "hit"}) == hits + 1
+
+    def test_escrita_recalcula(self):
+        assert self.client.get(self.url).data["total_fazendas"] == 0
+        estado = Estado.objects.create(nome_estado="Bahia")
+        cidade = Cidade.objects.create(nome_cidade="Barreiras", estado=estado)
+        produtor = Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF", nome_produtor="Ana")
+        Propriedade.objects.create(nome_propriedade="Fazenda", area_total=10.0, area_agricultavel=5.0,
+                                   area_vegetacao=5.0, cidade=cidade, produtor=produtor)
+        assert self.client.get(self.url).data["total_fazendas"] == 1
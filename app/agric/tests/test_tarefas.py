@@ -0,0 +1,200 @@
+import csv
+import io
+import time
+from datetime import timedelta
+
+import pytest
+from rest_framework.test import APIClient
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from django.utils import timezone
+from agric import tarefas
+from agric.models import Estado, Cidade, Produtor, Propriedade, TipoCultura, Cultura, Tarefa
+
+
+@pytest.fixture(autouse=True)
+def resultados(settings, tmp_path):
+    settings.JOBS_RESULT_DIR = str(tmp_path)
+    settings.JOBS_RETRY_BACKOFF = 30
+    return tmp_path
+
+
+@pytest.fixture
+def tipo_instavel(monkeypatch):
+    """
+    Registra o tipo "instavel", que falha enquanto houver falhas restantes.
+    """
+    falhas = {"restantes": 1}
+
+    def instavel(execucao):
+        if falhas["restantes"]:
+            falhas["restantes"] -= 1
+            raise RuntimeError("falha temporária")
+        return {"ok": True}
+    monkeypatch.setitem(tarefas.TIPOS, "instavel", (instavel, None))
+    return falhas
+
+
+def executar_fila():
+    call_command("executar_tarefas", "--uma-vez", "--threads", "1", stdout=io.StringIO())
+
+
+@pytest.mark.django_db
+class TestEndpointTarefas:
+    def setup_method(self):
+        self.client = APIClient()
+        self.url = reverse("tarefa-list")
+        estado = Estado.objects.create(nome_estado="Goiás")
+        cidade = Cidade.objects.create(nome_cidade="Rio Verde", estado=estado)
+        produtor = Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF", nome_produtor="Ana")
+        soja = TipoCultura.objects.create(tipo_cultura="Soja")
+        for ano in (2024, 2025, 2025):
+            propriedade = Propriedade.objects.create(
+                nome_propriedade=f"Fazenda {ano}", area_total=100.0, area_agricultavel=60.0, area_vegetacao=40.0,
+                cidade=cidade, produtor=produtor)
+            Cultura.objects.create(ano_safra=ano, tipo_cultura=soja, propriedade=propriedade, area=10.0)
+
+    def test_exportacao_ate_o_download(self):
+        response = self.client.post(self.url, {"tipo": "exportar", "parametros": {"recurso": "culturas",
+                                                                                   "ano_safra": 2025}},
+                                    format="json")
+        assert response.status_code == 202
+        assert response.data["status"] == Tarefa.PENDENTE
+        assert response["Location"] == reverse("tarefa-detail", args=[response.data["id_tarefa"]])
+
+        executar_fila()
+        tarefa = self.client.get(response["Location"]).data
+        assert (tarefa["status"], tarefa["progresso"], tarefa["resultado"]) == (Tarefa.CONCLUIDA, 1.0, {"linhas": 2})
+        download = self.client.get(tarefa["download"])
+        assert download.status_code == 200
+        assert download["Content-Disposition"].startswith("attachment")
+        linhas = list(csv.reader(io.StringIO(b"".join(download.streaming_content).decode())))
+        assert linhas[0] == ["id_cultura", "ano_safra", "tipo_cultura", "propriedade", "area"]
+        assert [linha[1] for linha in linhas[1:]] == ["2025", "2025"]
+
+    def test_download_antes_da_conclusao(self):
+        response = self.client.post(self.url, {"tipo": "exportar", "parametros": {"recurso": "produtores"}},
+                                    format="json")
+        assert response.data["download"] is None
+        assert self.client.get(reverse("tarefa-download", args=[response.data["id_tarefa"]])).status_code == 404
+
+    @pytest.mark.parametrize("payload,campo", [
+        ({"tipo": "apagar_tudo"}, "tipo"),
+        ({"tipo": "exportar", "parametros": {"recurso": "senhas"}}, "parametros"),
+        ({"tipo": "exportar", "parametros": {"recurso": "produtores", "estado": 1}}, "parametros"),
+        ({"tipo": "exportar", "parametros": {"recurso": "culturas", "ano_safra": "2025"}}, "parametros"),
+        ({"tipo": "recalcular_resumos", "parametros": {"x": 1}}, "parametros"),
+        ({"tipo": "compactar_alteracoes", "max_tentativas": 0}, "max_tentativas"),
+    ])
+    def test_payload_invalido(self, payload, campo):
+        response = self.client.post(self.url, payload, format="json")
+        assert response.status_code == 400
+        assert campo in response.data
+
+
+@pytest.mark.django_db
+class TestFila:
+    def test_prioridade_e_ordem_de_chegada(self):
+        baixa = Tarefa.objects.create(tipo="recalcular_resumos")
+        alta = Tarefa.objects.create(tipo="recalcular_resumos", prioridade=10)
+        outra_baixa = Tarefa.objects.create(tipo="recalcular_resumos")
+        ordem = [tarefas.reservar("w").pk for _ in range(3)]
+        assert ordem == [alta.pk, baixa.pk, outra_baixa.pk]
+        assert tarefas.reservar("w") is None
+
+    def test_reserva_unica(self):
+        tarefa = Tarefa.objects.create(tipo="recalcular_resumos")
+        assert tarefas.reservar("w1").pk == tarefa.pk
+        assert tarefas.reservar("w2") is None
+        assert Tarefa.objects.get().worker == "w1"
+
+    def test_repeticao_com_espera(self, tipo_instavel):
+        tarefa = Tarefa.objects.create(tipo="instavel")
+        executar_fila()
+        tarefa.refresh_from_db()
+        assert (tarefa.status, tarefa.tentativas, tarefa.mensagem) == (Tarefa.PENDENTE, 1, "falha temporária")
+        assert tarefa.disponivel_em > timezone.now() + timedelta(seconds=25)
+        Tarefa.objects.update(disponivel_em=timezone.now())
+        executar_fila()
+        tarefa.refresh_from_db()
+        assert (tarefa.status, tarefa.tentativas, tarefa.resultado) == (Tarefa.CONCLUIDA, 2, {"ok": True})
+
+    def test_falha_definitiva(self, tipo_instavel):
+        tarefa = Tarefa.objects.create(tipo="instavel", max_tentativas=1)
+        executar_fila()
+        tarefa.refresh_from_db()
+        assert tarefa.status == Tarefa.FALHOU
+        assert tarefa.concluida_em is not None
+
+    def test_reserva_expirada_volta_para_a_fila(self):
+        tarefa = Tarefa.objects.create(tipo="recalcular_resumos")
+        reservada = tarefas.reservar("w1")
+        Tarefa.objects.update(expira_em=timezone.now() - timedelta(seconds=1))
+        assert tarefas.liberar_expiradas() == 1
+        # O worker original perde a reserva: seu progresso não sobrescreve a nova execução.
+        assert tarefas.reservar("w2").pk == tarefa.pk
+        with pytest.raises(tarefas.ReservaPerdida):
+            tarefas.Execucao(reservada).progresso(0.5)
+        assert tarefas.executar(reservada) == Tarefa.PENDENTE
+        assert Tarefa.objects.get().status == Tarefa.EXECUTANDO
+
+    def test_reserva_perdida_antes_da_conclusao(self, monkeypatch, resultados):
+        def tomada_por_outro_worker(execucao):
+            execucao.caminho("csv").write_text("parcial")
+            Tarefa.objects.filter(pk=execucao.tarefa.pk).update(worker="w2")
+            return {"linhas": 1}
+        monkeypatch.setitem(tarefas.TIPOS, "lenta", (tomada_por_outro_worker, None))
+        Tarefa.objects.create(tipo="lenta")
+        assert tarefas.executar(tarefas.reservar("w1")) == Tarefa.PENDENTE
+        tarefa = Tarefa.objects.get()
+        assert (tarefa.status, tarefa.worker, tarefa.arquivo, tarefa.resultado) == (Tarefa.EXECUTANDO, "w2", "", None)
+        assert not list(resultados.iterdir())
+
+    def test_remove_tarefas_antigas_e_arquivos(self, resultados):
+        Tarefa.objects.create(tipo="exportar", parametros={"recurso": "produtores"})
+        executar_fila()
+        arquivo = resultados / Tarefa.objects.get().arquivo
+        assert arquivo.is_file()
+        assert tarefas.remover_antigas() == 0
+        Tarefa.objects.update(concluida_em=timezone.now() - timedelta(days=8))
+        assert tarefas.remover_antigas() == 1
+        assert not arquivo.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_renovador_renova_durante_tarefa_longa(settings):
+    settings.JOBS_LEASE_SECONDS = 60
+    Tarefa.objects.create(tipo="recalcular_resumos")
+    tarefas.reservar("w1")
+    Tarefa.objects.update(expira_em=timezone.now() + timedelta(seconds=1))
+    renovador = tarefas.RenovadorDeReservas("w1", intervalo=0.05)
+    renovador.start()
+    try:
+        # O laço principal está ocupado (tarefa executada inline); só a thread renova.
+        limite = time.monotonic() + 5
+        while Tarefa.objects.get().expira_em < timezone.now() + timedelta(seconds=30) and time.monotonic() < limite:
+            time.sleep(0.05)
+    finally:
+        renovador.parar()
+    assert Tarefa.objects.get().expira_em > timezone.now() + timedelta(seconds=30)
+    assert not renovador.is_alive()
+
+
+@pytest.mark.parametrize("argumentos", [("executar_tarefas", "--uma-vez"), ("clonar_safra", "2024", "2025"),
+                                        ("importar_csv", "produtores", "inexistente.csv"),
+                                        ("verificar_estado_propriedade", "--fix"), ("seed",), ("clear_data",)])
+def test_comandos_de_escrita_exigem_cache_compartilhado(settings, argumentos):
+    settings.ALLOW_LOCAL_CACHE = False
+    with pytest.raises(CommandError, match="cache compartilhado"):
+        call_command(*argumentos, stdout=io.StringIO())
+
+
+@pytest.mark.django_db
+def test_cache_compartilhado_aceito(settings, tmp_path):
+    settings.ALLOW_LOCAL_CACHE = False
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                                   "LOCATION": str(tmp_path / "cache")}}
+    saida = io.StringIO()
+    call_command("executar_tarefas", "--uma-vez", "--threads", "1", stdout=saida)
+    assert "0 tarefas executadas" in saida.getvalue()
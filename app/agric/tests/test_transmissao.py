@@ -0,0 +1,153 @@
+import asyncio
+import json
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from agric import transmissao
+from agric.dashboard import obter_dashboard
+from agric.models import Estado, Cidade, Produtor, Propriedade
+from agric.querycount import QueryRecorder
+
+
+def ler_evento(bloco):
+    """
+    Converte um bloco de texto SSE em (evento, id, dados).
+    """
+    campos = dict(linha.split(": ", 1) for linha in bloco.strip().splitlines())
+    return campos.get("event"), campos.get("id"), json.loads(campos["data"]) if "data" in campos else None
+
+
+async def proximo(stream):
+    bloco = await asyncio.wait_for(stream.__anext__(), timeout=5)
+    return bloco.decode() if isinstance(bloco, bytes) else bloco
+
+
+async def abrir(**headers):
+    response = await AsyncClient().get(reverse("dashboard-stream"), headers=headers)
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/event-stream")
+    stream = aiter(response.streaming_content)
+    assert (await proximo(stream)).startswith("retry:")
+    return stream
+
+
+async def fechar(stream):
+    """
+    Simula a desconexão do cliente: o servidor ASGI cancela a leitura em andamento.
+    """
+    leitura = asyncio.ensure_future(stream.__anext__())
+    await asyncio.sleep(0.01)
+    leitura.cancel()
+    await asyncio.gather(leitura, return_exceptions=True)
+
+
+@pytest.fixture(autouse=True)
+def stream_rapido(settings):
+    settings.DASHBOARD_STREAM_INTERVAL = 0.01
+    settings.DASHBOARD_STREAM_HEARTBEAT = 0.2
+
+
+@pytest.fixture
+def calculos(monkeypatch):
+    """
+    Conta os cálculos do dashboard feitos pelo difusor.
+    """
+    chamadas = []
+    obter = transmissao.obter_dashboard
+
+    def contar():
+        chamadas.append(1)
+        return obter()
+    monkeypatch.setattr(transmissao, "obter_dashboard", contar)
+    return chamadas
+
+
+@pytest.mark.django_db
+class TestStreamDashboard:
+    def setup_method(self):
+        estado = Estado.objects.create(nome_estado="Goiás")
+        self.cidade = Cidade.objects.create(nome_cidade="Rio Verde", estado=estado)
+        self.produtor = Produtor.objects.create(cpf_cnpj="52998224725", tipo_documento="CPF",
+                                                nome_produtor="Ana")
+
+    def criar_propriedade(self):
+        Propriedade.objects.create(nome_propriedade="Fazenda", area_total=100.0, area_agricultavel=60.0,
+                                   area_vegetacao=40.0, cidade=self.cidade, produtor=self.produtor)
+
+    def test_dashboard_e_diferencas(self):
+        async def cenario():
+            stream = await abrir()
+            evento, versao, dados = ler_evento(await proximo(stream))
+            assert evento == "dashboard" and dados["total_fazendas"] == 0
+            await sync_to_async(self.criar_propriedade)()
+            evento, nova_versao, delta = ler_evento(await proximo(stream))
+            assert evento == "delta" and nova_versao != versao
+            assert delta["total_fazendas"] == 1 and delta["total_hectares"] == 100.0
+            # Apenas os campos alterados: nenhuma cultura foi criada.
+            assert "culturas_plantadas" not in delta
+            await fechar(stream)
+        async_to_sync(cenario)()
+
+    def test_um_calculo_para_todos_os_clientes(self, calculos):
+        async def cenario():
+            streams = [await abrir() for _ in range(3)]
+            for stream in streams:
+                assert ler_evento(await proximo(stream))[0] == "dashboard"
+            assert len(calculos) == 1
+            await sync_to_async(self.criar_propriedade)()
+            for stream in streams:
+                assert ler_evento(await proximo(stream))[0] == "delta"
+            assert len(calculos) == 2
+            for stream in streams:
+                await fechar(stream)
+            assert not transmissao.difusor.assinantes
+        async_to_sync(cenario)()
+
+    def test_sem_consultas_enquanto_nada_muda(self, calculos):
+        obter_dashboard()
+
+        async def cenario():
+            stream = await abrir()
+            assert ler_evento(await proximo(stream))[0] == "dashboard"
+            # Várias conferências de versão (no cache) até o heartbeat.
+            assert await proximo(stream) == ": heartbeat\n\n"
+            await fechar(stream)
+        with QueryRecorder() as recorder:
+            async_to_sync(cenario)()
+        assert recorder.count == 0
+        assert len(calculos) == 1
+
+    def test_reconexao_com_versao_corrente(self):
+        async def cenario():
+            stream = await abrir()
+            _, versao, _ = ler_evento(await proximo(stream))
+            await fechar(stream)
+            stream = await abrir(last_event_id=versao)
+            assert await proximo(stream) == ": heartbeat\n\n"
+            await fechar(stream)
+        async_to_sync(cenario)()
+
+    def test_wsgi_entrega_unica(self):
+        response = Client().get(reverse("dashboard-stream"))
+        assert response.status_code == 200
+        blocos = b"".join(response.streaming_content).decode().split("\n\n")
+        assert blocos[0].startswith("retry:")
+        evento, versao, dados = ler_evento(blocos[1])
+        assert evento == "dashboard" and dados["total_fazendas"] == 0
+        response = Client().get(reverse("dashboard-stream"), headers={"last-event-id": versao})
+        assert b"".join(response.streaming_content).decode().count("event:") == 0
+
+
+class TestAssinante:
+    def test_cliente_lento_recebe_o_dashboard_completo(self):
+        assinante = transmissao.Assinante(tamanho=2)
+        assinante.entregar("v1", {"a": 1, "b": 1}, {"a": 1, "b": 1})
+        assinante.entregar("v2", {"a": 2, "b": 1}, {"a": 2})
+        # Fila cheia: as diferenças pendentes são trocadas pelo dashboard completo.
+        assinante.entregar("v3", {"a": 3, "b": 1}, {"a": 3})
+        assert assinante.fila.qsize() == 1
+        assert assinante.fila.get_nowait() == ("dashboard", "v3", {"a": 3, "b": 1})
+        assinante.entregar("v4", {"a": 3, "b": 2}, {"b": 2})
+        assert assinante.fila.get_nowait() == ("delta", "v4", {"b": 2})
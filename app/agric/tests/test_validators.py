@@ -1,5 +1,5 @@
 import pytest
-from agric.validators import is_valid_cpf, is_valid_cnpj, get_document_type
+from agric.validators import is_valid_cpf, is_valid_cnpj, get_document_type, parse_document
 
 # CPFs válidos e inválidos para teste
 VALID_CPF = "12345678909"
@@ -53,4 +53,12 @@ def test_get_document_type_invalido():
     assert get_document_type("123") is None
     assert get_document_type("") is None
     assert get_document_type("abc") is None
-    
\ No newline at end of file
+    
+
+def test_parse_document():
+    assert parse_document("123.456.789-09") == (VALID_CPF, "CPF", True)
+    assert parse_document("11.222.333/0001-81") == (VALID_CNPJ, "CNPJ", True)
+    assert parse_document(INVALID_CPF) == (INVALID_CPF, "CPF", False)
+    assert parse_document(REPEATED_CNPJ) == (REPEATED_CNPJ, "CNPJ", False)
+    assert parse_document("123") == ("123", None, False)
+    assert parse_document(None) == ("", None, False)
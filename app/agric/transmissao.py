@@ -0,0 +1,178 @@
+"""
+transmissao.py
+
+Atualizações do dashboard enviadas aos clientes por Server-Sent Events (/api/dashboard/stream/).
+
+- Difusor: um por processo, no event loop do ASGI. Uma única tarefa observa as versões das
+  tabelas do dashboard (no cache, sem consultas ao banco), obtém o dashboard uma vez por versão
+  (`obter_dashboard`, coalescido entre os workers) e entrega a diferença a todos os assinantes.
+- Assinante: fila limitada (DASHBOARD_STREAM_QUEUE) de um cliente. Um cliente lento que enche a
+  fila não segura os demais: suas diferenças pendentes são descartadas e ele recebe o dashboard
+  completo na próxima entrega.
+- eventos: gerador assíncrono do stream de um cliente, com o dashboard completo no início
+  (omitido se o Last-Event-ID já for a versão corrente), as diferenças seguintes e um comentário
+  de heartbeat a cada DASHBOARD_STREAM_HEARTBEAT segundos sem eventos.
+- eventos_sincronos: sob WSGI, um worker não pode manter o stream aberto; envia apenas o
+  dashboard corrente e encerra, e o EventSource reconecta após DASHBOARD_STREAM_RETRY ms.
+- notificar: escritas em Propriedade e Cultura no processo acordam o difusor após o commit (ver
+  `agric.signals`); as feitas em outros workers são percebidas pela troca de versão em até
+  DASHBOARD_STREAM_INTERVAL segundos.
+
+Eventos publicados em /metrics: agric_dashboard_stream_eventos_total{tipo} com tipo em
+dashboard (completo), delta e heartbeat.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .dashboard import DASHBOARD_MODELS, obter_dashboard, versions_token
+from .metrics import registry
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+COMPLETO = "dashboard"
+DELTA = "delta"
+
+
+class Assinante:
+    """
+    Fila de eventos de um cliente do stream.
+    """
+    def __init__(self, tamanho, ultima_versao=None):
+        self.fila = asyncio.Queue(maxsize=tamanho)
+        self.ultima_versao = ultima_versao
+        self.completo = True
+
+    def entregar(self, versao, dados, diferenca):
+        if self.completo and versao == self.ultima_versao:
+            # O cliente reconectou já com esta versão.
+            self.completo = False
+            return
+        if self.completo or self.fila.full():
+            while not self.fila.empty():
+                self.fila.get_nowait()
+            self.fila.put_nowait((COMPLETO, versao, dados))
+            self.completo = False
+        else:
+            self.fila.put_nowait((DELTA, versao, diferenca))
+
+
+class Difusor:
+    """
+    Observa as versões das tabelas do dashboard e distribui as mudanças aos assinantes.
+    """
+    def __init__(self):
+        self.assinantes = set()
+        self.versao = None
+        self.dados = None
+        self._loop = None
+        self._acordar = None
+        self._tarefa = None
+
+    def _preparar(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Primeiro stream neste event loop.
+            self.assinantes, self.versao, self.dados, self._tarefa = set(), None, None, None
+            self._loop = loop
+            self._acordar = asyncio.Event()
+        if self._tarefa is None or self._tarefa.done():
+            self._tarefa = loop.create_task(self._observar())
+
+    async def assinar(self, ultima_versao=None) -> Assinante:
+        self._preparar()
+        assinante = Assinante(settings.DASHBOARD_STREAM_QUEUE, ultima_versao)
+        self.assinantes.add(assinante)
+        if self.dados is not None:
+            assinante.entregar(self.versao, self.dados, {})
+        return assinante
+
+    def cancelar(self, assinante):
+        self.assinantes.discard(assinante)
+        if not self.assinantes and self._tarefa is not None:
+            self._tarefa.cancel()
+            self._tarefa = None
+
+    def notificar(self):
+        """
+        Acorda o difusor para conferir as versões. Pode ser chamado de qualquer thread.
+        """
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._acordar.set)
+
+    def publicar(self, versao, dados):
+        anterior = self.dados
+        diferenca = {campo: valor for campo, valor in dados.items()
+                     if anterior is None or anterior.get(campo) != valor}
+        self.versao, self.dados = versao, dados
+        if anterior is not None and not diferenca:
+            return
+        for assinante in list(self.assinantes):
+            assinante.entregar(versao, dados, diferenca)
+
+    async def _observar(self):
+        while self.assinantes:
+            self._acordar.clear()
+            try:
+                versao = await sync_to_async(versions_token)(DASHBOARD_MODELS)
+                if versao != self.versao:
+                    dados, stale = await sync_to_async(obter_dashboard)()
+                    # Dados de uma versão anterior: publica e confere de novo na próxima volta.
+                    self.publicar((self.versao or "") if stale else versao, dados)
+            except Exception as e:
+                logger.error("Erro ao atualizar o stream do dashboard: %s", str(e), exc_info=True)
+            try:
+                await asyncio.wait_for(self._acordar.wait(), settings.DASHBOARD_STREAM_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+
+difusor = Difusor()
+
+
+def evento(tipo, versao, dados) -> str:
+    registry.inc("agric_dashboard_stream_eventos_total", "Eventos enviados no stream do dashboard.",
+                 {"tipo": tipo})
+    return f"event: {tipo}\nid: {versao}\ndata: {json.dumps(dados, cls=DjangoJSONEncoder)}\n\n"
+
+
+def heartbeat() -> str:
+    registry.inc("agric_dashboard_stream_eventos_total", "Eventos enviados no stream do dashboard.",
+                 {"tipo": "heartbeat"})
+    return ": heartbeat\n\n"
+
+
+async def eventos(ultima_versao=None):
+    """
+    Gera os eventos do stream de um cliente até a desconexão.
+    """
+    assinante = await difusor.assinar(ultima_versao)
+    try:
+        yield f"retry: {settings.DASHBOARD_STREAM_RETRY}\n\n"
+        while True:
+            try:
+                tipo, versao, dados = await asyncio.wait_for(
+                    assinante.fila.get(), settings.DASHBOARD_STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield heartbeat()
+                continue
+            yield evento(tipo, versao, dados)
+    finally:
+        difusor.cancelar(assinante)
+
+
+def eventos_sincronos(ultima_versao=None):
+    """
+    Gera o stream de uma única entrega, para servidores WSGI.
+    """
+    yield f"retry: {settings.DASHBOARD_STREAM_RETRY}\n\n"
+    versao = versions_token(DASHBOARD_MODELS)
+    if versao != ultima_versao:
+        dados, stale = obter_dashboard()
+        yield evento(COMPLETO, "" if stale else versao, dados)
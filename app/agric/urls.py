@@ -17,18 +17,29 @@ para os recursos principais, e uma rota customizada para o dashboard.
 
 Rotas principais:
 - /admin/                : Interface administrativa do Django.
-- /api/produtores/       : CRUD de produtores rurais.
+- /api/produtores/       : CRUD de produtores rurais (e <cpf_cnpj>/portfolio/, com propriedades e culturas).
 - /api/estados/          : CRUD de estados.
 - /api/cidades/          : CRUD de cidades.
 - /api/tipos-cultura/    : CRUD de tipos de cultura.
 - /api/propriedades/     : CRUD de propriedades rurais.
-- /api/culturas/         : CRUD de culturas agrícolas.
+- /api/culturas/         : CRUD de culturas agrícolas (e clonar-safra/, virada de safra).
 - /api/dashboard/        : Visão consolidada dos dados (dashboard).
-"""
-from django.contrib import admin
-from django.urls import path
+- /api/dashboard/stream/ : Atualizações do dashboard por Server-Sent Events (ASGI).
+- /api/changes/          : Alterações desde um cursor (sincronização incremental).
+- /api/analytics/        : Agregações ad-hoc sobre o snapshot analítico em memória.
+- /api/distribution/     : Percentis e histograma das áreas das propriedades.
+- /api/ranking/          : Maiores produtores por área.
+- /api/geo/              : Drill-down geográfico (Brasil; estados/<id>/, cidades/<id>/, propriedades/<id>/).
+- /api/jobs/             : Fila de tarefas em segundo plano (criação, acompanhamento e download).
+- /api/slow-queries/     : Consultas SQL lentas do processo, com os planos (somente staff).
+- /metrics               : Métricas por rota no formato Prometheus (METRICS_ALLOWED_IPS ou METRICS_TOKEN).
 
+O admin e a documentação OpenAPI (/api/schema/, /api/docs/, /api/redoc/) só são registrados
+quando os respectivos apps estão instalados (ver `agric.settings_api`).
+"""
+from django.apps import apps
 from django.urls import path, include
+from django.utils.module_loading import import_string
 from rest_framework.routers import DefaultRouter
 from .views import ProdutorViewSet
 from .views import EstadoViewSet
@@ -36,9 +47,16 @@ from .views import CidadeViewSet
 from .views import TipoCulturaViewSet
 from .views import PropriedadeViewSet
 from .views import CulturaViewSet
+from .views import TarefaViewSet
 from .views import DashboardView
-
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from .views import DashboardStreamView
+from .views import AlteracoesView
+from .views import AnalyticsView
+from .views import DistribuicaoView
+from .views import RankingProdutoresView
+from .views import GeoView
+from .views import ConsultasLentasView
+from .metrics import metrics_view
 
 
 router = DefaultRouter()
@@ -48,20 +66,58 @@ router.register(r'cidades', CidadeViewSet, basename='cidade')
 router.register(r'tipos-cultura', TipoCulturaViewSet, basename='tipocultura')
 router.register(r'propriedades', PropriedadeViewSet, basename='propriedade')
 router.register(r'culturas', CulturaViewSet, basename='cultura')
+router.register(r'jobs', TarefaViewSet, basename='tarefa')
+
+
+def lazy_view(dotted_path, **initkwargs):
+    """
+    Retorna uma view que só importa a classe `dotted_path` no primeiro acesso.
+    Evita carregar o drf_spectacular na inicialização dos workers.
+    """
+    view = None
+
+    def wrapper(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(dotted_path).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+    wrapper.csrf_exempt = True
+    return wrapper
 
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('api/', include(router.urls)),
     path('api/dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('api/dashboard/stream/', DashboardStreamView.as_view(), name='dashboard-stream'),
+    path('api/changes/', AlteracoesView.as_view(), name='alteracoes'),
+    path('api/analytics/', AnalyticsView.as_view(), name='analytics'),
+    path('api/distribution/', DistribuicaoView.as_view(), name='distribuicao'),
+    path('api/ranking/', RankingProdutoresView.as_view(), name='ranking'),
+    path('api/geo/', GeoView.as_view(), name='geo'),
+    path('api/geo/estados/<int:pk>/', GeoView.as_view(), {'nivel': 'estado'}, name='geo-estado'),
+    path('api/geo/cidades/<int:pk>/', GeoView.as_view(), {'nivel': 'cidade'}, name='geo-cidade'),
+    path('api/geo/propriedades/<int:pk>/', GeoView.as_view(), {'nivel': 'propriedade'},
+         name='geo-propriedade'),
+    path('api/slow-queries/', ConsultasLentasView.as_view(), name='consultas-lentas'),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 
-urlpatterns += [
-    # Gera o schema OpenAPI em formato JSON
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    # Interface Swagger UI
-    path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-    # Interface Redoc
-    path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
-]
\ No newline at end of file
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+    urlpatterns += [
+        path('admin/', admin.site.urls),
+    ]
+
+
+if apps.is_installed('drf_spectacular'):
+    urlpatterns += [
+        # Gera o schema OpenAPI em formato JSON
+        path('api/schema/', lazy_view('drf_spectacular.views.SpectacularAPIView'), name='schema'),
+        # Interface Swagger UI
+        path('api/docs/', lazy_view('drf_spectacular.views.SpectacularSwaggerView', url_name='schema'),
+             name='swagger-ui'),
+        # Interface Redoc
+        path('api/redoc/', lazy_view('drf_spectacular.views.SpectacularRedocView', url_name='schema'),
+             name='redoc'),
+    ]
\ No newline at end of file
@@ -9,6 +9,7 @@ Funções:
 - is_valid_cpf(cpf): Valida um CPF brasileiro.
 - is_valid_cnpj(cnpj): Valida um CNPJ brasileiro.
 - get_document_type(value): Retorna 'CPF', 'CNPJ' ou None conforme o valor informado.
+- parse_document(value): Normaliza, identifica e valida o documento em uma única passada.
 
 Essas funções são utilizadas para garantir a integridade dos dados de produtores rurais no sistema agric.
 """
@@ -29,13 +30,17 @@ def is_valid_cpf(cpf) -> bool:
     - Não pode ser uma sequência repetida.
     - Validação dos dígitos verificadores conforme algoritmo oficial.
     """
-    cpf = re.sub(r'\D', '', cpf)
+    return _cpf_digits_ok(re.sub(r'\D', '', cpf))
+
+
+def _cpf_digits_ok(cpf) -> bool:
+    # `cpf` já contém apenas dígitos; cada dígito é convertido uma única vez.
     if len(cpf) != 11 or cpf == cpf[0] * 11:
         return False
+    digits = [int(d) for d in cpf]
     for i in range(9, 11):
-        value = sum((int(cpf[num]) * ((i+1) - num) for num in range(0, i)))
-        check = ((value * 10) % 11) % 10
-        if check != int(cpf[i]):
+        value = sum(d * w for d, w in zip(digits, range(i + 1, 1, -1)))
+        if (value * 10) % 11 % 10 != digits[i]:
             return False
     return True
 
@@ -55,34 +60,22 @@ def is_valid_cnpj(cnpj) -> bool:
     - Não pode ser uma sequência repetida.
     - Validação dos dígitos verificadores conforme algoritmo oficial.
     """    
-    cnpj = re.sub(r'\D', '', cnpj)
+    return _cnpj_digits_ok(re.sub(r'\D', '', cnpj))
+
+
+# Pesos dos dois dígitos verificadores do CNPJ.
+_CNPJ_WEIGHTS = ((5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2), (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2))
+
+
+def _cnpj_digits_ok(cnpj) -> bool:
+    # `cnpj` já contém apenas dígitos; cada dígito é convertido uma única vez.
     if len(cnpj) != 14 or cnpj == cnpj[0] * 14:
         return False
-    size = 12
-    numbers = cnpj[:size]
-    digits = cnpj[size:]
-    sum_ = 0
-    pos = size - 7
-    for i in range(size):
-        sum_ += int(numbers[i]) * pos
-        pos -= 1
-        if pos < 2:
-            pos = 9
-    result = sum_ % 11
-    if int(digits[0]) != (0 if result < 2 else 11 - result):
-        return False
-    size += 1
-    numbers = cnpj[:size]
-    sum_ = 0
-    pos = size - 7
-    for i in range(size):
-        sum_ += int(numbers[i]) * pos
-        pos -= 1
-        if pos < 2:
-            pos = 9
-    result = sum_ % 11
-    if int(digits[1]) != (0 if result < 2 else 11 - result):
-        return False
+    digits = [int(d) for d in cnpj]
+    for i, weights in enumerate(_CNPJ_WEIGHTS, start=12):
+        result = sum(d * w for d, w in zip(digits, weights)) % 11
+        if digits[i] != (0 if result < 2 else 11 - result):
+            return False
     return True
 
 
@@ -101,4 +94,24 @@ def get_document_type(value) -> str:
         return 'CPF'
     elif len(value) == 14:
         return 'CNPJ'
-    return None
\ No newline at end of file
+    return None
+
+
+def parse_document(value) -> tuple:
+    """
+    Normaliza, identifica e valida um documento em uma única passada (uma remoção de máscara
+    e uma conferência dos dígitos verificadores).
+
+    Args:
+        value (str): Número do documento, com ou sem máscara.
+
+    Returns:
+        tuple: (documento apenas com dígitos, 'CPF', 'CNPJ' ou None, True se os dígitos
+        verificadores conferem).
+    """
+    digits = re.sub(r'\D', '', value or '')
+    if len(digits) == 11:
+        return digits, 'CPF', _cpf_digits_ok(digits)
+    if len(digits) == 14:
+        return digits, 'CNPJ', _cnpj_digits_ok(digits)
+    return digits, None, False
@@ -0,0 +1,112 @@
+"""
+versioning.py
+
+Carimbos de versão por tabela, guardados no cache do Django (`CACHES['default']`).
+
+Cada model tem uma versão (timestamp em nanossegundos) trocada a cada escrita na tabela
+(ver `agric.signals`). Caches em memória de cada processo comparam a versão que carregaram
+com a versão corrente para saber se precisam recarregar. Com um backend de cache compartilhado
+(Memcached, Redis, DatabaseCache) a invalidação vale para todos os workers; com o LocMemCache
+padrão, vale apenas dentro do processo. Por isso o worker de tarefas e os comandos que escrevem
+dados chamam `exigir_cache_compartilhado` e recusam iniciar com um cache local ao processo (a
+menos que ALLOW_LOCAL_CACHE=1, ex: testes e uso com um único processo).
+
+Há também versões por objeto (`get_object_version`/`bump_object_version`), usadas pelo cache de
+representações (`agric.reprcache`) para invalidar um único registro sem descartar a tabela.
+Elas expiram após `OBJECT_VERSION_TIMEOUT` segundos; uma versão expirada é recriada com outro
+valor, o que apenas força a releitura do objeto.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+KEY_PREFIX = "agric:versao:"
+OBJECT_VERSION_TIMEOUT = 24 * 60 * 60
+
+
+def version_key(model) -> str:
+    return f"{KEY_PREFIX}{model._meta.label_lower}"
+
+
+def get_version(model) -> int:
+    """
+    Retorna a versão corrente da tabela de `model`, inicializando-a se ainda não existir.
+    """
+    key = version_key(model)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(models) -> dict:
+    """
+    Retorna {model: versão} para vários models com uma única leitura no cache.
+    """
+    keys = {version_key(model): model for model in models}
+    found = cache.get_many(list(keys))
+    result = {}
+    for key, model in keys.items():
+        result[model] = found[key] if key in found else get_version(model)
+    return result
+
+
+def bump_version(model) -> int:
+    """
+    Troca a versão da tabela de `model`, invalidando os caches que dependem dela.
+    """
+    version = time.time_ns()
+    cache.set(version_key(model), version, timeout=None)
+    return version
+
+
+def object_version_key(model, pk) -> str:
+    return f"{KEY_PREFIX}{model._meta.label_lower}:{pk}"
+
+
+def get_object_version(model, pk) -> int:
+    """
+    Retorna a versão corrente do objeto `pk` de `model`, inicializando-a se ainda não existir.
+    """
+    key = object_version_key(model, pk)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=OBJECT_VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def bump_object_version(model, pk) -> int:
+    """
+    Troca a versão do objeto `pk` de `model`.
+    """
+    version = time.time_ns()
+    cache.set(object_version_key(model, pk), version, timeout=OBJECT_VERSION_TIMEOUT)
+    return version
+
+
+def cache_compartilhado() -> bool:
+    """
+    Indica se o cache padrão é visto por todos os processos (as versões gravadas por um comando
+    ou pelo worker chegam aos processos da API).
+    """
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def exigir_cache_compartilhado(comando):
+    """
+    Levanta CommandError se o cache for local ao processo: as escritas de `comando` não
+    invalidariam os caches dos processos da API (304, cache de referência, dashboard).
+    """
+    from django.core.management.base import CommandError
+
+    if not cache_compartilhado() and not settings.ALLOW_LOCAL_CACHE:
+        raise CommandError(
+            f"{comando} precisa de um cache compartilhado entre os processos (CACHES['default'] é "
+            f"{settings.CACHES['default']['BACKEND']}). Configure DJANGO_CACHE_BACKEND/DJANGO_CACHE_LOCATION "
+            "(ex: Redis) ou, com um único processo, ALLOW_LOCAL_CACHE=1.")
@@ -13,27 +13,51 @@ Inclui ViewSets para os principais recursos do domínio agrícola:
 
 Cada ViewSet provê operações CRUD completas, com suporte a filtros por identificadores 
 customizados (ex: cpf_cnpj, id_estado, etc).
+Listagens, detalhes e o dashboard suportam GET condicional (ETag/Last-Modified, ver
+`agric.conditional`); as tabelas de referência podem ser guardadas por proxies reversos.
 Também expõe um endpoint customizado para o dashboard consolidado, que retorna estatísticas 
 agregadas sobre fazendas, culturas e uso do solo.
 
 Classes:
-- ProdutorViewSet: CRUD de produtores rurais.
+- ProdutorViewSet: CRUD de produtores rurais e portfólio (propriedades e culturas) do produtor.
 - EstadoViewSet: CRUD de estados.
 - CidadeViewSet: CRUD de cidades.
 - TipoCulturaViewSet: CRUD de tipos de cultura.
 - PropriedadeViewSet: CRUD de propriedades rurais.
-- CulturaViewSet: CRUD de culturas agrícolas.
+- CulturaViewSet: CRUD de culturas agrícolas e virada de safra (cópia das culturas de uma safra).
 - DashboardView: Endpoint GET para estatísticas consolidadas.
+- DashboardStreamView: Stream (Server-Sent Events) das atualizações do dashboard.
+- AlteracoesView: Endpoint GET de sincronização incremental (alterações desde um cursor).
+- AnalyticsView: Endpoint GET de agregações ad-hoc, respondidas pelo snapshot em memória.
+- DistribuicaoView: Endpoint GET de percentis e histograma das áreas das propriedades.
+- RankingProdutoresView: Endpoint GET dos maiores produtores por área.
+- GeoView: Drill-down geográfico (Brasil → estado → cidade → propriedade) com filhos paginados.
+- TarefaViewSet: Enfileiramento, acompanhamento e download do resultado de tarefas em segundo plano.
+- ConsultasLentasView: Consultas SQL lentas do processo, com os planos capturados (somente staff).
 """
 from rest_framework import viewsets
+from rest_framework import mixins
+from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.permissions import IsAdminUser
 from rest_framework import status
-from django.db.models import F, Sum, Count
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.serializers import as_serializer_error
+from rest_framework.renderers import BaseRenderer
+import json
 import time
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.urls import reverse
 
-from .models import Produtor
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+
+from .models import Produtor, ResumoProdutor
 from .serializers import ProdutorSerializer
+from .serializers import PortfolioSerializer
 from .models import Estado
 from .serializers import EstadoSerializer
 from .models import Cidade
@@ -42,29 +66,57 @@ from .models import TipoCultura
 from .serializers import TipoCulturaSerializer
 from .models import Cultura
 from .serializers import CulturaSerializer
+from .serializers import ClonarSafraSerializer, ClonarSafraResultadoSerializer
 from .models import Propriedade
+from .models import erro_de_restricao
 from .serializers import PropriedadeSerializer
 from .serializers import DashboardResponseSerializer
+from .models import Tarefa
+from .serializers import TarefaSerializer
+from .tarefas import diretorio_de_resultados
+from .dashboard import DASHBOARD_MODELS, obter_dashboard
+from .transmissao import eventos, eventos_sincronos
+from .alteracoes import CursorExpirado, pagina_de_alteracoes
+from .resumos import CAMPOS, MEDIDAS, obter_distribuicao, obter_ranking
+from .geo import NoNaoEncontrado, abrir
+from .safras import clonar_safra
+from .consultas_lentas import registro as consultas_lentas
+from .conditional import ConditionalGetMixin
+from .reprcache import RepresentationCacheMixin
 
-from drf_spectacular.utils import extend_schema
-from drf_spectacular.utils import extend_schema_view
-from drf_spectacular.utils import OpenApiExample
+from .schema import extend_schema
+from .schema import extend_schema_view
+from .schema import OpenApiExample
+from .schema import OpenApiParameter
 
 import logging
 logger = logging.getLogger(__name__)
 
 
-class LoggingModelViewSet(viewsets.ModelViewSet):
+def _log(view, acao, inicio, erro=None, **campos):
+    """
+    Registra a conclusão (ou, com `erro`, a falha) de uma ação iniciada em `inicio`
+    (time.monotonic()). A mensagem é fixa: view, ação, tempo e os demais `campos` vão apenas
+    nos campos estruturados (`extra`), exibidos pelos formatters de texto e JSON (ver `agric.logs`).
+    """
+    extra = {"view": view, "acao": acao, "tempo": time.monotonic() - inicio, **campos}
+    if erro is None:
+        logger.info("Ação concluída", extra=extra)
+    else:
+        logger.error("Erro na ação: %s", erro, exc_info=True, extra=extra)
+
+
+class LoggingModelViewSet(ConditionalGetMixin, RepresentationCacheMixin, viewsets.ModelViewSet):
     """
     ModelViewSet base com logging de tempo de execução, usuário e tratamento de exceções 
-    para operações CRUD.
+    para operações CRUD, GET condicional em list/retrieve e retrieve servido pelo cache
+    de representações (`agric.reprcache`).
     """
     def list(self, request, *args, **kwargs):
         user = getattr(request, "user", None)
         start = time.monotonic()
         response = super().list(request, *args, **kwargs)
-        elapsed = time.monotonic() - start
-        logger.info("Usuário %s acessou list %s | Tempo: %.3fs", user, self.__class__.__name__, elapsed)
+        _log(self.__class__.__name__, "list", start, usuario=str(user))
         return response
 
     def create(self, request, *args, **kwargs):
@@ -72,11 +124,10 @@ class LoggingModelViewSet(viewsets.ModelViewSet):
         start = time.monotonic()
         try:
             response = super().create(request, *args, **kwargs)
-            logger.info("Usuário %s criou em %s | Tempo: %.3fs", user, self.__class__.__name__, time.monotonic() - start)
+            _log(self.__class__.__name__, "create", start, usuario=str(user))
             return response
         except Exception as e:
-            elapsed = time.monotonic() - start
-            logger.error("Erro ao criar em %s por %s: %s | Tempo: %.3fs", self.__class__.__name__, user, str(e), elapsed, exc_info=True)
+            _log(self.__class__.__name__, "create", start, erro=e, usuario=str(user))
             raise
 
     def update(self, request, *args, **kwargs):
@@ -84,11 +135,10 @@ class LoggingModelViewSet(viewsets.ModelViewSet):
         start = time.monotonic()
         try:
             response = super().update(request, *args, **kwargs)
-            logger.info("Usuário %s atualizou em %s | Tempo: %.3fs", user, self.__class__.__name__, time.monotonic() - start)
+            _log(self.__class__.__name__, "update", start, usuario=str(user))
             return response
         except Exception as e:
-            elapsed = time.monotonic() - start
-            logger.error("Erro ao atualizar em %s por %s: %s | Tempo: %.3fs", self.__class__.__name__, user, str(e), elapsed, exc_info=True)
+            _log(self.__class__.__name__, "update", start, erro=e, usuario=str(user))
             raise
 
 
@@ -97,11 +147,10 @@ class LoggingModelViewSet(viewsets.ModelViewSet):
         start = time.monotonic()
         try:
             response = super().partial_update(request, *args, **kwargs)
-            logger.info("Usuário %s fez PATCH em %s | Tempo: %.3fs", user, self.__class__.__name__, time.monotonic() - start)
+            _log(self.__class__.__name__, "partial_update", start, usuario=str(user))
             return response
         except Exception as e:
-            elapsed = time.monotonic() - start
-            logger.error("Erro ao fazer PATCH em %s por %s: %s | Tempo: %.3fs", self.__class__.__name__, user, str(e), elapsed, exc_info=True)
+            _log(self.__class__.__name__, "partial_update", start, erro=e, usuario=str(user))
             raise
 
 
@@ -110,13 +159,40 @@ class LoggingModelViewSet(viewsets.ModelViewSet):
         start = time.monotonic()
         try:
             response = super().destroy(request, *args, **kwargs)
-            logger.info("Usuário %s deletou em %s | Tempo: %.3fs", user, self.__class__.__name__, time.monotonic() - start)
+            _log(self.__class__.__name__, "destroy", start, usuario=str(user))
             return response
         except Exception as e:
-            elapsed = time.monotonic() - start
-            logger.error("Erro ao deletar em %s por %s: %s | Tempo: %.3fs", self.__class__.__name__, user, str(e), elapsed, exc_info=True)
+            _log(self.__class__.__name__, "destroy", start, erro=e, usuario=str(user))
             raise
 
+    # A escrita e sua linha no log de alterações (gravada em agric.signals) são confirmadas juntas.
+    # savepoint=False: sem SAVEPOINT extra quando já há uma transação aberta.
+    # Violações das CheckConstraints que escaparem aos serializers viram 400 com a mensagem de sempre.
+    def perform_create(self, serializer):
+        try:
+            with transaction.atomic(savepoint=False):
+                super().perform_create(serializer)
+        except IntegrityError as e:
+            raise self.erro_de_integridade(e) from e
+
+    def perform_update(self, serializer):
+        try:
+            with transaction.atomic(savepoint=False):
+                super().perform_update(serializer)
+        except IntegrityError as e:
+            raise self.erro_de_integridade(e) from e
+
+    def perform_destroy(self, instance):
+        with transaction.atomic(savepoint=False):
+            super().perform_destroy(instance)
+
+    @staticmethod
+    def erro_de_integridade(erro):
+        validacao = erro_de_restricao(erro)
+        if validacao is None:
+            return erro
+        return ValidationError(as_serializer_error(validacao))
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -169,6 +245,16 @@ class LoggingModelViewSet(viewsets.ModelViewSet):
         description="Remove um produtor rural do sistema.",
         responses={204: None}
     ),
+    portfolio=extend_schema(
+        summary="Portfólio do produtor",
+        description=(
+            "Retorna o produtor com seus totais (propriedades, áreas, culturas e área plantada, mantidos "
+            "a cada escrita) e suas propriedades, com os nomes da cidade e do estado e as culturas de "
+            "cada uma. O número de consultas é fixo, qualquer que seja o tamanho do portfólio."
+        ),
+        parameters=[OpenApiParameter("ano_safra", int, description="Inclui apenas as culturas do ano-safra.")],
+        responses={200: PortfolioSerializer}
+    ),
 )
 class ProdutorViewSet(LoggingModelViewSet):
     """
@@ -176,10 +262,46 @@ class ProdutorViewSet(LoggingModelViewSet):
 
     Permite listar, criar, consultar, atualizar e deletar produtores.
     O campo `cpf_cnpj` pode ser CPF ou CNPJ, e é usado como identificador único.
+    O portfólio (/portfolio/) carrega propriedades e culturas com Prefetch: quatro consultas
+    (produtor, resumos, propriedades e culturas), com os nomes vindos do cache de referência.
     """
     queryset = Produtor.objects.all()
     serializer_class = ProdutorSerializer
     lookup_field = 'cpf_cnpj'
+    portfolio_models = (Produtor, Propriedade, Cultura, Cidade, Estado, TipoCultura)
+
+    def get_queryset(self):
+        if self.action != "portfolio":
+            return super().get_queryset()
+        culturas = Cultura.objects.order_by('-ano_safra', 'tipo_cultura_id')
+        ano_safra = parametro_inteiro(self.request, "ano_safra")
+        if ano_safra is not None:
+            culturas = culturas.filter(ano_safra=ano_safra)
+        return Produtor.objects.prefetch_related(
+            Prefetch('resumos', queryset=ResumoProdutor.objects.filter(estado_id=ResumoProdutor.TODOS)),
+            Prefetch('propriedades', queryset=Propriedade.objects.order_by('-area_total', 'pk').prefetch_related(
+                Prefetch('culturas', queryset=culturas))))
+
+    def get_serializer_class(self):
+        if self.action == "portfolio":
+            return PortfolioSerializer
+        return super().get_serializer_class()
+
+    def get_version_models(self):
+        if self.action == "portfolio":
+            return self.portfolio_models
+        return super().get_version_models()
+
+    @action(detail=True, methods=["get"])
+    def portfolio(self, request, *args, **kwargs):
+        return self.conditional_response(request, self.montar_portfolio)
+
+    def montar_portfolio(self, request):
+        start = time.monotonic()
+        data = self.get_serializer(self.get_object()).data
+        _log(self.__class__.__name__, "portfolio", start, cpf_cnpj=data["cpf_cnpj"],
+             propriedades=len(data["propriedades"]))
+        return Response(data, status=status.HTTP_200_OK)
 
 
 @extend_schema_view(
@@ -220,7 +342,9 @@ class ProdutorViewSet(LoggingModelViewSet):
 class EstadoViewSet(LoggingModelViewSet):
     """
     Endpoints para gestão de estados.
+    Listagem e detalhe podem ser guardados por proxies reversos (Cache-Control: public).
     """
+    public_cache = True
     queryset = Estado.objects.all()
     serializer_class = EstadoSerializer
     lookup_field = 'id_estado'
@@ -264,11 +388,20 @@ class EstadoViewSet(LoggingModelViewSet):
 class CidadeViewSet(LoggingModelViewSet):
     """
     ViewSet para operações CRUD de Cidade.
+    Listagem e detalhe podem ser guardados por proxies reversos (Cache-Control: public).
     """
+    public_cache = True
     queryset = Cidade.objects.all()
     serializer_class = CidadeSerializer
     lookup_field = 'id_cidade'
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('update', 'partial_update'):
+            # O UniqueTogetherValidator lê instance.estado; sem o JOIN seria uma query a mais.
+            queryset = queryset.select_related('estado')
+        return queryset
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -308,7 +441,9 @@ class CidadeViewSet(LoggingModelViewSet):
 class TipoCulturaViewSet(LoggingModelViewSet):
     """
     ViewSet para operações CRUD de TipoCultura.
+    Listagem e detalhe podem ser guardados por proxies reversos (Cache-Control: public).
     """
+    public_cache = True
     queryset = TipoCultura.objects.all()
     serializer_class = TipoCulturaSerializer
     lookup_field = 'id_tipo_cultura'
@@ -352,8 +487,9 @@ class TipoCulturaViewSet(LoggingModelViewSet):
 class PropriedadeViewSet(LoggingModelViewSet):
     """
     ViewSet para operações CRUD de Propriedade.
+    O produtor é exposto pelo documento, lido no mesmo SELECT (join pela chave inteira).
     """
-    queryset = Propriedade.objects.all()
+    queryset = Propriedade.objects.select_related('produtor')
     serializer_class = PropriedadeSerializer
     lookup_field = 'id_propriedade'
 
@@ -361,7 +497,11 @@ class PropriedadeViewSet(LoggingModelViewSet):
 @extend_schema_view(
     list=extend_schema(
         summary="Listar culturas",
-        description="Retorna todas as culturas agrícolas cadastradas.",
+        description=(
+            "Retorna todas as culturas agrícolas cadastradas. Filtre por `ano_safra` para consultar "
+            "uma única safra (com a tabela particionada, apenas a partição da safra é lida)."
+        ),
+        parameters=[OpenApiParameter("ano_safra", int, description="Ano da safra")],
         responses={200: CulturaSerializer(many=True)}
     ),
     create=extend_schema(
@@ -392,15 +532,66 @@ class PropriedadeViewSet(LoggingModelViewSet):
         description="Remove uma cultura do sistema.",
         responses={204: None}
     ),
+    clonar_safra=extend_schema(
+        summary="Virada de safra",
+        description=(
+            "Copia as culturas da safra `origem` para `destino` em uma única instrução SQL, com filtros "
+            "opcionais por estado, produtor e tipo de cultura. Culturas já existentes no destino são "
+            "mantidas, e propriedades sem área agricultável livre para todas as culturas copiadas ficam "
+            "de fora. Retorna as contagens."
+        ),
+        request=ClonarSafraSerializer,
+        responses={200: ClonarSafraResultadoSerializer},
+        examples=[
+            OpenApiExample(
+                'Exemplo de requisição',
+                value={"origem": 2024, "destino": 2025, "estado": 3},
+                request_only=True
+            )
+        ]
+    ),
 )
 class CulturaViewSet(LoggingModelViewSet):
     """
     ViewSet para operações CRUD de Cultura.
+    A listagem aceita o filtro `?ano_safra=`; POST /clonar-safra/ copia as culturas de uma safra
+    para outra (ver `agric.safras`).
     """
     queryset = Cultura.objects.all()
     serializer_class = CulturaSerializer
     lookup_field = 'id_cultura'
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        ano_safra = self.request.query_params.get('ano_safra')
+        if self.action == 'list' and ano_safra is not None:
+            if not ano_safra.isdigit():
+                raise ValidationError({"ano_safra": "Informe um ano válido."})
+            queryset = queryset.filter(ano_safra=int(ano_safra))
+        if self.action in ('update', 'partial_update'):
+            # O UniqueTogetherValidator lê instance.tipo_cultura e instance.propriedade; sem o JOIN,
+            # a propriedade seria lida duas vezes em um PUT (campo do serializer e validador).
+            queryset = queryset.select_related('tipo_cultura', 'propriedade')
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == "clonar_safra":
+            return ClonarSafraSerializer
+        return super().get_serializer_class()
+
+    @action(detail=False, methods=["post"], url_path="clonar-safra")
+    def clonar_safra(self, request):
+        start = time.monotonic()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        dados = serializer.validated_data
+        resultado = clonar_safra(dados['origem'], dados['destino'],
+                                 *(dados[campo].pk if campo in dados else None
+                                   for campo in ('estado', 'produtor', 'tipo_cultura')))
+        _log(self.__class__.__name__, "clonar_safra", start, usuario=str(request.user), origem=dados['origem'],
+             destino=dados['destino'])
+        return Response(resultado, status=status.HTTP_200_OK)
+
 
 @extend_schema(
     summary="Dashboard consolidado",
@@ -421,60 +612,450 @@ class CulturaViewSet(LoggingModelViewSet):
                     {"nome_estado": "São Paulo", "qtd_fazendas": 1, "total_hectares": 70.5}
                 ],
                 "culturas_plantadas": [
-                    {"tipo_cultura": "Grãos", "qtd": 2},
-                    {"tipo_cultura": "Frutas", "qtd": 1}
+                    {"tipo_cultura": "Grãos", "qtd": 2, "area": 120.0},
+                    {"tipo_cultura": "Frutas", "qtd": 1, "area": 30.0}
                 ],
                 "uso_do_solo": {
                     "total_agricultavel": 200.0,
-                    "total_vegetacao": 50.5
+                    "total_vegetacao": 50.5,
+                    "total_plantado": 150.0
                 }
             },
             response_only=True
         )
     ]
 )
-class DashboardView(APIView):
+class DashboardView(ConditionalGetMixin, APIView):
     """
     Endpoint somente leitura para estatísticas consolidadas do sistema.
+    Responde 304 enquanto nenhuma das tabelas agregadas mudar. O cálculo é feito uma única
+    vez por versão das tabelas, mesmo sob requisições concorrentes (ver `agric.dashboard`).
     """
+    version_models = DASHBOARD_MODELS
+
     def get(self, request):
         logger.info("Dashboard acessado por %s", request.user)
+        return self.conditional_response(request, self.calcular)
+
+    def calcular(self, request):
         start = time.monotonic()
         try:
-            total_fazendas = Propriedade.objects.count()
-            total_hectares = Propriedade.objects.aggregate(total=Sum('area_total'))['total'] or 0
-
-            fazendas_por_estado = list(Propriedade.objects
-                    .values(nome_estado=F('cidade__estado__nome_estado'))
-                    .annotate(qtd_fazendas=Count('id_propriedade'),
-                        total_hectares=Sum('area_total'))
-                    .order_by('-qtd_fazendas'))
-
-            culturas = (Cultura.objects
-                    .values(nome_tipo_cultura=F('tipo_cultura__tipo_cultura'))
-                    .annotate(qtd=Count('id_cultura'))
-                    .order_by('-qtd'))
-            culturas_list = [{"tipo_cultura": item["nome_tipo_cultura"], 
-                              "qtd": item["qtd"]} for item in culturas]
-
-            uso_solo = Propriedade.objects.aggregate(total_agricultavel=Sum('area_agricultavel'),
-                total_vegetacao=Sum('area_vegetacao'))
-
-            data = {
-                "total_fazendas": total_fazendas,
-                "total_hectares": total_hectares,
-                "fazendas_por_estado": fazendas_por_estado,
-                "culturas_plantadas": culturas_list,
-                "uso_do_solo": uso_solo,
-            }
-            serializer = DashboardResponseSerializer(data=data)
-            serializer.is_valid(raise_exception=True)
+            data, stale = obter_dashboard()
             logger.debug("Dados do dashboard: %s", data)
-            return Response(serializer.data, status=status.HTTP_200_OK)
         except Exception as e:
-            logger.error("Erro ao calcular estatísticas do dashboard: %s", str(e), exc_info=True)
+            _log("DashboardView", "get", start, erro=e)
             raise
-        finally:
-            elapsed = time.monotonic() - start
-            logger.info("Tempo de execução do dashboard: %.3fs", elapsed)
+        _log("DashboardView", "get", start, stale=stale)
+        response = Response(data, status=status.HTTP_200_OK)
+        response.stale = stale
+        return response
+
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Renderer de text/event-stream: o corpo vem do StreamingHttpResponse da view; respostas de
+    erro (autenticação, throttling) viram um evento `erro`.
+    """
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return f"event: erro\ndata: {json.dumps(data)}\n\n".encode()
+
+
+@extend_schema(
+    summary="Stream de atualizações do dashboard",
+    description=(
+        "Server-Sent Events: envia o dashboard completo (evento `dashboard`) e, a cada escrita "
+        "nas tabelas agregadas, apenas os campos alterados (evento `delta`), com um comentário "
+        "de heartbeat nos intervalos sem eventos. O `id` de cada evento é a versão do dashboard: "
+        "ao reconectar com `Last-Event-ID` ainda corrente, o dashboard completo não é reenviado. "
+        "Requer servidor ASGI; sob WSGI, envia o dashboard corrente e encerra (o cliente reconecta)."
+    ),
+    responses={(200, "text/event-stream"): str},
+)
+class DashboardStreamView(APIView):
+    """
+    Endpoint de atualizações do dashboard por Server-Sent Events, sem polling dos clientes.
+    Um único cálculo por versão é distribuído a todos os clientes do processo (ver
+    `agric.transmissao`).
+    """
+    renderer_classes = [EventStreamRenderer]
+
+    def get(self, request):
+        logger.info("Stream do dashboard aberto por %s", request.user)
+        ultima_versao = request.headers.get("Last-Event-ID")
+        if isinstance(request._request, ASGIRequest):
+            conteudo = eventos(ultima_versao)
+        else:
+            conteudo = eventos_sincronos(ultima_versao)
+        response = StreamingHttpResponse(conteudo, content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # Sem buffer em proxies reversos (nginx).
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+@extend_schema(
+    summary="Alterações desde um cursor",
+    description=(
+        "Retorna, em ordem, as criações, atualizações e exclusões posteriores ao cursor `since`, "
+        "com a representação atual de cada objeto criado ou alterado (cada objeto aparece uma vez "
+        "por página). Use o `cursor` retornado na próxima chamada enquanto `mais` for verdadeiro. "
+        "Cursores anteriores à retenção do log retornam 410: recarregue as tabelas e continue a "
+        "partir do `cursor` informado na resposta."
+    ),
+    parameters=[
+        OpenApiParameter("since", int, description="Cursor da última página recebida (0 no início)."),
+        OpenApiParameter("limit", int, description="Máximo de alterações lidas do log nesta página (até CHANGES_PAGE_SIZE)."),
+    ],
+    examples=[
+        OpenApiExample(
+            'Exemplo de resposta',
+            value={
+                "cursor": 1042,
+                "mais": False,
+                "alteracoes": [
+                    {"modelo": "produtor", "chave": "12345678901", "operacao": "U",
+                     "dados": {"cpf_cnpj": "12345678901", "tipo_documento": "CPF", "nome_produtor": "João Silva"}},
+                    {"modelo": "cultura", "chave": "17", "operacao": "D", "dados": None}
+                ]
+            },
+            response_only=True
+        )
+    ]
+)
+class AlteracoesView(APIView):
+    """
+    Endpoint somente leitura para sincronização incremental a partir do log de alterações
+    (ver `agric.alteracoes`).
+    """
+    def get(self, request):
+        parametros = {}
+        for nome in ("since", "limit"):
+            valor = request.query_params.get(nome)
+            if valor is not None:
+                if not valor.isdigit():
+                    raise ValidationError({nome: "Informe um inteiro não negativo."})
+                parametros[nome] = int(valor)
+        try:
+            data = pagina_de_alteracoes(parametros.get("since", 0), parametros.get("limit"))
+        except CursorExpirado as e:
+            logger.info("Cursor de alterações expirado: %s (mínimo %s)", parametros.get("since", 0), e.cursor_minimo)
+            return Response({"detail": "Cursor expirado: recarregue os dados e continue a partir de `cursor`.",
+                             "cursor": e.cursor_atual}, status=status.HTTP_410_GONE)
+        return Response(data, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    summary="Agregações ad-hoc",
+    description=(
+        "Agrupa propriedades ou culturas pelas dimensões informadas e calcula as medidas pedidas, "
+        "a partir de um snapshot colunar em memória (sem consultar o banco enquanto os dados não mudam). "
+        "Dimensões: estado, cidade, produtor, tipo_documento e, para culturas, tipo_cultura e ano_safra. "
+        "Medidas: `count`, `sum:<campo>`, `mean:<campo>` (area_total, area_agricultavel e area_vegetacao "
+        "para propriedades; area para culturas) e `distinct:<dimensão>`."
+    ),
+    parameters=[
+        OpenApiParameter("fonte", str, enum=["propriedades", "culturas"], description="Padrão: culturas."),
+        OpenApiParameter("dimensoes", str, description="Dimensões separadas por vírgula (ex: estado,ano_safra)."),
+        OpenApiParameter("medidas", str, description="Medidas separadas por vírgula (padrão: count)."),
+    ],
+    examples=[
+        OpenApiExample(
+            'Exemplo de resposta',
+            value={
+                "fonte": "culturas",
+                "dimensoes": ["estado", "ano_safra"],
+                "medidas": ["count", "sum:area"],
+                "linhas": [
+                    {"estado": "Goiás", "ano_safra": 2024, "count": 12, "sum:area": 310.5},
+                    {"estado": "Goiás", "ano_safra": 2025, "count": 9, "sum:area": 254.0}
+                ]
+            },
+            response_only=True
+        )
+    ]
+)
+class AnalyticsView(APIView):
+    """
+    Endpoint somente leitura para agregações ad-hoc sobre o snapshot analítico em memória
+    (ver `agric.analytics`).
+    """
+    def get(self, request):
+        # NumPy só é importado no primeiro acesso, fora da inicialização dos workers.
+        from .analytics import ConsultaInvalida, snapshot
+
+        start = time.monotonic()
+        fonte = request.query_params.get("fonte", "culturas")
+        dimensoes = [d for d in request.query_params.get("dimensoes", "").split(",") if d]
+        medidas = [m for m in request.query_params.get("medidas", "count").split(",") if m]
+        try:
+            linhas = snapshot.consultar(fonte, dimensoes, medidas)
+        except ConsultaInvalida as e:
+            raise ValidationError({"detail": str(e)})
+        _log("AnalyticsView", "get", start, fonte=fonte, dimensoes=dimensoes)
+        return Response({"fonte": fonte, "dimensoes": dimensoes, "medidas": medidas, "linhas": linhas},
+                        status=status.HTTP_200_OK)
+
+
+def parametro_inteiro(request, nome, padrao=None, minimo=0, maximo=None):
+    """
+    Lê o parâmetro inteiro `nome` da query string, levantando ValidationError (400) se inválido.
+    """
+    valor = request.query_params.get(nome)
+    if valor is None:
+        return padrao
+    if not valor.isdigit() or int(valor) < minimo or (maximo is not None and int(valor) > maximo):
+        intervalo = f"entre {minimo} e {maximo}" if maximo is not None else f"a partir de {minimo}"
+        raise ValidationError({nome: f"Informe um inteiro {intervalo}."})
+    return int(valor)
+
+
+def parametro_opcao(request, nome, opcoes, padrao):
+    valor = request.query_params.get(nome, padrao)
+    if valor not in opcoes:
+        raise ValidationError({nome: f"Use um de: {', '.join(opcoes)}."})
+    return valor
+
+
+FILTROS_RESUMOS = [
+    OpenApiParameter("estado", int, description="Filtra pelo id do estado."),
+    OpenApiParameter("ano_safra", int, description="Filtra as propriedades com culturas no ano-safra."),
+]
+
+
+@extend_schema(
+    summary="Distribuição das áreas das propriedades",
+    description=(
+        "Retorna quantidade, mínimo, máximo, média, percentis (p10 a p99) e histograma de faixas de "
+        "mesma largura de `area_total` ou `area_agricultavel`, calculados no banco. No PostgreSQL os "
+        "percentis são exatos; nos demais bancos são estimados com erro relativo de até 1% "
+        "(`aproximado`). O resultado fica em cache até a próxima escrita em propriedades (ou culturas, "
+        "com `ano_safra`)."
+    ),
+    parameters=FILTROS_RESUMOS + [
+        OpenApiParameter("campo", str, enum=list(CAMPOS), description="Padrão: area_total."),
+        OpenApiParameter("faixas", int, description="Faixas do histograma (1 a 100, padrão 10)."),
+    ],
+    examples=[
+        OpenApiExample(
+            'Exemplo de resposta',
+            value={
+                "campo": "area_total", "total": 3, "minimo": 100.0, "maximo": 300.0, "media": 200.0,
+                "percentis": {"p10": 120.0, "p25": 150.0, "p50": 200.0, "p75": 250.0, "p90": 280.0, "p99": 298.0},
+                "aproximado": False,
+                "histograma": [{"de": 100.0, "ate": 200.0, "qtd": 1}, {"de": 200.0, "ate": 300.0, "qtd": 2}]
+            },
+            response_only=True
+        )
+    ]
+)
+class DistribuicaoView(APIView):
+    """
+    Endpoint somente leitura para a distribuição das áreas das propriedades (ver `agric.resumos`).
+    """
+    def get(self, request):
+        start = time.monotonic()
+        campo = parametro_opcao(request, "campo", CAMPOS, "area_total")
+        data, _ = obter_distribuicao(campo, parametro_inteiro(request, "estado"),
+                                     parametro_inteiro(request, "ano_safra"),
+                                     parametro_inteiro(request, "faixas", 10, minimo=1, maximo=100))
+        _log("DistribuicaoView", "get", start, campo=campo)
+        return Response(data, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    summary="Ranking de produtores por área",
+    description=(
+        "Retorna os `limite` maiores produtores pela soma de `area_total` ou `area_agricultavel` das "
+        "suas propriedades (lida dos totais por produtor mantidos a cada escrita; com `ano_safra`, "
+        "apenas das propriedades com cultura na safra), ou, com `medida=area_plantada`, pela área "
+        "plantada no `ano_safra` (obrigatório nesse caso)."
+    ),
+    parameters=FILTROS_RESUMOS + [
+        OpenApiParameter("medida", str, enum=list(MEDIDAS), description="Padrão: area_total."),
+        OpenApiParameter("limite", int, description="Quantidade de produtores (1 a 100, padrão 10)."),
+    ],
+    examples=[
+        OpenApiExample(
+            'Exemplo de resposta',
+            value={
+                "medida": "area_total",
+                "produtores": [
+                    {"posicao": 1, "cpf_cnpj": "12345678901", "nome_produtor": "João Silva",
+                     "propriedades": 3, "valor": 1500.0}
+                ]
+            },
+            response_only=True
+        )
+    ]
+)
+class RankingProdutoresView(APIView):
+    """
+    Endpoint somente leitura para o ranking de produtores por área (ver `agric.resumos`).
+    """
+    def get(self, request):
+        start = time.monotonic()
+        medida = parametro_opcao(request, "medida", MEDIDAS, "area_total")
+        ano_safra = parametro_inteiro(request, "ano_safra")
+        if medida == "area_plantada" and ano_safra is None:
+            raise ValidationError({"ano_safra": "Informe o ano-safra com medida=area_plantada."})
+        data, _ = obter_ranking(medida, parametro_inteiro(request, "estado"), ano_safra,
+                                parametro_inteiro(request, "limite", 10, minimo=1, maximo=100))
+        _log("RankingProdutoresView", "get", start, medida=medida)
+        return Response(data, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    summary="Drill-down geográfico",
+    description=(
+        "Abre um nó da hierarquia Brasil → estado → cidade → propriedade: totais de propriedades, "
+        "áreas e culturas (com a abertura por tipo de cultura) e uma página dos filhos, ordenados pela "
+        "área total. Os totais de estados e cidades vêm de tabelas de resumo mantidas a cada escrita, "
+        "então abrir um nó custa o mesmo qualquer que seja o volume abaixo dele. Cada filho traz a "
+        "`url` do seu próprio nó; `proxima` aponta a página seguinte dos filhos."
+    ),
+    parameters=[
+        OpenApiParameter("limite", int, description="Filhos por página (1 a 500, padrão 50)."),
+        OpenApiParameter("offset", int, description="Posição do primeiro filho (padrão 0)."),
+    ],
+    examples=[
+        OpenApiExample(
+            'Exemplo de resposta',
+            value={
+                "no": {"nivel": "estado", "id": 1, "nome": "Goiás", "propriedades": 2, "area_total": 300.0,
+                       "area_agricultavel": 200.0, "area_vegetacao": 100.0, "culturas": 3,
+                       "area_plantada": 150.0,
+                       "por_cultura": [{"tipo_cultura": "Soja", "culturas": 3, "area_plantada": 150.0}]},
+                "filhos": [
+                    {"nivel": "cidade", "id": 7, "nome": "Rio Verde", "propriedades": 2, "area_total": 300.0,
+                     "area_agricultavel": 200.0, "area_vegetacao": 100.0, "culturas": 3, "area_plantada": 150.0,
+                     "url": "http://localhost:8000/api/geo/cidades/7/"}
+                ],
+                "proxima": None
+            },
+            response_only=True
+        )
+    ]
+)
+class GeoView(ConditionalGetMixin, APIView):
+    """
+    Endpoint somente leitura do drill-down geográfico (ver `agric.geo`).
+    Responde 304 enquanto nenhuma das tabelas do dashboard mudar.
+    """
+    version_models = DASHBOARD_MODELS
+    rotas = {"estado": "geo-estado", "cidade": "geo-cidade", "propriedade": "geo-propriedade"}
+
+    def get(self, request, nivel="brasil", pk=None):
+        return self.conditional_response(request, self.abrir, nivel, pk)
+
+    def abrir(self, request, nivel, pk):
+        start = time.monotonic()
+        limite = parametro_inteiro(request, "limite", 50, minimo=1, maximo=500)
+        offset = parametro_inteiro(request, "offset", 0)
+        try:
+            data = abrir(nivel, pk, limite, offset)
+        except NoNaoEncontrado as e:
+            raise NotFound(str(e))
+        for filho in data["filhos"]:
+            filho["url"] = request.build_absolute_uri(reverse(self.rotas[filho["nivel"]], args=[filho["id"]]))
+        proxima = None
+        if data.pop("mais"):
+            proxima = replace_query_param(request.build_absolute_uri(), "offset", offset + limite)
+        _log("GeoView", "get", start, nivel=nivel, pk=pk)
+        return Response({**data, "proxima": proxima}, status=status.HTTP_200_OK)
+
+
+@extend_schema_view(
+    create=extend_schema(
+        summary="Enfileira uma tarefa em segundo plano",
+        description=(
+            "Cria uma tarefa pendente, executada pelo comando `executar_tarefas`, e responde 202 com "
+            "a tarefa (Location aponta para o acompanhamento). Tipos: `exportar` (parâmetros `recurso` "
+            "= produtores, propriedades ou culturas, e os filtros `estado` e `ano_safra`), "
+            "`recalcular_resumos` e `compactar_alteracoes` (`dias`). Tarefas de maior `prioridade` "
+            "são executadas primeiro; falhas são repetidas até `max_tentativas`."
+        ),
+        examples=[
+            OpenApiExample(
+                'Exportar culturas de uma safra',
+                value={"tipo": "exportar", "parametros": {"recurso": "culturas", "ano_safra": 2025}, "prioridade": 5},
+                request_only=True
+            )
+        ]
+    ),
+    retrieve=extend_schema(
+        summary="Acompanha uma tarefa",
+        description="Retorna status, progresso (0 a 1), tentativas, resultado e a URL de download do arquivo gerado."
+    ),
+    download=extend_schema(
+        summary="Baixa o arquivo de resultado",
+        description="Transmite o arquivo gerado pela tarefa concluída (404 enquanto não houver arquivo).",
+        responses={(200, 'text/csv'): bytes}
+    ),
+)
+class TarefaViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    ViewSet da fila de tarefas em segundo plano (ver `agric.tarefas`): criação, acompanhamento
+    e download do resultado.
+    """
+    queryset = Tarefa.objects.all()
+    serializer_class = TarefaSerializer
+    lookup_field = 'id_tarefa'
+
+    def create(self, request, *args, **kwargs):
+        start = time.monotonic()
+        response = super().create(request, *args, **kwargs)
+        _log(self.__class__.__name__, "create", start, usuario=str(request.user), id_tarefa=response.data["id_tarefa"],
+             tipo=response.data["tipo"])
+        response.status_code = status.HTTP_202_ACCEPTED
+        response["Location"] = reverse("tarefa-detail", args=[response.data["id_tarefa"]])
+        return response
+
+    @action(detail=True, methods=["get"])
+    def download(self, request, *args, **kwargs):
+        tarefa = self.get_object()
+        if tarefa.status != Tarefa.CONCLUIDA or not tarefa.arquivo:
+            raise Http404("A tarefa não tem arquivo de resultado.")
+        caminho = diretorio_de_resultados() / tarefa.arquivo
+        if not caminho.is_file():
+            raise Http404("Arquivo de resultado removido.")
+        # FileResponse transmite o arquivo em blocos, sem carregá-lo em memória.
+        return FileResponse(open(caminho, "rb"), as_attachment=True, filename=tarefa.arquivo)
+
+
+@extend_schema_view(
+    get=extend_schema(
+        summary="Consultas lentas",
+        description=(
+            "Últimas consultas SQL deste processo acima de `SLOW_QUERY_MS` (mais recentes primeiro), com "
+            "rota, duração, parâmetros redigidos e a origem no código, e o plano (`EXPLAIN`) capturado na "
+            "primeira ocorrência de cada formato de query. Somente para usuários staff."
+        ),
+        parameters=[
+            OpenApiParameter("limite", int, description="Quantidade de consultas (1 a 1000, padrão 50)."),
+            OpenApiParameter("rota", str, description="Apenas as consultas de uma rota (nome da URL)."),
+        ],
+    ),
+    delete=extend_schema(summary="Limpa as consultas lentas", description="Esvazia o anel e os planos do processo."),
+)
+class ConsultasLentasView(APIView):
+    """
+    Endpoint do log de consultas lentas do processo (ver `agric.consultas_lentas`).
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        data = consultas_lentas.listar(parametro_inteiro(request, "limite", 50, minimo=1, maximo=1000),
+                                       request.query_params.get("rota") or None)
+        return Response(data, status=status.HTTP_200_OK)
 
+    def delete(self, request):
+        consultas_lentas.limpar()
+        logger.info("Consultas lentas limpas", extra={"view": "ConsultasLentasView", "usuario": str(request.user)})
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark de inicialização da API agric.
+
+Compara perfis de configuração (por padrão `agric.settings` e `agric.settings_api`)
+medindo, em processos Python novos (como um worker recém-criado do gunicorn):
+- setup: tempo de `django.setup()`
+- urls: tempo de importação do ROOT_URLCONF (views, serializers, roteador)
+- primeira_resposta: tempo da primeira requisição GET /api/ pelo cliente de testes
+- processo: tempo total do processo filho, incluindo a inicialização do interpretador
+
+Uso:
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --runs 20 --settings agric.settings agric.settings_api
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+
+CHILD = """
+import json, time
+t0 = time.perf_counter()
+import django
+from django.conf import settings
+django.setup()
+t1 = time.perf_counter()
+from django.utils.module_loading import import_module
+import_module(settings.ROOT_URLCONF)
+t2 = time.perf_counter()
+from django.test import Client
+client = Client()
+t3 = time.perf_counter()
+response = client.get("/api/")
+t4 = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({"setup": t1 - t0, "urls": t2 - t1, "primeira_resposta": t4 - t3}))
+"""
+
+
+def run_once(settings_module) -> dict:
+    """
+    Executa um processo filho com o perfil informado e retorna os tempos medidos (em segundos).
+    """
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings_module,
+           "DJANGO_LOG_LEVEL": "WARNING", "DJANGO_READ_DOTENV": "0"}
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=APP_DIR, env=env,
+                         check=True, capture_output=True, text=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["processo"] = time.perf_counter() - start
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de inicialização dos perfis de settings.")
+    parser.add_argument("--runs", type=int, default=10, help="Execuções por perfil")
+    parser.add_argument("--settings", nargs="+", default=["agric.settings", "agric.settings_api"])
+    parser.add_argument("--json", action="store_true", help="Imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    report = {}
+    for settings_module in args.settings:
+        runs = [run_once(settings_module) for _ in range(args.runs)]
+        report[settings_module] = {
+            metric: {"mediana_ms": statistics.median(r[metric] for r in runs) * 1000,
+                     "min_ms": min(r[metric] for r in runs) * 1000}
+            for metric in runs[0]
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for settings_module, metrics in report.items():
+        print(settings_module)
+        for metric, values in metrics.items():
+            print(f"  {metric:<18} mediana {values['mediana_ms']:8.1f} ms   min {values['min_ms']:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Gerador de carga concorrente para a API agric.
+
+Simula N usuários virtuais (threads), cada um com sua própria `requests.Session`
+(conexões persistentes), executando cenários sorteados conforme os pesos informados:
+- crud: cria, consulta, altera (PATCH) e remove uma propriedade.
+- dashboard: consulta o dashboard consolidado (polling).
+- listagem: lista um dos recursos (produtores, estados, cidades, tipos de cultura,
+  propriedades ou culturas) e consulta um item da lista.
+
+Ao final, reporta por endpoint: requisições, taxa de erros, vazão e latências p50/p95/p99.
+
+Pré-requisitos: API rodando (runserver ou gunicorn) e base com ao menos uma cidade e um
+produtor (ex: `python scripts/seed_api.py` ou `--seed`).
+
+Uso:
+    python scripts/load_api.py --usuarios 20 --duracao 60
+    python scripts/load_api.py --url http://localhost:8000/api --cenarios crud=1,dashboard=3,listagem=2
+    python scripts/load_api.py --usuarios 50 --duracao 30 --json resultado.json
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+import seed_api
+
+
+RECURSOS = {
+    "produtores": "cpf_cnpj",
+    "estados": "id_estado",
+    "cidades": "id_cidade",
+    "tipos-cultura": "id_tipo_cultura",
+    "propriedades": "id_propriedade",
+    "culturas": "id_cultura",
+}
+
+
+class Estatisticas:
+    """
+    Latências e erros por endpoint, compartilhados entre os usuários virtuais.
+    """
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.erros = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def registrar(self, endpoint, latencia, ok):
+        with self._lock:
+            self.latencias[endpoint].append(latencia)
+            if not ok:
+                self.erros[endpoint] += 1
+
+    def relatorio(self, duracao) -> dict:
+        resultado = {}
+        for endpoint, amostras in sorted(self.latencias.items()):
+            ordenadas = sorted(amostras)
+            resultado[endpoint] = {
+                "requisicoes": len(ordenadas),
+                "erros": self.erros[endpoint],
+                "taxa_erro": self.erros[endpoint] / len(ordenadas),
+                "vazao_rps": len(ordenadas) / duracao,
+                "p50_ms": percentil(ordenadas, 50) * 1000,
+                "p95_ms": percentil(ordenadas, 95) * 1000,
+                "p99_ms": percentil(ordenadas, 99) * 1000,
+            }
+        return resultado
+
+
+def percentil(ordenadas, p) -> float:
+    indice = min(len(ordenadas) - 1, max(0, round(p / 100 * len(ordenadas)) - 1))
+    return ordenadas[indice]
+
+
+class UsuarioVirtual(threading.Thread):
+    """
+    Executa cenários sorteados em loop até o prazo, com uma sessão HTTP própria.
+    """
+    def __init__(self, numero, cenarios, prazo, estatisticas, referencias):
+        super().__init__(name=f"usuario-{numero}", daemon=True)
+        self.http = requests.Session()
+        self.rng = random.Random(numero)
+        self.nomes, self.pesos = zip(*cenarios.items())
+        self.prazo = prazo
+        self.estatisticas = estatisticas
+        self.referencias = referencias
+        self.contador = 0
+
+    def requisicao(self, metodo, endpoint, caminho, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            resposta = self.http.request(metodo, f"{seed_api.API_URL}/{caminho}", timeout=30, **kwargs)
+            ok = resposta.status_code < 400
+        except requests.RequestException:
+            resposta, ok = None, False
+        self.estatisticas.registrar(f"{metodo} {endpoint}", time.perf_counter() - inicio, ok)
+        return resposta if ok else None
+
+    def run(self):
+        while time.monotonic() < self.prazo:
+            cenario = self.rng.choices(self.nomes, self.pesos)[0]
+            getattr(self, f"cenario_{cenario}")()
+
+    def cenario_dashboard(self):
+        self.requisicao("GET", "/dashboard/", "dashboard/")
+
+    def cenario_listagem(self):
+        recurso = self.rng.choice(list(RECURSOS))
+        resposta = self.requisicao("GET", f"/{recurso}/", f"{recurso}/")
+        if resposta is not None and resposta.json():
+            item = self.rng.choice(resposta.json())
+            self.requisicao("GET", f"/{recurso}/{{id}}/", f"{recurso}/{item[RECURSOS[recurso]]}/")
+
+    def cenario_crud(self):
+        self.contador += 1
+        criada = self.requisicao("POST", "/propriedades/", "propriedades/", json={
+            "nome_propriedade": f"Carga {self.name} {self.contador}",
+            "area_total": 100.0,
+            "area_agricultavel": 60.0,
+            "area_vegetacao": 40.0,
+            "cidade": self.rng.choice(self.referencias["cidades"]),
+            "produtor": self.rng.choice(self.referencias["produtores"]),
+        })
+        if criada is None:
+            return
+        caminho = f"propriedades/{criada.json()['id_propriedade']}/"
+        self.requisicao("GET", "/propriedades/{id}/", caminho)
+        self.requisicao("PATCH", "/propriedades/{id}/", caminho, json={"area_vegetacao": 30.0})
+        self.requisicao("DELETE", "/propriedades/{id}/", caminho)
+
+
+def parse_cenarios(valor) -> dict:
+    """
+    Converte "crud=1,dashboard=3" em {"crud": 1.0, "dashboard": 3.0}.
+    """
+    cenarios = {}
+    for item in filter(None, (p.strip() for p in valor.split(","))):
+        nome, _, peso = item.partition("=")
+        if not hasattr(UsuarioVirtual, f"cenario_{nome}"):
+            raise SystemExit(f"Cenário desconhecido: {nome}")
+        cenarios[nome] = float(peso or 1)
+    return cenarios
+
+
+def carregar_referencias() -> dict:
+    """
+    Busca ids de cidades e documentos de produtores existentes para o cenário de CRUD.
+    """
+    http = seed_api.session()
+    cidades = [c["id_cidade"] for c in http.get(f"{seed_api.API_URL}/cidades/").json()]
+    produtores = [p["cpf_cnpj"] for p in http.get(f"{seed_api.API_URL}/produtores/").json()]
+    return {"cidades": cidades, "produtores": produtores}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerador de carga concorrente para a API agric.")
+    parser.add_argument("--url", default=seed_api.API_URL, help="URL base da API (padrão: %(default)s)")
+    parser.add_argument("--usuarios", type=int, default=10, help="Usuários virtuais concorrentes")
+    parser.add_argument("--duracao", type=float, default=30, help="Duração do teste em segundos")
+    parser.add_argument("--cenarios", default="crud=1,dashboard=3,listagem=2",
+                        help="Pesos dos cenários (padrão: %(default)s)")
+    parser.add_argument("--seed", action="store_true", help="Popula a base via scripts/seed_api.py antes")
+    parser.add_argument("--json", help="Grava o relatório neste arquivo JSON")
+    args = parser.parse_args()
+
+    seed_api.API_URL = args.url.rstrip("/")
+    cenarios = parse_cenarios(args.cenarios)
+    if args.seed:
+        seed_api.main()
+    referencias = carregar_referencias()
+    if "crud" in cenarios and not (referencias["cidades"] and referencias["produtores"]):
+        raise SystemExit("Cenário crud requer cidades e produtores cadastrados (use --seed).")
+
+    estatisticas = Estatisticas()
+    prazo = time.monotonic() + args.duracao
+    inicio = time.perf_counter()
+    usuarios = [UsuarioVirtual(i, cenarios, prazo, estatisticas, referencias) for i in range(args.usuarios)]
+    for usuario in usuarios:
+        usuario.start()
+    for usuario in usuarios:
+        usuario.join()
+    duracao = time.perf_counter() - inicio
+
+    relatorio = estatisticas.relatorio(duracao)
+    total = sum(r["requisicoes"] for r in relatorio.values())
+    erros = sum(r["erros"] for r in relatorio.values())
+    print(f"{args.usuarios} usuários, {duracao:.1f}s, {total} requisições "
+          f"({total / duracao:.1f} req/s), {erros} erros")
+    print(f"{'endpoint':<32} {'req':>7} {'req/s':>8} {'erro':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, r in relatorio.items():
+        print(f"{endpoint:<32} {r['requisicoes']:>7} {r['vazao_rps']:>8.1f} {r['taxa_erro']:>7.1%} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"usuarios": args.usuarios, "duracao": duracao, "cenarios": cenarios,
+                       "endpoints": relatorio}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
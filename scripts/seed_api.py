@@ -16,14 +16,33 @@ Características:
 
 Uso:
     python scripts/seed_api.py
+    AGRIC_API_URL=http://localhost:8000/api python scripts/seed_api.py
 
+As requisições compartilham uma `requests.Session` (conexões HTTP reaproveitadas).
+As funções `post` e `session` também são usadas pelo gerador de carga `scripts/load_api.py`.
 """
+import os
 import requests
 import random
 from datetime import datetime
 from faker import Faker
 
 
+API_URL = os.getenv("AGRIC_API_URL", "http://localhost:8000/api")
+
+_session = None
+
+
+def session() -> requests.Session:
+    """
+    Retorna a sessão HTTP compartilhada do processo, criando-a no primeiro uso.
+    """
+    global _session
+    if _session is None:
+        _session = requests.Session()
+    return _session
+
+
 def main():
     """
     Função principal que executa o processo de seed.
@@ -132,15 +151,15 @@ def main():
     print("Seed via API concluido!")
 
 
-def post(endpoint, data) -> dict:
+def post(endpoint, data, http=None) -> dict:
     """
     Envia uma requisição POST para a API para criar um novo recurso.
         :param endpoint: O endpoint da API onde o recurso será criado.
         :param data: Os dados a serem enviados no corpo da requisição.
+        :param http: Sessão HTTP a utilizar (padrão: sessão compartilhada do processo).
         :return: O JSON retornado pela API ou None em caso de erro.
     """
-    API_URL = "http://localhost:8000/api"
-    r = requests.post(f"{API_URL}/{endpoint}/", json=data)
+    r = (http or session()).post(f"{API_URL}/{endpoint}/", json=data)
     if r.status_code not in (200, 201):
         print(f"Erro ao criar em {endpoint}: {r.status_code} - {r.text}")
     return r.json() if r.ok else None